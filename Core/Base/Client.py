@@ -86,6 +86,17 @@ class Client(object):
     # Execute the method
     return getattr(rpcClient, toExecute)(*parms)
 
+  def batch(self, url='', timeout=None):
+    """ Return an object collecting calls to the service, to send them in a single round trip.
+        Note that the calls go directly to the service, bypassing the methods of the client class.
+
+        :param url: url of the service. If not set, use self.serverURL
+        :param timeout: timeout of the whole batch. If not given, self.timeout will be used
+
+        :return: :py:class:`~DIRAC.Core.DISET.private.RPCBatch.RPCBatch`
+    """
+    return self._getRPC(url=url, timeout=timeout).batch()
+
   def _getRPC(self, rpc=None, url='', timeout=None):
     """ Return an RPCClient object constructed following the attributes.
 
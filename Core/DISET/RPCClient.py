@@ -8,6 +8,7 @@ __RCSID__ = "$Id$"
 
 
 from DIRAC.Core.DISET.private.InnerRPCClient import InnerRPCClient
+from DIRAC.Core.DISET.private.RPCBatch import RPCBatch
 
 
 class _MagicMethod(object):
@@ -88,6 +89,17 @@ class RPCClient(object):
     """
     return self.__innerRPCClient.executeRPC(sFunctionName, args, **kwargs)
 
+  def batch(self):
+    """ Get an object collecting the calls to this service, to execute them in a single round trip.
+        See :py:class:`~DIRAC.Core.DISET.private.RPCBatch.RPCBatch`::
+
+          with rpc.batch() as batch:
+            batch.setJobStatus(1, 'Running', '', 'source')
+            batch.setJobStatus(2, 'Running', '', 'source')
+          results = batch.result['Value']
+    """
+    return RPCBatch(self.__innerRPCClient.executeBatchRPC)
+
   def __getattr__(self, attrName):
     """ Function for emulating the existence of functions.
 
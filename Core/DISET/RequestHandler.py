@@ -14,9 +14,11 @@ import six
 
 import DIRAC
 
+from DIRAC.Core.DISET import BATCH_RPC_ACTION
 from DIRAC.Core.DISET.private.FileHelper import FileHelper
 from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR, isReturnStructure
 from DIRAC.Core.Utilities import Time
+from DIRAC.Core.Utilities.DErrno import ENOAUTH
 from DIRAC.ConfigurationSystem.Client.Config import gConfig
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
 from DIRAC.Core.Security.Properties import CS_ADMINISTRATOR
@@ -127,6 +129,8 @@ class RequestHandler(object):
     try:
       if actionType == "RPC":
         retVal = self.__doRPC(actionTuple[1])
+      elif actionType == BATCH_RPC_ACTION:
+        retVal = self.__doBatchRPC()
       elif actionType == "FileTransfer":
         retVal = self.__doFileTransfer(actionTuple[1])
       elif actionType == "Connection":
@@ -246,6 +250,30 @@ class RequestHandler(object):
     self.__logRemoteQuery("RPC/%s" % method, args)
     return self.__RPCCallFunction(method, args)
 
+  def __doBatchRPC(self):
+    """
+    Execute several RPC calls sent at once.
+    Each call is authorized on its own, and an error in one call does not prevent the others.
+
+    :return: S_OK(list of the S_OK/S_ERROR returned by each call, in the same order)
+    """
+    retVal = self.__trPool.receive(self.__trid)
+    if not retVal['OK']:
+      raise RequestHandler.ConnectionError("Error while receiving arguments %s %s" %
+                                           (self.srv_getFormattedRemoteCredentials(), retVal['Message']))
+    results = []
+    for method, args in retVal['Value']:
+      self.__logRemoteQuery("%s/%s" % (BATCH_RPC_ACTION, method), args)
+      if not self.__authQuery(method):
+        gLogger.warn("Unauthorized query", "%s in a batch by %s" % (method, self.srv_getFormattedRemoteCredentials()))
+        results.append(S_ERROR(ENOAUTH, "Unauthorized query"))
+        continue
+      result = self.__RPCCallFunction(method, args)
+      if not isReturnStructure(result):
+        result = S_ERROR("Method %s does not return a S_OK/S_ERROR!" % method)
+      results.append(result)
+    return S_OK(results)
+
   def __RPCCallFunction(self, method, args):
     """
       Check the arguments then call the RPC function
@@ -427,16 +455,17 @@ class RequestHandler(object):
 #
 ####
 
-  # @classmethod
-  # def __authQuery( cls, method ):
-  #  """
-  #  Check if connecting user is allowed to perform an action
-  #
-  #  :type method: string
-  #  :param method: Method to check
-  #  :return: S_OK/S_ERROR
-  #  """
-  #  return cls.__srvInfoDict[ 'authManager' ].authQuery( method, cls.getRemoteCredentials() )
+  def __authQuery(self, method):
+    """
+    Check if connecting user is allowed to perform an RPC call.
+    The proposal only authorizes a whole action, this is used for the calls of a batch.
+
+    :type method: string
+    :param method: Method to check
+    :return: bool
+    """
+    return self.__srvInfoDict['authManager'].authQuery(method, self.getRemoteCredentials(),
+                                                       getattr(self, "auth_%s" % method, False))
 
   def __logRemoteQuery(self, method, args):
     """
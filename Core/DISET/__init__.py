@@ -10,3 +10,5 @@ __RCSID__ = "$Id$"
 DEFAULT_RPC_TIMEOUT = 600
 #: Default timeout to establish a connection
 DEFAULT_CONNECTION_TIMEOUT = 10
+#: Action (DISET) or method (HTTPS) executing several RPC calls in one round trip
+BATCH_RPC_ACTION = 'BatchRPC'
@@ -0,0 +1,145 @@
+""" Asynchronous counterpart of InnerRPCClient.
+    It is used through :py:class:`DIRAC.Core.Tornado.Client.AsyncRPCClient.AsyncRPCClient`.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+from datetime import timedelta
+
+from tornado import gen
+
+from DIRAC.Core.DISET.private.BaseClient import BaseClient
+from DIRAC.Core.DISET.private.ConnectionPool import ConnectionPool
+from DIRAC.Core.DISET.private.InnerRPCClient import InnerRPCClient
+from DIRAC.Core.DISET.private.Transports.AsyncTransport import AsyncTransport, getAsyncConnectionPool, getSSLContext
+from DIRAC.Core.Security import Locations
+from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
+
+
+class AsyncInnerRPCClient(BaseClient):
+  """ Performs the RPC calls without blocking the event loop:
+
+        * borrows an idle connection from the pool of the loop, or connects
+        * proposes the action
+        * sends the method parameters
+        * retrieves the result
+        * gives the connection back to the pool if the server agreed to keep it open
+
+      The URL and the credentials are discovered as for the blocking client.
+      Credentials delegation (used by the Gateways) is not supported.
+  """
+
+  def __getSSLContext(self):
+    """ Return the SSL context matching the credentials of this client, or None for dip """
+    if self._getURLTuple()[0] != 'dips':
+      return S_OK(None)
+    if self.kwargs.get(self.KW_PROXY_STRING):
+      return S_ERROR("Proxy string not supported")
+    if self.kwargs.get(self.KW_USE_CERTIFICATES):
+      certKeyTuple = Locations.getHostCertificateAndKeyLocation()
+      if not certKeyTuple:
+        return S_ERROR("No host certificate found")
+      certFile, keyFile = certKeyTuple
+    else:
+      certFile = self.kwargs.get(self.KW_PROXY_LOCATION) or Locations.getProxyLocation()
+      keyFile = None
+      if not certFile:
+        return S_ERROR("No proxy found")
+    caPath = None
+    if not self.kwargs.get(self.KW_SKIP_CA_CHECK):
+      caPath = Locations.getCAsLocation()
+      if not caPath:
+        return S_ERROR("No CAs found")
+    try:
+      return S_OK(getSSLContext(certFile, keyFile, caPath))
+    except Exception as e:  # pylint: disable=broad-except
+      return S_ERROR("Can't load the credentials: %s" % repr(e))
+
+  @gen.coroutine
+  def __connect(self, connectionPool, poolKey):
+    """ Borrow an idle connection, or open a new one
+
+        :return: S_OK((AsyncTransport, reused))/S_ERROR
+    """
+    transport = connectionPool.get(poolKey) if connectionPool else None
+    if transport:
+      raise gen.Return(S_OK((transport, True)))
+    retVal = self.__getSSLContext()
+    if not retVal['OK']:
+      raise gen.Return(retVal)
+    urlTuple = self._getURLTuple()
+    retVal = yield AsyncTransport.connect(urlTuple[1], urlTuple[2], sslContext=retVal['Value'], timeout=self.timeout)
+    if not retVal['OK']:
+      raise gen.Return(retVal)
+    raise gen.Return(S_OK((retVal['Value'], False)))
+
+  @gen.coroutine
+  def executeRPC(self, functionName, args):
+    """ Perform the RPC call
+
+        :param functionName: name of the function
+        :param args: arguments to the function
+
+        :return: future of the return of the server call. In any case we add the connection stub to it.
+    """
+    stub = [self._getBaseStub(), functionName, list(args)]
+    try:
+      retVal = yield gen.with_timeout(timedelta(seconds=self.timeout), self.__executeRPC(functionName, list(args)))
+    except gen.TimeoutError:
+      retVal = S_ERROR("Timeout (%s s) calling %s" % (self.timeout, functionName))
+    if isinstance(retVal, dict):
+      retVal['rpcStub'] = stub
+    raise gen.Return(retVal)
+
+  @gen.coroutine
+  def __executeRPC(self, functionName, args):
+    """ Send the call and receive the result, see :py:meth:`executeRPC` """
+    connectionPool = getAsyncConnectionPool()
+    retVal = self._getProposal(("RPC", functionName), keepConnection=bool(connectionPool))
+    if not retVal['OK']:
+      raise gen.Return(retVal)
+    proposal = retVal
+    poolKey = ConnectionPool.getKey(self._getURLTuple(), self.kwargs)
+
+    while True:
+      retVal = yield self.__connect(connectionPool, poolKey)
+      if not retVal['OK']:
+        raise gen.Return(retVal)
+      transport, reused = retVal['Value']
+      retVal = yield transport.sendData(proposal)
+      if retVal['OK']:
+        retVal = yield transport.receiveData()
+        if not isinstance(retVal, dict):
+          retVal = S_ERROR("Invalid reply")
+      # The server may have closed a pooled connection at the same time we reused it
+      if reused and not retVal['OK'] and 'closed' in retVal['Message']:
+        transport.close()
+        continue
+      break
+
+    keepConnection = False
+    try:
+      if not retVal['OK']:
+        raise gen.Return(retVal)
+      serverRequirements = retVal.get('Value')
+      if isinstance(serverRequirements, dict) and 'delegate' in serverRequirements:
+        raise gen.Return(S_ERROR("Credentials delegation is not supported by the asynchronous client"))
+      serverKeepsConnection = InnerRPCClient._serverKeepsConnection(retVal)
+
+      retVal = yield transport.sendData(S_OK(args))
+      if not retVal['OK']:
+        raise gen.Return(retVal)
+
+      receivedData = yield transport.receiveData()
+      if not isinstance(receivedData, dict):
+        raise gen.Return(S_ERROR("Invalid reply"))
+      keepConnection = serverKeepsConnection and receivedData['OK']
+      raise gen.Return(receivedData)
+    finally:
+      if keepConnection:
+        connectionPool.put(poolKey, transport)
+      else:
+        transport.close()
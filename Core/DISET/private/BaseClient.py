@@ -22,6 +22,7 @@ from DIRAC.ConfigurationSystem.Client.PathFinder import getServiceURL, getServic
 from DIRAC.ConfigurationSystem.Client.Helpers import Registry
 from DIRAC.ConfigurationSystem.Client.Helpers.CSGlobals import skipCACheck
 from DIRAC.Core.DISET.private.TransportPool import getGlobalTransportPool
+from DIRAC.Core.DISET.private.ConnectionPool import ConnectionPool, getGlobalConnectionPool
 from DIRAC.Core.DISET.ThreadConfig import ThreadConfig
 
 
@@ -78,7 +79,6 @@ class BaseClient(object):
     self.__forceUseCertificates = self.kwargs.get(self.KW_USE_CERTIFICATES)
     self.__initStatus = S_OK()
     self.__idDict = {}
-    self.__extraCredentials = ""
     self.__enableThreadCheck = False
     self.__retry = 0
     self.__retryDelay = 0
@@ -238,38 +238,39 @@ class BaseClient(object):
         return S_ERROR("Invalid proxy chain specified on instantiation")
     return S_OK()
 
-  def __discoverExtraCredentials(self):
-    """ Add extra credentials informations.
-        * self.__extraCredentials
-          -> if KW_EXTRA_CREDENTIALS in kwargs, we set it
-          -> Otherwise, if we use the server certificate, we set it to VAL_EXTRA_CREDENTIALS_HOST
-          -> If we have a delegation (see bellow), we set it to (delegatedDN, delegatedGroup)
+  def __getExtraCredentials(self):
+    """ Find the extra credentials to send with a proposal.
+        * extra credentials
+          -> if KW_EXTRA_CREDENTIALS in kwargs, we use it
+          -> Otherwise, if we use the server certificate, we use VAL_EXTRA_CREDENTIALS_HOST
+          -> If we have a delegation (see bellow), we use (delegatedDN, delegatedGroup)
           -> otherwise it is an empty string
         * delegation:
-          -> if KW_DELEGATED_DN in kwargs, or delegatedDN in threadConfig, put in in self.kwargs
-          -> if KW_DELEGATED_GROUP in kwargs or delegatedGroup in threadConfig, put it in self.kwargs
+          -> KW_DELEGATED_DN in kwargs, or delegatedDN in threadConfig
+          -> KW_DELEGATED_GROUP in kwargs or delegatedGroup in threadConfig
           -> If we have a delegated DN but not group, we find the corresponding group in the CS
 
-        :return: S_OK()/S_ERROR()
+        The delegation can come from the calling thread, so nothing is stored in the client,
+        which can be shared by several threads.
+
+        :return: S_OK(extra credentials)/S_ERROR()
     """
     # which extra credentials to use?
-    self.__extraCredentials = self.VAL_EXTRA_CREDENTIALS_HOST if self.__useCertificates else ""
+    extraCredentials = self.VAL_EXTRA_CREDENTIALS_HOST if self.__useCertificates else ""
     if self.KW_EXTRA_CREDENTIALS in self.kwargs:
-      self.__extraCredentials = self.kwargs[self.KW_EXTRA_CREDENTIALS]
+      extraCredentials = self.kwargs[self.KW_EXTRA_CREDENTIALS]
 
     # Are we delegating something?
     delegatedDN = self.kwargs.get(self.KW_DELEGATED_DN) or self.__threadConfig.getDN()
     delegatedGroup = self.kwargs.get(self.KW_DELEGATED_GROUP) or self.__threadConfig.getGroup()
     if delegatedDN:
-      self.kwargs[self.KW_DELEGATED_DN] = delegatedDN
       if not delegatedGroup:
         result = Registry.findDefaultGroupForDN(delegatedDN)
         if not result['OK']:
           return result
         delegatedGroup = result['Value']
-      self.kwargs[self.KW_DELEGATED_GROUP] = delegatedGroup
-      self.__extraCredentials = (delegatedDN, delegatedGroup)
-    return S_OK()
+      extraCredentials = (delegatedDN, delegatedGroup)
+    return S_OK(extraCredentials)
 
   def __findServiceURL(self):
     """ Discovers the URL of a service, taking into account gateways, multiple URLs, banned URLs
@@ -454,13 +455,19 @@ and this is thread %s
         if not result['OK']:
           return result
 
-    # Take all the extra credentials
-    self.__discoverExtraCredentials()
     if not self.__initStatus['OK']:
       return self.__initStatus
     if self.__enableThreadCheck:
       self.__checkThreadID()
 
+    # Reuse an established connection if there is one
+    connectionPool = getGlobalConnectionPool()
+    if connectionPool:
+      transport = connectionPool.get(ConnectionPool.getKey(self.__URLTuple, self.kwargs))
+      if transport:
+        gLogger.debug("Reusing connection to: %s" % self.serviceURL)
+        return S_OK((getGlobalTransportPool().add(transport), transport))
+
     gLogger.debug("Trying to connect to: %s" % self.serviceURL)
     try:
       # Calls the transport method of the apropriate protocol.
@@ -515,11 +522,19 @@ and this is thread %s
 
     return S_OK((trid, transport))
 
-  def _disconnect(self, trid):
+  def _disconnect(self, trid, keepConnection=False):
     """ Disconnect the connection.
 
         :param str trid: Transport ID in the transportPool
+        :param bool keepConnection: if True, the server agreed to keep the connection open,
+                                    so it is given back to the ConnectionPool instead of being closed
     """
+    connectionPool = getGlobalConnectionPool() if keepConnection else None
+    transport = getGlobalTransportPool().get(trid) if connectionPool else None
+    if transport:
+      getGlobalTransportPool().remove(trid)
+      connectionPool.put(ConnectionPool.getKey(self.__URLTuple, self.kwargs), transport)
+      return
     getGlobalTransportPool().close(trid)
 
   @staticmethod
@@ -553,15 +568,12 @@ and this is thread %s
         :return: whatever the server sent back
 
     """
-    if not self.__initStatus['OK']:
-      return self.__initStatus
-    stConnectionInfo = ((self.__URLTuple[3], self.setup, self.vo),
-                        action,
-                        self.__extraCredentials,
-                        DIRAC.version)
+    retVal = self._getProposal(action, keepConnection=bool(getGlobalConnectionPool()))
+    if not retVal['OK']:
+      return retVal
 
     # Send the connection info and get the answer back
-    retVal = transport.sendData(S_OK(BaseClient._serializeStConnectionInfo(stConnectionInfo)))
+    retVal = transport.sendData(retVal)
     if not retVal['OK']:
       return retVal
     serverReturn = transport.receiveData()
@@ -575,6 +587,36 @@ and this is thread %s
         serverReturn = self.__delegateCredentials(transport, serverRequirements['delegate'])
     return serverReturn
 
+  def _getProposal(self, action, keepConnection=False):
+    """ Build the message proposing an action, see :py:meth:`_proposeAction`
+
+        :param action: tuple (<action type>, <action name>)
+        :param bool keepConnection: ask the server to keep the connection open after the call,
+                                    so that it can be reused. Older servers just ignore it.
+
+        :return: S_OK(serialized connection info)/S_ERROR()
+    """
+    if not self.__initStatus['OK']:
+      return self.__initStatus
+    # The delegated identity is per thread
+    retVal = self.__getExtraCredentials()
+    if not retVal['OK']:
+      return retVal
+    stConnectionInfo = ((self.__URLTuple[3], self.setup, self.vo),
+                        action,
+                        retVal['Value'],
+                        DIRAC.version)
+    if keepConnection:
+      stConnectionInfo += ({'keepConnection': True},)
+    return S_OK(BaseClient._serializeStConnectionInfo(stConnectionInfo))
+
+  def _getURLTuple(self):
+    """ Return the URL of the service, split by Network.splitURL
+
+        :return: tuple (protocol, host, port, System/Component)
+    """
+    return self.__URLTuple
+
   def __delegateCredentials(self, transport, delegationRequest):
     """ Perform a credential delegation. This seems to be used only for the GatewayService.
         It calls the delegation mechanism of the Transport class. Note that it is not used when
@@ -645,6 +687,12 @@ and this is thread %s
     # independently decide whether to use their cert or not anyway.
     if 'useCertificates' in newKwargs:
       del newKwargs['useCertificates']
+    # Keep the identity delegated by the calling thread, so that the call can be replayed on its behalf
+    delegatedDN, delegatedGroup = self.__threadConfig.getID()
+    if delegatedDN and not newKwargs.get(self.KW_DELEGATED_DN):
+      newKwargs[self.KW_DELEGATED_DN] = delegatedDN
+      if delegatedGroup and not newKwargs.get(self.KW_DELEGATED_GROUP):
+        newKwargs[self.KW_DELEGATED_GROUP] = delegatedGroup
     return [self._destinationSrv, newKwargs]
 
   def __bool__(self):
@@ -654,4 +702,4 @@ and this is thread %s
   __nonzero__ = __bool__
 
   def __str__(self):
-    return "<DISET Client %s %s>" % (self.serviceURL, self.__extraCredentials)
+    return "<DISET Client %s %s>" % (self.serviceURL, self.kwargs.get(self.KW_EXTRA_CREDENTIALS, ""))
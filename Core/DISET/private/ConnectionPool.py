@@ -0,0 +1,181 @@
+""" Process wide pool of established client connections.
+
+    Opening a DISET connection costs a TCP connection and, for dips, a full TLS handshake.
+    When the server agrees to keep the connection open after an RPC call
+    (see :py:meth:`DIRAC.Core.DISET.private.Service.Service._processProposal`),
+    the client gives the transport back to this pool instead of closing it, and the next
+    call to the same endpoint with the same credentials borrows it.
+
+    The pool is configured in the CS, in the /DIRAC/ConnectionPool section:
+
+      * Enabled: use the pool (default True)
+      * IdleTimeout: seconds after which an idle connection is closed (default 30).
+        It must be smaller than the ConnectionIdleTimeout of the services.
+      * MaxIdlePerEndpoint: maximum number of idle connections kept per endpoint (default 10)
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import select
+import threading
+import time
+
+from DIRAC.FrameworkSystem.Client.Logger import gLogger
+from DIRAC.ConfigurationSystem.Client.Config import gConfig
+from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
+
+
+class ConnectionPool(object):
+  """ Thread safe pool of idle client transports, keyed by endpoint and credentials.
+      A transport is either borrowed by exactly one caller, or idle in the pool.
+  """
+
+  def __init__(self, idleTimeout=30, maxIdlePerEndpoint=10):
+    """ c'tor
+
+        :param int idleTimeout: seconds after which an idle transport is closed
+        :param int maxIdlePerEndpoint: maximum number of idle transports per key
+    """
+    self.idleTimeout = idleTimeout
+    self.maxIdlePerEndpoint = maxIdlePerEndpoint
+    self.log = gLogger.getSubLogger('ConnectionPool')
+    self.__lock = threading.Lock()
+    # { key : [ ( transport, time it was given back ) ] }
+    self.__idle = {}
+    self.__stats = {'hits': 0, 'misses': 0, 'discarded': 0}
+
+  @staticmethod
+  def getKey(urlTuple, kwargs):
+    """ Build the key identifying a connection: the endpoint, and all the connection
+        options, except the ones which are sent with every proposal.
+
+        :param urlTuple: (protocol, host, port, ...) as returned by Network.splitURL
+        :param dict kwargs: BaseClient kwargs
+
+        :return: hashable key
+    """
+    perCallOptions = ('extraCredentials', 'delegatedDN', 'delegatedGroup', 'setup', 'VO')
+    options = tuple(sorted((str(k), str(v)) for k, v in kwargs.items() if k not in perCallOptions))
+    return (tuple(urlTuple[:3]), options)
+
+  @staticmethod
+  def isHealthy(transport):
+    """ An idle transport must not be readable: if it is, the peer either
+        closed it or sent something unexpected.
+
+        :param transport: transport object
+
+        :return: bool
+    """
+    try:
+      sock = transport.getSocket()
+      if sock is None or sock.fileno() < 0:
+        return False
+      # poll, unlike select, accepts the file descriptors above FD_SETSIZE
+      poller = select.poll()
+      poller.register(sock, select.POLLIN | select.POLLPRI)
+      return not poller.poll(0)
+    except Exception:
+      return False
+
+  def get(self, key):
+    """ Borrow an idle transport
+
+        :param key: key returned by getKey
+
+        :return: transport or None if there is no usable one
+    """
+    now = time.time()
+    while True:
+      with self.__lock:
+        idleList = self.__idle.get(key)
+        if not idleList:
+          self.__stats['misses'] += 1
+          return None
+        # Most recently used first: it is the least likely to have been closed
+        transport, lastUse = idleList.pop()
+      if now - lastUse < self.idleTimeout and self.isHealthy(transport):
+        with self.__lock:
+          self.__stats['hits'] += 1
+        return transport
+      self.__discard(transport)
+
+  def put(self, key, transport):
+    """ Give back a transport after a successful call
+
+        :param key: key returned by getKey
+        :param transport: transport object
+    """
+    with self.__lock:
+      idleList = self.__idle.setdefault(key, [])
+      if len(idleList) < self.maxIdlePerEndpoint:
+        idleList.append((transport, time.time()))
+        transport = None
+    if transport:
+      self.__discard(transport)
+
+  def purge(self):
+    """ Close the transports idle for longer than idleTimeout
+    """
+    limit = time.time() - self.idleTimeout
+    expired = []
+    with self.__lock:
+      for key in list(self.__idle):
+        expired.extend(transport for transport, lastUse in self.__idle[key] if lastUse <= limit)
+        self.__idle[key] = [(transport, lastUse) for transport, lastUse in self.__idle[key] if lastUse > limit]
+        if not self.__idle[key]:
+          del self.__idle[key]
+    for transport in expired:
+      self.__discard(transport)
+
+  def closeAll(self):
+    """ Close all the idle transports
+    """
+    with self.__lock:
+      idle = self.__idle
+      self.__idle = {}
+    for idleList in idle.values():
+      for transport, _lastUse in idleList:
+        self.__discard(transport)
+
+  def getStats(self):
+    """ Return the usage statistics
+
+        :return: dict with hits, misses, discarded and idle (current number of idle transports)
+    """
+    with self.__lock:
+      stats = dict(self.__stats)
+      stats['idle'] = sum(len(idleList) for idleList in self.__idle.values())
+    return stats
+
+  def __discard(self, transport):
+    """ Close a transport which will not be reused """
+    with self.__lock:
+      self.__stats['discarded'] += 1
+    try:
+      transport.close()
+    except Exception as e:
+      self.log.debug("Error closing pooled transport", repr(e))
+
+
+gConnectionPool = None
+gConnectionPoolLock = threading.Lock()
+
+
+def getGlobalConnectionPool():
+  """ Return the process wide ConnectionPool, or None if it is disabled in the CS
+  """
+  global gConnectionPool
+  if not gConfig.getValue('/DIRAC/ConnectionPool/Enabled', True):
+    return None
+  with gConnectionPoolLock:
+    if not gConnectionPool:
+      gConnectionPool = ConnectionPool(idleTimeout=gConfig.getValue('/DIRAC/ConnectionPool/IdleTimeout', 30),
+                                       maxIdlePerEndpoint=gConfig.getValue('/DIRAC/ConnectionPool/MaxIdlePerEndpoint',
+                                                                           10))
+      # Regularly close what the services would close anyway
+      gThreadScheduler.addPeriodicTask(gConnectionPool.idleTimeout, gConnectionPool.purge)
+  return gConnectionPool
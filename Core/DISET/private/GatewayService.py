@@ -36,6 +36,7 @@ from DIRAC import gLogger, S_OK, S_ERROR
 from DIRAC.Core.Utilities.LockRing import LockRing
 from DIRAC.Core.Utilities.DictCache import DictCache
 from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
+from DIRAC.Core.DISET import BATCH_RPC_ACTION
 from DIRAC.Core.DISET.private.FileHelper import FileHelper
 from DIRAC.Core.DISET.private.MessageBroker import MessageBroker, getGlobalMessageBroker
 from DIRAC.Core.DISET.MessageClient import MessageClient
@@ -241,6 +242,12 @@ class GatewayService(Service):
     elif actionType == "RPC":
       gLogger.info("Forwarding %s/%s action to %s for %s" % (actionType, actionMethod, targetService, idString))
       retVal = self.__forwardRPCCall(targetService, clientInitArgs, actionMethod, retVal['Value'])
+    elif actionType == BATCH_RPC_ACTION:
+      gLogger.info("Forwarding %s action to %s for %s" % (actionType, targetService, idString))
+      retVal = RPCClient(targetService, **clientInitArgs).executeBatchRPC(retVal['Value'])
+      # The stubs contain the delegated credentials
+      for callResult in retVal.get('Value', []):
+        callResult.pop('rpcStub', None)
     elif actionType == "Connection" and actionMethod == "new":
       gLogger.info("Initiating a messaging connection to %s for %s" % (targetService, idString))
       retVal = self._msgForwarder.addClient(trid, targetService, clientInitArgs, retVal['Value'])
@@ -0,0 +1,112 @@
+""" Server side counterpart of the client ConnectionPool.
+
+    After an RPC call for which the client asked to keep the connection open,
+    the Service parks the transport here. A single thread waits for the next
+    proposal on all the parked transports and gives the readable ones back to the
+    Service. Transports idle for longer than the timeout are closed.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import os
+import select
+import threading
+import time
+
+from DIRAC.FrameworkSystem.Client.Logger import gLogger
+
+
+class IdleTransportListener(object):
+  """ Wait for activity on idle server transports
+  """
+
+  def __init__(self, transportPool, readyCallback, idleTimeout=60):
+    """ c'tor
+
+        :param transportPool: TransportPool holding the transports
+        :param readyCallback: called with (transport, trid) when the client sends something
+        :param int idleTimeout: seconds after which an idle transport is closed
+    """
+    self.idleTimeout = idleTimeout
+    self.__transportPool = transportPool
+    self.__readyCallback = readyCallback
+    self.__lock = threading.Lock()
+    # { trid : time it became idle }
+    self.__idle = {}
+    # Used to wake up the listening thread when a transport is added
+    self.__wakeUpRead, self.__wakeUpWrite = os.pipe()
+    self.__thread = None
+    self.log = gLogger.getSubLogger('IdleTransportListener')
+
+  def add(self, trid):
+    """ Park a transport until the client sends a new proposal
+
+        :param str trid: transport ID in the transport pool
+    """
+    transport = self.__transportPool.get(trid)
+    if not transport:
+      return
+    # Some data may already have been read from the socket, and would never make it readable
+    if transport.hasPendingData():
+      self.__readyCallback(transport, trid)
+      return
+    with self.__lock:
+      self.__idle[trid] = time.time()
+      if not self.__thread:
+        self.__thread = threading.Thread(target=self.__listen)
+        self.__thread.setDaemon(True)
+        self.__thread.start()
+    os.write(self.__wakeUpWrite, b"x")
+
+  def getNumIdle(self):
+    """ Number of transports currently idle """
+    with self.__lock:
+      return len(self.__idle)
+
+  def __listen(self):
+    while True:
+      try:
+        self.__listenOnce()
+      except Exception as e:
+        self.log.exception("Error while waiting on idle transports", lException=e)
+        time.sleep(1)
+
+  def __listenOnce(self):
+    """ Wait for one of the idle transports to become readable or to expire
+    """
+    now = time.time()
+    # poll is used rather than select, which does not accept the file descriptors above FD_SETSIZE
+    poller = select.poll()
+    poller.register(self.__wakeUpRead, select.POLLIN)
+    fds = {}
+    expired = []
+    with self.__lock:
+      for trid, idleSince in list(self.__idle.items()):
+        transport = self.__transportPool.get(trid)
+        if not transport or now - idleSince >= self.idleTimeout:
+          del self.__idle[trid]
+          expired.append(trid)
+        else:
+          fd = transport.getSocket().fileno()
+          fds[fd] = trid
+          poller.register(fd, select.POLLIN | select.POLLPRI)
+      nextExpiry = min(self.__idle.values()) + self.idleTimeout - now if self.__idle else None
+    for trid in expired:
+      self.__transportPool.close(trid)
+    # Closed or failed sockets are returned as well, with POLLHUP or POLLERR:
+    # the read done by the Service then fails, and closes them
+    events = poller.poll(None if nextExpiry is None else max(nextExpiry, 0) * 1000)
+    for fd, _event in events:
+      if fd == self.__wakeUpRead:
+        os.read(self.__wakeUpRead, 1024)
+        continue
+      trid = fds[fd]
+      with self.__lock:
+        if self.__idle.pop(trid, None) is None:
+          continue
+      transport = self.__transportPool.get(trid)
+      if transport:
+        self.__readyCallback(transport, trid)
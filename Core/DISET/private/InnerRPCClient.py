@@ -6,8 +6,9 @@ from __future__ import print_function
 
 __RCSID__ = "$Id$"
 
+from DIRAC.Core.DISET import BATCH_RPC_ACTION
 from DIRAC.Core.DISET.private.BaseClient import BaseClient
-from DIRAC.Core.Utilities.ReturnValues import S_OK
+from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 from DIRAC.Core.Utilities.DErrno import cmpError, ENOAUTH
 
 
@@ -47,6 +48,8 @@ class InnerRPCClient(BaseClient):
       return retVal
     # Get the transport connection ID as well as the Transport object
     trid, transport = retVal['Value']
+    # Set to True if the server agreed to keep the connection open and the call went through
+    keepConnection = False
     try:
       # Handshake to perform the RPC call for functionName
       retVal = self._proposeAction(transport, ("RPC", functionName))
@@ -62,12 +65,15 @@ class InnerRPCClient(BaseClient):
             retVal['rpcStub'] = stub
             return retVal
 
+      serverKeepsConnection = self._serverKeepsConnection(retVal)
+
       # Send the arguments to the function
       # Note: we need to convert the arguments to list
       # We do not need to deseralize it because variadic functions
       # can work with list too
       retVal = transport.sendData(S_OK(list(args)))
       if not retVal['OK']:
+        retVal['rpcStub'] = stub
         return retVal
 
       # Get the result of the call and append the stub to it
@@ -77,6 +83,180 @@ class InnerRPCClient(BaseClient):
       receivedData = transport.receiveData()
       if isinstance(receivedData, dict):
         receivedData['rpcStub'] = stub
+        keepConnection = serverKeepsConnection and receivedData['OK']
       return receivedData
     finally:
-      self._disconnect(trid)
+      self._disconnect(trid, keepConnection=keepConnection)
+
+  def executeBatchRPC(self, calls):
+    """ Perform several RPC calls in a single round trip.
+        Services which do not know about batches get the calls one by one.
+
+        :param calls: list of (functionName, args)
+
+        :return: S_OK(list of the return of each call, each with its own stub) or
+                 S_ERROR if the batch could not be executed
+    """
+    calls = [[functionName, list(args)] for functionName, args in calls]
+    retVal = self._connect()
+
+    stub = [self._getBaseStub(), BATCH_RPC_ACTION, [calls]]
+    if not retVal['OK']:
+      retVal['rpcStub'] = stub
+      return retVal
+    trid, transport = retVal['Value']
+    keepConnection = False
+    oneByOne = False
+    try:
+      retVal = self._proposeAction(transport, (BATCH_RPC_ACTION, 'execute'))
+      if not retVal['OK']:
+        if "is not a known action type" in retVal['Message']:
+          oneByOne = True
+        elif cmpError(retVal, ENOAUTH):  # This query is unauthorized
+          retVal['rpcStub'] = stub
+          return retVal
+        else:  # we have network problem or the service is not responding
+          if self.__retry < 3:
+            self.__retry += 1
+            return self.executeBatchRPC(calls)
+          else:
+            retVal['rpcStub'] = stub
+            return retVal
+      else:
+        serverKeepsConnection = self._serverKeepsConnection(retVal)
+
+        retVal = transport.sendData(S_OK(calls))
+        if not retVal['OK']:
+          retVal['rpcStub'] = stub
+          return retVal
+
+        receivedData = transport.receiveData()
+        if not isinstance(receivedData, dict):
+          retVal = S_ERROR("Invalid reply")
+          retVal['rpcStub'] = stub
+          return retVal
+        keepConnection = serverKeepsConnection and receivedData['OK']
+        if not receivedData['OK']:
+          receivedData['rpcStub'] = stub
+          return receivedData
+    finally:
+      self._disconnect(trid, keepConnection=keepConnection)
+
+    if oneByOne:
+      return S_OK([self.executeRPC(functionName, args) for functionName, args in calls])
+
+    # Each result gets the stub of its own call, so that it can be replayed
+    baseStub = stub[0]
+    for (functionName, args), result in zip(calls, receivedData['Value']):
+      result['rpcStub'] = [baseStub, functionName, args]
+    return receivedData
+
+  @staticmethod
+  def _serverKeepsConnection(proposalResult):
+    """ Whether the server agreed to keep the connection open after the call
+
+        :param proposalResult: what _proposeAction returned
+
+        :return: bool
+    """
+    return isinstance(proposalResult.get('Value'), dict) and bool(proposalResult['Value'].get('keepConnection'))
+
+  def executeRPCIter(self, functionName, args, path=()):
+    """ Perform the RPC call, and decode the reply while it is being received.
+        This is meant for calls returning huge replies, which can then be
+        processed with a bounded memory footprint.
+
+        The connection stays open until the returned generator is exhausted
+        (or garbage collected).
+
+        :param functionName: name of the function
+        :param args: arguments to the function
+        :param path: keys, inside the returned Value, leading to the container
+                     to stream (see :py:func:`DIRAC.Core.Utilities.DEncode.iterDecode`)
+
+        :return: S_OK(generator of (keyPath, value)), keyPath being relative to the returned Value,
+                 or S_ERROR (connection problem, or error returned by the server)
+    """
+    retVal = self._connect()
+
+    stub = [self._getBaseStub(), functionName, list(args)]
+    if not retVal['OK']:
+      retVal['rpcStub'] = stub
+      return retVal
+    trid, transport = retVal['Value']
+    streaming = False
+    try:
+      retVal = self._proposeAction(transport, ("RPC", functionName))
+      if not retVal['OK']:
+        if cmpError(retVal, ENOAUTH):  # This query is unauthorized
+          retVal['rpcStub'] = stub
+          return retVal
+        else:  # we have network problem or the service is not responding
+          if self.__retry < 3:
+            self.__retry += 1
+            return self.executeRPCIter(functionName, args, path=path)
+          else:
+            retVal['rpcStub'] = stub
+            return retVal
+
+      serverKeepsConnection = self._serverKeepsConnection(retVal)
+
+      retVal = transport.sendData(S_OK(list(args)))
+      if not retVal['OK']:
+        retVal['rpcStub'] = stub
+        return retVal
+
+      retVal = transport.receiveDataIter(path=('Value',) + tuple(path))
+      if not retVal['OK']:
+        retVal['rpcStub'] = stub
+        return retVal
+      replyIter = retVal['Value']
+
+      # The keys of the reply are sorted, so 'OK' and the error description
+      # (Message, Errno, CallStack...) are all received before 'Value'
+      reply = {}
+      try:
+        for keyPath, value in replyIter:
+          # A reply which is not a dict comes as a single element with an empty keyPath
+          if not keyPath:
+            retVal = S_ERROR("Invalid reply")
+            retVal['rpcStub'] = stub
+            return retVal
+          reply[keyPath[0]] = value
+          if keyPath[0] == 'OK':
+            break
+        if not reply.get('OK'):
+          for keyPath, value in replyIter:
+            reply[keyPath[0]] = value
+      except (IOError, ValueError) as e:
+        retVal = S_ERROR("Error while receiving data: %s" % repr(e))
+        retVal['rpcStub'] = stub
+        return retVal
+      if not reply.get('OK'):
+        reply.setdefault('OK', False)
+        reply.setdefault('Message', 'Invalid reply: %s' % reply)
+        reply['rpcStub'] = stub
+        return reply
+
+      streaming = True
+      return S_OK(self.__iterReplyValue(trid, replyIter, serverKeepsConnection))
+    finally:
+      if not streaming:
+        self._disconnect(trid)
+
+  def __iterReplyValue(self, trid, replyIter, serverKeepsConnection=False):
+    """ Yield the part of the streamed reply which is under 'Value',
+        and disconnect at the end.
+
+        :param str trid: Transport ID in the transportPool
+        :param replyIter: generator returned by receiveDataIter
+        :param bool serverKeepsConnection: the connection can be reused if the reply is fully read
+    """
+    keepConnection = False
+    try:
+      for keyPath, value in replyIter:
+        if keyPath[0] == 'Value':
+          yield keyPath[1:], value
+      keepConnection = serverKeepsConnection
+    finally:
+      self._disconnect(trid, keepConnection=keepConnection)
@@ -0,0 +1,70 @@
+""" RPCBatch collects RPC calls to a service, to send them in a single round trip.
+    It is obtained from :py:meth:`DIRAC.Core.DISET.RPCClient.RPCClient.batch`
+    or :py:meth:`DIRAC.Core.Tornado.Client.TornadoClient.TornadoClient.batch`.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+from DIRAC.Core.Utilities.ReturnValues import S_OK
+
+
+class RPCBatch(object):
+  """ Calls made on this object are only recorded, and are all executed by :py:meth:`flush`.
+      Used as a context manager, the calls are flushed when leaving the block::
+
+        with RPCClient('WorkloadManagement/JobStateUpdate').batch() as batch:
+          for jobID in jobIDs:
+            batch.setJobStatus(jobID, 'Running', 'Application', 'JobWrapper')
+        result = batch.result
+
+      ``result`` is S_OK with the list of the S_OK/S_ERROR returned by each call, in order,
+      or S_ERROR if the batch could not be executed at all.
+      Calling a method returns the index of its result in this list.
+  """
+
+  def __init__(self, executeBatchFunc):
+    """ c'tor
+
+        :param executeBatchFunc: function taking a list of (method, args),
+                                 and returning S_OK(list of results)
+    """
+    self.__executeBatch = executeBatchFunc
+    self.__calls = []
+    self.result = None
+
+  def __getattr__(self, method):
+    """ Return a function recording a call to the remote method """
+    # Do not pretend to have the private and special attributes (copy, pickle, ...)
+    if method.startswith('_'):
+      raise AttributeError(method)
+
+    def call(*args):
+      self.__calls.append((method, list(args)))
+      return len(self.__calls) - 1
+    return call
+
+  def __len__(self):
+    return len(self.__calls)
+
+  def flush(self):
+    """ Execute the calls recorded so far
+
+        :return: S_OK(list of results)/S_ERROR
+    """
+    calls, self.__calls = self.__calls, []
+    if not calls:
+      self.result = S_OK([])
+    else:
+      self.result = self.__executeBatch(calls)
+    return self.result
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, excType, excValue, traceback):
+    # Nothing is sent if the block failed
+    if excType is None:
+      self.flush()
@@ -26,12 +26,14 @@ else:
 import DIRAC
 from DIRAC import gConfig, gLogger, S_OK, S_ERROR
 from DIRAC.Core.Utilities.DErrno import ENOAUTH
+from DIRAC.Core.DISET import BATCH_RPC_ACTION
 from DIRAC.FrameworkSystem.Client.MonitoringClient import gMonitor
 from DIRAC.Core.Utilities import Time, MemStat, Network
 from DIRAC.Core.DISET.private.LockManager import LockManager
 from DIRAC.FrameworkSystem.Client.MonitoringClient import MonitoringClient
 from DIRAC.Core.DISET.private.ServiceConfiguration import ServiceConfiguration
 from DIRAC.Core.DISET.private.TransportPool import getGlobalTransportPool
+from DIRAC.Core.DISET.private.IdleTransportListener import IdleTransportListener
 from DIRAC.Core.DISET.private.MessageBroker import MessageBroker, MessageSender
 from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
 from DIRAC.Core.Utilities.ReturnValues import isReturnStructure
@@ -50,7 +52,8 @@ class Service(object):
   SVC_VALID_ACTIONS = {'RPC': 'export',
                        'FileTransfer': 'transfer',
                        'Message': 'msg',
-                       'Connection': 'Message'}
+                       'Connection': 'Message',
+                       BATCH_RPC_ACTION: 'RPC'}
   SVC_SECLOG_CLIENT = SecurityLogClient()
 
   def __init__(self, serviceData):
@@ -79,6 +82,7 @@ class Service(object):
     self._stats = {'queries': 0, 'connections': 0}
     self._authMgr = AuthManager("%s/Authorization" % PathFinder.getServiceSection(serviceData['loadName']))
     self._transportPool = getGlobalTransportPool()
+    self._idleListener = None
     self.__cloneId = 0
     self.__maxFD = 0
 
@@ -115,12 +119,17 @@ class Service(object):
                                     self._cfg.getMaxWaitingPetitions())
       self._threadPool.daemonize()
     self._msgBroker = MessageBroker("%sMSB" % self._name, threadPool=self._threadPool)
+    # Connections kept open after an RPC call wait here for the next proposal
+    self._idleListener = IdleTransportListener(self._transportPool, self._queueIdleTransport,
+                                               idleTimeout=self._cfg.getConnectionIdleTimeout())
     # Create static dict
     self._serviceInfoDict = {'serviceName': self._name,
                              'serviceSectionPath': PathFinder.getServiceSection(self._name),
                              'URL': self._cfg.getURL(),
                              'messageSender': MessageSender(self._name, self._msgBroker),
                              'validNames': self._validNames,
+                             # Used to authorize each call of a batch
+                             'authManager': self._authMgr,
                              'csPaths': [PathFinder.getServiceSection(svcName) for svcName in self._validNames]
                              }
     # Initialize Monitoring
@@ -363,8 +372,23 @@ class Service(object):
       self._threadPool.generateJobAndQueueIt(self._processInThread,
                                              args=(clientTransport,))
 
+  def _queueIdleTransport(self, clientTransport, trid):
+    """
+      Called by the IdleTransportListener when a client sends a new proposal
+      on a connection kept open after a previous call.
+
+      :param clientTransport: Object which describes the connection
+      :param str trid: transport ID in the transport pool
+    """
+    self._stats['connections'] += 1
+    if useThreadPoolExecutor:
+      self._threadPool.submit(self._processInThread, clientTransport, trid)
+    else:
+      self._threadPool.generateJobAndQueueIt(self._processInThread,
+                                             args=(clientTransport, trid))
+
   # Threaded process function
-  def _processInThread(self, clientTransport):
+  def _processInThread(self, clientTransport, trid=None):
     """
     This method handles a RPC, FileTransfer or Connection.
     Connection may be opened via ServiceReactor.__acceptIncomingConnection
@@ -384,9 +408,11 @@ class Service(object):
     - Executing the action asked by the client
 
     :param clientTransport: Object which describe the opened connection (SSLTransport or PlainTransport)
+    :param str trid: transport ID if the connection was kept open after a previous call.
+                     In that case, the handshake is already done.
 
     :return: S_OK with "closeTransport" a boolean to indicate if th connection have to be closed
-            e.g. after RPC, closeTransport=True
+            e.g. after RPC, closeTransport=True, unless the client asked to keep it open
 
     """
     self.__maxFD = max(self.__maxFD, clientTransport.oSocket.fileno())
@@ -396,22 +422,27 @@ class Service(object):
     except Exception:
       monReport = False
     try:
-      # Handshake
-      try:
-        result = clientTransport.handshake()
-        if not result['OK']:
-          clientTransport.close()
+      reusedConnection = trid is not None
+      if not reusedConnection:
+        # Handshake
+        try:
+          result = clientTransport.handshake()
+          if not result['OK']:
+            clientTransport.close()
+            return
+        except BaseException:
+          return
+        # Add to the transport pool
+        trid = self._transportPool.add(clientTransport)
+        if not trid:
           return
-      except BaseException:
-        return
-      # Add to the transport pool
-      trid = self._transportPool.add(clientTransport)
-      if not trid:
-        return
       # Receive and check proposal
-      result = self._receiveAndCheckProposal(trid)
+      result = self._receiveAndCheckProposal(trid, reusedConnection=reusedConnection)
       if not result['OK']:
-        self._transportPool.sendAndClose(trid, result)
+        if result.get('connectionClosed'):
+          self._transportPool.close(trid)
+        else:
+          self._transportPool.sendAndClose(trid, result)
         return
       proposalTuple = result['Value']
       # Instantiate handler
@@ -427,6 +458,8 @@ class Service(object):
         if not result['OK']:
           gLogger.error("Error processing proposal", result['Message'])
         self._transportPool.close(trid)
+      elif result.get('keepConnection'):
+        self._idleListener.add(trid)
       return result
     finally:
       self._lockManager.unlockGlobal()
@@ -457,12 +490,18 @@ class Service(object):
     proposalTuple = tuple(tuple(x) if isinstance(x, list) else x for x in serializedProposal)
     return proposalTuple
 
-  def _receiveAndCheckProposal(self, trid):
+  def _receiveAndCheckProposal(self, trid, reusedConnection=False):
     clientTransport = self._transportPool.get(trid)
     # Get the peer credentials
     credDict = clientTransport.getConnectingCredentials()
     # Receive the action proposal
     retVal = clientTransport.receiveData(1024)
+    if not retVal['OK'] and reusedConnection:
+      # The client closed a connection it was not going to use anymore
+      gLogger.debug("Kept open connection closed by the client", retVal['Message'])
+      result = S_ERROR("Connection closed")
+      result['connectionClosed'] = True
+      return result
     if not retVal['OK']:
       gLogger.error("Invalid action proposal", "%s %s" % (self._createIdentityString(credDict,
                                                                                      clientTransport),
@@ -573,8 +612,14 @@ class Service(object):
     return S_OK(handlerInstance)
 
   def _processProposal(self, trid, proposalTuple, handlerObj):
+    # The client may ask to keep the connection open after an RPC call.
+    # The 5th element of the proposal holds the connection options
+    connectionOptions = proposalTuple[4] if len(proposalTuple) > 4 and isinstance(proposalTuple[4], dict) else {}
+    keepConnection = (proposalTuple[1][0] in ('RPC', BATCH_RPC_ACTION) and
+                      bool(connectionOptions.get('keepConnection')) and
+                      self._idleListener is not None and self._idleListener.idleTimeout > 0)
     # Notify the client we're ready to execute the action
-    retVal = self._transportPool.send(trid, S_OK())
+    retVal = self._transportPool.send(trid, S_OK({'keepConnection': True}) if keepConnection else S_OK())
     if not retVal['OK']:
       return retVal
 
@@ -602,7 +647,8 @@ class Service(object):
       if not result['OK']:
         self._msgBroker.removeTransport(trid)
 
-    result['closeTransport'] = not messageConnection or not result['OK']
+    result['keepConnection'] = keepConnection and result['OK']
+    result['closeTransport'] = not (messageConnection or result['keepConnection']) or not result['OK']
     return result
 
   def _mbConnect(self, trid, handlerObj=None):
@@ -82,6 +82,12 @@ class ServiceConfiguration:
     except BaseException:
       return 20
 
+  def getConnectionIdleTimeout(self):
+    try:
+      return int(self.getOption("ConnectionIdleTimeout"))
+    except BaseException:
+      return 60
+
   def getMaxThreadsForMethod(self, actionType, method):
     try:
       return int(self.getOption("ThreadLimit/%s/%s" % (actionType, method)))
@@ -0,0 +1,195 @@
+""" Non blocking counterpart of BaseTransport, used by the asynchronous RPC clients.
+
+    It speaks the same protocol over a tornado IOStream, so that a single thread running
+    the event loop can keep many calls in flight. On Python 3, the tornado event loop is the
+    asyncio one, and the futures returned here can be awaited by asyncio coroutines.
+
+    Only what a client needs is implemented: sending and receiving messages,
+    and answering the keep alives the server sends during long calls.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import os
+import ssl
+import threading
+import weakref
+
+import six
+from tornado import gen
+from tornado.ioloop import IOLoop, PeriodicCallback
+from tornado.iostream import StreamClosedError, UnsatisfiableReadError
+from tornado.tcpclient import TCPClient
+
+from DIRAC.ConfigurationSystem.Client.Config import gConfig
+from DIRAC.Core.DISET.private.ConnectionPool import ConnectionPool
+from DIRAC.Core.DISET.private.Transports.BaseTransport import BaseTransport
+from DIRAC.Core.Utilities import MixedEncode
+from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
+
+# Longest message length header ("<size>:") accepted
+MAX_HEADER_SIZE = 32
+
+
+class AsyncTransport(object):
+  """ Client side connection to a DISET service, over a tornado IOStream
+  """
+
+  def __init__(self, stream):
+    """ c'tor
+
+        :param stream: connected tornado IOStream
+    """
+    self.stream = stream
+
+  @classmethod
+  @gen.coroutine
+  def connect(cls, host, port, sslContext=None, timeout=None):
+    """ Open a connection
+
+        :param str host: host name
+        :param int port: port
+        :param sslContext: ssl.SSLContext to use, or None for a plain connection
+        :param timeout: seconds to wait for the connection
+
+        :return: S_OK(AsyncTransport)/S_ERROR
+    """
+    if timeout:
+      timeout = IOLoop.current().time() + timeout
+    try:
+      stream = yield TCPClient().connect(host, int(port), ssl_options=sslContext, timeout=timeout)
+    except Exception as e:  # pylint: disable=broad-except
+      raise gen.Return(S_ERROR("Can't connect to %s:%s: %s" % (host, port, repr(e))))
+    raise gen.Return(S_OK(cls(stream)))
+
+  def getSocket(self):
+    """ Return the socket, used by the ConnectionPool to check idle connections """
+    # The event loop notices when the server closes an idle connection
+    if self.stream.closed():
+      return None
+    return self.stream.socket
+
+  def close(self):
+    """ Close the connection """
+    self.stream.close()
+
+  @gen.coroutine
+  def sendData(self, uData, prefix=b""):
+    """ Send a message
+
+        :param uData: data to send
+        :param bytes prefix: prefix of the message (keep alive magic)
+
+        :return: S_OK/S_ERROR
+    """
+    codedData = MixedEncode.encode(uData)
+    if isinstance(codedData, six.text_type):
+      codedData = codedData.encode()
+    try:
+      yield self.stream.write(b"".join([prefix, str(len(codedData)).encode(), b":", codedData]))
+    except StreamClosedError:
+      raise gen.Return(S_ERROR("Connection closed by peer"))
+    raise gen.Return(S_OK())
+
+  @gen.coroutine
+  def receiveData(self, maxBufferSize=0):
+    """ Receive the next message. Keep alive pings received before it are answered.
+
+        :param int maxBufferSize: maximum size of the message, 0 for no limit
+
+        :return: the message (normally a S_OK/S_ERROR structure), or S_ERROR
+    """
+    keepAliveMagic = BaseTransport.keepAliveMagic
+    while True:
+      try:
+        header = yield self.stream.read_until(b":", max_bytes=MAX_HEADER_SIZE)
+        isKeepAlive = header.startswith(keepAliveMagic)
+        if isKeepAlive:
+          header = header[len(keepAliveMagic):]
+        pkgSize = int(header[:-1])
+        if maxBufferSize and pkgSize > maxBufferSize:
+          raise gen.Return(S_ERROR("Read limit exceeded (%s chars)" % maxBufferSize))
+        pkgData = yield self.stream.read_bytes(pkgSize)
+      except StreamClosedError:
+        raise gen.Return(S_ERROR("Peer closed connection"))
+      except (UnsatisfiableReadError, ValueError):
+        raise gen.Return(S_ERROR("Invalid message header"))
+      try:
+        data = MixedEncode.decode(pkgData)[0]
+      except Exception as e:  # pylint: disable=broad-except
+        raise gen.Return(S_ERROR("Could not decode received data: %s" % str(e)))
+      if not isKeepAlive:
+        raise gen.Return(data)
+      # A ping from the server while it processes the call: send the pong
+      kaData = data.get('Value', {}) if isinstance(data, dict) else {}
+      if kaData.get('kaping'):
+        result = yield self.sendData(S_OK({'id': kaData.get('id'), 'kaping': False}), prefix=keepAliveMagic)
+        if not result['OK']:
+          raise gen.Return(result)
+
+
+gSSLContexts = {}
+gSSLContextsLock = threading.Lock()
+
+
+def getSSLContext(certFile, keyFile=None, caPath=None, checkHostname=False):
+  """ Return a client ssl.SSLContext, shared by all the connections using the same credentials.
+      Loading the credentials is expensive, so the contexts are cached, until the files change.
+
+      :param str certFile: certificate (or proxy) file
+      :param str keyFile: key file, if not in certFile
+      :param str caPath: directory of the CAs. If not set, the server certificate is not verified
+      :param bool checkHostname: check that the server certificate matches the host name
+
+      :return: ssl.SSLContext
+  """
+  try:
+    mtime = os.stat(certFile).st_mtime
+  except OSError:
+    mtime = None
+  key = (certFile, keyFile, mtime, caPath, checkHostname)
+  with gSSLContextsLock:
+    context = gSSLContexts.get(key)
+    if context:
+      return context
+  if caPath:
+    context = ssl.create_default_context(capath=caPath)
+    context.check_hostname = checkHostname
+    # Clients authenticate with proxies
+    if hasattr(ssl, 'VERIFY_ALLOW_PROXY_CERTS'):
+      context.verify_flags |= ssl.VERIFY_ALLOW_PROXY_CERTS  # pylint: disable=no-member
+  else:
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+  context.load_cert_chain(certFile, keyFile)
+  with gSSLContextsLock:
+    gSSLContexts[key] = context
+  return context
+
+
+gAsyncConnectionPools = weakref.WeakKeyDictionary()
+
+
+def getAsyncConnectionPool():
+  """ Return the pool of idle connections of the current event loop,
+      or None if the connection pool is disabled in the CS (see ConnectionPool).
+
+      The connections are bound to the event loop which opened them, hence one pool per loop.
+      As many calls run concurrently, it keeps more idle connections per endpoint
+      (/DIRAC/ConnectionPool/AsyncMaxIdlePerEndpoint, default 100).
+  """
+  if not gConfig.getValue('/DIRAC/ConnectionPool/Enabled', True):
+    return None
+  ioLoop = IOLoop.current()
+  pool = gAsyncConnectionPools.get(ioLoop)
+  if not pool:
+    pool = ConnectionPool(idleTimeout=gConfig.getValue('/DIRAC/ConnectionPool/IdleTimeout', 30),
+                          maxIdlePerEndpoint=gConfig.getValue('/DIRAC/ConnectionPool/AsyncMaxIdlePerEndpoint', 100))
+    gAsyncConnectionPools[ioLoop] = pool
+    # The streams can only be closed from their loop
+    PeriodicCallback(pool.purge, pool.idleTimeout * 1000).start()
+  return pool
@@ -31,7 +31,7 @@ from hashlib import md5
 
 from DIRAC.Core.Utilities.ReturnValues import S_ERROR, S_OK
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
-from DIRAC.Core.Utilities import MixedEncode
+from DIRAC.Core.Utilities import DEncode, MixedEncode
 
 
 class BaseTransport(object):
@@ -142,6 +142,13 @@ class BaseTransport(object):
   def getSocket(self):
     return self.oSocket
 
+  def hasPendingData(self):
+    """ Whether some data was already received, and can be read without the socket being readable
+
+        :return: bool
+    """
+    return bool(self.byteStream)
+
   def _readReady(self):
     if not self.iReadTimeout:
       return True
@@ -190,6 +197,46 @@ class BaseTransport(object):
     sCodedData = None
     return S_OK()
 
+  def __receiveHeader(self, maxBufferSize):
+    """ Read the header of the next message, and remove it from the bytestream
+
+        :param int maxBufferSize: maximum number of bytes to buffer while looking for the header
+
+        :return: S_OK(size of the message) or S_OK(None) for a keep alive
+    """
+    # Look either for message length of keep alive magic string
+    iSeparatorPosition = self.byteStream.find(b":", 0, 10)
+    keepAliveMagicLen = len(BaseTransport.keepAliveMagic)
+    isKeepAlive = self.byteStream.find(BaseTransport.keepAliveMagic, 0, keepAliveMagicLen) == 0
+    # While not found the message length or the ka, keep receiving
+    while iSeparatorPosition == -1 and not isKeepAlive:
+      retVal = self._read(16384)
+      # If error return
+      if not retVal['OK']:
+        return retVal
+      # If closed return error
+      if not retVal['Value']:
+        return S_ERROR("Peer closed connection")
+      # New data!
+      self.byteStream += retVal['Value']
+      # Look again for either message length of ka magic string
+      iSeparatorPosition = self.byteStream.find(b":", 0, 10)
+      isKeepAlive = self.byteStream.find(BaseTransport.keepAliveMagic, 0, keepAliveMagicLen) == 0
+      # Over the limit?
+      if maxBufferSize and len(self.byteStream) > maxBufferSize and iSeparatorPosition == -1:
+        return S_ERROR("Read limit exceeded (%s chars)" % maxBufferSize)
+    # Keep alive magic!
+    if isKeepAlive:
+      gLogger.debug("Received keep alive header")
+      # Remove the ka magic from the buffer
+      self.byteStream = self.byteStream[keepAliveMagicLen:]
+      return S_OK(None)
+    # From here it must be a real message!
+    # Process the size and remove the msg length from the bytestream
+    pkgSize = int(self.byteStream[:iSeparatorPosition])
+    self.byteStream = self.byteStream[iSeparatorPosition + 1:]
+    return S_OK(pkgSize)
+
   def receiveData(self, maxBufferSize=0, blockAfterKeepAlive=True, idleReceive=False):
     self.__updateLastActionTimestamp()
     if self.receivedMessages:
@@ -197,37 +244,14 @@ class BaseTransport(object):
     # Buffer size can't be less than 0
     maxBufferSize = max(maxBufferSize, 0)
     try:
-      # Look either for message length of keep alive magic string
-      iSeparatorPosition = self.byteStream.find(b":", 0, 10)
-      keepAliveMagicLen = len(BaseTransport.keepAliveMagic)
-      isKeepAlive = self.byteStream.find(BaseTransport.keepAliveMagic, 0, keepAliveMagicLen) == 0
-      # While not found the message length or the ka, keep receiving
-      while iSeparatorPosition == -1 and not isKeepAlive:
-        retVal = self._read(16384)
-        # If error return
-        if not retVal['OK']:
-          return retVal
-        # If closed return error
-        if not retVal['Value']:
-          return S_ERROR("Peer closed connection")
-        # New data!
-        self.byteStream += retVal['Value']
-        # Look again for either message length of ka magic string
-        iSeparatorPosition = self.byteStream.find(b":", 0, 10)
-        isKeepAlive = self.byteStream.find(BaseTransport.keepAliveMagic, 0, keepAliveMagicLen) == 0
-        # Over the limit?
-        if maxBufferSize and len(self.byteStream) > maxBufferSize and iSeparatorPosition == -1:
-          return S_ERROR("Read limit exceeded (%s chars)" % maxBufferSize)
+      retVal = self.__receiveHeader(maxBufferSize)
+      if not retVal['OK']:
+        return retVal
+      pkgSize = retVal['Value']
       # Keep alive magic!
-      if isKeepAlive:
-        gLogger.debug("Received keep alive header")
-        # Remove the ka magic from the buffer and process the keep alive
-        self.byteStream = self.byteStream[keepAliveMagicLen:]
+      if pkgSize is None:
         return self.__processKeepAlive(maxBufferSize, blockAfterKeepAlive)
-      # From here it must be a real message!
-      # Process the size and remove the msg length from the bytestream
-      pkgSize = int(self.byteStream[:iSeparatorPosition])
-      pkgData = self.byteStream[iSeparatorPosition + 1:]
+      pkgData = self.byteStream
       readSize = len(pkgData)
       if readSize >= pkgSize:
         # If we already have all the data we need
@@ -269,6 +293,63 @@ class BaseTransport(object):
       gLogger.exception("Network error while receiving data")
       return S_ERROR("Network error while receiving data: %s" % str(e))
 
+  def receiveDataIter(self, path=(), maxBufferSize=0):
+    """ Incremental version of receiveData: the message is decoded while it is being read,
+        so that big messages are never held entirely in memory.
+        Keep alives received before the message are processed.
+
+        :param path: keys leading to the container to stream (see DEncode.iterDecode)
+        :param int maxBufferSize: maximum size of the message
+
+        :return: S_OK(generator of (keyPath, value)) / S_ERROR.
+                 The generator raises IOError if the connection fails while reading the message,
+                 and ValueError if the message cannot be decoded.
+    """
+    self.__updateLastActionTimestamp()
+    if self.receivedMessages:
+      return S_OK(DEncode.walk(self.receivedMessages.pop(0), path))
+    maxBufferSize = max(maxBufferSize, 0)
+    try:
+      retVal = self.__receiveHeader(maxBufferSize)
+      # Keep alive magic! Process it and wait for the real message
+      while retVal['OK'] and retVal['Value'] is None:
+        retVal = self.__processKeepAlive(maxBufferSize, blockAfterKeepAlive=False)
+        if retVal['OK']:
+          retVal = self.__receiveHeader(maxBufferSize)
+      if not retVal['OK']:
+        return retVal
+    except Exception as e:
+      gLogger.exception("Network error while receiving data")
+      return S_ERROR("Network error while receiving data: %s" % str(e))
+    pkgSize = retVal['Value']
+    if maxBufferSize and pkgSize > maxBufferSize:
+      return S_ERROR("Read limit exceeded (%s chars)" % maxBufferSize)
+    return S_OK(MixedEncode.iterDecode(self.__iterMessageChunks(pkgSize), path))
+
+  def __iterMessageChunks(self, pkgSize):
+    """ Yield the raw chunks of a message as they are read from the socket.
+        Whatever is read after the end of the message is kept in the bytestream.
+
+        :param int pkgSize: size of the message
+    """
+    chunk = self.byteStream[:pkgSize]
+    self.byteStream = self.byteStream[pkgSize:]
+    readSize = len(chunk)
+    yield chunk
+    while readSize < pkgSize:
+      retVal = self._read(min(pkgSize - readSize, self.packetSize), skipReadyCheck=True)
+      if not retVal['OK']:
+        raise IOError(retVal['Message'])
+      if not retVal['Value']:
+        raise IOError("Peer closed connection")
+      chunk = retVal['Value']
+      if readSize + len(chunk) > pkgSize:
+        self.byteStream = chunk[pkgSize - readSize:]
+        chunk = chunk[:pkgSize - readSize]
+      readSize += len(chunk)
+      self.__updateLastActionTimestamp()
+      yield chunk
+
   def __processKeepAlive(self, maxBufferSize, blockAfterKeepAlive=True):
     gLogger.debug("Received Keep Alive")
     # Next message down the stream will be the ka data
@@ -16,6 +16,8 @@ from M2Crypto.SSL.Checker import SSLVerificationError
 from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 from DIRAC.Core.DISET.private.Transports.BaseTransport import BaseTransport
 from DIRAC.Core.DISET.private.Transports.SSL.M2Utils import getM2SSLContext, getM2PeerInfo
+from DIRAC.Core.DISET.private.Transports.SSL.SessionCache import SESSION_TIMEOUT, getSession, \
+    gClientSessionCache, gPeerCredentialsCache
 
 from DIRAC.Core.DISET import DEFAULT_CONNECTION_TIMEOUT, DEFAULT_RPC_TIMEOUT
 
@@ -80,6 +82,10 @@ class SSLTransport(BaseTransport):
 
     self.__locked = False  # We don't support locking, so this is always false.
 
+    # Key of the client SSL session in gClientSessionCache.
+    # Only set once the connection is established
+    self.__sessionKey = None
+
     self.__ctx = kwargs.pop('ctx', None)
     if not self.__ctx:
       self.__ctx = getM2SSLContext(**kwargs)
@@ -117,6 +123,11 @@ class SSLTransport(BaseTransport):
     # a host name.
     addrInfoList = socket.getaddrinfo(host, port, socket.AF_UNSPEC,
                                       socket.SOCK_STREAM)
+
+    # Resume the SSL session of a previous connection to this server, if any.
+    # This avoids a full handshake, and the server does not need to check our chain again
+    sessionKey = gClientSessionCache.getKey(self.stServerAddress, self.__kwargs)
+    session = gClientSessionCache.get(sessionKey)
     for (family, _socketType, _proto, _canonname, _socketAddress) in \
             addrInfoList:
 
@@ -135,7 +146,16 @@ class SSLTransport(BaseTransport):
         # set SNI server name since we know it at this point
         self.oSocket.set_tlsext_host_name(host)
 
-        self.oSocket.connect((host, port))
+        if session:
+          self.oSocket.set_session(session)
+
+        try:
+          self.oSocket.connect((host, port))
+        except (SSL.SSLError, SSLVerificationError):
+          # Do not try to resume this session again
+          gClientSessionCache.delete(sessionKey)
+          raise
+        self.__sessionKey = sessionKey
 
         # Once the connection is established, we can use the timeout
         # asked for RPC
@@ -164,6 +184,9 @@ class SSLTransport(BaseTransport):
     host = self.stServerAddress[0]
     port = self.stServerAddress[1]
     self.__ctx.set_session_id_ctx(("DIRAC-%s-%s" % (host, port)).encode())
+    # Sessions (either in the server cache or as tickets) can be resumed for that long
+    if SESSION_TIMEOUT > 0:
+      self.__ctx.set_session_timeout(SESSION_TIMEOUT)
     self.oSocket = self.__getConnection()
     # Make sure reuse address is set correctly
     if self.bAllowReuseAddress:
@@ -182,6 +205,16 @@ class SSLTransport(BaseTransport):
     """ Close this socket. """
 
     if self.oSocket:
+      # Keep the session for the next connection to the same server.
+      # It is fetched now rather than after the handshake because
+      # TLS 1.3 tickets are only received after the handshake
+      if self.__sessionKey:
+        try:
+          gClientSessionCache.add(self.__sessionKey, getSession(self.oSocket))
+        except (socket.error, SSL.SSLError):
+          gClientSessionCache.delete(self.__sessionKey)
+        self.__sessionKey = None
+
       # TL;DR:
       # Do NOT touch that method
       #
@@ -328,7 +361,7 @@ class SSLTransport(BaseTransport):
           raise SSL.Checker.SSLVerificationError(
               'post connection check failed')
 
-      self.peerCredentials = getM2PeerInfo(self.oSocket)
+      self.peerCredentials = self.__getPeerInfo()
 
       # Now that the handshake has been performed on the server
       # we can set the timeout for the RPC operations.
@@ -360,7 +393,24 @@ class SSLTransport(BaseTransport):
 
     self.oSocket = oSocket
     self.remoteAddress = self.oSocket.getpeername()
-    self.peerCredentials = getM2PeerInfo(self.oSocket)
+    self.peerCredentials = self.__getPeerInfo()
+
+  def __getPeerInfo(self):
+    """ Get the credentials of the peer.
+        They are taken from gPeerCredentialsCache if the peer certificate was seen recently,
+        which is in particular the case when the client resumes its SSL session.
+
+        :returns: dict, see getM2PeerInfo
+    """
+    peerCert = self.oSocket.get_peer_cert()
+    if peerCert is None:
+      return getM2PeerInfo(self.oSocket)
+    fingerprint = peerCert.get_fingerprint('sha256')
+    peerInfo = gPeerCredentialsCache.get(fingerprint)
+    if peerInfo is None:
+      peerInfo = getM2PeerInfo(self.oSocket)
+      gPeerCredentialsCache.add(fingerprint, peerInfo)
+    return peerInfo
 
   def setClientSocket_multipleSteps(self, oSocket):
     """ Set the inner socket (i.e. SSL.Connection object) of this instance
@@ -466,6 +516,19 @@ class SSLTransport(BaseTransport):
     except (socket.error, SSL.SSLError, SSLVerificationError) as e:
       return S_ERROR("Error in _read: %s %s" % (e, repr(e)))
 
+  def hasPendingData(self):
+    """ Whether some data was already received, including the bytes
+        decrypted and buffered by the SSL connection
+
+        :returns: bool
+    """
+    if super(SSLTransport, self).hasPendingData():
+      return True
+    try:
+      return bool(self.oSocket and self.oSocket.pending())
+    except (socket.error, SSL.SSLError):
+      return False
+
   def isLocked(self):
     """ Returns if this instance is locked.
         Always returns false.
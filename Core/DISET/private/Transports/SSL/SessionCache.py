@@ -0,0 +1,176 @@
+""" Caches used to make reconnections cheaper with M2Crypto:
+
+    * the client keeps the SSL session (session ID or ticket) of each server it talked to,
+      so that the next connection resumes it instead of doing a full handshake
+    * the server keeps the credentials extracted from the peer chain,
+      so that a reconnecting client does not pay for the chain parsing again
+
+    The lifetime of both is given by the DIRAC_M2CRYPTO_SESSION_TIMEOUT environment variable
+    (seconds, default 300). Setting it to 0 disables both caches.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import os
+import threading
+import time
+
+from M2Crypto import m2
+from M2Crypto.SSL.Session import Session
+
+from DIRAC.Core.Security import Locations
+from DIRAC.Core.Utilities.DictCache import DictCache
+
+SESSION_TIMEOUT = int(os.getenv('DIRAC_M2CRYPTO_SESSION_TIMEOUT', 300))
+
+# Expired entries are removed at most that often
+PURGE_INTERVAL = 60
+
+
+def getSession(conn):
+  """ Get the session of an SSL connection, in a form which can outlive the connection.
+
+      SSL.Connection.get_session does not take a reference on the session, which is then freed twice.
+      So we take our own reference, if this M2Crypto version allows it.
+
+      :param conn: M2Crypto.SSL.Connection
+
+      :return: M2Crypto.SSL.Session or None
+  """
+  # pylint: disable=no-member
+  if not hasattr(m2, 'ssl_get1_session'):
+    return None
+  session = m2.ssl_get1_session(conn.ssl)
+  if not session:
+    return None
+  return Session(session, 1)
+
+
+class ClientSessionCache(object):
+  """ SSL sessions of the client, per server and per client credentials
+  """
+
+  def __init__(self, timeout=SESSION_TIMEOUT):
+    """ c'tor
+
+        :param int timeout: seconds during which a session is reused
+    """
+    self.timeout = timeout
+    self.__lock = threading.Lock()
+    # { key : ( M2Crypto.SSL.Session, time it was stored ) }
+    self.__sessions = {}
+
+  @staticmethod
+  def getKey(serverAddress, kwargs):
+    """ Build the key of a session. A session is bound to the credentials used to establish it,
+        so it must not be reused if the proxy changed.
+
+        :param tuple serverAddress: (host, port)
+        :param dict kwargs: transport kwargs, as given to getM2SSLContext
+
+        :return: hashable key
+    """
+    credentials = 'certificates' if kwargs.get('useCertificates') else kwargs.get('proxyLocation')
+    if not credentials:
+      credentials = Locations.getProxyLocation()
+    try:
+      credentials = (credentials, os.stat(credentials).st_mtime)
+    except (OSError, TypeError):
+      pass
+    return (tuple(serverAddress), credentials, bool(kwargs.get('skipCACheck')))
+
+  def get(self, key):
+    """ Get the session to resume
+
+        :param key: key returned by getKey
+
+        :return: M2Crypto.SSL.Session or None
+    """
+    with self.__lock:
+      session, storedAt = self.__sessions.get(key, (None, 0))
+      if session and time.time() - storedAt >= self.timeout:
+        del self.__sessions[key]
+        session = None
+    return session
+
+  def add(self, key, session):
+    """ Store the session of a connection
+
+        :param key: key returned by getKey
+        :param session: M2Crypto.SSL.Session
+    """
+    if self.timeout <= 0 or not session:
+      return
+    with self.__lock:
+      self.__sessions[key] = (session, time.time())
+
+  def delete(self, key):
+    """ Forget the session, for example after a failed handshake
+
+        :param key: key returned by getKey
+    """
+    with self.__lock:
+      self.__sessions.pop(key, None)
+
+
+class PeerCredentialsCache(object):
+  """ Credentials of the peers, keyed by the fingerprint of their certificate.
+      The certificate is checked by OpenSSL during the handshake (or was checked when the
+      resumed session was established), so the credentials derived from it can be reused.
+  """
+
+  def __init__(self, timeout=SESSION_TIMEOUT):
+    """ c'tor
+
+        :param int timeout: seconds during which the credentials are kept
+    """
+    self.timeout = timeout
+    self.__cache = DictCache()
+    self.__lastPurge = time.time()
+    self.__stats = {'hits': 0, 'misses': 0}
+
+  def get(self, fingerprint):
+    """ Get the credentials of a peer
+
+        :param str fingerprint: fingerprint of the peer certificate
+
+        :return: copy of the credentials dict, or None
+    """
+    credentials = self.__cache.get(fingerprint) if self.timeout > 0 else None
+    if credentials is None:
+      self.__stats['misses'] += 1
+      return None
+    self.__stats['hits'] += 1
+    # The transport adds the extra credentials to its own dict
+    return dict(credentials)
+
+  def add(self, fingerprint, credentials):
+    """ Store the credentials of a peer, at most until its chain expires
+
+        :param str fingerprint: fingerprint of the peer certificate
+        :param dict credentials: dict returned by getM2PeerInfo
+    """
+    if self.timeout <= 0:
+      return
+    validSeconds = self.timeout
+    remainingSecs = credentials['x509Chain'].getRemainingSecs()
+    if remainingSecs['OK']:
+      validSeconds = min(validSeconds, remainingSecs['Value'])
+    if validSeconds <= 0:
+      return
+    self.__cache.add(fingerprint, validSeconds, dict(credentials))
+    now = time.time()
+    if now - self.__lastPurge > PURGE_INTERVAL:
+      self.__lastPurge = now
+      self.__cache.purgeExpired()
+
+  def getStats(self):
+    """ Return the hits and misses counters """
+    return dict(self.__stats)
+
+
+gClientSessionCache = ClientSessionCache()
+gPeerCredentialsCache = PeerCredentialsCache()
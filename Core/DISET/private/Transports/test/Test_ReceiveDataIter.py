@@ -0,0 +1,177 @@
+""" Test the incremental reception of messages (BaseTransport.receiveDataIter)
+    and its use by InnerRPCClient.executeRPCIter, over a pair of connected PlainTransports
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import socket
+import threading
+
+from mock import MagicMock
+from pytest import fixture, raises
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.DISET.private.InnerRPCClient import InnerRPCClient
+from DIRAC.Core.DISET.private.Transports.PlainTransport import PlainTransport
+from DIRAC.Core.Utilities import DEncode
+
+
+REPLICAS = S_OK({'Successful': dict(('/lfn/%s' % i, {'SE1': 'pfn%s' % i, 'SE2': 'pfn%s' % i}) for i in range(5000)),
+                 'Failed': {'/lfn/missing': 'No such file or directory'}})
+
+
+@fixture
+def transports():
+  """ Two connected PlainTransports """
+  serverSocket, clientSocket = socket.socketpair()
+  server = PlainTransport(('', 0))
+  server.setClientSocket(serverSocket)
+  client = PlainTransport(('', 0))
+  client.setClientSocket(clientSocket)
+  # Keep the read chunks small so that the messages are received in many pieces
+  client.packetSize = 1024
+  yield server, client
+  server.close()
+  client.close()
+
+
+def sendInThread(transport, *messages):
+  """ Send the messages from a thread, so that big messages do not block on a full socket buffer """
+  def send():
+    for message in messages:
+      transport.sendData(message)
+  thread = threading.Thread(target=send)
+  thread.start()
+  return thread
+
+
+def test_receiveDataIter(transports):
+  """ The message is received and decoded in pieces, and what follows it is kept for the next call """
+  server, client = transports
+  thread = sendInThread(server, REPLICAS, S_OK('next message'))
+
+  result = client.receiveDataIter(path=('Value', 'Successful'))
+  assert result['OK'], result
+  assert list(result['Value']) == list(DEncode.walk(REPLICAS, ('Value', 'Successful')))
+  assert client.receiveData() == S_OK('next message')
+  thread.join()
+
+
+def test_receiveDataIterKeepAlive(transports):
+  """ A keep alive received before the message is answered and skipped """
+  server, client = transports
+  server.sendData(S_OK({'id': 'kaId', 'kaping': True}), prefix=server.keepAliveMagic)
+  server.sendData(S_OK([1, 2, 3]))
+
+  result = client.receiveDataIter(path=('Value',))
+  assert result['OK'], result
+  assert list(result['Value']) == [(('OK',), True), (('Value', 0), 1), (('Value', 1), 2), (('Value', 2), 3)]
+
+  # The pong went back to the server
+  result = server.receiveData(blockAfterKeepAlive=False)
+  assert result['OK'], result
+  assert result.get('keepAlive')
+
+
+def test_receiveDataIterMaxBufferSize(transports):
+  """ Messages bigger than maxBufferSize are refused """
+  server, client = transports
+  server.sendData(S_OK('x' * 1000))
+  result = client.receiveDataIter(maxBufferSize=100)
+  assert not result['OK']
+
+
+def test_receiveDataIterPeerClosed(transports):
+  """ The generator raises IOError if the connection is lost in the middle of the message """
+  server, client = transports
+  encodedData = DEncode.encode(S_OK(['x' * 100] * 100))
+  server.oSocket.sendall(b"%d:" % len(encodedData) + encodedData[:5000])
+  server.oSocket.shutdown(socket.SHUT_WR)
+
+  result = client.receiveDataIter(path=('Value',))
+  assert result['OK'], result
+  with raises(IOError):
+    list(result['Value'])
+
+
+def getRPCClient(transport):
+  """ InnerRPCClient whose connection is the given transport """
+  rpcClient = InnerRPCClient.__new__(InnerRPCClient)
+  rpcClient._connect = MagicMock(return_value=S_OK(('trid', transport)))
+  rpcClient._proposeAction = MagicMock(return_value=S_OK())
+  rpcClient._disconnect = MagicMock()
+  rpcClient._getBaseStub = MagicMock(return_value=['Test/Service', {}])
+  return rpcClient
+
+
+def test_executeRPCIter(transports):
+  """ The Value of the reply is streamed, and the connection is closed at the end """
+  server, client = transports
+  rpcClient = getRPCClient(client)
+  thread = sendInThread(server, REPLICAS)
+
+  result = rpcClient.executeRPCIter('getReplicas', (['/lfn/0'],), path=('Successful',))
+  assert result['OK'], result
+  assert not rpcClient._disconnect.called
+  assert list(result['Value']) == list(DEncode.walk(REPLICAS['Value'], ('Successful',)))
+  # The server did not offer to keep the connection open
+  rpcClient._disconnect.assert_called_once_with('trid', keepConnection=False)
+  # The arguments were sent
+  assert server.receiveData() == S_OK([['/lfn/0']])
+  thread.join()
+
+
+def test_executeRPCIterError(transports):
+  """ An error returned by the server is returned as is """
+  server, client = transports
+  rpcClient = getRPCClient(client)
+  server.sendData(S_ERROR('Nope'))
+
+  result = rpcClient.executeRPCIter('getReplicas', ([],))
+  assert not result['OK']
+  assert result['Message'] == 'Nope'
+  assert 'rpcStub' in result
+  rpcClient._disconnect.assert_called_once_with('trid')
+
+
+def test_executeRPCIterInvalidReply(transports):
+  """ A reply which is not a dict is refused """
+  server, client = transports
+  rpcClient = getRPCClient(client)
+  server.sendData('not a dict')
+
+  result = rpcClient.executeRPCIter('getReplicas', ([],))
+  assert not result['OK']
+  assert 'rpcStub' in result
+  rpcClient._disconnect.assert_called_once_with('trid')
+
+
+def test_executeRPCSendError():
+  """ The stub is returned when the arguments cannot be sent """
+  transport = MagicMock()
+  transport.sendData.return_value = S_ERROR('Broken pipe')
+  rpcClient = getRPCClient(transport)
+
+  for result in (rpcClient.executeRPCIter('getReplicas', ([],)),
+                 rpcClient.executeRPC('getReplicas', ([],)),
+                 rpcClient.executeBatchRPC([('getReplicas', ([],))])):
+    assert not result['OK']
+    assert result['Message'] == 'Broken pipe'
+    assert 'rpcStub' in result
+  assert not transport.receiveData.called
+
+
+def test_executeRPCIterKeepConnection(transports):
+  """ The connection is given back for reuse only once the whole reply was read """
+  server, client = transports
+  rpcClient = getRPCClient(client)
+  rpcClient._proposeAction.return_value = S_OK({'keepConnection': True})
+  thread = sendInThread(server, REPLICAS)
+
+  result = rpcClient.executeRPCIter('getReplicas', (['/lfn/0'],), path=('Successful',))
+  assert result['OK'], result
+  for _keyPath, _value in result['Value']:
+    pass
+  rpcClient._disconnect.assert_called_once_with('trid', keepConnection=True)
+  thread.join()
@@ -0,0 +1,73 @@
+""" Test the caches used for the SSL session resumption """
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+from mock import MagicMock
+
+from DIRAC import S_OK
+from DIRAC.Core.DISET.private.Transports.SSL.SessionCache import ClientSessionCache, PeerCredentialsCache
+
+SERVER = ('server.example.org', 9130)
+
+
+def test_clientSessionKey(tmp_path):
+  """ A session is not reused with other credentials """
+  proxy = tmp_path / 'proxy.pem'
+  proxy.write_text(u'proxy')
+  key = ClientSessionCache.getKey(SERVER, {'proxyLocation': str(proxy)})
+  assert key == ClientSessionCache.getKey(SERVER, {'proxyLocation': str(proxy), 'timeout': 10})
+  assert key != ClientSessionCache.getKey(SERVER, {'useCertificates': True})
+  assert key != ClientSessionCache.getKey(('server.example.org', 9131), {'proxyLocation': str(proxy)})
+  # The proxy was renewed
+  os.utime(str(proxy), (0, 0))
+  assert key != ClientSessionCache.getKey(SERVER, {'proxyLocation': str(proxy)})
+
+
+def test_clientSessionCache():
+  """ Sessions are kept for the timeout """
+  cache = ClientSessionCache(timeout=300)
+  session = MagicMock()
+  assert cache.get('key') is None
+  cache.add('key', session)
+  assert cache.get('key') is session
+  cache.delete('key')
+  assert cache.get('key') is None
+
+  cache.timeout = 0
+  cache.add('key', session)
+  assert cache.get('key') is None
+
+
+def getCredentials(remainingSecs):
+  """ Credentials as returned by getM2PeerInfo """
+  chain = MagicMock()
+  chain.getRemainingSecs.return_value = S_OK(remainingSecs)
+  return {'DN': '/DC=org/CN=pilot', 'x509Chain': chain, 'isProxy': True, 'isLimitedProxy': False}
+
+
+def test_peerCredentialsCache():
+  """ The cached credentials are copies, which the transport can extend """
+  cache = PeerCredentialsCache(timeout=300)
+  credentials = getCredentials(3600)
+  assert cache.get('fingerprint') is None
+  cache.add('fingerprint', credentials)
+
+  cached = cache.get('fingerprint')
+  assert cached == credentials
+  cached['extraCredentials'] = 'group'
+  assert 'extraCredentials' not in cache.get('fingerprint')
+  assert cache.getStats() == {'hits': 2, 'misses': 1}
+
+
+def test_peerCredentialsCacheExpiredChain():
+  """ The credentials are not kept longer than the chain is valid, nor when the cache is disabled """
+  cache = PeerCredentialsCache(timeout=300)
+  cache.add('expired', getCredentials(0))
+  assert cache.get('expired') is None
+
+  cache = PeerCredentialsCache(timeout=0)
+  cache.add('fingerprint', getCredentials(3600))
+  assert cache.get('fingerprint') is None
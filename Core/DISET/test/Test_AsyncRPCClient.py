@@ -0,0 +1,140 @@
+""" Test the asynchronous RPC client: AsyncTransport, AsyncInnerRPCClient against a DISET like server,
+    and the bounded gather
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import socket
+import threading
+
+from mock import MagicMock
+from pytest import fixture
+from tornado import gen
+from tornado.ioloop import IOLoop
+from tornado.iostream import IOStream
+
+from DIRAC import S_OK
+from DIRAC.Core.DISET.private.AsyncInnerRPCClient import AsyncInnerRPCClient
+from DIRAC.Core.DISET.private.Transports.AsyncTransport import AsyncTransport
+from DIRAC.Core.DISET.private.Transports.PlainTransport import PlainTransport
+from DIRAC.Core.Tornado.Client.AsyncRPCClient import gather
+
+
+@fixture
+def ioLoop():
+  """ A fresh event loop """
+  loop = IOLoop()
+  yield loop
+  loop.close(all_fds=True)
+
+
+def test_receiveDataKeepAlive(ioLoop):
+  """ The keep alives sent by the server during the call are answered """
+  serverSocket, clientSocket = socket.socketpair()
+  server = PlainTransport(('', 0))
+  server.setClientSocket(serverSocket)
+  server.sendData(S_OK({'id': 'kaId', 'kaping': True}), prefix=server.keepAliveMagic)
+  server.sendData(S_OK([1, 2, 3]))
+
+  @gen.coroutine
+  def receive():
+    transport = AsyncTransport(IOStream(clientSocket))
+    result = yield transport.receiveData()
+    raise gen.Return(result)
+
+  assert ioLoop.run_sync(receive) == S_OK([1, 2, 3])
+  # The pong went back to the server
+  result = server.receiveData(blockAfterKeepAlive=False)
+  assert result['OK'] and result.get('keepAlive')
+  server.close()
+
+
+@fixture
+def service():
+  """ A DISET like service answering the calls on a single connection,
+      and keeping it open as long as the client asks for it
+  """
+  listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+  listener.bind(('127.0.0.1', 0))
+  listener.listen(5)
+  calls = []
+  connections = []
+
+  def serve():
+    while True:
+      try:
+        sock, _address = listener.accept()
+      except (OSError, socket.error):
+        return
+      connections.append(sock)
+      transport = PlainTransport(('', 0))
+      transport.setClientSocket(sock)
+      while True:
+        proposal = transport.receiveData()
+        if not proposal['OK']:
+          break
+        keepConnection = len(proposal['Value']) > 4
+        transport.sendData(S_OK({'keepConnection': True}) if keepConnection else S_OK())
+        args = transport.receiveData()['Value']
+        calls.append((proposal['Value'][1], args))
+        transport.sendData(S_OK(args))
+        if not keepConnection:
+          break
+      transport.close()
+
+  thread = threading.Thread(target=serve)
+  thread.daemon = True
+  thread.start()
+  yield listener.getsockname(), calls, connections
+  listener.close()
+
+
+def test_executeRPC(ioLoop, service):
+  """ The calls get their results and stubs, and reuse the connection """
+  (host, port), calls, connections = service
+  rpcClient = AsyncInnerRPCClient.__new__(AsyncInnerRPCClient)
+  rpcClient.kwargs = {}
+  rpcClient.timeout = 30
+  rpcClient._getURLTuple = MagicMock(return_value=('dip', host, port, 'Test/Service'))
+  rpcClient._getBaseStub = MagicMock(return_value=['Test/Service', {}])
+
+  def getProposal(action, keepConnection=False):
+    proposal = [['Test/Service', 'Setup', 'VO'], list(action), '', 'v1']
+    return S_OK(proposal + [{'keepConnection': True}] if keepConnection else proposal)
+  rpcClient._getProposal = getProposal
+
+  @gen.coroutine
+  def execute():
+    first = yield rpcClient.executeRPC('echo', ('hello',))
+    second = yield rpcClient.executeRPC('echo', ('world',))
+    raise gen.Return((first, second))
+
+  first, second = ioLoop.run_sync(execute)
+  assert first['OK'] and first['Value'] == ['hello']
+  assert second['Value'] == ['world']
+  assert second['rpcStub'] == [['Test/Service', {}], 'echo', ['world']]
+  assert calls == [(['RPC', 'echo'], ['hello']), (['RPC', 'echo'], ['world'])]
+  assert len(connections) == 1
+
+
+def test_gather(ioLoop):
+  """ The results come in order, with at most maxConcurrency calls running """
+  running = []
+  maxRunning = []
+
+  @gen.coroutine
+  def call(value):
+    running.append(value)
+    maxRunning.append(len(running))
+    yield gen.sleep(0.01)
+    running.remove(value)
+    raise gen.Return(S_OK(value))
+
+  @gen.coroutine
+  def execute():
+    results = yield gather([lambda value=value: call(value) for value in range(20)], maxConcurrency=3)
+    raise gen.Return(results)
+
+  assert ioLoop.run_sync(execute) == [S_OK(value) for value in range(20)]
+  assert max(maxRunning) == 3
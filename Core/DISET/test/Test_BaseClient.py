@@ -0,0 +1,58 @@
+""" Test the credentials sent by the BaseClient with its proposals
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# pylint: disable=protected-access
+
+import threading
+
+from mock import patch
+from pytest import fixture
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.DISET.ThreadConfig import ThreadConfig
+from DIRAC.Core.DISET.private.BaseClient import BaseClient
+
+USER_DN = '/DC=org/CN=user'
+
+
+@fixture
+def client():
+  """ A BaseClient which does not need any credentials """
+  with patch.object(BaseClient, '_BaseClient__checkTransportSanity', return_value=S_OK()):
+    yield BaseClient('dips://server.example.org:9130/Framework/Dummy', useCertificates=False)
+
+
+def getExtraCredentials(proposal):
+  """ Extra credentials of a proposal returned by _getProposal """
+  assert proposal['OK'], proposal
+  return proposal['Value'][2]
+
+
+def test_delegationPerThread(client):
+  """ The identity delegated by a thread is only used for the calls of this thread """
+  kwargs = dict(client.kwargs)
+  proposals = {}
+
+  def delegatedCall():
+    ThreadConfig().setID(USER_DN, 'user_group')
+    proposals['delegated'] = client._getProposal(('RPC', 'ping'))
+
+  thread = threading.Thread(target=delegatedCall)
+  thread.start()
+  thread.join()
+  assert getExtraCredentials(proposals['delegated']) == [USER_DN, 'user_group']
+  assert client.kwargs == kwargs
+  assert getExtraCredentials(client._getProposal(('RPC', 'ping'))) == ''
+
+
+def test_delegationError(client):
+  """ The proposal fails if the group of the delegated DN cannot be found """
+  with patch('DIRAC.Core.DISET.private.BaseClient.Registry.findDefaultGroupForDN',
+             return_value=S_ERROR('No group for DN')):
+    client.kwargs[BaseClient.KW_DELEGATED_DN] = USER_DN
+    result = client._getProposal(('RPC', 'ping'))
+  assert not result['OK']
+  assert result['Message'] == 'No group for DN'
@@ -0,0 +1,195 @@
+""" Test the reuse of DISET connections:
+    the client side ConnectionPool and the server side IdleTransportListener
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import resource
+import socket
+import threading
+import time
+
+import six
+from mock import MagicMock
+from pytest import fixture, mark, skip
+
+from DIRAC import S_OK
+from DIRAC.Core.DISET.private.ConnectionPool import ConnectionPool
+from DIRAC.Core.DISET.private.IdleTransportListener import IdleTransportListener
+from DIRAC.Core.DISET.private.Service import Service
+from DIRAC.Core.DISET.private.TransportPool import TransportPool
+from DIRAC.Core.DISET.private.Transports.PlainTransport import PlainTransport
+
+URL_TUPLE = ('dips', 'server.example.org', 9130, 'Framework/Dummy')
+# Above the FD_SETSIZE limit of select
+HIGH_FD = 1500
+
+
+@fixture
+def transports():
+  """ Two PlainTransports connected over TCP, so that they can be added to a TransportPool """
+  listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+  listener.bind(('127.0.0.1', 0))
+  listener.listen(1)
+  clientSocket = socket.create_connection(listener.getsockname())
+  serverSocket, _address = listener.accept()
+  listener.close()
+  server = PlainTransport(('', 0))
+  server.setClientSocket(serverSocket)
+  client = PlainTransport(('', 0))
+  client.setClientSocket(clientSocket)
+  yield server, client
+  for transport in (server, client):
+    if transport.getSocket().fileno() >= 0:
+      transport.close()
+
+
+def test_getKey():
+  """ Per call options do not prevent the reuse, connection options do """
+  key = ConnectionPool.getKey(URL_TUPLE, {'timeout': 600, 'extraCredentials': 'group'})
+  assert key == ConnectionPool.getKey(URL_TUPLE, {'timeout': 600, 'setup': 'Other'})
+  assert key != ConnectionPool.getKey(URL_TUPLE, {'timeout': 600, 'proxyLocation': '/tmp/x509up_u1'})
+  assert key != ConnectionPool.getKey(('dips', 'server.example.org', 9131, 'Framework/Dummy'), {'timeout': 600})
+
+
+def test_getPut(transports):
+  """ A transport given back is reused, once """
+  _server, client = transports
+  pool = ConnectionPool()
+  key = ConnectionPool.getKey(URL_TUPLE, {})
+  assert pool.get(key) is None
+  pool.put(key, client)
+  assert pool.getStats()['idle'] == 1
+  assert pool.get(key) is client
+  assert pool.get(key) is None
+  assert pool.getStats() == {'hits': 1, 'misses': 2, 'discarded': 0, 'idle': 0}
+
+
+def test_closedByPeer(transports):
+  """ A transport closed by the server is not reused """
+  server, client = transports
+  pool = ConnectionPool()
+  key = ConnectionPool.getKey(URL_TUPLE, {})
+  pool.put(key, client)
+  server.close()
+  assert pool.get(key) is None
+  assert pool.getStats()['discarded'] == 1
+  assert client.getSocket().fileno() < 0
+
+
+def test_idleTimeout(transports):
+  """ Transports idle for too long are closed """
+  _server, client = transports
+  pool = ConnectionPool(idleTimeout=0)
+  key = ConnectionPool.getKey(URL_TUPLE, {})
+  pool.put(key, client)
+  pool.purge()
+  assert pool.getStats()['idle'] == 0
+  assert client.getSocket().fileno() < 0
+
+
+def test_maxIdlePerEndpoint():
+  """ Only maxIdlePerEndpoint transports are kept per endpoint """
+  pool = ConnectionPool(maxIdlePerEndpoint=2)
+  key = ConnectionPool.getKey(URL_TUPLE, {})
+  extraTransports = [MagicMock() for _ in range(3)]
+  for transport in extraTransports:
+    pool.put(key, transport)
+  assert pool.getStats()['idle'] == 2
+  extraTransports[2].close.assert_called_once_with()
+  pool.closeAll()
+  assert pool.getStats()['idle'] == 0
+  extraTransports[0].close.assert_called_once_with()
+
+
+def test_idleTransportListener(transports):
+  """ A parked server transport is given back when the client sends a new proposal,
+      and closed when it stays idle for too long
+  """
+  server, client = transports
+  transportPool = TransportPool()
+  trid = transportPool.add(server)
+  ready = []
+  event = threading.Event()
+
+  def readyCallback(transport, readyTrid):
+    ready.append((transport, readyTrid))
+    event.set()
+
+  listener = IdleTransportListener(transportPool, readyCallback, idleTimeout=60)
+  listener.add(trid)
+  assert listener.getNumIdle() == 1
+  client.sendData(S_OK('proposal'))
+  assert event.wait(10)
+  assert ready == [(server, trid)]
+  assert listener.getNumIdle() == 0
+  assert server.receiveData() == S_OK('proposal')
+
+  listener.idleTimeout = 0.1
+  listener.add(trid)
+  for _ in range(100):
+    if not transportPool.exists(trid):
+      break
+    time.sleep(0.1)
+  assert not transportPool.exists(trid)
+  assert len(ready) == 1
+
+
+def test_idleTransportListenerPendingData(transports):
+  """ A transport with data already received is not parked """
+  server, _client = transports
+  transportPool = TransportPool()
+  trid = transportPool.add(server)
+  readyCallback = MagicMock()
+  listener = IdleTransportListener(transportPool, readyCallback, idleTimeout=60)
+  server.byteStream = b'12:'
+  listener.add(trid)
+  readyCallback.assert_called_once_with(server, trid)
+  assert listener.getNumIdle() == 0
+
+
+@mark.skipif(six.PY2, reason="socket.socket(fileno=...) is needed")
+def test_highFileDescriptor(transports):
+  """ The sockets above the FD_SETSIZE limit of select are handled """
+  if resource.getrlimit(resource.RLIMIT_NOFILE)[0] <= HIGH_FD:
+    skip("Not enough file descriptors allowed")
+  server, client = transports
+  os.dup2(server.getSocket().fileno(), HIGH_FD)
+  server.oSocket.close()
+  server.oSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM, fileno=HIGH_FD)
+  assert ConnectionPool.isHealthy(server)
+
+  transportPool = TransportPool()
+  trid = transportPool.add(server)
+  event = threading.Event()
+  listener = IdleTransportListener(transportPool, lambda transport, readyTrid: event.set(), idleTimeout=60)
+  listener.add(trid)
+  client.sendData(S_OK('proposal'))
+  assert event.wait(10)
+  assert not ConnectionPool.isHealthy(server)
+
+
+def test_processProposalKeepConnection():
+  """ The server only keeps the connection open for RPC calls, when the client asks for it """
+  service = Service.__new__(Service)
+  service._transportPool = MagicMock()
+  service._transportPool.send.return_value = S_OK()
+  service._executeAction = MagicMock(return_value=S_OK())
+  service._idleListener = MagicMock(idleTimeout=60)
+  keepOption = {'keepConnection': True}
+  serviceTuple = ('Framework/Dummy', 'Setup', 'VO')
+
+  result = service._processProposal('trid', (serviceTuple, ('RPC', 'ping'), None, 'v1', keepOption), None)
+  service._transportPool.send.assert_called_with('trid', S_OK({'keepConnection': True}))
+  assert result['keepConnection'] and not result['closeTransport']
+
+  result = service._processProposal('trid', (serviceTuple, ('RPC', 'ping'), None, 'v1'), None)
+  service._transportPool.send.assert_called_with('trid', S_OK())
+  assert not result['keepConnection'] and result['closeTransport']
+
+  result = service._processProposal('trid', (serviceTuple, ('FileTransfer', 'FromClient'), None, 'v1', keepOption),
+                                    None)
+  service._transportPool.send.assert_called_with('trid', S_OK())
+  assert not result['keepConnection'] and result['closeTransport']
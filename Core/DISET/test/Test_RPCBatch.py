@@ -0,0 +1,120 @@
+""" Test the batches of RPC calls: the RPCBatch collecting the calls and InnerRPCClient.executeBatchRPC
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import socket
+
+from mock import MagicMock
+from pytest import fixture
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.DISET import BATCH_RPC_ACTION
+from DIRAC.Core.DISET.private.InnerRPCClient import InnerRPCClient
+from DIRAC.Core.DISET.private.RPCBatch import RPCBatch
+from DIRAC.Core.DISET.private.Transports.PlainTransport import PlainTransport
+from DIRAC.Core.Utilities.DErrno import ENOAUTH, cmpError
+
+
+@fixture
+def transports():
+  """ Two connected PlainTransports """
+  serverSocket, clientSocket = socket.socketpair()
+  server = PlainTransport(('', 0))
+  server.setClientSocket(serverSocket)
+  client = PlainTransport(('', 0))
+  client.setClientSocket(clientSocket)
+  yield server, client
+  server.close()
+  client.close()
+
+
+def getRPCClient(transport, proposalResult=S_OK()):
+  """ InnerRPCClient whose connection is the given transport """
+  rpcClient = InnerRPCClient.__new__(InnerRPCClient)
+  rpcClient._connect = MagicMock(return_value=S_OK(('trid', transport)))
+  rpcClient._proposeAction = MagicMock(return_value=proposalResult)
+  rpcClient._disconnect = MagicMock()
+  rpcClient._getBaseStub = MagicMock(return_value=['Test/Service', {}])
+  return rpcClient
+
+
+def test_collectCalls():
+  """ The calls are only sent when flushing, in order """
+  executeBatch = MagicMock(return_value=S_OK([S_OK(1), S_OK(2)]))
+  batch = RPCBatch(executeBatch)
+  assert batch.setJobStatus(1, 'Running') == 0
+  assert batch.ping() == 1
+  assert len(batch) == 2
+  assert not executeBatch.called
+
+  assert batch.flush() == S_OK([S_OK(1), S_OK(2)])
+  executeBatch.assert_called_once_with([('setJobStatus', [1, 'Running']), ('ping', [])])
+  assert len(batch) == 0
+  # Nothing left to send
+  assert batch.flush() == S_OK([])
+  assert executeBatch.call_count == 1
+
+
+def test_contextManager():
+  """ The calls are flushed at the end of the block, unless it failed """
+  executeBatch = MagicMock(return_value=S_OK([S_OK()]))
+  with RPCBatch(executeBatch) as batch:
+    batch.ping()
+  assert batch.result == S_OK([S_OK()])
+
+  executeBatch.reset_mock()
+  try:
+    with RPCBatch(executeBatch) as batch:
+      batch.ping()
+      raise ValueError()
+  except ValueError:
+    pass
+  assert not executeBatch.called
+  assert batch.result is None
+
+
+def test_privateAttributes():
+  """ Private and special attributes are not taken for remote calls """
+  batch = RPCBatch(MagicMock())
+  assert not hasattr(batch, '_private')
+  assert not hasattr(batch, '__deepcopy__')
+
+
+def test_executeBatchRPC(transports):
+  """ The calls go in a single message, and each result gets the stub of its call """
+  server, client = transports
+  rpcClient = getRPCClient(client, S_OK({'keepConnection': True}))
+  server.sendData(S_OK([S_OK('pong'), S_ERROR('Nope')]))
+
+  result = rpcClient.executeBatchRPC([('ping', ()), ('setJobStatus', (1, 'Running'))])
+  assert result['OK'], result
+  assert [callResult['OK'] for callResult in result['Value']] == [True, False]
+  assert result['Value'][1]['rpcStub'] == [['Test/Service', {}], 'setJobStatus', [1, 'Running']]
+  rpcClient._proposeAction.assert_called_once_with(client, (BATCH_RPC_ACTION, 'execute'))
+  rpcClient._disconnect.assert_called_once_with('trid', keepConnection=True)
+  assert server.receiveData() == S_OK([['ping', []], ['setJobStatus', [1, 'Running']]])
+
+
+def test_executeBatchRPCOldService(transports):
+  """ A service which does not know about batches gets the calls one by one """
+  _server, client = transports
+  rpcClient = getRPCClient(client, S_ERROR("BatchRPC is not a known action type"))
+  rpcClient.executeRPC = MagicMock(side_effect=lambda method, args: S_OK(method))
+
+  result = rpcClient.executeBatchRPC([('ping', ()), ('echo', ('hello',))])
+  assert result == S_OK([S_OK('ping'), S_OK('echo')])
+  rpcClient.executeRPC.assert_called_with('echo', ['hello'])
+  rpcClient._disconnect.assert_called_once_with('trid', keepConnection=False)
+
+
+def test_executeBatchRPCUnauthorized(transports):
+  """ A batch which is not authorized at all is not retried """
+  _server, client = transports
+  rpcClient = getRPCClient(client, S_ERROR(ENOAUTH, "Unauthorized query"))
+
+  result = rpcClient.executeBatchRPC([('ping', ())])
+  assert cmpError(result, ENOAUTH)
+  assert result['rpcStub'][1] == BATCH_RPC_ACTION
+  assert rpcClient._proposeAction.call_count == 1
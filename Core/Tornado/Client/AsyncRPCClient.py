@@ -0,0 +1,108 @@
+"""
+  Asynchronous RPC client, for both DISET (``dips``) and HTTPS services.
+
+  The calls return futures instead of blocking, so that a single thread can keep
+  many calls in flight. The connections are shared by all the clients of the event loop.
+
+  On Python 3, the futures can be awaited from asyncio coroutines::
+
+    import asyncio
+    import functools
+    from DIRAC.Core.Tornado.Client.AsyncRPCClient import AsyncRPCClient, gather
+
+    async def getStatuses(jobIDs):
+      jobMonitoring = AsyncRPCClient('WorkloadManagement/JobMonitoring')
+      # At most 50 calls at the same time
+      return await gather([functools.partial(jobMonitoring.getJobStatus, jobID) for jobID in jobIDs],
+                          maxConcurrency=50)
+
+    results = asyncio.get_event_loop().run_until_complete(getStatuses(jobIDs))
+
+  The tornado coroutines (``@gen.coroutine``, ``yield``) can use them the same way.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import functools
+
+from tornado import gen
+from tornado.locks import Semaphore
+
+from DIRAC import gLogger
+from DIRAC.Core.DISET.private.AsyncInnerRPCClient import AsyncInnerRPCClient
+from DIRAC.Core.Tornado.Client.ClientSelector import isHTTPS
+from DIRAC.Core.Tornado.Client.private.AsyncTornadoClient import AsyncTornadoClient
+
+#: Default number of calls executed at the same time by :py:func:`gather`
+DEFAULT_MAX_CONCURRENCY = 100
+
+sLog = gLogger.getSubLogger(__name__)
+
+
+class AsyncRPCClient(object):
+  """ Emulates the functions of a service, like RPCClient, but each call returns a future
+      of the S_OK/S_ERROR structure::
+
+        result = await AsyncRPCClient('Framework/SystemAdministrator').ping()
+  """
+
+  def __init__(self, url, **kwargs):
+    """ c'tor
+
+        :param url: URL of the service (proper uri or just System/Component)
+        :param kwargs: same as RPCClient
+    """
+    try:
+      useHTTPS = isHTTPS(url)
+    except Exception as e:  # pylint: disable=broad-except
+      sLog.warn("Could not select DISET or Tornado client", "%s" % repr(e))
+      useHTTPS = False
+    if useHTTPS:
+      self.__innerClient = AsyncTornadoClient(url, **kwargs)
+    else:
+      self.__innerClient = AsyncInnerRPCClient(url, **kwargs)
+
+  def executeRPC(self, method, *args):
+    """ Call a method of the service
+
+        :param str method: name of the method
+        :param args: arguments of the method
+
+        :return: future of the S_OK/S_ERROR returned by the service
+    """
+    return self.__innerClient.executeRPC(method, args)
+
+  def __getattr__(self, method):
+    # Do not pretend to have the private and special attributes
+    if method.startswith('_'):
+      raise AttributeError(method)
+    return functools.partial(self.executeRPC, method)
+
+
+@gen.coroutine
+def gather(calls, maxConcurrency=DEFAULT_MAX_CONCURRENCY):
+  """ Execute calls concurrently, but not more than maxConcurrency at the same time
+
+      :param calls: iterable of functions without arguments returning a future,
+                    typically ``functools.partial(client.method, arg)``
+      :param int maxConcurrency: maximum number of calls running at the same time
+
+      :return: future of the list of the results, in the order of the calls
+  """
+  semaphore = Semaphore(maxConcurrency)
+
+  @gen.coroutine
+  def execute(call):
+    yield semaphore.acquire()
+    try:
+      result = yield call()
+    finally:
+      semaphore.release()
+    raise gen.Return(result)
+
+  results = yield [execute(call) for call in calls]
+  raise gen.Return(results)
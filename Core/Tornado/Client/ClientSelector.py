@@ -27,6 +27,22 @@ from DIRAC.Core.Tornado.Client.TornadoClient import TornadoClient
 sLog = gLogger.getSubLogger(__name__)
 
 
+def isHTTPS(serviceName):
+  """
+    Tell whether a service is to be contacted with HTTPS.
+
+    :param serviceName: either "system/service" or a complete URL
+    :returns: bool
+  """
+  # If we are not already given a URL, resolve it
+  if serviceName.startswith(('http', 'dip')):
+    completeUrl = serviceName
+  else:
+    completeUrl = getServiceURL(serviceName)
+    sLog.verbose("URL resolved: %s" % completeUrl)
+  return completeUrl.startswith("http")
+
+
 def ClientSelector(disetClient, *args, **kwargs):  # We use same interface as RPCClient
   """
     Select the correct Client (either RPC or Transfer ), instantiate it, and return it.
@@ -68,14 +84,7 @@ def ClientSelector(disetClient, *args, **kwargs):  # We use same interface as RP
     serviceName = args[0]
     sLog.verbose("Trying to autodetect client for %s" % serviceName)
 
-    # If we are not already given a URL, resolve it
-    if serviceName.startswith(('http', 'dip')):
-      completeUrl = serviceName
-    else:
-      completeUrl = getServiceURL(serviceName)
-      sLog.verbose("URL resolved: %s" % completeUrl)
-
-    if completeUrl.startswith("http"):
+    if isHTTPS(serviceName):
       sLog.info("Using HTTPS for service %s" % serviceName)
       rpc = tornadoClient(*args, **kwargs)
     else:
@@ -29,6 +29,11 @@ __RCSID__ = "$Id$"
 
 # pylint: disable=broad-except
 
+import errno
+
+from DIRAC import S_OK
+from DIRAC.Core.DISET import BATCH_RPC_ACTION
+from DIRAC.Core.DISET.private.RPCBatch import RPCBatch
 from DIRAC.Core.Tornado.Client.private.TornadoBaseClient import TornadoBaseClient
 from DIRAC.Core.Utilities.JEncode import encode
 
@@ -68,11 +73,39 @@ class TornadoClient(TornadoBaseClient):
     retVal['rpcStub'] = (self._getBaseStub(), method, list(args))
     return retVal
 
+  def executeBatchRPC(self, calls):
+    """
+      Calls several remote methods in a single request.
+      Services which do not know about batches get the calls one by one.
+
+      :param calls: list of (method, args)
+      :returns: S_OK(list of the return of each call, each with its own stub) or S_ERROR
+    """
+    calls = [[method, list(args)] for method, args in calls]
+    retVal = self._request(method=BATCH_RPC_ACTION, args=encode([calls]))
+    if not retVal['OK']:
+      # Not implemented, or not authorized by the default rules of an older service
+      if retVal.get('Errno') in (errno.ENOSYS, errno.EACCES):
+        return S_OK([self.executeRPC(method, *args) for method, args in calls])
+      retVal['rpcStub'] = (self._getBaseStub(), BATCH_RPC_ACTION, [calls])
+      return retVal
+    baseStub = self._getBaseStub()
+    for (method, args), result in zip(calls, retVal['Value']):
+      result['rpcStub'] = (baseStub, method, args)
+    return retVal
+
+  def batch(self):
+    """
+      Get an object collecting the calls to this service, to execute them in a single request.
+      See :py:class:`~DIRAC.Core.DISET.private.RPCBatch.RPCBatch`
+    """
+    return RPCBatch(self.executeBatchRPC)
+
   def receiveFile(self, destFile, *args):
     """
       Equivalent of :py:meth:`~DIRAC.Core.DISET.TransferClient.TransferClient.receiveFile`
 
-      In practice, it calls the remote method `streamToClient` and stores the raw result in a file
+      In practice, it calls the remote method `streamToClient` and streams the raw result to a file
 
       :param str destFile: path where to store the result
       :param args: list of arguments
@@ -83,6 +116,19 @@ class TornadoClient(TornadoBaseClient):
     retVal = self._request(outputFile=destFile, **rpcCall)
     return retVal
 
+  def sendFile(self, srcFile, *args):
+    """
+      Equivalent of :py:meth:`~DIRAC.Core.DISET.TransferClient.TransferClient.sendFile`
+
+      In practice, it streams the file to the remote method `streamFromClient`
+
+      :param str srcFile: path of the file to send
+      :param args: list of arguments
+      :returns: S_OK/S_ERROR returned by the service
+    """
+    rpcCall = {'method': 'streamFromClient', 'args': encode(args)}
+    return self._request(inputFile=srcFile, **rpcCall)
+
 
 def executeRPCStub(rpcStub):
   """
@@ -0,0 +1,101 @@
+"""
+  Asynchronous counterpart of :py:class:`~DIRAC.Core.Tornado.Client.TornadoClient.TornadoClient`.
+  It is used through :py:class:`DIRAC.Core.Tornado.Client.AsyncRPCClient.AsyncRPCClient`.
+
+  The requests are sent with the tornado ``AsyncHTTPClient``, one per event loop,
+  so that all the calls of a process share its connections.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import errno
+import weakref
+
+from six.moves import http_client
+from six.moves.urllib.parse import urlencode
+from tornado import gen
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.ioloop import IOLoop
+
+from DIRAC import S_ERROR
+from DIRAC.ConfigurationSystem.Client.Config import gConfig
+from DIRAC.Core.DISET.private.Transports.AsyncTransport import getSSLContext
+from DIRAC.Core.Tornado.Client.private.TornadoBaseClient import TornadoBaseClient
+from DIRAC.Core.Utilities.JEncode import decode, encode
+
+# Tornado code for the errors which happened before getting a response (connection, timeout)
+HTTP_CLIENT_ERROR = 599
+
+gHTTPClients = weakref.WeakKeyDictionary()
+
+
+def getAsyncHTTPClient():
+  """ Return the AsyncHTTPClient of the current event loop.
+      Its number of simultaneous requests is /DIRAC/ConnectionPool/AsyncMaxClients (default 100),
+      the other ones are queued.
+  """
+  ioLoop = IOLoop.current()
+  httpClient = gHTTPClients.get(ioLoop)
+  if not httpClient:
+    httpClient = AsyncHTTPClient(force_instance=True,
+                                 max_clients=gConfig.getValue('/DIRAC/ConnectionPool/AsyncMaxClients', 100))
+    gHTTPClients[ioLoop] = httpClient
+  return httpClient
+
+
+class AsyncTornadoClient(TornadoBaseClient):
+  """ Performs the RPC calls to HTTPS services without blocking the event loop
+  """
+
+  @gen.coroutine
+  def executeRPC(self, method, args):
+    """ Calls a remote service
+
+        :param str method: remote procedure name
+        :param args: list of arguments
+        :returns: future of the decoded response of the server, with the rpcStub
+    """
+    args = list(args)
+    retVal = yield self._asyncRequest(method=method, args=encode(args))
+    if isinstance(retVal, dict):
+      retVal['rpcStub'] = (self._getBaseStub(), method, args)
+    raise gen.Return(retVal)
+
+  @gen.coroutine
+  def _asyncRequest(self, **kwargs):
+    """ Sends the request to the server, see :py:meth:`TornadoBaseClient._request`
+
+        :param kwargs: POST parameters, in particular ``method`` and ``args``
+
+        :returns: future of the decoded response
+    """
+    retVal = self._getRequestParameters(kwargs)
+    if not retVal['OK']:
+      raise gen.Return(retVal)
+    url, verify, cert = retVal['Value']
+
+    certFile, keyFile = cert if isinstance(cert, (tuple, list)) else (cert, None)
+    # Like requests, check the server certificate and host name, unless skipCACheck is set
+    try:
+      sslContext = getSSLContext(certFile, keyFile, caPath=verify or None, checkHostname=bool(verify))
+    except Exception as e:  # pylint: disable=broad-except
+      raise gen.Return(S_ERROR("Can't load the credentials: %s" % repr(e)))
+
+    request = HTTPRequest(url, method='POST', body=urlencode(kwargs),
+                          request_timeout=self.timeout, ssl_options=sslContext)
+    response = yield getAsyncHTTPClient().fetch(request, raise_error=False)
+
+    if response.code == http_client.OK:
+      raise gen.Return(decode(response.body)[0])
+    # Same errors as the blocking client
+    if response.code == http_client.NOT_IMPLEMENTED:
+      raise gen.Return(S_ERROR(errno.ENOSYS, "%s is not implemented" % kwargs.get('method')))
+    if response.code in (http_client.FORBIDDEN, http_client.UNAUTHORIZED):
+      raise gen.Return(S_ERROR(errno.EACCES, "No access to %s" % url))
+    if response.code == HTTP_CLIENT_ERROR:
+      raise gen.Return(S_ERROR("Error calling %s: %s" % (url, repr(response.error))))
+    raise gen.Return(S_ERROR("%s: %s" % (response.error, response.body)))
@@ -478,25 +478,17 @@ class TornadoBaseClient(object):
       del newKwargs['useCertificates']
     return (self._destinationSrv, newKwargs)
 
-  def _request(self, retry=0, outputFile=None, **kwargs):
+  def _getRequestParameters(self, kwargs):
     """
-      Sends the request to server
-
-      :param retry: internal parameters for recursive call. TODO: remove ?
-      :param outputFile: (default None) path to a file where to store the received data.
-                        If set, the server response will be streamed for optimization
-                        purposes, and the response data will not go through the
-                        JDecode process
-      :param **kwargs: Any argument there is used as a post parameter. They are detailed bellow.
-      :param method: (mandatory) name of the distant method
-      :param args: (mandatory) json serialized list of argument for the procedure
+      Add the connection informations to the POST arguments, and find where and how to send them.
 
+      :param dict kwargs: POST arguments, modified in place
 
+      :returns: S_OK((url, verify, cert)), where ``verify`` and ``cert`` are as expected by ``requests``:
 
-      :returns: The received data. If outputFile is set, return always S_OK
-
+                * ``verify``: CA location, or boolean telling whether to check the server certificate
+                * ``cert``: proxy location, or (certificate, key) tuple
     """
-
     # Adding some informations to send
     if self.__extraCredentials:
       kwargs[self.KW_EXTRA_CREDENTIALS] = encode(self.__extraCredentials)
@@ -519,6 +511,35 @@ class TornadoBaseClient(object):
     else:
       cert = self.__proxy_location
 
+    return S_OK((url, verify, cert))
+
+  def _request(self, retry=0, outputFile=None, inputFile=None, **kwargs):
+    """
+      Sends the request to server
+
+      :param retry: internal parameters for recursive call. TODO: remove ?
+      :param outputFile: (default None) path to a file where to store the received data.
+                        If set, the server response will be streamed for optimization
+                        purposes, and the response data will not go through the
+                        JDecode process
+      :param inputFile: (default None) path to a file to stream to the server as the body of the request,
+                        the other arguments being sent in the URL
+      :param **kwargs: Any argument there is used as a post parameter. They are detailed bellow.
+      :param method: (mandatory) name of the distant method
+      :param args: (mandatory) json serialized list of argument for the procedure
+
+
+
+      :returns: The received data. If outputFile is set, return S_OK,
+                unless the server returned a DIRAC structure instead of the data
+
+    """
+
+    retVal = self._getRequestParameters(kwargs)
+    if not retVal['OK']:
+      return retVal
+    url, verify, cert = retVal['Value']
+
     # We have a try/except for all the exceptions
     # whose default behavior is to try again,
     # maybe to different server
@@ -528,6 +549,15 @@ class TornadoBaseClient(object):
       try:
         rawText = None
 
+        # Stream upload, the data is read from the file while sending it
+        if inputFile:
+          with open(inputFile, 'rb') as f:
+            call = requests.post(url, params=kwargs, data=f, headers={'Content-Type': 'application/octet-stream'},
+                                 timeout=self.timeout, verify=verify, cert=cert)
+          rawText = call.text
+          call.raise_for_status()
+          return decode(rawText)[0]
+
         # Default case, just return the result
         if not outputFile:
           call = requests.post(url, data=kwargs,
@@ -553,12 +583,14 @@ class TornadoBaseClient(object):
           # https://requests.readthedocs.io/en/latest/user/advanced/#body-content-workflow
           with requests.post(url, data=kwargs, timeout=self.timeout, verify=verify,
                              cert=cert, stream=True) as r:
-            rawText = r.text
-            r.raise_for_status()
+            # Only read the whole content for the errors and the DIRAC structures
+            if not r.ok or r.headers.get('Content-Type', '').startswith('application/json'):
+              rawText = r.text
+              r.raise_for_status()
+              return decode(rawText)[0]
 
             with open(outputFile, 'wb') as f:
-              for chunk in r.iter_content(4096):
-                # if chunk:  # filter out keep-alive new chuncks
+              for chunk in r.iter_content(1024 * 1024):
                 f.write(chunk)
 
             return S_OK()
@@ -581,7 +613,7 @@ class TornadoBaseClient(object):
       if url not in self.__bannedUrls:
         self.__bannedUrls += [url]
       if retry < self.__nbOfUrls - 1:
-        self._request(retry=retry + 1, outputFile=outputFile, **kwargs)
+        self._request(retry=retry + 1, outputFile=outputFile, inputFile=inputFile, **kwargs)
 
       errStr = "%s: %s" % (str(e), rawText)
       return S_ERROR(errStr)
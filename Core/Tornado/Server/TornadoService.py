@@ -11,28 +11,49 @@ __RCSID__ = "$Id$"
 
 from io import open
 
+import inspect
 import os
+import tempfile
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from six.moves import http_client
-from tornado.web import RequestHandler, HTTPError
+from tornado.web import RequestHandler, HTTPError, stream_request_body
 from tornado import gen
+from tornado.httputil import parse_body_arguments
 import tornado.ioloop
 from tornado.ioloop import IOLoop
+from tornado.iostream import StreamClosedError
 
 import DIRAC
 
 from DIRAC import gConfig, gLogger, S_OK, S_ERROR
 from DIRAC.ConfigurationSystem.Client import PathFinder
+from DIRAC.Core.DISET import BATCH_RPC_ACTION
 from DIRAC.Core.DISET.AuthManager import AuthManager
 from DIRAC.Core.Security.X509Chain import X509Chain  # pylint: disable=import-error
+from DIRAC.Core.Utilities.DErrno import ENOAUTH
 from DIRAC.Core.Utilities.JEncode import decode, encode
 from DIRAC.FrameworkSystem.Client.MonitoringClient import MonitoringClient
 
 sLog = gLogger.getSubLogger(__name__)
 
+#: Size of the chunks sent when streaming a file to the client
+STREAM_CHUNK_SIZE = 1024 * 1024
 
+#: Content-Type of the raw data streamed in both directions
+RAW_CONTENT_TYPE = 'application/octet-stream'
+
+
+def _isCoroutineFunction(func):
+  """ Whether func is a coroutine, either native (async def) or a tornado one """
+  if gen.is_coroutine_function(func):
+    return True
+  return getattr(inspect, 'iscoroutinefunction', lambda _func: False)(func)
+
+
+@stream_request_body
 class TornadoService(RequestHandler):  # pylint: disable=abstract-method
   """
     Base class for all the Handlers.
@@ -44,11 +65,19 @@ class TornadoService(RequestHandler):  # pylint: disable=abstract-method
     the `tornado documentation <https://www.tornadoweb.org/en/stable/guide/structure.html>`_.
 
     For compatibility with the existing :py:class:`DIRAC.Core.DISET.TransferClient.TransferClient`,
-    the handler can define a method ``export_streamToClient``. This is the method that will be called
-    whenever ``TransferClient.receiveFile`` is called. It is the equivalent of the DISET
-    ``transfer_toClient``.
-    Note that this is here only for compatibility, and we discourage using it for new purposes, as it is
-    bound to disappear.
+    the handler can define the methods ``export_streamToClient`` and ``export_streamFromClient``,
+    called by :py:meth:`~DIRAC.Core.Tornado.Client.TornadoClient.TornadoClient.receiveFile` and
+    :py:meth:`~DIRAC.Core.Tornado.Client.TornadoClient.TornadoClient.sendFile`.
+    They are the equivalent of the DISET ``transfer_toClient`` and ``transfer_fromClient``.
+    The files are streamed in both directions, so that the memory used does not depend on their size:
+
+    * ``export_streamToClient`` can return the data itself, but also a file object or a generator of chunks,
+      which are read in the executor and sent one at a time, waiting for the client to receive them.
+      A DIRAC structure (typically an ``S_ERROR``) is returned to the client as such.
+    * ``export_streamFromClient`` is called with the path of a temporary file, in which the data sent
+      by the client was written while receiving it, followed by the arguments. The file is removed
+      after the call, the method has to move it to keep it. The size of the data is limited by the
+      ``MaxUploadSizeMiB`` option of the service (default 10240).
 
     The handler only define the ``post`` verb. Please refer to :py:meth:`.post` for the details.
 
@@ -92,21 +121,41 @@ class TornadoService(RequestHandler):  # pylint: disable=abstract-method
 
 
         def export_streamToClient(self, myDataToSend, token):
-          ''' Automatically called when ``Transfer.receiveFile`` is called.
+          ''' Automatically called when ``TornadoClient.receiveFile`` is called.
               Contrary to the other ``export_`` methods, it does not need
               to return a DIRAC structure.
           '''
 
           # Do whatever with the token
 
-          with open(myFileToSend, 'r') as fd:
-            return fd.read()
+          # The file is streamed to the client and closed by the server
+          return open(myFileToSend, 'rb')
+
+
+        def export_streamFromClient(self, tmpFilePath, myFileName, token):
+          ''' Automatically called when ``TornadoClient.sendFile`` is called.
+          '''
+          shutil.move(tmpFilePath, myFileName)
+          return S_OK()
 
 
     Note that because we inherit from :py:class:`tornado.web.RequestHandler`
     and we are running using executors, the methods you export cannot write
     back directly to the client. Please see inline comments for more details.
 
+    Each service has its own executor, configured in its CS section like the DISET services:
+
+    * ``MaxThreads`` (default 15): number of requests executed at the same time
+    * ``MaxWaitingPetitions`` (default 500): number of requests waiting for a thread.
+      Beyond that, the requests are refused with ``503 Service Unavailable``,
+      and the clients try another instance of the service.
+
+    Exported methods which are coroutines (``async def export_someMethod`` in Python 3,
+    or decorated with ``tornado.gen.coroutine``) are not sent to the executor but run directly
+    on the IOLoop. They must never block, but can wait for other asynchronous operations
+    (see for example :py:mod:`DIRAC.Core.Tornado.Client.AsyncRPCClient`).
+    They cannot be called in a batch.
+
     In order to pass information around and keep some states, we use instance attributes.
     These are initialized in the :py:meth:`.initialize` method.
 
@@ -147,6 +196,14 @@ class TornadoService(RequestHandler):  # pylint: disable=abstract-method
     cls._monitor.setComponentLocation(fullUrl)
 
     cls._monitor.registerActivity("Queries", "Queries served", "Framework", "queries", MonitoringClient.OP_RATE)
+    cls._monitor.registerActivity('PendingQueries', "Pending queries", 'Framework', 'queries',
+                                  MonitoringClient.OP_MEAN)
+    cls._monitor.registerActivity('RejectedQueries', "Queries rejected because the service is too busy", 'Framework',
+                                  'queries', MonitoringClient.OP_RATE)
+    cls._monitor.registerActivity('QueueWaitTime', "Time waiting for a thread", 'Framework', 'ms',
+                                  MonitoringClient.OP_MEAN)
+    cls._monitor.registerActivity('ExecutionTime', "Time executing the queries", 'Framework', 'ms',
+                                  MonitoringClient.OP_MEAN)
 
     cls._monitor.setComponentExtraParam('DIRACVersion', DIRAC.version)
     cls._monitor.setComponentExtraParam('platform', DIRAC.getPlatform())
@@ -198,6 +255,12 @@ class TornadoService(RequestHandler):  # pylint: disable=abstract-method
                      }
       cls._serviceInfoDict = serviceInfo
 
+      # Executor of the service, and number of requests waiting for one of its threads
+      cls._maxWaitingRequests = cls.srv_getCSOption('MaxWaitingPetitions', 500)
+      cls._executor = ThreadPoolExecutor(max(1, cls.srv_getCSOption('MaxThreads', 15)))
+      cls._queueLock = threading.Lock()
+      cls._queuedRequests = 0
+
       cls.__monitorLastStatsUpdate = time.time()
 
       cls.initializeHandler(serviceInfo)
@@ -240,6 +303,11 @@ class TornadoService(RequestHandler):  # pylint: disable=abstract-method
         ==> initialize in DISET became initializeRequest in HTTPS !
     """
 
+    # Body of the request, received by :py:meth:`.data_received`
+    self.__bodyChunks = []
+    # Temporary file receiving the data uploaded by the client, if any
+    self.__uploadFile = None
+
     # Only initialized once
     if not self.__init_done:
       # Ideally, if something goes wrong, we would like to return a Server Error 500
@@ -256,19 +324,12 @@ class TornadoService(RequestHandler):  # pylint: disable=abstract-method
 
   def prepare(self):
     """
-      Prepare the request. It reads certificates and check authorizations.
-      We make the assumption that there is always going to be a ``method`` argument
-      regardless of the HTTP method used
+      Prepare the request. It reads certificates, and for the uploads, checks authorizations
+      and creates the temporary file receiving the data.
 
+      The body of the request is not received yet (see :py:meth:`.data_received`):
+      the other requests are authorized by :py:meth:`.post` once it is parsed.
     """
-
-    # "method" argument of the POST call.
-    # This resolves into the ``export_<method>`` method
-    # on the handler side
-    # If the argument is not available, the method exists
-    # and an error 400 ``Bad Request`` is returned to the client
-    self.method = self.get_argument("method")
-
     self._stats['requests'] += 1
     self._monitor.setComponentExtraParam('queries', self._stats['requests'])
     self._monitor.addMark("Queries")
@@ -284,6 +345,46 @@ class TornadoService(RequestHandler):  # pylint: disable=abstract-method
           (self.getRemoteAddress(), self.request.path))
       raise HTTPError(status_code=http_client.UNAUTHORIZED)
 
+    # The uploads carry the raw data in the body, and the other arguments in the URL
+    if self.request.headers.get('Content-Type', '').startswith(RAW_CONTENT_TYPE):
+      self.method = self.get_query_argument("method")
+      # Refuse the upload before receiving the data
+      self.__checkAuthorization()
+      maxUploadSize = self.srv_getCSOption('MaxUploadSizeMiB', 10240) * 1024 * 1024
+      self.request.connection.set_max_body_size(maxUploadSize)
+      self.__uploadFile = tempfile.NamedTemporaryFile(prefix='TornadoUpload_', delete=False)
+
+  def data_received(self, chunk):
+    """
+      Called by tornado for each chunk of the body of the request.
+      Uploaded data goes to the temporary file, the rest is kept to be parsed by :py:meth:`.post`
+
+      :param bytes chunk: part of the body
+    """
+    if self.__uploadFile:
+      self.__uploadFile.write(chunk)
+    else:
+      self.__bodyChunks.append(chunk)
+
+  def __parseBody(self):
+    """
+      Parse the arguments from the body of the request, like tornado does when the body is not streamed
+    """
+    self.request.body = b''.join(self.__bodyChunks)
+    self.__bodyChunks = []
+    parse_body_arguments(self.request.headers.get('Content-Type', ''), self.request.body,
+                         self.request.body_arguments, self.request.files, self.request.headers)
+    for name, values in self.request.body_arguments.items():
+      self.request.arguments.setdefault(name, []).extend(values)
+
+  def __checkAuthorization(self):
+    """
+      Check that the client can call the method. If not, an error 401 is returned to the client.
+    """
+    # The calls of a batch are authorized one by one when executing it
+    if self.method == BATCH_RPC_ACTION:
+      return
+
     # Resolves the hard coded authorization requirements
     try:
       hardcodedAuth = getattr(self, 'auth_' + self.method)
@@ -314,7 +415,9 @@ class TornadoService(RequestHandler):  # pylint: disable=abstract-method
 
       The ``POST`` arguments expected are:
 
-      * ``method``: name of the method to call
+      * ``method``: name of the method to call, or ``BatchRPC`` to call several methods.
+        In that case, ``args`` contains the list of ``[method, args]`` to call,
+        and the result is the list of their results.
       * ``args``: JSON encoded arguments for the method
       * ``extraCredentials``: (optional) Extra informations to authenticate client
       * ``rawContent``: (optionnal, default False) If set to True, return the raw output
@@ -322,7 +425,11 @@ class TornadoService(RequestHandler):  # pylint: disable=abstract-method
 
       If ``rawContent`` was requested by the client, the ``Content-Type``
       is ``application/octet-stream``, otherwise we set it to ``application/json``
-      and JEncode retVal.
+      and JEncode retVal. If the method returned a file object or a generator,
+      its content is streamed to the client.
+
+      For the uploads, whose ``Content-Type`` is ``application/octet-stream``, the body
+      is the data and the other arguments are in the URL.
 
       If ``retVal`` is a dictionary that contains a ``Callstack`` item,
       it is removed, not to leak internal information.
@@ -352,23 +459,37 @@ class TornadoService(RequestHandler):  # pylint: disable=abstract-method
             u'validGroup': False}}
     """
 
+    if self.__uploadFile:
+      self.__uploadFile.close()
+    else:
+      self.__parseBody()
+      # "method" argument of the POST call.
+      # This resolves into the ``export_<method>`` method
+      # on the handler side
+      # If the argument is not available, the method exists
+      # and an error 400 ``Bad Request`` is returned to the client
+      self.method = self.get_argument("method")
+      self.__checkAuthorization()
+
     sLog.notice(
         "Incoming request %s /%s: %s" %
         (self.srv_getFormattedRemoteCredentials(),
          self._serviceName,
          self.method))
 
-    # Execute the method in an executor (basically a separate thread)
-    # Because of that, we cannot calls certain methods like `self.write`
-    # in __executeMethod. This is because these methods are not threadsafe
-    # https://www.tornadoweb.org/en/branch5.1/web.html#thread-safety-notes
-    # However, we can still rely on instance attributes to store what should
-    # be sent back (reminder: there is an instance
-    # of this class created for each request)
-    retVal = yield IOLoop.current().run_in_executor(None, self.__executeMethod)
-
-    # retVal is :py:class:`tornado.concurrent.Future`
-    self.result = retVal.result()
+    method = self.__getMethod()
+    if method and _isCoroutineFunction(method):
+      # Coroutines run directly on the IOLoop
+      self.result = yield self.__executeCoroutine(method)
+    else:
+      # Execute the method in an executor (basically a separate thread)
+      # Because of that, we cannot calls certain methods like `self.write`
+      # in __executeMethod. This is because these methods are not threadsafe
+      # https://www.tornadoweb.org/en/branch5.1/web.html#thread-safety-notes
+      # However, we can still rely on instance attributes to store what should
+      # be sent back (reminder: there is an instance
+      # of this class created for each request)
+      self.result = yield self.__runInExecutor(self.__executeMethod, method)
 
     # Here it is safe to write back to the client, because we are not
     # in a thread anymore
@@ -378,75 +499,172 @@ class TornadoService(RequestHandler):  # pylint: disable=abstract-method
     # the 'streamToClient' method.
     rawContent = self.get_argument('rawContent', default=False)
 
-    if rawContent:
+    if rawContent and not isinstance(self.result, dict):
       # See 4.5.1 http://www.rfc-editor.org/rfc/rfc2046.txt
-      self.set_header("Content-Type", "application/octet-stream")
+      self.set_header("Content-Type", RAW_CONTENT_TYPE)
+      if hasattr(self.result, 'read') or inspect.isgenerator(self.result):
+        yield self.__stream(self.result)
+        return
       result = self.result
     else:
+      # Also the DIRAC structures returned instead of the raw content, typically errors
       self.set_header("Content-Type", "application/json")
       result = encode(self.result)
 
     self.write(result)
     self.finish()
 
-  # This nice idea of streaming to the client cannot work because we are ran in an executor
-  # and we should not write back to the client in a different thread.
-  # See https://www.tornadoweb.org/en/branch5.1/web.html#thread-safety-notes
-  # def export_streamToClient(self, filename):
-  #   # https://bhch.github.io/posts/2017/12/serving-large-files-with-tornado-safely-without-blocking/
-  #   #import ipdb; ipdb.set_trace()
-  #   # chunk size to read
-  #   chunk_size = 1024 * 1024 * 1  # 1 MiB
-
-  #   with open(filename, 'rb') as f:
-  #     while True:
-  #       chunk = f.read(chunk_size)
-  #       if not chunk:
-  #         break
-  #       try:
-  #         self.write(chunk)  # write the chunk to response
-  #         self.flush()  # send the chunk to client
-  #       except StreamClosedError:
-  #         # this means the client has closed the connection
-  #         # so break the loop
-  #         break
-  #       finally:
-  #         # deleting the chunk is very important because
-  #         # if many clients are downloading files at the
-  #         # same time, the chunks in memory will keep
-  #         # increasing and will eat up the RAM
-  #         del chunk
-  #         # pause the coroutine so other handlers can run
-  #         yield gen.sleep(0.000000001)  # 1 nanosecond
-
-  #   return S_OK()
-
   @gen.coroutine
-  def __executeMethod(self):
+  def __stream(self, source):
     """
-      Execute the method called, this method is ran in an executor
-      We have several try except to catch the different problem which can occur
+      Send the content of a file object or of a generator of chunks to the client.
+      The chunks are read in the executor, and the next one only once the previous one
+      was sent, so that a slow client does not make the data pile up in memory.
 
-      - First, the method does not exist => Attribute error, return an error to client
-      - second, anything happend during execution => General Exception, send error to client
+      :param source: file object or generator, closed at the end
+    """
+    if hasattr(source, 'read'):
+      def readChunk():
+        return source.read(STREAM_CHUNK_SIZE)
+    else:
+      def readChunk():
+        # Skip the empty chunks, which would be taken for the end of the data
+        for chunk in source:
+          if chunk:
+            return chunk
+        return None
+
+    sentChunks = 0
+    try:
+      while True:
+        chunk = yield IOLoop.current().run_in_executor(self._executor, readChunk)
+        if not chunk:
+          break
+        self.write(chunk)
+        # Wait for the chunk to be sent
+        yield self.flush()
+        sentChunks += 1
+      self.finish()
+    except StreamClosedError:
+      sLog.warn("Client closed the connection while streaming", self.method)
+    except Exception as e:  # pylint: disable=broad-except
+      sLog.exception("Exception while streaming", "%s:%s" % (str(e), repr(e)))
+      if not sentChunks:
+        raise HTTPError(http_client.INTERNAL_SERVER_ERROR)
+      # The headers are already sent, the only thing left to do is closing the connection
+      self.request.connection.close()
+    finally:
+      source.close()
 
-      .. warning::
-        This method is called in an executor, and so cannot use methods like self.write
-        See https://www.tornadoweb.org/en/branch5.1/web.html#thread-safety-notes
+  def __getMethod(self):
     """
+      Get the exported method called. If it does not exist, return an error 501 to the client
 
-    # getting method
+      :returns: the method, or None for a batch
+    """
+    if self.method == BATCH_RPC_ACTION:
+      return None
     try:
       # For compatibility reasons with DISET, the methods are still called ``export_*``
-      method = getattr(self, 'export_%s' % self.method)
-    except AttributeError as e:
+      return getattr(self, 'export_%s' % self.method)
+    except AttributeError:
       sLog.error("Invalid method", self.method)
       raise HTTPError(status_code=http_client.NOT_IMPLEMENTED)
 
-    # Decode args
-    args_encoded = self.get_body_argument('args', default=encode([]))
+  @gen.coroutine
+  def __runInExecutor(self, func, *args):
+    """
+      Run a function in the executor of the service, unless too many requests are already waiting for it,
+      in which case an error 503 is returned to the client.
+
+      :returns: future of the return value of func
+    """
+    cls = self.__class__
+    with cls._queueLock:
+      if cls._queuedRequests >= cls._maxWaitingRequests:
+        self._monitor.addMark('RejectedQueries')
+        sLog.warn("Too many pending requests, rejecting", "%s (%s pending)" % (self.method, cls._queuedRequests))
+        raise HTTPError(status_code=http_client.SERVICE_UNAVAILABLE)
+      cls._queuedRequests += 1
+      pendingRequests = cls._queuedRequests
+    self._monitor.addMark('PendingQueries', pendingRequests)
+
+    submitTime = time.time()
+    # Set by the thread, and sent to the monitoring from the IOLoop
+    timings = {}
+
+    def run():
+      startTime = time.time()
+      timings['QueueWaitTime'] = startTime - submitTime
+      with cls._queueLock:
+        cls._queuedRequests -= 1
+      try:
+        return func(*args)
+      finally:
+        timings['ExecutionTime'] = time.time() - startTime
+
+    try:
+      retVal = yield IOLoop.current().run_in_executor(cls._executor, run)
+    finally:
+      for activity, seconds in timings.items():
+        self._monitor.addMark(activity, 1000. * seconds)
+    raise gen.Return(retVal)
+
+  def __getArgs(self):
+    """
+      Decode the arguments of the method called.
+      For the uploads, the path of the file containing the data comes first.
+
+      :returns: list of arguments
+    """
+    args = decode(self.get_argument('args', default=encode([])))[0]
+    if self.__uploadFile:
+      args = [self.__uploadFile.name] + list(args)
+    return args
+
+  @gen.coroutine
+  def __executeCoroutine(self, method):
+    """
+      Execute a method which is a coroutine, on the IOLoop
+
+      :param method: exported method
+
+      :returns: future of the return value of the method
+    """
+    args = self.__getArgs()
+    startTime = time.time()
+    try:
+      self.initializeRequest()
+      retVal = yield method(*args)
+    except Exception as e:  # pylint: disable=broad-except
+      sLog.exception("Exception serving request", "%s:%s" % (str(e), repr(e)))
+      raise HTTPError(http_client.INTERNAL_SERVER_ERROR)
+    finally:
+      self._monitor.addMark('ExecutionTime', 1000. * (time.time() - startTime))
+    raise gen.Return(retVal)
+
+  def __executeMethod(self, method):
+    """
+      Execute the method called, this method is ran in an executor
+      If anything happens during execution, an error 500 is returned to the client.
+
+      .. warning::
+        This method is called in an executor, and so cannot use methods like self.write
+        See https://www.tornadoweb.org/en/branch5.1/web.html#thread-safety-notes
+
+      :param method: exported method, or None for a batch
+    """
+
+    if method is None:
+      calls = decode(self.get_body_argument('args', default=encode([[]])))[0][0]
+      try:
+        self.initializeRequest()
+      except Exception as e:  # pylint: disable=broad-except
+        sLog.exception("Exception serving request", "%s:%s" % (str(e), repr(e)))
+        raise HTTPError(http_client.INTERNAL_SERVER_ERROR)
+      return self.__executeBatch(calls)
 
-    args = decode(args_encoded)[0]
+    args = self.__getArgs()
     # Execute
     try:
       self.initializeRequest()
@@ -457,6 +675,38 @@ class TornadoService(RequestHandler):  # pylint: disable=abstract-method
 
     return retVal
 
+  def __executeBatch(self, calls):
+    """
+      Execute the calls of a batch, each one being authorized on its own.
+      An error in one call does not prevent the others.
+
+      :param calls: list of (method, args)
+
+      :returns: S_OK(list of the S_OK/S_ERROR returned by each call, in the same order)
+    """
+    results = []
+    for methodName, args in calls:
+      hardcodedAuth = getattr(self, 'auth_' + methodName, None)
+      if not self._authManager.authQuery(methodName, self.credDict, hardcodedAuth):
+        sLog.error("Unauthorized access", "Identity %s; method %s in a batch" %
+                   (self.srv_getFormattedRemoteCredentials(), methodName))
+        results.append(S_ERROR(ENOAUTH, "Unauthorized query"))
+        continue
+      method = getattr(self, 'export_%s' % methodName, None)
+      if method is None:
+        sLog.error("Invalid method", methodName)
+        results.append(S_ERROR("Unknown method %s" % methodName))
+        continue
+      if _isCoroutineFunction(method):
+        results.append(S_ERROR("Method %s can not be called in a batch" % methodName))
+        continue
+      try:
+        results.append(method(*args))
+      except Exception as e:  # pylint: disable=broad-except
+        sLog.exception("Exception serving request", "%s:%s" % (str(e), repr(e)))
+        results.append(S_ERROR("Exception while executing %s: %s" % (methodName, repr(e))))
+    return S_OK(results)
+
   # def __write_return(self, retVal):
   #   """
   #     Write back to the client and return.
@@ -493,11 +743,30 @@ class TornadoService(RequestHandler):  # pylint: disable=abstract-method
 
   #   self.write(returnedData)
 
+  def on_connection_close(self):
+    """
+      Called if the client closes the connection, in particular during an upload
+    """
+    # Once received, the file belongs to the method until the end of the request
+    if self.__uploadFile and not self.__uploadFile.closed:
+      self.__removeUploadFile()
+
+  def __removeUploadFile(self):
+    """
+      Remove the temporary file of an upload, unless the method moved it
+    """
+    if self.__uploadFile:
+      self.__uploadFile.close()
+      if os.path.exists(self.__uploadFile.name):
+        os.remove(self.__uploadFile.name)
+      self.__uploadFile = None
+
   def on_finish(self):
     """
       Called after the end of HTTP request.
       Log the request duration
     """
+    self.__removeUploadFile()
     elapsedTime = 1000.0 * self.request.request_time()
 
     try:
@@ -505,7 +774,7 @@ class TornadoService(RequestHandler):  # pylint: disable=abstract-method
         argsString = "OK"
       else:
         argsString = "ERROR: %s" % self.result['Message']
-    except (AttributeError, KeyError):  # In case it is not a DIRAC structure
+    except (AttributeError, KeyError, TypeError):  # In case it is not a DIRAC structure
       if self._reason == 'OK':
         argsString = 'OK'
       else:
@@ -0,0 +1,177 @@
+""" Test the execution of the requests by TornadoService: executor, load shedding, coroutine handlers
+    and file streaming
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import threading
+
+from mock import MagicMock, patch
+from pytest import fixture
+from six.moves.urllib.parse import urlencode
+from tornado import gen
+from tornado.httpclient import AsyncHTTPClient
+from tornado.ioloop import IOLoop
+from tornado.web import Application
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.Tornado.Server.TornadoService import TornadoService
+from DIRAC.Core.Utilities.JEncode import decode, encode
+
+# Released by the tests to let the blocking calls finish
+gRelease = threading.Event()
+
+
+class DummyHandler(TornadoService):
+  """ Handler of the tests, which does not need certificates """
+
+  auth_block = ['all']
+  auth_sleep = ['all']
+  auth_streamToClient = ['all']
+  auth_streamFromClient = ['all']
+
+  # Content of the files received by streamFromClient
+  received = []
+
+  def _gatherPeerCredentials(self):
+    return {'DN': '/DC=org/CN=test', 'group': 'test_user', 'username': 'test'}
+
+  @staticmethod
+  def export_block():
+    gRelease.wait(10)
+    return S_OK('blocked')
+
+  @gen.coroutine
+  def export_sleep(self, seconds):
+    yield gen.sleep(seconds)
+    raise gen.Return(S_OK(threading.current_thread().name))
+
+  @staticmethod
+  def export_streamToClient(kind, nbChunks):
+    if kind == 'generator':
+      return (b'%d' % (i % 10) * 1000 for i in range(nbChunks))
+    if kind == 'file':
+      return open(__file__, 'rb')
+    return S_ERROR('Nothing to stream')
+
+  def export_streamFromClient(self, tmpFilePath, fileName):
+    with open(tmpFilePath, 'rb') as fd:
+      self.received.append((fileName, fd.read(), tmpFilePath))
+    return S_OK(fileName)
+
+
+@fixture
+def server():
+  """ Serve DummyHandler, with one thread and one waiting request at most """
+  DummyHandler._TornadoService__init_done = False
+  DummyHandler._monitor = MagicMock()
+  DummyHandler._stats = {'requests': 0}
+  DummyHandler._initMonitoring = classmethod(lambda cls, *args: S_OK())
+  DummyHandler.srv_getCSOption = classmethod(lambda cls, option, default=None: 1)
+  module = 'DIRAC.Core.Tornado.Server.TornadoService.'
+  patchers = [patch(module + 'PathFinder'), patch(module + 'AuthManager')]
+  for patcher in patchers:
+    patcher.start().return_value.authQuery.return_value = True
+  ioLoop = IOLoop()
+  ioLoop.make_current()
+  application = Application([('/Test/Dummy', DummyHandler)])
+  httpServer = application.listen(0, address='127.0.0.1')
+  port = list(httpServer._sockets.values())[0].getsockname()[1]
+  gRelease.clear()
+  yield ioLoop, 'http://127.0.0.1:%s/Test/Dummy' % port
+  gRelease.set()
+  httpServer.stop()
+  ioLoop.close(all_fds=True)
+  for patcher in patchers:
+    patcher.stop()
+
+
+@gen.coroutine
+def call(url, method, *args):
+  """ Call a method, return the HTTP code and the decoded body """
+  response = yield AsyncHTTPClient().fetch(url, method='POST', raise_error=False,
+                                           body=urlencode({'method': method, 'args': encode(list(args))}))
+  raise gen.Return((response.code, decode(response.body)[0] if response.code == 200 else None))
+
+
+def test_loadShedding(server):
+  """ Beyond MaxThreads running and MaxWaitingPetitions waiting requests, the requests are refused """
+  ioLoop, url = server
+
+  @gen.coroutine
+  def execute():
+    running = call(url, 'block')
+    waiting = call(url, 'block')
+    yield gen.sleep(0.5)
+    rejected = yield call(url, 'block')
+    gRelease.set()
+    results = yield [running, waiting]
+    raise gen.Return([rejected] + results)
+
+  rejected, running, waiting = ioLoop.run_sync(execute, timeout=30)
+  assert rejected == (503, None)
+  assert running == waiting == (200, S_OK('blocked'))
+
+
+def test_coroutineHandler(server):
+  """ Coroutines run on the IOLoop, even when all the threads are busy """
+  ioLoop, url = server
+
+  @gen.coroutine
+  def execute():
+    blocked = call(url, 'block')
+    results = yield [call(url, 'sleep', 0.01) for _ in range(5)]
+    gRelease.set()
+    yield blocked
+    raise gen.Return(results)
+
+  results = ioLoop.run_sync(execute, timeout=30)
+  assert results == [(200, S_OK(threading.current_thread().name))] * 5
+
+
+def test_streamToClient(server):
+  """ The generators and files are streamed, the DIRAC structures are encoded """
+  ioLoop, url = server
+
+  @gen.coroutine
+  def download(kind):
+    response = yield AsyncHTTPClient().fetch(url, method='POST', raise_error=False,
+                                             body=urlencode({'method': 'streamToClient', 'rawContent': True,
+                                                             'args': encode([kind, 2000])}))
+    raise gen.Return((response.headers['Content-Type'], response.body))
+
+  contentType, body = ioLoop.run_sync(lambda: download('generator'), timeout=30)
+  assert contentType == 'application/octet-stream'
+  assert body == b''.join(b'%d' % (i % 10) * 1000 for i in range(2000))
+
+  contentType, body = ioLoop.run_sync(lambda: download('file'), timeout=30)
+  with open(__file__.replace('.pyc', '.py'), 'rb') as fd:
+    assert body == fd.read()
+
+  contentType, body = ioLoop.run_sync(lambda: download('error'), timeout=30)
+  assert contentType == 'application/json'
+  result = decode(body)[0]
+  assert not result['OK'] and result['Message'] == 'Nothing to stream'
+
+
+def test_streamFromClient(server):
+  """ The data is received in a temporary file, removed after the call """
+  ioLoop, url = server
+  data = os.urandom(300 * 1024)
+  DummyHandler.received = []
+
+  @gen.coroutine
+  def upload():
+    response = yield AsyncHTTPClient().fetch(url + '?' + urlencode({'method': 'streamFromClient',
+                                                                    'args': encode(['myFile'])}),
+                                             method='POST', body=data, raise_error=False,
+                                             headers={'Content-Type': 'application/octet-stream'})
+    raise gen.Return(decode(response.body)[0])
+
+  assert ioLoop.run_sync(upload, timeout=30) == S_OK('myFile')
+  (fileName, received, tmpFilePath), = DummyHandler.received
+  assert fileName == 'myFile'
+  assert received == data
+  assert not os.path.exists(tmpFilePath)
@@ -1,23 +1,78 @@
 """ ClassAd Class - a light purely Python representation of the
     Condor ClassAd library.
+
+    The same JDLs are parsed many times (job submission, rescheduling, matching, agents...):
+    the parsed attributes are kept in a LRU cache keyed by the JDL, and shared by the ClassAds
+    built from the same JDL until one of them is modified.
 """
 
 from __future__ import print_function
 from __future__ import absolute_import
 from __future__ import division
 __RCSID__ = "$Id$"
+import collections
+import threading
+
 import six
 
+# Maximum number of parsed JDLs kept in the cache
+PARSE_CACHE_SIZE = 1024
+
+_parseCache = collections.OrderedDict()
+_parseCacheLock = threading.Lock()
+
+
+def _getCachedContents(jdl):
+  """ Get the parsed attributes of a JDL from the cache, moving it at the end of the LRU order
+
+      :return: the attributes dictionary, which must not be modified, or None if not cached
+  """
+  with _parseCacheLock:
+    contents = _parseCache.pop(jdl, None)
+    if contents is not None:
+      _parseCache[jdl] = contents
+  return contents
+
+
+def _cacheContents(jdl, contents):
+  """ Keep the parsed attributes of a JDL, dropping the least recently used ones
+  """
+  with _parseCacheLock:
+    _parseCache[jdl] = contents
+    while len(_parseCache) > PARSE_CACHE_SIZE:
+      _parseCache.popitem(last=False)
+
 
 class ClassAd(object):
 
   def __init__(self, jdl):
     """ClassAd constructor from a JDL string
     """
-    self.contents = {}
-    result = self.__analyse_jdl(jdl)
-    if result:
-      self.contents = result
+    self.__contents = _getCachedContents(jdl)
+    if self.__contents is None:
+      self.__contents = self.__analyse_jdl(jdl)
+      _cacheContents(jdl, self.__contents)
+    # The attributes are copied at the first modification
+    self.__shared = True
+
+  @property
+  def contents(self):
+    """ Dictionary of the attribute expressions, which can be modified
+    """
+    return self.__getWritableContents()
+
+  @contents.setter
+  def contents(self, contents):
+    self.__contents = contents
+    self.__shared = False
+
+  def __getWritableContents(self):
+    """ Get the attributes, copying them first if they are shared with the parse cache
+    """
+    if self.__shared:
+      self.__contents = dict(self.__contents)
+      self.__shared = False
+    return self.__contents
 
   def __analyse_jdl(self, jdl, index=0):
     """Analyse one [] jdl enclosure
@@ -53,7 +108,7 @@ class ClassAd(object):
       elif valuemode:
         ind1 = body.find("[", index)
         ind2 = body.find(";", index)
-        if ind1 != -1 and ind1 < ind2:
+        if ind1 != -1 and (ind2 == -1 or ind1 < ind2):
           value, newind = self.__find_subjdl(body, ind1)
         elif ind1 == -1 and ind2 == -1:
           value = body[index:]
@@ -93,32 +148,32 @@ class ClassAd(object):
           ind = ind1
         else:
           result = body[index:ind1 + 1]
-          if body[ind1 + 1] == ";":
+          if body[ind1 + 1:ind1 + 2] == ";":
             return (result, ind1 + 2)
-          return result, 0
+          return result, ind1 + 1
 
-    return result, 0
+    return result, len(body)
 
   def insertAttributeInt(self, name, attribute):
     """Insert a named integer attribute
     """
 
-    self.contents[name] = str(attribute)
+    self.__getWritableContents()[name] = str(attribute)
 
   def insertAttributeBool(self, name, attribute):
     """Insert a named boolean attribute
     """
 
     if attribute:
-      self.contents[name] = 'true'
+      self.__getWritableContents()[name] = 'true'
     else:
-      self.contents[name] = 'false'
+      self.__getWritableContents()[name] = 'false'
 
   def insertAttributeString(self, name, attribute):
     """Insert a named string attribute
     """
 
-    self.contents[name] = '"' + str(attribute) + '"'
+    self.__getWritableContents()[name] = '"' + str(attribute) + '"'
 
   def insertAttributeVectorString(self, name, attributelist):
     """Insert a named string list attribute
@@ -126,7 +181,7 @@ class ClassAd(object):
 
     tmp = ['"' + x + '"' for x in attributelist]
     tmpstr = ','.join(tmp)
-    self.contents[name] = '{' + tmpstr + '}'
+    self.__getWritableContents()[name] = '{' + tmpstr + '}'
 
   def insertAttributeVectorInt(self, name, attributelist):
     """Insert a named string list attribute
@@ -134,7 +189,7 @@ class ClassAd(object):
 
     tmp = [str(x) for x in attributelist]
     tmpstr = ','.join(tmp)
-    self.contents[name] = '{' + tmpstr + '}'
+    self.__getWritableContents()[name] = '{' + tmpstr + '}'
 
   def insertAttributeVectorStringList(self, name, attributelist):
     """Insert a named list of string lists
@@ -145,28 +200,28 @@ class ClassAd(object):
       # tmp = map ( lambda x : '"' + x + '"', stringList )
       tmpstr = ','.join(stringList)
       listOfLists.append('{' + tmpstr + '}')
-    self.contents[name] = '{' + ','.join(listOfLists) + '}'
+    self.__getWritableContents()[name] = '{' + ','.join(listOfLists) + '}'
 
   def lookupAttribute(self, name):
     """Check the presence of the given attribute
     """
 
-    return name in self.contents
+    return name in self.__contents
 
   def set_expression(self, name, attribute):
     """Insert a named expression attribute
     """
 
-    self.contents[name] = str(attribute)
+    self.__getWritableContents()[name] = str(attribute)
 
   def get_expression(self, name):
     """Get expression corresponding to a named attribute
     """
 
-    if name in self.contents:
-      if isinstance(self.contents[name], six.integer_types):
-        return str(self.contents[name])
-      return self.contents[name]
+    if name in self.__contents:
+      if isinstance(self.__contents[name], six.integer_types):
+        return str(self.__contents[name])
+      return self.__contents[name]
     return ""
 
   def isAttributeList(self, name):
@@ -236,8 +291,8 @@ class ClassAd(object):
     """Delete a named attribute
     """
 
-    if name in self.contents:
-      del self.contents[name]
+    if name in self.__contents:
+      del self.__getWritableContents()[name]
       return 1
     return 0
 
@@ -245,7 +300,7 @@ class ClassAd(object):
     """Check the JDL validity - to be defined
     """
 
-    if self.contents:
+    if self.__contents:
       return 1
     return 0
 
@@ -254,7 +309,7 @@ class ClassAd(object):
     """
 
     result = ''
-    for name, value in sorted(self.contents.items()):
+    for name, value in sorted(self.__contents.items()):
       if value[0:1] == "{":
         result = result + 4 * ' ' + name + " = \n"
         result = result + 8 * ' ' + '{\n'
@@ -319,4 +374,4 @@ class ClassAd(object):
 
     :return: list of names as strings
     """
-    return self.contents.keys()
+    return self.__contents.keys()
@@ -518,22 +518,415 @@ g_dDecodeFunctions[_ord("d")] = decodeDict
 
 
 # Encode function
-def encode(uObject):
-  """ Generic encoding function """
+def tableEncode(uObject):
+  """ Generic encoding function going through the g_dEncodeFunctions table.
+      This is the reference implementation, used when debugging the call stack.
+  """
   eList = []
   # print("ENCODE FUNCTION : %s" % g_dEncodeFunctions[ type( uObject ) ])
   g_dEncodeFunctions[type(uObject)](uObject, eList)
   return b"".join(eList)
 
 
-def decode(data):
-  """ Generic decoding function """
+def tableDecode(data):
+  """ Generic decoding function going through the g_dDecodeFunctions table.
+      This is the reference implementation, used when debugging the call stack.
+  """
   if not data:
     return data
   # print("DECODE FUNCTION : %s" % g_dDecodeFunctions[ sStream [ iIndex ] ])
   return g_dDecodeFunctions[data[0]](data, 0)
 
 
+# Fast path
+#
+# The functions below produce and consume exactly the same wire format as the
+# table driven functions above, but avoid one Python call per element:
+# scalars found inside containers are handled inline, and only nested
+# containers recurse. The decoder never slices the input buffer for
+# containers, and strings longer than ZERO_COPY_THRESHOLD are decoded directly
+# from a memoryview of the input instead of from an intermediate bytes copy.
+# Types not known by the fast path are delegated to g_dEncodeFunctions, so
+# extending the table keeps working.
+
+# Strings longer than this (in bytes) are decoded without an intermediate copy
+ZERO_COPY_THRESHOLD = 4096
+
+_B_INT = _ord("i")
+_B_LONG = _ord("I")
+_B_BOOL = _ord("b")
+_B_STRING = _ord("s")
+_B_UNICODE = _ord("u")
+_B_DATETIME = _ord("z")
+_B_NONE = _ord("n")
+_B_LIST = _ord("l")
+_B_TUPLE = _ord("t")
+_B_DICT = _ord("d")
+_B_END = _ord("e")
+_B_FALSE = _ord("0")
+
+
+def _fastEncodeObject(uObject, eList):
+  """ Encode uObject appending the chunks to eList.
+      Strings, ints, None and booleans within lists, tuples and dicts are encoded inline.
+
+      :param uObject: object to encode
+      :param eList: list of bytes chunks, extended in place
+  """
+  append = eList.append
+  oType = type(uObject)
+
+  if oType is dict:
+    append(b"d")
+    for key in sorted(uObject):
+      if type(key) is str:
+        bKey = key.encode()
+        append(b"s%d:" % len(bKey))
+        append(bKey)
+      else:
+        _fastEncodeObject(key, eList)
+      value = uObject[key]
+      vType = type(value)
+      if vType is str:
+        bValue = value.encode()
+        append(b"s%d:" % len(bValue))
+        append(bValue)
+      elif vType is int:
+        append(b"i%de" % value)
+      elif value is None:
+        append(b"n")
+      elif vType is bool:
+        append(b"b1" if value else b"b0")
+      else:
+        _fastEncodeObject(value, eList)
+    append(b"e")
+  elif oType is list or oType is tuple:
+    append(b"l" if oType is list else b"t")
+    for value in uObject:
+      vType = type(value)
+      if vType is str:
+        bValue = value.encode()
+        append(b"s%d:" % len(bValue))
+        append(bValue)
+      elif vType is int:
+        append(b"i%de" % value)
+      elif value is None:
+        append(b"n")
+      elif vType is bool:
+        append(b"b1" if value else b"b0")
+      else:
+        _fastEncodeObject(value, eList)
+    append(b"e")
+  elif oType is str:
+    bValue = uObject.encode()
+    append(b"s%d:" % len(bValue))
+    append(bValue)
+  elif oType is bytes:
+    append(b"s%d:" % len(uObject))
+    append(uObject)
+  elif oType is int:
+    append(b"i%de" % uObject)
+  elif uObject is None:
+    append(b"n")
+  elif oType is bool:
+    append(b"b1" if uObject else b"b0")
+  elif oType is float:
+    append(b"f" + str(uObject).encode() + b"e")
+  elif oType is _dateTimeType and uObject.tzinfo is None:
+    append(b"zati%dei%dei%dei%dei%dei%dei%dene" % (uObject.year, uObject.month, uObject.day,
+                                                   uObject.hour, uObject.minute, uObject.second,
+                                                   uObject.microsecond))
+  else:
+    # other datetimes and anything registered by third parties
+    g_dEncodeFunctions[oType](uObject, eList)
+
+
+def _fastDecodeObject(data, view, i):
+  """ Decode the object starting at position i of data
+
+      :param data: bytes-like object supporting index()
+      :param view: memoryview of data, used for the zero copy decoding of big strings
+      :param i: position of the type marker
+
+      :returns: (decoded object, index after the object)
+  """
+  marker = data[i]
+
+  if marker == _B_DICT:
+    index = data.index
+    oD = {}
+    i += 1
+    while data[i] != _B_END:
+      if data[i] == _B_STRING:
+        colon = index(b":", i)
+        i = colon + 1 + int(data[i + 1:colon])
+        key = data[colon + 1:i].decode("utf-8", "surrogateescape")
+      elif data[i] == _B_INT:
+        end = index(b"e", i)
+        key = int(data[i + 1:end])
+        i = end + 1
+      else:
+        key, i = _fastDecodeObject(data, view, i)
+      if data[i] == _B_STRING:
+        colon = index(b":", i)
+        i = colon + 1 + int(data[i + 1:colon])
+        if i - colon > ZERO_COPY_THRESHOLD:
+          oD[key] = str(view[colon + 1:i], "utf-8", "surrogateescape")
+        else:
+          oD[key] = data[colon + 1:i].decode("utf-8", "surrogateescape")
+      elif data[i] == _B_INT:
+        end = index(b"e", i)
+        oD[key] = int(data[i + 1:end])
+        i = end + 1
+      else:
+        oD[key], i = _fastDecodeObject(data, view, i)
+    return (oD, i + 1)
+
+  if marker == _B_LIST or marker == _B_TUPLE:
+    index = data.index
+    oL = []
+    append = oL.append
+    i += 1
+    while data[i] != _B_END:
+      if data[i] == _B_STRING:
+        colon = index(b":", i)
+        i = colon + 1 + int(data[i + 1:colon])
+        if i - colon > ZERO_COPY_THRESHOLD:
+          append(str(view[colon + 1:i], "utf-8", "surrogateescape"))
+        else:
+          append(data[colon + 1:i].decode("utf-8", "surrogateescape"))
+      elif data[i] == _B_INT:
+        end = index(b"e", i)
+        append(int(data[i + 1:end]))
+        i = end + 1
+      else:
+        value, i = _fastDecodeObject(data, view, i)
+        append(value)
+    if marker == _B_TUPLE:
+      return (tuple(oL), i + 1)
+    return (oL, i + 1)
+
+  if marker == _B_STRING or marker == _B_UNICODE:
+    colon = data.index(b":", i)
+    end = colon + 1 + int(data[i + 1:colon])
+    if end - colon > ZERO_COPY_THRESHOLD:
+      return (str(view[colon + 1:end], "utf-8", "surrogateescape"), end)
+    return (data[colon + 1:end].decode("utf-8", "surrogateescape"), end)
+
+  if marker == _B_INT or marker == _B_LONG:
+    end = data.index(b"e", i + 1)
+    return (int(data[i + 1:end]), end + 1)
+
+  if marker == _B_NONE:
+    return (None, i + 1)
+
+  if marker == _B_BOOL:
+    return (data[i + 1] != _B_FALSE, i + 2)
+
+  if marker == _B_DATETIME:
+    dataType = data[i + 1]
+    tupleObject, i = _fastDecodeObject(data, view, i + 2)
+    if dataType == _ord('a'):
+      return (datetime.datetime(*tupleObject), i)
+    if dataType == _ord('d'):
+      return (datetime.date(*tupleObject), i)
+    if dataType == _ord('t'):
+      return (datetime.time(*tupleObject), i)
+    raise Exception("Unexpected type %s while decoding a datetime object" % dataType)
+
+  # Floats and anything registered by third parties
+  return g_dDecodeFunctions[marker](data, i)
+
+
+def fastEncode(uObject):
+  """ Encoding function, wire compatible with tableEncode """
+  eList = []
+  _fastEncodeObject(uObject, eList)
+  return b"".join(eList)
+
+
+def fastDecode(data):
+  """ Decoding function, wire compatible with tableDecode
+
+      :param data: bytes or bytearray
+
+      :returns: (decoded object, length of the decoded data)
+  """
+  if not data:
+    return data
+  with memoryview(data) as view:
+    return _fastDecodeObject(data, view, 0)
+
+
+def encode(uObject):
+  """ Generic encoding function """
+  if DIRAC_DEBUG_DENCODE_CALLSTACK or six.PY2:
+    return tableEncode(uObject)
+  return fastEncode(uObject)
+
+
+def decode(data):
+  """ Generic decoding function """
+  if DIRAC_DEBUG_DENCODE_CALLSTACK or six.PY2:
+    return tableDecode(data)
+  return fastDecode(data)
+
+
+# Incremental decoding
+#
+# iterDecode consumes the encoded data chunk by chunk (typically as it is read
+# from a socket) and yields the elements of one container as soon as they are
+# complete. Consumed bytes are dropped from the internal buffer, so the memory
+# footprint is bounded by the biggest single element instead of the whole
+# message.
+
+# Consumed bytes are dropped from the buffer once there are more than this
+STREAM_COMPACT_THRESHOLD = 1048576
+
+
+class _StreamBuffer(object):
+  """ Growing window over an iterable of bytes chunks """
+
+  def __init__(self, chunks):
+    self.chunks = iter(chunks)
+    self.buf = bytearray()
+    self.pos = 0
+    self.exhausted = False
+
+  def fill(self, minSize):
+    """ Read chunks until at least minSize bytes are available after pos
+
+        :returns: True if the requested size is available
+    """
+    while len(self.buf) - self.pos < minSize and not self.exhausted:
+      try:
+        self.buf.extend(next(self.chunks))
+      except StopIteration:
+        self.exhausted = True
+    return len(self.buf) - self.pos >= minSize
+
+  def peek(self):
+    """ Return the byte at the current position """
+    if not self.fill(1):
+      raise ValueError("Truncated DEncode stream")
+    return self.buf[self.pos]
+
+  def skip(self):
+    """ Move past the current byte """
+    self.pos += 1
+
+  def readElement(self):
+    """ Decode the complete element starting at the current position,
+        reading more chunks as long as it is incomplete.
+        The size of the window is doubled at each attempt to keep the total cost linear.
+
+        An element is only considered complete when at least one byte follows it
+        (or the stream is exhausted): a float like f1e+20e would otherwise be
+        decoded as 1. if the chunk ends right after f1e.
+    """
+    while True:
+      try:
+        with memoryview(self.buf) as view:
+          value, end = _fastDecodeObject(self.buf, view, self.pos)
+        if end < len(self.buf) or (self.exhausted and end == len(self.buf)):
+          break
+      except (IndexError, ValueError):
+        # incomplete (or corrupted) element
+        pass
+      except KeyError:
+        # unknown type marker: the stream is misaligned
+        raise ValueError("Corrupted DEncode stream")
+      if self.exhausted:
+        raise ValueError("Truncated DEncode stream")
+      self.fill(2 * (len(self.buf) - self.pos) + 1)
+    self.pos = end
+    if self.pos > STREAM_COMPACT_THRESHOLD:
+      del self.buf[:self.pos]
+      self.pos = 0
+    return value
+
+
+def _iterStream(stream, keyPath, path):
+  """ Yield the elements of the encoded object at the current position of stream
+
+      :param stream: _StreamBuffer instance
+      :param keyPath: tuple of keys leading to the current object
+      :param path: remaining keys leading to the container to stream
+  """
+  marker = stream.peek()
+  if marker not in (_B_DICT, _B_LIST, _B_TUPLE):
+    yield (keyPath, stream.readElement())
+    return
+  stream.skip()
+  position = 0
+  while stream.peek() != _B_END:
+    if marker == _B_DICT:
+      key = stream.readElement()
+    else:
+      key = position
+      position += 1
+    if path and key == path[0]:
+      for item in _iterStream(stream, keyPath + (key,), path[1:]):
+        yield item
+    else:
+      yield (keyPath + (key,), stream.readElement())
+  stream.skip()
+
+
+def walk(uObject, path=()):
+  """ Yield the elements of an already decoded object, the same way iterDecode does
+
+      :param uObject: decoded object
+      :param path: keys (for dicts) or positions (for lists and tuples) leading to the container to walk
+
+      :returns: generator of (keyPath, value)
+  """
+  def _walk(uObject, keyPath, path):
+    if isinstance(uObject, dict):
+      items = ((key, uObject[key]) for key in sorted(uObject))
+    elif isinstance(uObject, (list, tuple)):
+      items = enumerate(uObject)
+    else:
+      yield (keyPath, uObject)
+      return
+    for key, value in items:
+      if path and key == path[0]:
+        for item in _walk(value, keyPath + (key,), path[1:]):
+          yield item
+      else:
+        yield (keyPath + (key,), value)
+
+  return _walk(uObject, (), tuple(path))
+
+
+def iterDecode(chunks, path=()):
+  """ Incremental decoding function.
+
+      The encoded stream is followed down to the container designated by path, and the
+      elements of this container are yielded one by one as soon as they are fully received.
+      The other values found on the way (the siblings of the keys in path) are yielded
+      whole, in encoding order (i.e. sorted keys for dicts).
+
+      For example, a S_OK({'Successful': {lfn: replicas}, 'Failed': {}}) reply
+      streamed with path=('Value', 'Successful') yields::
+
+        (('OK',), True)
+        (('Value', 'Failed'), {})
+        (('Value', 'Successful', lfn1), replicas1)
+        (('Value', 'Successful', lfn2), replicas2)
+
+      On Python 2 the whole stream is buffered before decoding.
+
+      :param chunks: iterable of bytes
+      :param path: keys (for dicts) or positions (for lists and tuples) leading to the container to stream
+
+      :returns: generator of (keyPath, value)
+  """
+  if DIRAC_DEBUG_DENCODE_CALLSTACK or six.PY2:
+    return walk(decode(b"".join(chunks))[0], path)
+  return _iterStream(_StreamBuffer(chunks), (), tuple(path))
+
+
 if __name__ == "__main__":
   gObject = {2: "3", True: (3, None), 2.0 * 10 ** 20: 2.0 * 10 ** -10}
   print("Initial: %s" % gObject)
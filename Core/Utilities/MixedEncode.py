@@ -40,3 +40,17 @@ def decode(encodedData):
     except Exception:
       return JEncode.decode(encodedData)
   return DEncode.decode(encodedData)
+
+
+def iterDecode(chunks, path=()):
+  """ Decode the encoded stream incrementally
+
+      :param chunks: iterable of encoded chunks
+      :param path: keys leading to the container to stream (see DEncode.iterDecode)
+
+      :return: generator of (keyPath, value)
+  """
+  if os.getenv('DIRAC_USE_JSON_DECODE', 'NO').lower() in ('yes', 'true'):
+    # JSON cannot be decoded incrementally, and we do not know the encoding before trying
+    return DEncode.walk(decode(b"".join(chunks))[0], path)
+  return DEncode.iterDecode(chunks, path)
@@ -39,6 +39,17 @@
     Returns S_OK with fetchall() out in Value or S_ERROR upon failure.
 
 
+    _queryIter( cmd, [batchSize=1000] )
+
+    Executes SQL command "cmd" with a server side cursor, for the queries returning
+    too many rows to hold them all in memory.
+    The rows are read while iterating, with a connection of its own, which is
+    given back to the Queue at the end of the iteration, or closed if the iteration
+    is interrupted.
+    Returns S_OK with an iterator over tuples of at most batchSize rows in Value,
+    or S_ERROR upon failure.
+
+
     _update( cmd, [conn] )
 
     Executes SQL command "cmd" and issue a commit
@@ -90,6 +101,22 @@
       String type values will be appropriately escaped.
 
 
+    insertMany( self, tableName, inFields, valuesList, updateFields = None, conn = None ):
+
+      Insert a row in "tableName" for each list of values of "valuesList",
+      with as few statements as max_allowed_packet allows.
+      The values are passed as parameters of the statement, they are not escaped
+      and can not be SQL functions.
+      The existing rows are updated with the new values of "updateFields", if given.
+
+
+    updateMany( self, tableName, updateFields, condFields, valuesList, conn = None ):
+
+      Update "updateFields" from "tableName" in the rows where each of the "condFields"
+      is equal to a value, for each list of values (update values then condition values)
+      of "valuesList".
+
+
     updateFields( self, tableName, updateFields = None, updateValues = None,
                   condDict = None,
                   limit = False, conn = None,
@@ -155,6 +182,7 @@ import collections
 import time
 import threading
 import MySQLdb
+import MySQLdb.cursors
 
 from DIRAC import gLogger
 from DIRAC import S_OK, S_ERROR
@@ -205,6 +233,67 @@ def _quotedList(fieldList=None):
   return ', '.join(quotedFields)
 
 
+class _RowBatchIterator(object):
+  """
+  Iterator over the rows of a server side cursor, see MySQL._queryIter
+  """
+
+  def __init__(self, cursor, batchSize, release):
+    """
+    :param cursor: SSCursor on which the query was executed
+    :param int batchSize: maximum number of rows of each batch
+    :param release: function called with the completion status once the iteration is over
+    """
+    self.__cursor = cursor
+    self.__batchSize = batchSize
+    self.__release = release
+
+  def __iter__(self):
+    return self
+
+  def __next__(self):
+    if not self.__cursor:
+      raise StopIteration
+    try:
+      rows = self.__cursor.fetchmany(self.__batchSize)
+    except BaseException:
+      self.close()
+      raise
+    if not rows:
+      self.__finish(True)
+      raise StopIteration
+    return rows
+
+  next = __next__
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+  def __finish(self, complete):
+    cursor, self.__cursor = self.__cursor, None
+    if not cursor:
+      return
+    # Closing an interrupted cursor would read the rest of the rows from the server
+    if complete:
+      try:
+        cursor.close()
+      except BaseException:
+        complete = False
+    self.__release(complete)
+
+  def close(self):
+    """
+    Stop the iteration, and release the connection
+    """
+    self.__finish(False)
+
+  def __del__(self):
+    self.close()
+
+
 class MySQL(object):
   """
   Basic multithreaded DIRAC MySQL Client Class
@@ -287,6 +376,44 @@ class MySQL(object):
           return S_ERROR(DErrno.EMYSQL, "Could not connect")
       return S_OK(conn)
 
+    def borrow(self, dbName):
+      """
+      Get a connection which is not assigned to the current thread, for the queries which
+      keep it busy while the thread does other queries. It has to be given back with giveBack.
+
+      :param str dbName: name of the DB to select
+
+      :return: S_OK(connection)/S_ERROR
+      """
+      try:
+        conn, lastName = self.__spares.pop()
+      except IndexError:
+        conn, lastName = None, ""
+      try:
+        if not conn or not self.__ping(conn):
+          conn, lastName = self.__newConn(), ""
+        if lastName != dbName:
+          conn.select_db(dbName)
+      except MySQLdb.MySQLError as excp:
+        return S_ERROR(DErrno.EMYSQL, "Could not connect: %s" % excp)
+      return S_OK(conn)
+
+    def giveBack(self, conn, dbName, reusable=True):
+      """
+      Give back a connection obtained with borrow
+
+      :param conn: connection
+      :param str dbName: name of the DB selected on the connection
+      :param bool reusable: if False, the connection is closed
+      """
+      if reusable and len(self.__spares) < self.__maxSpares:
+        self.__spares.append((conn, dbName))
+        return
+      try:
+        conn.close()
+      except BaseException as exc:
+        gLogger.warn("Exception while closing MySQL connection: %s" % exc)
+
     def __ping(self, conn):
       try:
         conn.ping(True)
@@ -399,6 +526,7 @@ class MySQL(object):
     self.__passwd = str(passwd)
     self.__dbName = str(dbName)
     self.__port = port
+    self.__maxStatementLength = 0
     cKey = (self.__hostName, self.__userName, self.__passwd, self.__port)
     if cKey not in MySQL.__connectionPools:
       MySQL.__connectionPools[cKey] = MySQL.ConnectionPool(*cKey)
@@ -622,10 +750,43 @@ class MySQL(object):
 
     return retDict
 
-  def _update(self, cmd, conn=None, debug=False):
+  def _queryIter(self, cmd, batchSize=1000):
+    """
+    execute MySQL query command, reading the rows from the server while iterating
+    instead of loading them all in memory
+
+    The iteration uses its own connection, so that other queries can be done meanwhile.
+    It is given back once all the rows are read, or closed if the iterator is closed
+    (or garbage collected) before the end.
+
+    :param str cmd: query
+    :param int batchSize: maximum number of rows in each batch
+
+    :return: S_OK with an iterator over tuples of rows, or S_ERROR upon error
+    """
+    retDict = self.__connectionPool.borrow(self.__dbName)
+    if not retDict['OK']:
+      return retDict
+    connection = retDict['Value']
+
+    def release(complete):
+      self.__connectionPool.giveBack(connection, self.__dbName, reusable=complete)
+
+    try:
+      cursor = connection.cursor(MySQLdb.cursors.SSCursor)
+      cursor.execute(cmd)
+    except BaseException as x:
+      release(False)
+      return self._except('_queryIter', x, 'Execution failed.')
+
+    return S_OK(_RowBatchIterator(cursor, batchSize, release))
+
+  def _update(self, cmd, conn=None, debug=False, args=None):
     """ execute MySQL update command
 
         :param debug: unused
+        :param tuple args: parameters of the command, its placeholders being %s.
+                           They are not escaped, and are the way to pass binary values.
 
         return S_OK with number of updated registers upon success
         return S_ERROR upon error
@@ -640,7 +801,7 @@ class MySQL(object):
 
     try:
       cursor = connection.cursor()
-      res = cursor.execute(cmd)
+      res = cursor.execute(cmd, args)
       retDict = S_OK(res)
       if cursor.lastrowid:
         retDict['lastRowId'] = cursor.lastrowid
@@ -655,6 +816,55 @@ class MySQL(object):
 
     return retDict
 
+  def __getMaxStatementLength(self, connection):
+    """
+    Return the maximum length of the statements built by executemany,
+    based on the max_allowed_packet of the server
+    """
+    if not self.__maxStatementLength:
+      cursor = connection.cursor()
+      try:
+        cursor.execute("SELECT @@max_allowed_packet")
+        # Leave some room for the protocol
+        self.__maxStatementLength = max(64 * 1024, int(cursor.fetchone()[0]) - 1024)
+      finally:
+        cursor.close()
+    return self.__maxStatementLength
+
+  def _updateMany(self, cmd, valuesList, conn=None):
+    """ execute MySQL update command for each tuple of parameters of valuesList,
+        the placeholders of cmd being %s
+
+        The INSERT and REPLACE commands are sent as multiple rows statements,
+        split so that each one fits in the max_allowed_packet of the server.
+
+        return S_OK with number of updated registers upon success
+        return S_ERROR upon error
+    """
+    if not valuesList:
+      return S_OK(0)
+
+    connection = conn
+    if not connection:
+      retDict = self._getConnection()
+      if not retDict['OK']:
+        return retDict
+      connection = retDict['Value']
+
+    try:
+      cursor = connection.cursor()
+      cursor.max_stmt_length = self.__getMaxStatementLength(connection)
+      retDict = S_OK(cursor.executemany(cmd, valuesList))
+    except Exception as x:
+      retDict = self._except('_updateMany', x, 'Execution failed.')
+
+    try:
+      cursor.close()
+    except Exception:
+      pass
+
+    return retDict
+
   def _transaction(self, cmdList, conn=None):
     """ dummy transaction support
 
@@ -1426,6 +1636,67 @@ class MySQL(object):
     return self._update('INSERT INTO %s %s VALUES %s' %
                         (table, inFieldString, inValueString), conn)
 
+  def insertMany(self, tableName, inFields, valuesList, updateFields=None, conn=None):
+    """
+      Insert a row in "tableName" for each list of values of "valuesList", assigned to the fields "inFields".
+      The rows are sent with as few statements as max_allowed_packet allows.
+      The values are passed as parameters of the statement: they are not escaped,
+      and can not be SQL functions like UTC_TIMESTAMP().
+
+      If "updateFields" is given, the rows which already exist are updated with
+      the new values of these fields (INSERT ... ON DUPLICATE KEY UPDATE).
+
+      return S_OK( number of affected rows )
+    """
+    table = _quotedList([tableName])
+    if not table:
+      return S_ERROR(DErrno.EMYSQL, 'Invalid tableName argument')
+
+    inFieldString = _quotedList(inFields)
+    if inFieldString is None:
+      return S_ERROR(DErrno.EMYSQL, 'Invalid inFields arguments')
+
+    for values in valuesList:
+      retDict = _checkFields(inFields, values)
+      if not retDict['OK']:
+        return retDict
+
+    cmd = 'INSERT INTO %s ( %s ) VALUES ( %s )' % (table, inFieldString, ', '.join(['%s'] * len(inFields)))
+    if updateFields:
+      if _quotedList(updateFields) is None:
+        return S_ERROR(DErrno.EMYSQL, 'Invalid updateFields arguments')
+      quotedFields = [_quotedList([field]) for field in updateFields]
+      cmd += ' ON DUPLICATE KEY UPDATE %s' % ', '.join('%s = VALUES(%s)' % (field, field) for field in quotedFields)
+
+    return self._updateMany(cmd, [tuple(values) for values in valuesList], conn)
+
+  def updateMany(self, tableName, updateFields, condFields, valuesList, conn=None):
+    """
+      Update "updateFields" from "tableName" in the rows where each of the "condFields"
+      is equal to the given value, for each list of values of "valuesList".
+      Each list contains the new values of the "updateFields", followed by the values of the "condFields".
+      The values are passed as parameters of the statement, like for insertMany.
+
+      return S_OK( number of updated rows )
+    """
+    table = _quotedList([tableName])
+    if not table:
+      return S_ERROR(DErrno.EMYSQL, 'Invalid tableName argument')
+
+    if _quotedList(updateFields) is None or _quotedList(condFields) is None:
+      return S_ERROR(DErrno.EMYSQL, 'Invalid updateFields or condFields arguments')
+
+    for values in valuesList:
+      retDict = _checkFields(list(updateFields) + list(condFields), values)
+      if not retDict['OK']:
+        return retDict
+
+    cmd = 'UPDATE %s SET %s WHERE %s' % (table,
+                                         ', '.join('%s = %%s' % _quotedList([field]) for field in updateFields),
+                                         ' AND '.join('%s = %%s' % _quotedList([field]) for field in condFields))
+
+    return self._updateMany(cmd, [tuple(values) for values in valuesList], conn)
+
   def executeStoredProcedure(self, packageName, parameters, outputIds):
     conDict = self._getConnection()
     if not conDict['OK']:
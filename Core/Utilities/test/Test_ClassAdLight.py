@@ -0,0 +1,61 @@
+""" Test of the ClassAd light implementation and of its parse cache
+"""
+
+# pylint: disable=protected-access, missing-docstring
+
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+__RCSID__ = "$Id$"
+
+from DIRAC.Core.Utilities.ClassAd import ClassAdLight
+from DIRAC.Core.Utilities.ClassAd.ClassAdLight import ClassAd
+
+JDL = """[
+    Executable = "a.sh";
+    CPUTime = 1000;
+    Site = {"Site1", "Site2"};
+    Parameters = [ p = 1 ];
+]"""
+
+
+def test_parse():
+  classAd = ClassAd(JDL)
+  assert classAd.isOK()
+  assert classAd.getAttributeString('Executable') == 'a.sh'
+  assert classAd.getAttributeInt('CPUTime') == 1000
+  assert classAd.getListFromExpression('Site') == ['Site1', 'Site2']
+  assert classAd.getDictionaryFromSubJDL('Parameters') == {'p': '1'}
+  copy = ClassAd(classAd.asJDL())
+  assert copy.getListFromExpression('Site') == ['Site1', 'Site2']
+  assert copy.getAttributeInt('CPUTime') == 1000
+  # A sub JDL at the end of the JDL
+  assert ClassAd('[ Executable = "a.sh"; Parameters = [ p = 1 ] ]').getDictionaryFromSubJDL('Parameters') == {'p': '1'}
+  assert not ClassAd('Executable = "a.sh"').isOK()
+
+
+def test_copyOnWrite():
+  classAd1 = ClassAd(JDL)
+  classAd2 = ClassAd(JDL)
+  # Parsed once
+  assert classAd1._ClassAd__contents is classAd2._ClassAd__contents
+
+  classAd1.insertAttributeInt('CPUTime', 2000)
+  classAd1.deleteAttribute('Site')
+  assert classAd1.getAttributeInt('CPUTime') == 2000
+  assert not classAd1.lookupAttribute('Site')
+  assert classAd2.getAttributeInt('CPUTime') == 1000
+  assert ClassAd(JDL).lookupAttribute('Site')
+
+  # The contents are given modifiable
+  classAd2.contents['CPUTime'] = '3000'
+  assert ClassAd(JDL).getAttributeInt('CPUTime') == 1000
+
+
+def test_cacheSize(monkeypatch):
+  monkeypatch.setattr(ClassAdLight, 'PARSE_CACHE_SIZE', 2)
+  ClassAdLight._parseCache.clear()
+  for cpuTime in range(3):
+    ClassAd('[CPUTime = %d]' % cpuTime)
+  ClassAd('[CPUTime = 1]')
+  assert list(ClassAdLight._parseCache) == ['[CPUTime = 2]', '[CPUTime = 1]']
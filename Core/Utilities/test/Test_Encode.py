@@ -17,6 +17,8 @@ import sys
 
 
 from DIRAC.Core.Utilities.DEncode import encode as disetEncode, decode as disetDecode, g_dEncodeFunctions
+from DIRAC.Core.Utilities.DEncode import tableEncode, tableDecode, fastEncode, fastDecode, ZERO_COPY_THRESHOLD
+from DIRAC.Core.Utilities.DEncode import iterDecode, walk
 from DIRAC.Core.Utilities.JEncode import encode as jsonEncode, decode as jsonDecode, JSerializable
 from DIRAC.Core.Utilities.MixedEncode import encode as mixEncode, decode as mixDecode
 
@@ -33,20 +35,28 @@ parametrize = mark.parametrize
 # function, and add the tuple here
 
 disetTuple = (disetEncode, disetDecode)
+disetTableTuple = (tableEncode, tableDecode)
+disetFastTuple = (fastEncode, fastDecode)
 jsonTuple = (jsonEncode, jsonDecode)
 mixTuple = (mixEncode, mixDecode)
 
-enc_dec_imp = (disetTuple, jsonTuple, (mixTuple, 'No', 'No'), (mixTuple, 'Yes', 'No'), (mixTuple, 'Yes', 'Yes'))
+enc_dec_imp = (disetTuple, disetTableTuple, disetFastTuple, jsonTuple,
+               (mixTuple, 'No', 'No'), (mixTuple, 'Yes', 'No'), (mixTuple, 'Yes', 'Yes'))
 enc_dec_ids = (
     'disetTuple',
+    'disetTableTuple',
+    'disetFastTuple',
     'jsonTuple',
     'mixTuple',
     'mixTuple (DIRAC_USE_JSON_DECODE=Yes)',
     'mixTuple (DIRAC_USE_JSON_ENCODE=Yes')
 
-enc_dec_imp_without_json = (disetTuple, (mixTuple, 'No', 'No'), (mixTuple, 'Yes', 'No'))
+enc_dec_imp_without_json = (disetTuple, disetTableTuple, disetFastTuple,
+                            (mixTuple, 'No', 'No'), (mixTuple, 'Yes', 'No'))
 enc_dec_ids_without_json = (
     'disetTuple',
+    'disetTableTuple',
+    'disetFastTuple',
     'mixTuple',
     'mixTuple (DIRAC_USE_JSON_DECODE=Yes)')
 
@@ -234,6 +244,83 @@ def test_nestedStructure(enc_dec_without_json, data):
   agnosticTestFunction(enc_dec_without_json, data)
 
 
+@given(data=nestedStrategy)
+def test_fastPathWireCompatibility(data):
+  """ The fast path must produce and understand exactly the same bytes
+      as the table driven implementation
+  """
+  encodedData = tableEncode(data)
+  assert fastEncode(data) == encodedData
+  assert fastDecode(encodedData) == tableDecode(encodedData)
+  assert fastDecode(bytearray(encodedData)) == tableDecode(encodedData)
+
+
+def test_fastPathBigString():
+  """ Strings above ZERO_COPY_THRESHOLD are decoded from a memoryview """
+  data = {'small': u'\u20ac', 'big': u'\u20ac' * ZERO_COPY_THRESHOLD, 'list': [u'x' * (ZERO_COPY_THRESHOLD + 1)]}
+  encodedData = fastEncode(data)
+  assert encodedData == tableEncode(data)
+  assert fastDecode(encodedData) == (data, len(encodedData))
+
+
+@given(data=nestedStrategy, chunkSize=integers(min_value=1, max_value=64))
+def test_iterDecode(data, chunkSize):
+  """ Decoding the stream chunk by chunk gives the same elements as walking the decoded object """
+  encodedData = disetEncode(data)
+  chunks = [encodedData[i:i + chunkSize] for i in range(0, len(encodedData), chunkSize)]
+  assert list(iterDecode(chunks)) == list(walk(data))
+
+
+@parametrize('path', [(), ('Value',), ('Value', 'Successful'), ('Value', 'Successful', '/a/b'), ('Missing',)])
+def test_iterDecodePath(path):
+  """ Follow a path down to the container to stream """
+  data = {'OK': True, 'Value': {'Successful': {'/a/b': {'SE1': 'pfn1', 'SE2': 'pfn2'}, '/a/c': {}},
+                                'Failed': {'/a/d': 'No such file'}}}
+  encodedData = disetEncode(data)
+  chunks = [encodedData[i:i + 3] for i in range(0, len(encodedData), 3)]
+  assert list(iterDecode(chunks, path)) == list(walk(data, path))
+
+
+def test_iterDecodeReplicas():
+  """ Streaming the successful replicas of a S_OK reply """
+  data = {'OK': True, 'Value': {'Successful': {'/a/b': {'SE1': 'pfn1'}, '/a/c': {}},
+                                'Failed': {'/a/d': 'No such file'}}}
+  assert list(iterDecode([disetEncode(data)], ('Value', 'Successful'))) == [
+      (('OK',), True),
+      (('Value', 'Failed'), {'/a/d': 'No such file'}),
+      (('Value', 'Successful', '/a/b'), {'SE1': 'pfn1'}),
+      (('Value', 'Successful', '/a/c'), {})]
+
+
+@given(data=dictionaries(text(), floats(allow_nan=False)), chunkSize=integers(min_value=1, max_value=8))
+def test_iterDecodeFloat(data, chunkSize):
+  """ Floats with an exponent (f1e+20e) can be split right after the mantissa """
+  encodedData = disetEncode(data)
+  chunks = [encodedData[i:i + chunkSize] for i in range(0, len(encodedData), chunkSize)]
+  assert list(iterDecode(chunks)) == list(walk(disetDecode(encodedData)[0]))
+
+
+def test_iterDecodeFloatExponentSplit():
+  """ The chunk ends between the mantissa and the exponent of a float """
+  assert list(iterDecode([b'f1e', b'+20e'])) == [((), 1e+20)]
+  encodedData = disetEncode({'a': 1e20, 'b': 2})
+  splitAt = encodedData.index(b'e+') + 1
+  assert list(iterDecode([encodedData[:splitAt], encodedData[splitAt:]])) == [(('a',), 1e+20), (('b',), 2)]
+
+
+def test_iterDecodeCorrupted():
+  """ An unknown type marker raises ValueError """
+  with raises(ValueError):
+    list(iterDecode([b'ds1:aXe']))
+
+
+def test_iterDecodeTruncated():
+  """ A truncated stream raises ValueError """
+  encodedData = disetEncode({'a': [1, 2, 3], 'b': 'c'})
+  with raises(ValueError):
+    list(iterDecode([encodedData[:-2]]))
+
+
 # DEncode raises KeyError.....
 # Others raise TypeError
 # @parametrize('enc_dec', enc_dec_imp)
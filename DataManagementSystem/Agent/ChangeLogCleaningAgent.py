@@ -0,0 +1,45 @@
+""" Cleaning of the change log of the FileCatalog
+
+The changes older than the retention period are removed from the change log of the catalog,
+except those not yet applied to the snapshots of the dynamic datasets, which are refreshed first.
+
+.. literalinclude:: ../ConfigTemplate.cfg
+  :start-after: ##BEGIN ChangeLogCleaningAgent
+  :end-before: ##END
+  :dedent: 2
+  :caption: ChangeLogCleaningAgent options
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+from DIRAC import S_OK
+from DIRAC.Core.Base.AgentModule import AgentModule
+from DIRAC.Resources.Catalog.FileCatalogClient import FileCatalogClient
+
+AGENT_NAME = "DataManagement/ChangeLogCleaningAgent"
+
+
+class ChangeLogCleaningAgent(AgentModule):
+  """ Agent removing the old changes from the change log of the FileCatalog
+  """
+
+  def initialize(self):
+    """ initialization """
+    self.retentionDays = self.am_getOption("RetentionDays", 30)
+    self.log.info("Retention period = %s days" % self.retentionDays)
+    self.fileCatalogURL = self.am_getOption("FileCatalogURL", "DataManagement/FileCatalog")
+    self.fileCatalog = FileCatalogClient(url=self.fileCatalogURL)
+    return S_OK()
+
+  def execute(self):
+    """ execution in one cycle """
+    result = self.fileCatalog.cleanChangeLog(self.retentionDays)
+    if not result['OK']:
+      self.log.error("Failed to clean the change log", "%s: %s" % (self.fileCatalogURL, result['Message']))
+      return result
+    self.log.info("Removed changes from the change log", "%s: %d" % (self.fileCatalogURL, result['Value']))
+    return S_OK()
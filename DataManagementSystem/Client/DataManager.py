@@ -34,6 +34,7 @@ from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.AccountingSystem.Client.DataStoreClient import gDataStoreClient
 from DIRAC.AccountingSystem.Client.Types.DataOperation import DataOperation
 from DIRAC.DataManagementSystem.Utilities.DMSHelpers import DMSHelpers
+from DIRAC.DataManagementSystem.Utilities.ReplicaCache import gReplicaCache
 from DIRAC.Resources.Catalog.FileCatalog import FileCatalog
 from DIRAC.Resources.Storage.StorageElement import StorageElement
 from DIRAC.ResourceStatusSystem.Client.ResourceStatus import ResourceStatus
@@ -115,6 +116,12 @@ class DataManager(object):
     self.dmsHelper = DMSHelpers(vo=vo)
     self.registrationProtocol = self.dmsHelper.getRegistrationProtocols()
     self.thirdPartyProtocols = self.dmsHelper.getThirdPartyProtocols()
+    # Lifetime in seconds of the replicas in the cache shared by the DataManagers of the process, 0 to disable it
+    self.replicaCacheLifetime = Operations(vo=self.voName).getValue(
+        'DataManagement/ReplicaCacheLifetime', 0)
+    if self.replicaCacheLifetime:
+      gReplicaCache.maxSize = Operations(vo=self.voName).getValue(
+          'DataManagement/ReplicaCacheSize', gReplicaCache.maxSize)
 
   def setAccountingClient(self, client):
     """ Set Accounting Client instance
@@ -1071,6 +1078,7 @@ class DataManager(object):
       fileCatalog = self.fileCatalog
 
     res = fileCatalog.addFile(fileDict)
+    self.__invalidateReplicaCache(fileDict)
     if not res['OK']:
       errStr = "Completely failed to register files."
       self.log.getSubLogger('__registerFile').debug(errStr, res['Message'])
@@ -1140,6 +1148,7 @@ class DataManager(object):
       res = fileCatalog.addReplica(replicaDict)
     else:
       res = self.fileCatalog.addReplica(replicaDict)
+    self.__invalidateReplicaCache(replicaDict)
     if not res['OK']:
       errStr = "Completely failed to register replicas."
       log.debug(errStr, res['Message'])
@@ -1255,6 +1264,7 @@ class DataManager(object):
     completelyRemovedFiles = set(lfnDict) - set(failed)
     if completelyRemovedFiles:
       res = self.fileCatalog.removeFile(list(completelyRemovedFiles))
+      self.__invalidateReplicaCache(completelyRemovedFiles)
       if not res['OK']:
         failed.update(dict.fromkeys(completelyRemovedFiles,
                                     "Failed to remove file from the catalog: %s" % res['Message']))
@@ -1454,6 +1464,7 @@ class DataManager(object):
     for lfn, pfn, se in replicaTuples:
       replicaDict[lfn] = {'SE': se, 'PFN': pfn}
     res = self.fileCatalog.removeReplica(replicaDict)
+    self.__invalidateReplicaCache(replicaDict)
     oDataOperation.setEndTime()
     oDataOperation.setValueByKey('RegistrationTime', time.time() - start)
     if not res['OK']:
@@ -1720,11 +1731,17 @@ class DataManager(object):
     """
     catalogReplicas = {}
     failed = {}
+    if self.replicaCacheLifetime:
+      # Only the replicas found in the catalogs are cached
+      cacheKey = self.__getReplicaCacheKey(allStatus)
+      catalogReplicas, lfns = gReplicaCache.get(cacheKey, lfns, self.replicaCacheLifetime)
     for lfnChunk in breakListIntoChunks(lfns, 1000):
       res = self.fileCatalog.getReplicas(lfnChunk, allStatus=allStatus)
       if res['OK']:
         catalogReplicas.update(res['Value']['Successful'])
         failed.update(res['Value']['Failed'])
+        if self.replicaCacheLifetime:
+          gReplicaCache.add(cacheKey, res['Value']['Successful'])
       else:
         return res
     if not getUrl:
@@ -1752,6 +1769,23 @@ class DataManager(object):
       self.__filterTapeReplicas(result, diskOnly=diskOnly)
     return S_OK(result)
 
+  def __getReplicaCacheKey(self, allStatus):
+    """ Key of the replicas of the replica cache: they depend on the catalogs and on the allStatus flag """
+    return (tuple(catalogName for catalogName, _oCatalog, _master in self.fileCatalog.getReadCatalogs()),
+            self.voName, bool(allStatus))
+
+  def __invalidateReplicaCache(self, lfns):
+    """ Remove from the replica cache the LFNs whose replicas are modified """
+    if self.replicaCacheLifetime:
+      gReplicaCache.invalidate(lfns)
+
+  @staticmethod
+  def getReplicaCacheStatistics():
+    """ Get the statistics of the replica cache of the process: 'Hits' and 'Misses' by LFN,
+        number of 'Invalidations' and 'Size'
+    """
+    return S_OK(gReplicaCache.getStatistics())
+
   def getReplicasForJobs(self, lfns, allStatus=False, getUrl=True, diskOnly=False):
     """ get replicas useful for jobs
     """
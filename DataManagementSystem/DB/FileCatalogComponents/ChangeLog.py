@@ -0,0 +1,206 @@
+""" Ordered log of the changes of the FileCatalogDB, the change feed of the catalog
+
+    The files and replicas added and removed, and the metadata set and removed on files and directories,
+    are appended to the FC_ChangeLog table, with a monotonically increasing ChangeID. The consumers of the
+    feed, e.g. the snapshots of the datasets or external mirrors of the catalog, keep the ID of the last
+    change they processed and ask for the changes made after it.
+
+    The IDs are allocated when the changes are inserted, and two concurrent inserts can be committed in the
+    reverse order of their IDs: the changes younger than a few seconds can be held back for the consumers
+    which can not read a change twice, so that they do not skip the one committed late.
+
+    The log is cleaned by the ChangeLogCleaningAgent, after a retention period.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import six
+
+from DIRAC import S_OK, S_ERROR, gLogger
+from DIRAC.Core.Utilities.List import stringListToString
+
+# Operations recorded in the log
+ADD_FILE = 'AddFile'
+REMOVE_FILE = 'RemoveFile'
+ADD_REPLICA = 'AddReplica'
+REMOVE_REPLICA = 'RemoveReplica'
+SET_METADATA = 'SetMetadata'
+REMOVE_METADATA = 'RemoveMetadata'
+OPERATIONS = [ADD_FILE, REMOVE_FILE, ADD_REPLICA, REMOVE_REPLICA, SET_METADATA, REMOVE_METADATA]
+
+# Time in seconds during which the changes can still be committed out of order
+CHANGE_SETTLE_TIME = 5
+# Maximum number of changes returned to the consumers of the feed by each call
+MAX_CHANGES = 10000
+# Maximum number of changes removed by each query of the cleaning
+REMOVE_CHUNK_SIZE = 100000
+
+
+class ChangeLog(object):
+  """ Change log of the catalog
+  """
+
+  _tables = {}
+  _tables["FC_ChangeLog"] = {"Fields": {
+      "ChangeID": "BIGINT UNSIGNED AUTO_INCREMENT",
+      "ChangeTime": "DATETIME NOT NULL",
+      "Operation": "VARCHAR(16) NOT NULL",
+      # LFN of the file, or path of the directory when FileID is 0
+      "Path": "VARCHAR(1024) NOT NULL",
+      "FileID": "INT NOT NULL DEFAULT 0",
+      "Size": "BIGINT UNSIGNED NOT NULL DEFAULT 0",
+      "SEName": "VARCHAR(127) NOT NULL DEFAULT ''"
+  },
+      "PrimaryKey": "ChangeID",
+      "Indexes": {"ChangeTime": ["ChangeTime"]}
+  }
+
+  def __init__(self, database=None):
+    self.db = None
+    if database is not None:
+      self.setDatabase(database)
+
+  def setDatabase(self, database):
+    self.db = database
+
+    result = self.db._query("SHOW TABLES")
+    if not result['OK']:
+      return result
+    tableList = [x[0] for x in result['Value']]
+    tablesToCreate = {}
+    for table in self._tables:
+      if table not in tableList:
+        tablesToCreate[table] = self._tables[table]
+
+    result = self.db._createTables(tablesToCreate)
+    if not result['OK']:
+      gLogger.error("Failed to create tables", str(self._tables.keys()))
+    elif result['Value']:
+      gLogger.info("Tables created: %s" % ','.join(result['Value']))
+    return result
+
+  def addChanges(self, operation, changes):
+    """ Append changes to the log
+
+        :param str operation: one of OPERATIONS
+        :param list changes: tuples ( LFN, file ID, size, SE name ) of the changed files or replicas,
+                             or ( path, 0, 0, '' ) for the directories with changed metadata
+        :return: S_OK/S_ERROR
+    """
+    if operation not in OPERATIONS:
+      return S_ERROR('Unknown change log operation %s' % operation)
+    if not changes:
+      return S_OK()
+    req = "INSERT INTO FC_ChangeLog (ChangeTime, Operation, Path, FileID, Size, SEName)"
+    req += " VALUES (UTC_TIMESTAMP(), %s, %s, %s, %s, %s)"
+    return self.db._updateMany(req, [(operation, path, int(fileID), int(size), seName or '')
+                                     for path, fileID, size, seName in changes])
+
+  def getLastChangeID(self, settleTime=0):
+    """ Get the ID of the last change of the log
+
+        :param int settleTime: time in seconds before which the changes are not counted yet
+        :return: S_OK( int ), 0 if the log is empty / S_ERROR
+    """
+    req = "SELECT MAX(ChangeID) FROM FC_ChangeLog"
+    if settleTime:
+      req += " WHERE ChangeTime < UTC_TIMESTAMP() - INTERVAL %d SECOND" % int(settleTime)
+    result = self.db._query(req)
+    if not result['OK']:
+      return result
+    return S_OK(int(result['Value'][0][0] or 0) if result['Value'] else 0)
+
+  def getFirstChangeID(self):
+    """ Get the ID of the first change still in the log: the changes before it were cleaned
+
+        :return: S_OK( int ), 0 if the log is empty / S_ERROR
+    """
+    result = self.db._query("SELECT MIN(ChangeID) FROM FC_ChangeLog")
+    if not result['OK']:
+      return result
+    return S_OK(int(result['Value'][0][0] or 0) if result['Value'] else 0)
+
+  def __getPathCondition(self, path):
+    """ SQL condition selecting the changes of a path and of its contents
+    """
+    path = path.rstrip('/')
+    if not path:
+      return S_OK('')
+    result = self.db._escapeString(path)
+    if not result['OK']:
+      return result
+    escapedPath = result['Value']
+    # The wildcards of LIKE are taken literally in the path
+    likePath = path.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    result = self.db._escapeString(likePath + '/%')
+    if not result['OK']:
+      return result
+    return S_OK("(Path=%s OR Path LIKE %s)" % (escapedPath, result['Value']))
+
+  def getChanges(self, lastChangeID, operations=None, path=None, seNames=None, maxChanges=0, settleTime=0,
+                 maxChangeID=None):
+    """ Get the changes made after a given one, in their order
+
+        :param int lastChangeID: ID of the last change known by the caller, 0 for the whole log
+        :param list operations: operations of the changes to select, all if None
+        :param str path: directory of the changes to select, with its subdirectories
+        :param list seNames: storage elements of the replica changes to select
+        :param int maxChanges: maximum number of changes, no limit if 0
+        :param int settleTime: time in seconds before which the changes are not returned yet
+        :param int maxChangeID: ID of the last change which can be returned
+        :return: S_OK( list of dict ) with the 'ChangeID', 'ChangeTime', 'Operation', 'Path', 'FileID', 'Size'
+                 and 'SE' of the changes / S_ERROR
+    """
+    conditions = ["ChangeID > %d" % int(lastChangeID)]
+    if maxChangeID is not None:
+      conditions.append("ChangeID <= %d" % int(maxChangeID))
+    if operations:
+      conditions.append("Operation IN (%s)" % stringListToString(operations))
+    if seNames:
+      if isinstance(seNames, six.string_types):
+        seNames = [seNames]
+      conditions.append("SEName IN (%s)" % stringListToString(seNames))
+    if path:
+      result = self.__getPathCondition(path)
+      if not result['OK']:
+        return result
+      if result['Value']:
+        conditions.append(result['Value'])
+    if settleTime:
+      conditions.append("ChangeTime < UTC_TIMESTAMP() - INTERVAL %d SECOND" % int(settleTime))
+
+    req = "SELECT ChangeID, ChangeTime, Operation, Path, FileID, Size, SEName FROM FC_ChangeLog"
+    req += " WHERE %s ORDER BY ChangeID" % ' AND '.join(conditions)
+    if maxChanges:
+      req += " LIMIT %d" % int(maxChanges)
+    result = self.db._query(req)
+    if not result['OK']:
+      return result
+    return S_OK([{'ChangeID': int(changeID), 'ChangeTime': changeTime, 'Operation': operation, 'Path': changePath,
+                  'FileID': int(fileID), 'Size': int(size), 'SE': seName}
+                 for changeID, changeTime, operation, changePath, fileID, size, seName in result['Value']])
+
+  def removeChanges(self, retentionDays, maxChangeID=None):
+    """ Remove the changes older than the retention period
+
+        :param int retentionDays: retention period in days
+        :param int maxChangeID: ID of the last change which can be removed, e.g. not yet read by a consumer
+        :return: S_OK( int ) number of removed changes / S_ERROR
+    """
+    req = "DELETE FROM FC_ChangeLog WHERE ChangeTime < UTC_TIMESTAMP() - INTERVAL %d DAY" % int(retentionDays)
+    if maxChangeID is not None:
+      req += " AND ChangeID <= %d" % int(maxChangeID)
+    req += " LIMIT %d" % REMOVE_CHUNK_SIZE
+
+    removed = 0
+    while True:
+      result = self.db._update(req)
+      if not result['OK']:
+        return result
+      removed += result['Value']
+      if result['Value'] < REMOVE_CHUNK_SIZE:
+        return S_OK(removed)
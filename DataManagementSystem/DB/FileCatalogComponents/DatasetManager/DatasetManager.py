@@ -1,4 +1,11 @@
 """ DIRAC FileCatalog plug-in class to manage dynamic datasets defined by a metadata query
+
+    With the snapshots enabled, the IDs of the files of each dynamic dataset are materialised in the
+    FC_DatasetSnapshots table, as the zlib compressed deltas of the sorted IDs, with the number and size
+    of the files. A snapshot is refreshed from the changes of the files added, removed or with changed
+    metadata, and of the directories with changed metadata, read from the change log of the catalog:
+    only the metaquery of the directories of the changed files is evaluated, a change
+    of directory metadata affecting the dataset triggering the evaluation of the whole metaquery.
 """
 from __future__ import absolute_import
 from __future__ import division
@@ -6,11 +13,71 @@ from __future__ import print_function
 
 __RCSID__ = "$Id$"
 
+import array
 import hashlib
 import os
+import sys
+import zlib
+
+import six
 
 from DIRAC import S_OK, S_ERROR, gLogger
-from DIRAC.Core.Utilities.List import stringListToString
+from DIRAC.Core.Utilities.List import stringListToString, breakListIntoChunks
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.ChangeLog import ADD_FILE, REMOVE_FILE, \
+    SET_METADATA, REMOVE_METADATA, CHANGE_SETTLE_TIME
+
+# Maximum number of files of the queries on the file IDs of a snapshot
+SNAPSHOT_CHUNK_SIZE = 10000
+# Operations of the change log which can change the contents of the datasets
+SNAPSHOT_OPERATIONS = [ADD_FILE, REMOVE_FILE, SET_METADATA, REMOVE_METADATA]
+# Maximum number of changes read at once from the change log to refresh the snapshots
+CHANGES_BATCH_SIZE = 10000
+# Maximum number of attempts to refresh a snapshot which is refreshed concurrently
+MAX_REFRESH_ATTEMPTS = 5
+
+
+def packFileIDs(fileIDs):
+  """ Pack file IDs in the binary form of the snapshots: the zlib compressed deltas of the sorted IDs,
+      as little endian 32 bits unsigned integers
+
+      :param fileIDs: iterable of file IDs
+      :return: bytes
+  """
+  deltas = array.array('I')
+  previous = 0
+  for fileID in sorted(fileIDs):
+    deltas.append(fileID - previous)
+    previous = fileID
+  if sys.byteorder == 'big':
+    deltas.byteswap()
+  return zlib.compress(deltas.tobytes() if six.PY3 else deltas.tostring())
+
+
+def unpackFileIDs(data):
+  """ Unpack the file IDs of a snapshot
+
+      :param bytes data: packed file IDs, as returned by packFileIDs
+      :return: sorted list of file IDs
+  """
+  deltas = array.array('I')
+  if data:
+    if six.PY3:
+      deltas.frombytes(zlib.decompress(data))
+    else:
+      deltas.fromstring(zlib.decompress(data))
+  if sys.byteorder == 'big':
+    deltas.byteswap()
+  fileIDs = []
+  fileID = 0
+  for delta in deltas:
+    fileID += delta
+    fileIDs.append(fileID)
+  return fileIDs
+
+
+def _isInPath(path, basePath):
+  """ Whether a path is basePath or below it """
+  return path == basePath or path.startswith(basePath.rstrip('/') + '/')
 
 
 class DatasetManager(object):
@@ -46,9 +113,21 @@ class DatasetManager(object):
   },
       "PrimaryKey": "DatasetID",
   }
+  _tables["FC_DatasetSnapshots"] = {"Fields": {
+      "DatasetID": "INT NOT NULL",
+      "FileIDs": "LONGBLOB",
+      "NumberOfFiles": "INT NOT NULL DEFAULT 0",
+      "TotalSize": "BIGINT UNSIGNED NOT NULL DEFAULT 0",
+      "DatasetHash": "CHAR(36) NOT NULL",
+      "LastChangeID": "BIGINT UNSIGNED NOT NULL DEFAULT 0",
+      "UpdateDate": "DATETIME"
+  },
+      "PrimaryKey": "DatasetID",
+  }
 
   def __init__(self, database=None):
     self.db = None
+    self.snapshots = False
     if database is not None:
       self.setDatabase(database)
 
@@ -73,6 +152,13 @@ class DatasetManager(object):
       gLogger.info("Tables created: %s" % ','.join(result['Value']))
     return result
 
+  def setSnapshots(self, snapshots):
+    """ Enable or disable the materialised snapshots of the dynamic datasets
+
+        :param bool snapshots: flag
+    """
+    self.snapshots = snapshots
+
   def _getConnection(self, connection=False):
     if connection:
       return connection
@@ -107,12 +193,23 @@ class DatasetManager(object):
 
   def __addDataset(self, datasetName, metaQuery, credDict, uid, gid):
 
+    if self.snapshots:
+      # The changes made while the metaquery is evaluated are applied to the snapshot
+      result = self.__getLastChangeID()
+      if not result['OK']:
+        return result
+      lastChangeID = result['Value']
+
     result = self.__getMetaQueryParameters(metaQuery, credDict)
     if not result['OK']:
       return result
     totalSize = result['Value']['TotalSize']
     datasetHash = result['Value']['DatasetHash']
     numberOfFiles = result['Value']['NumberOfFiles']
+    if self.snapshots:
+      fileIDs = result['Value']['LFNIDList']
+      packedFileIDs = packFileIDs(fileIDs)
+      datasetHash = self.__getSnapshotHash(packedFileIDs)
 
     result = self.db.fileManager._getStatusInt('Dynamic')
     if not result['OK']:
@@ -155,6 +252,11 @@ class DatasetManager(object):
       else:
         return result
     datasetID = result['lastRowId']
+
+    if self.snapshots:
+      result = self.__storeSnapshot(datasetID, packedFileIDs, len(fileIDs), totalSize, lastChangeID)
+      if not result['OK']:
+        gLogger.error("Failed to store the dataset snapshot", "%s: %s" % (datasetName, result['Message']))
     return S_OK(datasetID)
 
   def _getDatasetDirectories(self, datasets):
@@ -378,7 +480,7 @@ class DatasetManager(object):
       return S_OK('Dataset %s does not exist' % datasetName)
     datasetID = result['Value'][0][0]
 
-    for table in ["FC_MetaDatasetFiles", "FC_MetaDatasets", "FC_DatasetAnnotations"]:
+    for table in ["FC_MetaDatasetFiles", "FC_MetaDatasets", "FC_DatasetAnnotations", "FC_DatasetSnapshots"]:
       req = "DELETE FROM %s WHERE DatasetID=%s" % (table, datasetID)
       result = self.db._update(req)
 
@@ -405,7 +507,7 @@ class DatasetManager(object):
   def __checkDataset(self, datasetName, credDict):
     """ Check that the dataset parameters correspond to the actual state
     """
-    req = "SELECT MetaQuery,DatasetHash,TotalSize,NumberOfFiles FROM FC_MetaDatasets"
+    req = "SELECT MetaQuery,DatasetHash,TotalSize,NumberOfFiles,DatasetID FROM FC_MetaDatasets"
     req += " WHERE DatasetName='%s'" % datasetName
     result = self.db._query(req)
     if not result['OK']:
@@ -419,7 +521,10 @@ class DatasetManager(object):
     totalSizeOld = int(row[2])
     numberOfFilesOld = int(row[3])
 
-    result = self.__getMetaQueryParameters(metaQuery, credDict)
+    if self.snapshots:
+      result = self.__refreshSnapshot(int(row[4]))
+    else:
+      result = self.__getMetaQueryParameters(metaQuery, credDict)
     if not result['OK']:
       return result
     totalSize = result['Value']['TotalSize']
@@ -680,6 +785,9 @@ class DatasetManager(object):
   def __getDynamicDatasetFiles(self, datasetID, credDict):
     """ Get dataset lfns from a dynamic meta query
     """
+    if self.snapshots:
+      return self.__getSnapshotDatasetFiles(datasetID)
+
     req = "SELECT MetaQuery FROM FC_MetaDatasets WHERE DatasetID=%d" % datasetID
     result = self.db._query(req)
     if not result['OK']:
@@ -831,3 +939,262 @@ class DatasetManager(object):
 
     result = self.setDatasetStatus(datasetName, 'Dynamic')
     return result
+
+  #####################################################################
+  #
+  #  Materialised snapshots of the dynamic datasets
+  #
+
+  def __getLastChangeID(self):
+    """ Get the ID of the last settled change of the change log: the changes after it are applied to the
+        snapshots by their next refresh, which would skip a change with a lower ID committed later
+    """
+    return self.db.changeLog.getLastChangeID(settleTime=CHANGE_SETTLE_TIME)
+
+  @staticmethod
+  def __getSnapshotHash(packedFileIDs):
+    """ Hash of the dataset contents for the snapshots: the MD5 of the packed file IDs
+    """
+    return hashlib.md5(packedFileIDs).hexdigest().upper()
+
+  def __storeSnapshot(self, datasetID, packedFileIDs, numberOfFiles, totalSize, lastChangeID, previousChangeID=None):
+    """ Store the snapshot of a dataset. With previousChangeID, the snapshot is only updated
+        if it was not refreshed by another thread or service in the meantime
+
+        :return: S_OK( bool ) whether the snapshot was stored / S_ERROR
+    """
+    datasetHash = self.__getSnapshotHash(packedFileIDs)
+    if previousChangeID is None:
+      req = "REPLACE INTO FC_DatasetSnapshots"
+      req += " (DatasetID, FileIDs, NumberOfFiles, TotalSize, DatasetHash, LastChangeID, UpdateDate)"
+      req += " VALUES (%s, %s, %s, %s, %s, %s, UTC_TIMESTAMP())"
+      args = (datasetID, packedFileIDs, numberOfFiles, totalSize, datasetHash, lastChangeID)
+    else:
+      req = "UPDATE FC_DatasetSnapshots SET FileIDs=%s, NumberOfFiles=%s, TotalSize=%s, DatasetHash=%s,"
+      req += " LastChangeID=%s, UpdateDate=UTC_TIMESTAMP() WHERE DatasetID=%s AND LastChangeID=%s"
+      args = (packedFileIDs, numberOfFiles, totalSize, datasetHash, lastChangeID, datasetID, previousChangeID)
+    result = self.db._update(req, args=args)
+    if not result['OK']:
+      return result
+    return S_OK(bool(result['Value']) or previousChangeID is None)
+
+  def __getOwnerCredentials(self, uid, gid):
+    """ Credentials of the owner of a dataset, with which its metaquery is evaluated for its snapshot
+    """
+    credDict = {}
+    result = self.db.ugManager.getUserName(uid)
+    if result['OK']:
+      credDict['username'] = result['Value']
+    result = self.db.ugManager.getGroupName(gid)
+    if result['OK']:
+      credDict['group'] = result['Value']
+    return credDict
+
+  def __getChanges(self, lastChangeID):
+    """ Get the settled changes recorded after a given one, at most CHANGES_BATCH_SIZE
+
+        :return: S_OK( list of tuples ( ChangeID, Path, FileID, Size ) ) / S_ERROR
+    """
+    result = self.db.changeLog.getChanges(lastChangeID, operations=SNAPSHOT_OPERATIONS,
+                                          maxChanges=CHANGES_BATCH_SIZE, settleTime=CHANGE_SETTLE_TIME)
+    if not result['OK']:
+      return result
+    return S_OK([(change['ChangeID'], change['Path'], change['FileID'], change['Size']) for change in result['Value']])
+
+  def __refreshSnapshot(self, datasetID, changes=None):
+    """ Bring the snapshot of a dataset up to date with the recorded changes, creating it if needed
+
+        :param int datasetID: dataset ID
+        :param list changes: changes recorded after the snapshot, as returned by __getChanges, if already known:
+                             the snapshot is only brought up to the last of them
+        :return: S_OK( dict ) with the 'NumberOfFiles', 'TotalSize' and 'DatasetHash', and the 'FileIDs' of the dataset
+    """
+    attempts = 0
+    while True:
+      result = self.__updateSnapshot(datasetID, changes)
+      if not result['OK']:
+        return result
+      snapshot, complete = result['Value']
+      if snapshot is None:
+        # Refreshed concurrently: the changes are applied again to the stored snapshot
+        attempts += 1
+        if attempts >= MAX_REFRESH_ATTEMPTS:
+          return S_ERROR('The snapshot of dataset %d is refreshed concurrently' % datasetID)
+      elif complete:
+        return S_OK(snapshot)
+
+  def __updateSnapshot(self, datasetID, changes=None):
+    """ Apply to the snapshot of a dataset the changes recorded after it, or a batch of them if not given
+
+        :return: S_OK( tuple ( snapshot dict as returned by __refreshSnapshot or None if the snapshot was
+                 refreshed concurrently, whether all the changes were applied ) ) / S_ERROR
+    """
+    req = "SELECT D.MetaQuery, D.UID, D.GID, S.FileIDs, S.TotalSize, S.LastChangeID FROM FC_MetaDatasets AS D"
+    req += " LEFT JOIN FC_DatasetSnapshots AS S USING (DatasetID) WHERE D.DatasetID=%d" % datasetID
+    result = self.db._query(req)
+    if not result['OK']:
+      return result
+    if not result['Value']:
+      return S_ERROR('Unknown MetaDataset ID %d' % datasetID)
+    metaQuery, uid, gid, packedFileIDs, totalSize, previousChangeID = result['Value'][0]
+    metaQuery = eval(metaQuery)
+    credDict = self.__getOwnerCredentials(uid, gid)
+
+    if previousChangeID is None:
+      # No snapshot yet
+      result = self.__createSnapshot(datasetID, metaQuery, credDict)
+      if not result['OK']:
+        return result
+      return S_OK((result['Value'], True))
+
+    previousChangeID = int(previousChangeID)
+    complete = True
+    if changes is None:
+      result = self.__getChanges(previousChangeID)
+      if not result['OK']:
+        return result
+      changes = result['Value']
+      complete = len(changes) < CHANGES_BATCH_SIZE
+    changes = [change for change in changes if change[0] > previousChangeID]
+    fileIDs = unpackFileIDs(packedFileIDs)
+    totalSize = int(totalSize)
+    if not changes:
+      return S_OK(({'FileIDs': fileIDs, 'NumberOfFiles': len(fileIDs), 'TotalSize': totalSize,
+                    'DatasetHash': self.__getSnapshotHash(packedFileIDs)}, True))
+    lastChangeID = changes[-1][0]
+
+    findMetaQuery = dict(metaQuery)
+    path = findMetaQuery.pop('Path', '/')
+    # Last change of each file, by directory
+    changedFiles = {}
+    for _changeID, changePath, fileID, size in changes:
+      if not fileID:
+        if _isInPath(changePath, path) or _isInPath(path, changePath):
+          # The directory metadata can change the whole dataset
+          result = self.__createSnapshot(datasetID, metaQuery, credDict)
+          if not result['OK']:
+            return result
+          return S_OK((result['Value'], True))
+      elif _isInPath(changePath, path):
+        changedFiles.setdefault(os.path.dirname(changePath), {})[fileID] = size
+
+    fileIDSet = set(fileIDs)
+    for dirPath, dirFiles in changedFiles.items():
+      result = self.db.dtree.findDir(dirPath)
+      if not result['OK']:
+        return result
+      matchedIDs = set()
+      if result['Value']:
+        result = self.db.fmeta.findFilesByMetadata(findMetaQuery, dirPath, credDict)
+        if not result['OK']:
+          return result
+        matchedIDs = set(result['Value']) & set(dirFiles)
+      for fileID, size in dirFiles.items():
+        if fileID in fileIDSet and fileID not in matchedIDs:
+          fileIDSet.remove(fileID)
+          totalSize -= size
+        elif fileID not in fileIDSet and fileID in matchedIDs:
+          fileIDSet.add(fileID)
+          totalSize += size
+
+    packedFileIDs = packFileIDs(fileIDSet)
+    result = self.__storeSnapshot(datasetID, packedFileIDs, len(fileIDSet), totalSize, lastChangeID,
+                                  previousChangeID=previousChangeID)
+    if not result['OK']:
+      return result
+    if not result['Value']:
+      return S_OK((None, False))
+    return S_OK(({'FileIDs': sorted(fileIDSet), 'NumberOfFiles': len(fileIDSet), 'TotalSize': totalSize,
+                  'DatasetHash': self.__getSnapshotHash(packedFileIDs)}, complete))
+
+  def __createSnapshot(self, datasetID, metaQuery, credDict):
+    """ Create the snapshot of a dataset from the evaluation of its whole metaquery
+    """
+    result = self.__getLastChangeID()
+    if not result['OK']:
+      return result
+    lastChangeID = result['Value']
+
+    result = self.__getMetaQueryParameters(metaQuery, credDict)
+    if not result['OK']:
+      return result
+    fileIDs = sorted(result['Value']['LFNIDList'])
+    totalSize = result['Value']['TotalSize']
+    packedFileIDs = packFileIDs(fileIDs)
+    result = self.__storeSnapshot(datasetID, packedFileIDs, len(fileIDs), totalSize, lastChangeID)
+    if not result['OK']:
+      return result
+    return S_OK({'FileIDs': fileIDs, 'NumberOfFiles': len(fileIDs), 'TotalSize': totalSize,
+                 'DatasetHash': self.__getSnapshotHash(packedFileIDs)})
+
+  def refreshDatasetSnapshots(self):
+    """ Refresh the snapshots of all the datasets
+
+        :return: S_OK/S_ERROR
+    """
+    if not self.snapshots:
+      return S_OK()
+    result = self.db._query("SELECT DatasetID, LastChangeID FROM FC_DatasetSnapshots")
+    if not result['OK']:
+      return result
+    snapshots = dict((int(datasetID), int(lastChangeID)) for datasetID, lastChangeID in result['Value'])
+    if not snapshots:
+      return S_OK()
+
+    # The changes are read by batches, each one applied to all the snapshots not yet refreshed beyond it
+    lastChangeID = min(snapshots.values())
+    failed = []
+    while True:
+      result = self.__getChanges(lastChangeID)
+      if not result['OK']:
+        return result
+      changes = result['Value']
+      if not changes:
+        break
+      lastChangeID = changes[-1][0]
+      for datasetID, snapshotChangeID in snapshots.items():
+        if datasetID in failed or snapshotChangeID >= lastChangeID:
+          continue
+        result = self.__refreshSnapshot(datasetID, changes)
+        if not result['OK']:
+          # Not refreshed by the next batches, which would miss the changes of this one
+          gLogger.error("Failed to refresh the dataset snapshot", "%d: %s" % (datasetID, result['Message']))
+          failed.append(datasetID)
+      if len(changes) < CHANGES_BATCH_SIZE:
+        break
+    if failed:
+      return S_ERROR('Failed to refresh the snapshots of %d datasets' % len(failed))
+    return S_OK()
+
+  def getSnapshotsLastChangeID(self):
+    """ Get the ID of the last change applied to all the snapshots: the changes after it are still needed
+
+        :return: S_OK( int ), or S_OK( None ) if no change is needed by the snapshots / S_ERROR
+    """
+    if not self.snapshots:
+      return S_OK(None)
+    result = self.db._query("SELECT MIN(LastChangeID) FROM FC_DatasetSnapshots")
+    if not result['OK']:
+      return result
+    if not result['Value'] or result['Value'][0][0] is None:
+      return S_OK(None)
+    return S_OK(int(result['Value'][0][0]))
+
+  def __getSnapshotDatasetFiles(self, datasetID):
+    """ Get the dataset lfns from its snapshot
+    """
+    result = self.__refreshSnapshot(datasetID)
+    if not result['OK']:
+      return result
+
+    lfnDict = {}
+    for fileIDs in breakListIntoChunks(result['Value']['FileIDs'], SNAPSHOT_CHUNK_SIZE):
+      result = self.db.fileManager._getFileLFNs(fileIDs)
+      if not result['OK']:
+        return result
+      lfnDict.update(result['Value']['Successful'])
+
+    fileIDList = list(lfnDict)
+    result = S_OK([lfnDict[i] for i in fileIDList])
+    result['FileIDList'] = fileIDList
+    return result
@@ -0,0 +1,166 @@
+""" Cache of the directory paths and IDs of the DirectoryManager of the FileCatalogDB
+
+    The cache maps the paths of the directories to their IDs and back, and holds the parent chain of
+    the directories, as returned by the getPathIDs method of the DirectoryManager, once it is known.
+    When full, the least recently used directories are evicted first.
+
+    The directories created or removed through the FileCatalogDB of the process are updated in the cache.
+    The directories removed by other instances of the service are only seen after the lifetime of the
+    entries: the lifetime should be short when several instances of the service write to the catalog.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import collections
+import threading
+import time
+
+
+class DirectoryCache(object):
+  """ LRU cache of the directory path <-> ID mapping, with a lifetime
+  """
+
+  def __init__(self, maxSize, lifetime):
+    """ c'tor
+
+        :param int maxSize: maximum number of cached directories
+        :param int lifetime: validity of the cached directories in seconds
+    """
+    self.maxSize = maxSize
+    self.lifetime = lifetime
+    self.__lock = threading.Lock()
+    # path -> [ time of the caching, ID or None, level or None, IDs of the parent chain or None ]
+    self.__paths = collections.OrderedDict()
+    self.__ids = {}
+    self.__hits = 0
+    self.__misses = 0
+    self.__invalidations = 0
+
+  def __getEntry(self, path, now):
+    """ Get the valid entry of a path, marked as most recently used. The lock must be held """
+    entry = self.__paths.pop(path, None)
+    if entry is None:
+      return None
+    if now - entry[0] > self.lifetime:
+      if entry[1] is not None:
+        self.__ids.pop(entry[1], None)
+      return None
+    self.__paths[path] = entry
+    return entry
+
+  def __count(self, hit):
+    """ Count a hit or a miss. The lock must be held """
+    if hit:
+      self.__hits += 1
+    else:
+      self.__misses += 1
+
+  def getID(self, path):
+    """ Get the ID of a directory
+
+        :param str path: normalized path
+        :return: tuple ( ID, level or None ), or None if the directory is not cached
+    """
+    with self.__lock:
+      entry = self.__getEntry(path, time.time())
+      hit = entry is not None and entry[1] is not None
+      self.__count(hit)
+      return (entry[1], entry[2]) if hit else None
+
+  def getPath(self, dirID):
+    """ Get the path of a directory
+
+        :param int dirID: directory ID
+        :return: path, or None if the directory is not cached
+    """
+    with self.__lock:
+      path = self.__ids.get(dirID)
+      entry = self.__getEntry(path, time.time()) if path is not None else None
+      self.__count(entry is not None)
+      return path if entry else None
+
+  def getPathIDs(self, path):
+    """ Get the parent chain of a directory
+
+        :param str path: normalized path
+        :return: list of IDs, or None if the chain is not cached
+    """
+    with self.__lock:
+      entry = self.__getEntry(path, time.time())
+      hit = entry is not None and entry[3] is not None
+      self.__count(hit)
+      return list(entry[3]) if hit else None
+
+  def add(self, path, dirID=None, level=None, pathIDs=None):
+    """ Cache a directory, what is already cached being kept if not given
+
+        :param str path: normalized path
+        :param int dirID: directory ID, if known
+        :param int level: level of the directory, if known
+        :param list pathIDs: parent chain of the directory, if known
+    """
+    now = time.time()
+    with self.__lock:
+      entry = self.__getEntry(path, now)
+      if entry and (dirID is None or entry[1] in (None, dirID)):
+        if dirID is None:
+          # Only the parent chain is new
+          now = entry[0]
+        entry[0] = now
+        entry[1] = entry[1] if dirID is None else dirID
+        entry[2] = entry[2] if level is None else level
+        entry[3] = entry[3] if pathIDs is None else list(pathIDs)
+      else:
+        if entry:
+          # Another directory with the same path
+          self.__ids.pop(entry[1], None)
+          del self.__paths[path]
+        entry = [now, dirID, level, None if pathIDs is None else list(pathIDs)]
+        self.__paths[path] = entry
+      if entry[1] is not None:
+        self.__ids[entry[1]] = path
+      while len(self.__paths) > self.maxSize:
+        _path, entry = self.__paths.popitem(last=False)
+        if entry[1] is not None:
+          self.__ids.pop(entry[1], None)
+
+  def invalidate(self, path=None, dirID=None):
+    """ Remove a directory from the cache, given by its path or ID
+
+        :param str path: normalized path
+        :param int dirID: directory ID
+    """
+    with self.__lock:
+      if path is None:
+        path = self.__ids.get(dirID)
+      entry = self.__paths.pop(path, None) if path is not None else None
+      if entry:
+        if entry[1] is not None:
+          self.__ids.pop(entry[1], None)
+        self.__invalidations += 1
+
+  def clear(self):
+    """ Empty the cache, and reset the statistics """
+    with self.__lock:
+      self.__paths.clear()
+      self.__ids.clear()
+      self.__hits = self.__misses = self.__invalidations = 0
+
+  def getStatistics(self):
+    """ Get the statistics of the cache
+
+        :return: dict with the number of 'Hits' and 'Misses', the 'HitRate' in percent,
+                 the number of 'Invalidations', the 'Size' and the 'MaxSize'
+    """
+    with self.__lock:
+      lookups = self.__hits + self.__misses
+      return {'Hits': self.__hits,
+              'Misses': self.__misses,
+              'HitRate': 100. * self.__hits / lookups if lookups else 0.,
+              'Invalidations': self.__invalidations,
+              'Size': len(self.__paths),
+              'MaxSize': self.maxSize}
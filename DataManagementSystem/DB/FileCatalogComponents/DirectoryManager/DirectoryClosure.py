@@ -35,7 +35,7 @@ class DirectoryClosure(DirectoryTreeBase):
     self.directoryTable = 'FC_DirectoryList'
     self.closureTable = 'FC_DirectoryClosure'
 
-  def findDir(self, path, connection=False):
+  def _findDir(self, path, connection=False):
     """  Find directory ID for the given path
 
       :param path: path of the directory
@@ -55,7 +55,7 @@ class DirectoryClosure(DirectoryTreeBase):
     res['Level'] = result['Value'][1]
     return res
 
-  def findDirs(self, paths, connection=False):
+  def _findDirs(self, paths, connection=False):
     """ Find DirIDs for the given path list
 
         :param paths: list of path
@@ -75,7 +75,7 @@ class DirectoryClosure(DirectoryTreeBase):
 
     return S_OK(dirDict)
 
-  def removeDir(self, path):
+  def _removeDir(self, path):
     """ Remove directory
 
         Removing a non existing directory is successful. In that case, DirID is 0
@@ -121,7 +121,7 @@ class DirectoryClosure(DirectoryTreeBase):
     else:
       return S_OK({"Exists": True, "DirID": result['Value']})
 
-  def getDirectoryPath(self, dirID):
+  def _getDirectoryPath(self, dirID):
     """ Get directory name by directory ID
 
         :param dirID: directory ID
@@ -165,7 +165,7 @@ class DirectoryClosure(DirectoryTreeBase):
 
     return S_OK(dirDict)
 
-  def getPathIDs(self, path):
+  def _getPathIDs(self, path):
     """ Get IDs of all the directories in the parent hierarchy for a directory
         specified by its path, including itself
 
@@ -95,7 +95,7 @@ class DirectoryFlatTree(DirectoryTreeBase):
         successful[dirName]['Execute'] = mode & stat.S_IXOTH
     return S_OK({'Successful': successful, 'Failed': res['Value']['Failed']})
 
-  def findDir(self, path):
+  def _findDir(self, path, connection=False):
     res = self.__findDirs([path])
     if not res['OK']:
       return res
@@ -103,7 +103,7 @@ class DirectoryFlatTree(DirectoryTreeBase):
       return S_OK(0)
     return S_OK(res['Value'].keys()[0])
 
-  def removeDir(self, path):
+  def _removeDir(self, path):
     """ Remove directory """
     res = self.findDir(path)
     if not res['OK']:
@@ -146,7 +146,7 @@ class DirectoryFlatTree(DirectoryTreeBase):
       return S_ERROR('Failed to create directory %s' % path)
     return S_OK(result['lastRowId'])
 
-  def makeDir(self, path):
+  def _makeDir(self, path):
     result = self.findDir(path)
     if not result['OK']:
       return result
@@ -187,7 +187,7 @@ class DirectoryFlatTree(DirectoryTreeBase):
       return S_ERROR('No parent found')
     return S_OK(result['Value'][0][0])
 
-  def getDirectoryPath(self, dirID):
+  def _getDirectoryPath(self, dirID):
     """ Get directory name by directory ID """
     req = "SELECT DirName FROM DirectoryInfo WHERE DirID=%d" % int(dirID)
     result = self.db._query(req)
@@ -204,7 +204,7 @@ class DirectoryFlatTree(DirectoryTreeBase):
       return result
     return S_OK(os.path.basename(result['Value']))
 
-  def getPathIDs(self, path):
+  def _getPathIDs(self, path):
     """ Get IDs of all the directories in the parent hierarchy """
     elements = path.split('/')
     pelements = []
@@ -31,7 +31,7 @@ class DirectoryLevelTree(DirectoryTreeBase):
 
     return 'Directory'
 
-  def findDir(self, path, connection=False):
+  def _findDir(self, path, connection=False):
     """  Find directory ID for the given path
     """
 
@@ -51,7 +51,7 @@ class DirectoryLevelTree(DirectoryTreeBase):
     res['Level'] = result['Value'][0][1]
     return res
 
-  def findDirs(self, paths, connection=False):
+  def _findDirs(self, paths, connection=False):
     """ Find DirIDs for the given path list
     """
     dpathList = []
@@ -71,7 +71,7 @@ class DirectoryLevelTree(DirectoryTreeBase):
 
     return S_OK(dirDict)
 
-  def removeDir(self, path):
+  def _removeDir(self, path):
     """ Remove directory
     """
 
@@ -110,7 +110,7 @@ class DirectoryLevelTree(DirectoryTreeBase):
     result['Level'] = level
     return result
 
-  def makeDir(self, path):
+  def _makeDir(self, path):
     """ Create a new directory entry
     """
     result = self.findDir(path)
@@ -237,7 +237,7 @@ class DirectoryLevelTree(DirectoryTreeBase):
 
     return S_OK(result['Value'][0][0])
 
-  def getDirectoryPath(self, dirID):
+  def _getDirectoryPath(self, dirID):
     """ Get directory name by directory ID
     """
     req = "SELECT DirName FROM FC_DirectoryLevelTree WHERE DirID=%d" % int(dirID)
@@ -283,7 +283,7 @@ class DirectoryLevelTree(DirectoryTreeBase):
 
     return S_OK(os.path.basename(result['Value']))
 
-  def getPathIDs(self, path):
+  def _getPathIDs(self, path):
     """ Get IDs of all the directories in the parent hierarchy for a directory
         specified by its path
     """
@@ -534,6 +534,9 @@ class DirectoryLevelTree(DirectoryTreeBase):
       result = self.__rebuildLevelIndexes(parentID, connection)
       resUnlock = self.db._query("UNLOCK TABLES", connection)
 
+    if self.cache and parentDict:
+      # Directory IDs and parents were changed
+      self.cache.clear()
     return S_OK()
 
   def _getConnection(self, connection=False):
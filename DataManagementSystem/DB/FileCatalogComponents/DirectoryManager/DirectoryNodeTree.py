@@ -21,7 +21,7 @@ class DirectoryNodeTree(DirectoryTreeBase):
     DirectoryTreeBase.__init__(self, database)
     self.treeTable = 'FC_DirectoryTreeM'
 
-  def findDir(self, path):
+  def _findDir(self, path, connection=False):
     """ Find the identifier of a directory specified by its path
     """
     dpath = path
@@ -47,7 +47,7 @@ class DirectoryNodeTree(DirectoryTreeBase):
 
     return S_OK(result['Value'][0][0])
 
-  def makeDir(self, path):
+  def _makeDir(self, path):
     """ Create a single directory
     """
     result = self.findDir(path)
@@ -134,7 +134,7 @@ class DirectoryNodeTree(DirectoryTreeBase):
 
     return S_OK(result['Value'][0][0])
 
-  def getDirectoryPath(self, dirID):
+  def _getDirectoryPath(self, dirID):
     """ Get directory path by directory ID
     """
 
@@ -155,7 +155,7 @@ class DirectoryNodeTree(DirectoryTreeBase):
 
     return S_OK('/' + dirPath)
 
-  def getPathIDs(self, path):
+  def _getPathIDs(self, path):
     """ Get IDs of all the directories in the parent hierarchy
     """
     result = self.findDir(path)
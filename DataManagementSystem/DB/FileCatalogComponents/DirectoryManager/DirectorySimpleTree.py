@@ -21,7 +21,7 @@ class DirectorySimpleTree(DirectoryTreeBase):
     DirectoryTreeBase.__init__(self, database)
     self.treeTable = 'FC_DirectoryTree'
 
-  def findDir(self, path):
+  def _findDir(self, path, connection=False):
 
     req = "SELECT DirID from FC_DirectoryTree WHERE DirName='%s'" % path
     result = self.db._query(req)
@@ -33,7 +33,7 @@ class DirectorySimpleTree(DirectoryTreeBase):
 
     return S_OK(result['Value'][0][0])
 
-  def removeDir(self, path):
+  def _removeDir(self, path):
     """ Remove directory
     """
 
@@ -48,7 +48,7 @@ class DirectorySimpleTree(DirectoryTreeBase):
     result = self.db._update(req)
     return result
 
-  def makeDir(self, path):
+  def _makeDir(self, path):
 
     result = self.findDir(path)
     if not result['OK']:
@@ -97,7 +97,7 @@ class DirectorySimpleTree(DirectoryTreeBase):
 
     return S_OK(result['Value'][0][0])
 
-  def getDirectoryPath(self, dirID):
+  def _getDirectoryPath(self, dirID):
     """ Get directory name by directory ID
     """
     req = "SELECT DirName FROM FC_DirectoryTree WHERE DirID=%d" % int(dirID)
@@ -119,7 +119,7 @@ class DirectorySimpleTree(DirectoryTreeBase):
 
     return S_OK(os.path.basename(result['Value']))
 
-  def getPathIDs(self, path):
+  def _getPathIDs(self, path):
     """ Get IDs of all the directories in the parent hierarchy
     """
 
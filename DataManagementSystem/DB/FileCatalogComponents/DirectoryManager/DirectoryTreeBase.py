@@ -25,6 +25,8 @@ class DirectoryTreeBase(object):
     self.db = database
     self.lock = threading.Lock()
     self.treeTable = ''
+    # DirectoryCache of the paths and IDs, None if disabled
+    self.cache = None
 
 ############################################################################
 #
@@ -32,32 +34,38 @@ class DirectoryTreeBase(object):
 #
 ############################################################################
 
-  def findDir(self, path, connection=False):
+  def _findDir(self, path, connection=False):
     """  Find directory ID for the given path
     """
     return S_ERROR("To be implemented on derived class")
 
-  def findDirs(self, paths, connection=False):
+  def _findDirs(self, paths, connection=False):
     """ Find DirIDs for the given path list
     """
     return S_ERROR("To be implemented on derived class")
 
-  def makeDir(self, path):
+  def _makeDir(self, path):
 
     return S_ERROR("To be implemented on derived class")
 
-  def removeDir(self, path):
+  def _removeDir(self, path):
 
     return S_ERROR("To be implemented on derived class")
 
   def getChildren(self, path, connection=False):
     return S_ERROR("To be implemented on derived class")
 
-  def getDirectoryPath(self, dirID):
+  def _getDirectoryPath(self, dirID):
     """ Get directory name by directory ID
     """
     return S_ERROR("To be implemented on derived class")
 
+  def _getPathIDs(self, path):
+    """ Get IDs of all the directories in the parent hierarchy for a directory
+        specified by its path
+    """
+    return S_ERROR("To be implemented on derived class")
+
   def countSubdirectories(self, dirId, includeParent=True):
     return S_ERROR("To be implemented on derived class")
 
@@ -66,6 +74,109 @@ class DirectoryTreeBase(object):
     """
     return S_ERROR("To be implemented on derived class")
 
+############################################################################
+#
+# Path <-> ID resolution, through the cache if any
+#
+############################################################################
+
+  def setCache(self, cache):
+    """ Set the DirectoryCache of the paths and IDs of the directories, None to disable it
+    """
+    self.cache = cache
+
+  def getCacheStatistics(self):
+    """ Get the statistics of the DirectoryCache
+    """
+    if not self.cache:
+      return S_ERROR('The directory cache is not enabled')
+    return S_OK(self.cache.getStatistics())
+
+  def findDir(self, path, connection=False):
+    """  Find directory ID for the given path
+    """
+    if not self.cache:
+      return self._findDir(path, connection)
+    dpath = os.path.normpath(path)
+    cached = self.cache.getID(dpath)
+    if cached:
+      result = S_OK(cached[0])
+      if cached[1] is not None:
+        result['Level'] = cached[1]
+      return result
+    result = self._findDir(path, connection)
+    # The directories not found are not cached, they can be created at any time
+    if result['OK'] and result['Value']:
+      self.cache.add(dpath, result['Value'], level=result.get('Level'))
+    return result
+
+  def findDirs(self, paths, connection=False):
+    """ Find DirIDs for the given path list
+    """
+    if not self.cache:
+      return self._findDirs(paths, connection)
+    dirDict = {}
+    notCached = []
+    for path in paths:
+      dpath = os.path.normpath(path)
+      cached = self.cache.getID(dpath)
+      if cached:
+        dirDict[dpath] = cached[0]
+      else:
+        notCached.append(path)
+    if notCached:
+      result = self._findDirs(notCached, connection)
+      if not result['OK']:
+        return result
+      for dirName, dirID in result['Value'].items():
+        self.cache.add(dirName, dirID)
+      dirDict.update(result['Value'])
+    return S_OK(dirDict)
+
+  def makeDir(self, path):
+    """ Create a new directory entry
+    """
+    result = self._makeDir(path)
+    if self.cache and result['OK'] and result['Value']:
+      self.cache.add(os.path.normpath(path), result['Value'])
+    return result
+
+  def removeDir(self, path):
+    """ Remove directory
+    """
+    result = self._removeDir(path)
+    if self.cache:
+      self.cache.invalidate(path=os.path.normpath(path))
+    return result
+
+  def getDirectoryPath(self, dirID):
+    """ Get directory name by directory ID
+    """
+    if not self.cache:
+      return self._getDirectoryPath(dirID)
+    path = self.cache.getPath(int(dirID))
+    if path is not None:
+      return S_OK(path)
+    result = self._getDirectoryPath(dirID)
+    if result['OK']:
+      self.cache.add(os.path.normpath(result['Value']), int(dirID))
+    return result
+
+  def getPathIDs(self, path):
+    """ Get IDs of all the directories in the parent hierarchy for a directory
+        specified by its path
+    """
+    if not self.cache:
+      return self._getPathIDs(path)
+    dpath = os.path.normpath(path)
+    pathIDs = self.cache.getPathIDs(dpath)
+    if pathIDs is not None:
+      return S_OK(pathIDs)
+    result = self._getPathIDs(path)
+    if result['OK']:
+      self.cache.add(dpath, pathIDs=result['Value'])
+    return result
+
 ##########################################################################
 
   def _getConnection(self, connection):
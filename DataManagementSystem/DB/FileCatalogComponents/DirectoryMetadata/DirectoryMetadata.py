@@ -19,10 +19,18 @@ class DirectoryMetadata(object):
   def __init__(self, database=None):
 
     self.db = database
+    self.index = None
 
   def setDatabase(self, database):
     self.db = database
 
+  def setMetadataIndex(self, index):
+    """ Set the inverted index of the metadata used by the searches, None to use the database only
+
+        :param index: MetadataIndex object or None
+    """
+    self.index = index
+
 ##############################################################################
 #
 #  Manage Metadata fields
@@ -76,6 +84,8 @@ class DirectoryMetadata(object):
 
     metadataID = result['lastRowId']
     result = self.__transformMetaParameterToData(pName)
+    if self.index:
+      self.index.clear(pName)
     if not result['OK']:
       return result
 
@@ -92,6 +102,8 @@ class DirectoryMetadata(object):
 
     req = "DROP TABLE FC_Meta_%s" % pName
     result = self.db._update(req)
+    if self.index:
+      self.index.clear(pName)
     error = ''
     if not result['OK']:
       error = result["Message"]
@@ -249,6 +261,8 @@ class DirectoryMetadata(object):
             return result
         else:
           return result
+      if self.index:
+        self.index.add(metaName, dirID, metaValue)
 
     return S_OK()
 
@@ -281,6 +295,8 @@ class DirectoryMetadata(object):
         result = self.db._update(req)
         if not result['OK']:
           failedMeta[meta] = result['Value']
+        elif self.index:
+          self.index.remove(meta, [dirID])
       else:
         # Meta parameter case
         req = "DELETE FROM FC_DirMeta WHERE MetaKey='%s' AND DirID=%d" % (meta, dirID)
@@ -519,7 +535,7 @@ class DirectoryMetadata(object):
 
     return S_OK(selectString)
 
-  def __findSubdirByMeta(self, metaName, value, pathSelection='', subdirFlag=True):
+  def __findSubdirByMeta(self, metaName, value, pathSelection='', subdirFlag=True, pathDirs=None):
     """ Find directories for the given metaName datum. If the the metaName datum type is a list,
         combine values in OR. In case the metaName datum is 'Any', finds all the subdirectories
         for which the metaName datum is defined at all.
@@ -528,10 +544,24 @@ class DirectoryMetadata(object):
         :param dict,list value: dictionary with selection instructions suitable for the database search
         :param str pathSelection: directory path selection string
         :param bool subdirFlag: fla to include subdirectories
+        :param set pathDirs: IDs of the directories selected by pathSelection, for the index
 
         :return: S_OK/S_ERROR, Value list of found directories
     """
 
+    if self.index and (not pathSelection or pathDirs is not None):
+      result = self.index.find(metaName, value)
+      if not result['OK']:
+        return result
+      if result['Value'] is not None:
+        dirList = sorted(result['Value'] & pathDirs if pathSelection else result['Value'])
+        if dirList and subdirFlag:
+          result = self.db.dtree.getAllSubdirectoriesByID(dirList)
+          if not result['OK']:
+            return result
+          dirList += result['Value']
+        return S_OK(dirList)
+
     result = self.__createMetaSelection(value, "M.")
     if not result['OK']:
       return result
@@ -569,15 +599,16 @@ class DirectoryMetadata(object):
 
     return S_OK(dirList)
 
-  def __findSubdirMissingMeta(self, metaName, pathSelection):
+  def __findSubdirMissingMeta(self, metaName, pathSelection, pathDirs=None):
     """ Find directories not having the given meta datum defined
 
         :param str metaName: metadata name
         :param str pathSelection: directory path selection string
+        :param set pathDirs: IDs of the directories selected by pathSelection, for the index
 
         :return: S_OK,S_ERROR , Value list of directories
     """
-    result = self.__findSubdirByMeta(metaName, 'Any', pathSelection)
+    result = self.__findSubdirByMeta(metaName, 'Any', pathSelection, pathDirs=pathDirs)
     if not result['OK']:
       return result
     dirList = result['Value']
@@ -633,20 +664,31 @@ class DirectoryMetadata(object):
     result['ExtraMetadata'] = extraDict
     return result
 
-  def __checkDirsForMetadata(self, metaName, value, pathString):
+  def __checkDirsForMetadata(self, metaName, value, pathIDs):
     """ Check if any of the given directories conform to the given metadata
 
         :param str metaName: matadata name
         :param dict,list value: dictionary with selection instructions suitable for the database search
-        :param str pathString: string of comma separated directory names
+        :param list pathIDs: directory IDs
 
         :return: S_OK/S_ERROR, Value directory ID
     """
+    if self.index:
+      result = self.index.find(metaName, value)
+      if not result['OK']:
+        return result
+      if result['Value'] is not None:
+        dirIDs = result['Value'].intersection(pathIDs)
+        if len(dirIDs) > 1:
+          return S_ERROR('Conflict in the directory metadata hierarchy')
+        return S_OK(dirIDs.pop() if dirIDs else None)
+
     result = self.__createMetaSelection(value, "M.")
     if not result['OK']:
       return result
     selectString = result['Value']
 
+    pathString = ','.join([str(x) for x in pathIDs])
     if selectString:
       req = "SELECT M.DirID FROM FC_Meta_%s AS M WHERE %s AND M.DirID IN (%s)" % (metaName, selectString, pathString)
     else:
@@ -675,7 +717,7 @@ class DirectoryMetadata(object):
 
     pathDirList = []
     pathDirID = 0
-    pathString = '0'
+    pathIDs = [0]
     if path != '/':
       result = self.db.dtree.getPathIDs(path)
       if not result['OK']:
@@ -683,7 +725,6 @@ class DirectoryMetadata(object):
         return result
       pathIDs = result['Value']
       pathDirID = pathIDs[-1]
-      pathString = ','.join([str(x) for x in pathIDs])
 
     result = self.__expandMetaDictionary(queryDict, credDict)
     if not result['OK']:
@@ -693,7 +734,7 @@ class DirectoryMetadata(object):
     # Now check the meta data for the requested directory and its parents
     finalMetaDict = dict(metaDict)
     for meta in metaDict:
-      result = self.__checkDirsForMetadata(meta, metaDict[meta], pathString)
+      result = self.__checkDirsForMetadata(meta, metaDict[meta], pathIDs)
       if not result['OK']:
         return result
       elif result['Value'] is not None:
@@ -703,30 +744,27 @@ class DirectoryMetadata(object):
 
     if finalMetaDict:
       pathSelection = ''
+      pathDirs = None
       if pathDirID:
         result = self.db.dtree.getSubdirectoriesByID(pathDirID, includeParent=True, requestString=True)
         if not result['OK']:
           return result
         pathSelection = result['Value']
-      dirList = []
-      first = True
+        if self.index:
+          result = self.db.dtree.getSubdirectoriesByID(pathDirID, includeParent=True)
+          if not result['OK']:
+            return result
+          pathDirs = set(result['Value'])
+      dirSet = None
       for meta, value in finalMetaDict.items():
         if value == "Missing":
-          result = self.__findSubdirMissingMeta(meta, pathSelection)
+          result = self.__findSubdirMissingMeta(meta, pathSelection, pathDirs)
         else:
-          result = self.__findSubdirByMeta(meta, value, pathSelection)
+          result = self.__findSubdirByMeta(meta, value, pathSelection, pathDirs=pathDirs)
         if not result['OK']:
           return result
-        mList = result['Value']
-        if first:
-          dirList = mList
-          first = False
-        else:
-          newList = []
-          for d in dirList:
-            if d in mList:
-              newList.append(d)
-          dirList = newList
+        dirSet = set(result['Value']) if dirSet is None else dirSet.intersection(result['Value'])
+      dirList = sorted(dirSet)
     else:
       if pathDirID:
         result = self.db.dtree.getSubdirectoriesByID(pathDirID, includeParent=True)
@@ -1009,5 +1047,7 @@ class DirectoryMetadata(object):
         failed[meta] = result['Message']
       else:
         successful[meta] = 'OK'
+        if self.index:
+          self.index.remove(meta, dirs)
 
     return S_OK({'Successful': successful, 'Failed': failed})
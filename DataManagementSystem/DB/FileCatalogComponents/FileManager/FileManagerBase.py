@@ -1328,3 +1328,15 @@ class FileManagerBase(object):
         :returns: S_OK with list of tuples (lfn, checksum, size)
     """
     return S_ERROR("To be implemented on derived class")
+
+  def iterSEDump(self, seName, batchSize=1000):
+    """
+         Iterate over all the files at a given SE, together with checksum and size,
+         without loading them all in memory
+
+        :param seName: name of the StorageElement
+        :param int batchSize: maximum number of files in each batch
+
+        :returns: S_OK with an iterator over tuples of (lfn, checksum, size)
+    """
+    return S_ERROR("To be implemented on derived class")
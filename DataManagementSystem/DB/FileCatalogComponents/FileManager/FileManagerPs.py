@@ -941,3 +941,21 @@ class FileManagerPs(FileManagerBase):
     seID = res['Value']
 
     return self.db.executeStoredProcedureWithCursor('ps_get_se_dump', (seID,))
+
+  def iterSEDump(self, seName, batchSize=1000):
+    """
+         Iterate over all the files at a given SE, together with checksum and size,
+         without loading them all in memory
+
+        :param seName: name of the StorageElement
+        :param int batchSize: maximum number of files in each batch
+
+        :returns: S_OK with an iterator over tuples of (lfn, checksum, size)
+    """
+
+    res = self.db.seManager.findSE(seName)
+    if not res['OK']:
+      return res
+    seID = res['Value']
+
+    return self.db._queryIter("call ps_get_se_dump(%d);" % seID, batchSize=batchSize)
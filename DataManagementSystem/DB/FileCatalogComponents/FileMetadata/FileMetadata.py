@@ -14,16 +14,27 @@ from DIRAC.DataManagementSystem.Client.MetaQuery import FILE_STANDARD_METAKEYS,
     FILES_TABLE_METAKEYS, \
     FILEINFO_TABLE_METAKEYS
 
+# Maximum number of file IDs found with the metadata index given to a SQL query
+MAX_INDEX_IDS_IN_QUERY = 10000
+
 
 class FileMetadata(object):
 
   def __init__(self, database=None):
 
     self.db = database
+    self.index = None
 
   def setDatabase(self, database):
     self.db = database
 
+  def setMetadataIndex(self, index):
+    """ Set the inverted index of the metadata used by the searches, None to use the database only
+
+        :param index: MetadataIndex object or None
+    """
+    self.index = index
+
 ##############################################################################
 #
 #  Manage Metadata fields
@@ -70,6 +81,8 @@ class FileMetadata(object):
 
     metadataID = result['lastRowId']
     result = self.__transformMetaParameterToData(pName)
+    if self.index:
+      self.index.clear(pName)
     if not result['OK']:
       return result
     return S_OK("Added new metadata: %d" % metadataID)
@@ -85,6 +98,8 @@ class FileMetadata(object):
 
     req = "DROP TABLE FC_FileMeta_%s" % pName
     result = self.db._update(req)
+    if self.index:
+      self.index.clear(pName)
     error = ''
     if not result['OK']:
       error = result["Message"]
@@ -165,6 +180,8 @@ class FileMetadata(object):
               return result
           else:
             return result
+        if self.index:
+          self.index.add(metaName, fileID, metaValue)
 
     return S_OK()
 
@@ -198,6 +215,8 @@ class FileMetadata(object):
         result = self.db._update(req)
         if not result['OK']:
           failedMeta[meta] = result['Value']
+        elif self.index:
+          self.index.remove(meta, [fileID])
       else:
         # Meta parameter case
         req = "DELETE FROM FC_FileMeta WHERE MetaKey='%s' AND FileID=%d" % (meta, fileID)
@@ -594,6 +613,36 @@ class FileMetadata(object):
 
     return S_OK(resultList)
 
+  def __findFileIDsInIndex(self, userMetaDict):
+    """ Find the files matching the user metadata which can be evaluated by the metadata index
+
+        :param dict userMetaDict: dictionary with user metadata
+
+        :return: S_OK/S_ERROR, Value - tuple ( set of file IDs or None if no metadata was evaluated,
+                 dictionary of the user metadata left to the SQL query )
+    """
+    fileIDs = None
+    sqlMetaDict = {}
+    for meta, value in userMetaDict.items():
+      if isinstance(value, six.string_types):
+        if value.lower() == 'any':
+          # All the files with a value which is not NULL
+          value = {'nin': []}
+        elif not value or value.lower() == 'missing' or '*' in value or '?' in value:
+          sqlMetaDict[meta] = value
+          continue
+      elif isinstance(value, list) and not value:
+        sqlMetaDict[meta] = value
+        continue
+      result = self.index.find(meta, value)
+      if not result['OK']:
+        return result
+      if result['Value'] is None:
+        sqlMetaDict[meta] = value
+      else:
+        fileIDs = result['Value'] if fileIDs is None else fileIDs & result['Value']
+    return S_OK((fileIDs, sqlMetaDict))
+
   def __findFilesByMetadata(self, metaDict, dirList, credDict):
     """ Find a list of file IDs meeting the metaDict requirements and belonging
         to directories in dirList
@@ -627,7 +676,15 @@ class FileMetadata(object):
       if not result['OK']:
         return result
       tablesAndConditions.extend(result['Value'])
-    # 3.- user search
+    # 3.- user search, with the metadata index first
+    fileIDs = None
+    if userMetaDict and self.index:
+      result = self.__findFileIDsInIndex(userMetaDict)
+      if not result['OK']:
+        return result
+      fileIDs, userMetaDict = result['Value']
+      if fileIDs is not None and not fileIDs:
+        return S_OK([])
     if userMetaDict:
       result = self.__buildUserMetaQuery(userMetaDict)
       if not result['OK']:
@@ -667,6 +724,19 @@ class FileMetadata(object):
       conditions.append(condition)
 
     query += ' '.join(tables)
+
+    if fileIDs is not None and (len(fileIDs) <= MAX_INDEX_IDS_IN_QUERY or not conditions):
+      # The files found with the index are selected by their ID, which also excludes the removed files
+      fileIDs = sorted(fileIDs)
+      fileList = []
+      for i in range(0, len(fileIDs), MAX_INDEX_IDS_IN_QUERY):
+        idConditions = conditions + ["F.FileID in (%s)" % intListToString(fileIDs[i:i + MAX_INDEX_IDS_IN_QUERY])]
+        result = self.db._query(query + ' WHERE %s' % ' AND '.join(idConditions))
+        if not result['OK']:
+          return result
+        fileList.extend(row[0] for row in result['Value'])
+      return S_OK(fileList)
+
     if conditions:
       query += ' WHERE %s' % ' AND '.join(conditions)
 
@@ -680,7 +750,8 @@ class FileMetadata(object):
     fileList = []
     for row in result['Value']:
       fileID = row[0]
-      fileList.append(fileID)
+      if fileIDs is None or fileID in fileIDs:
+        fileList.append(fileID)
 
     return S_OK(fileList)
 
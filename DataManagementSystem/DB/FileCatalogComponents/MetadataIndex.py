@@ -0,0 +1,308 @@
+""" In memory inverted index of the metadata of the FileCatalogDB, for the metadata queries
+
+    For each metadata field, the index holds the sorted distinct values of the field, and for each value
+    the sorted array of the IDs of the directories, or of the files, having it. A query term is evaluated
+    with set operations on these posting lists, the comparisons with a bisection of the sorted values.
+
+    The fields are loaded from their FC_Meta_<name> or FC_FileMeta_<name> table on their first query,
+    and reloaded after the lifetime of the index: the metadata set by other instances of the service
+    are only seen after that. The metadata set and removed through the FileCatalogDB of the process
+    are updated in the index.
+
+    The string values are compared case insensitively, like with the default collation of MySQL.
+    The query terms which can not be evaluated exactly by the index, e.g. a value which can not be
+    converted to the type of the field, are left to the SQL queries, as well as all the query terms
+    of a field having a stored value which can not be converted.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import array
+import bisect
+import datetime
+import threading
+import time
+
+import six
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.Utilities import Time
+
+# Special value of the queries selecting the objects with any value of the field
+ANY = 'Any'
+
+
+def _getKeyFunction(metaType):
+  """ Get the function converting a value to the key of the index, for a type of metadata field
+
+      :param str metaType: type of the field, as given to addMetadataField
+      :return: function raising ValueError or TypeError if the value can not be converted
+  """
+  metaType = metaType.lower()
+  if metaType.startswith('int'):
+    def toInt(value):
+      if isinstance(value, float) and not value.is_integer():
+        raise ValueError('Not an integer: %s' % value)
+      return int(value)
+    return toInt
+  if metaType.startswith('float') or metaType.startswith('double') or metaType.startswith('decimal'):
+    return float
+  if metaType.startswith('date'):
+    def toDateTime(value):
+      if isinstance(value, datetime.datetime):
+        return value
+      dateTime = Time.fromString(str(value))
+      if isinstance(dateTime, datetime.datetime):
+        return dateTime
+      if isinstance(dateTime, datetime.date):
+        # Compared as the midnight of the day, like by MySQL
+        return datetime.datetime.combine(dateTime, datetime.time())
+      raise ValueError('Not a date: %s' % value)
+    return toDateTime
+  return lambda value: str(value).lower()
+
+
+class MetadataIndex(object):
+  """ Inverted index of the metadata fields of the directories or of the files
+  """
+
+  def __init__(self, database, table, idColumn, fieldsTable, lifetime):
+    """ c'tor
+
+        :param database: FileCatalogDB
+        :param str table: name of the tables of the fields, with %s for the field name, e.g. FC_Meta_%s
+        :param str idColumn: name of the ID column of these tables, e.g. DirID
+        :param str fieldsTable: table of the fields and of their type, e.g. FC_MetaFields
+        :param int lifetime: time in seconds after which a field is reloaded from the database
+    """
+    self.db = database
+    self.table = table
+    self.idColumn = idColumn
+    self.fieldsTable = fieldsTable
+    self.lifetime = lifetime
+    self.__lock = threading.Lock()
+    # metaName -> { 'LoadTime', 'Key' (function, None if not supported), 'Values' (sorted keys),
+    #               'Postings' ( key -> array ) }
+    self.__fields = {}
+    self.__queries = 0
+    # Number of updates of each field and of clears of the index, to detect the updates made while
+    # a field is loaded
+    self.__updates = {}
+    self.__clears = 0
+
+  def __loadField(self, metaName):
+    """ Load a field from the database
+
+        :return: S_OK( field dict ), with a None 'Key' if a stored value is not supported by the index / S_ERROR
+    """
+    result = self.db._escapeString(metaName)
+    if not result['OK']:
+      return result
+    result = self.db._query("SELECT MetaType FROM %s WHERE MetaName=%s" % (self.fieldsTable, result['Value']))
+    if not result['OK']:
+      return result
+    if not result['Value']:
+      return S_ERROR('Unknown metadata field %s' % metaName)
+    toKey = _getKeyFunction(result['Value'][0][0])
+
+    result = self.db._query("SELECT %s, Value FROM %s" % (self.idColumn, self.table % metaName))
+    if not result['OK']:
+      return result
+    ids = {}
+    for objID, value in result['Value']:
+      key = None
+      if value is not None:
+        try:
+          key = toKey(value)
+        except (ValueError, TypeError):
+          # The queries of the field are left to SQL until it is reloaded
+          return S_OK({'LoadTime': time.time(), 'Key': None, 'Values': [], 'Postings': {}})
+      ids.setdefault(key, []).append(objID)
+
+    return S_OK({'LoadTime': time.time(),
+                 'Key': toKey,
+                 # The objects with a NULL value are only selected by the Any queries
+                 'Values': sorted(key for key in ids if key is not None),
+                 'Postings': dict((key, array.array('q', sorted(keyIDs))) for key, keyIDs in ids.items())})
+
+  def __getVersion(self, metaName):
+    """ Version of a field, changed by each update of the field. The lock must be held """
+    return self.__clears, self.__updates.get(metaName, 0)
+
+  def __setUpdated(self, metaName):
+    """ Record an update of a field. The lock must be held """
+    self.__updates[metaName] = self.__updates.get(metaName, 0) + 1
+
+  def __getField(self, metaName):
+    """ Get a field, loaded if needed. The lock must not be held: the other queries and the updates
+        are not blocked while the field is loaded
+
+        :return: S_OK( field dict ) / S_ERROR
+    """
+    with self.__lock:
+      field = self.__fields.get(metaName)
+      if field and time.time() - field['LoadTime'] <= self.lifetime:
+        return S_OK(field)
+      version = self.__getVersion(metaName)
+
+    result = self.__loadField(metaName)
+    if not result['OK']:
+      return result
+    field = result['Value']
+    with self.__lock:
+      # The field loaded while it was updated may miss the update: it is only used by this query
+      if self.__getVersion(metaName) == version:
+        self.__fields[metaName] = field
+    return S_OK(field)
+
+  @staticmethod
+  def __union(field, keys):
+    """ Union of the posting lists of keys """
+    postings = field['Postings']
+    return set().union(*[postings[key] for key in keys if key in postings])
+
+  def __evaluateOperation(self, field, operation, operand):
+    """ Evaluate an operation of a query term
+
+        :return: S_OK( set of IDs ), S_OK( None ) if the operation is not supported by the index / S_ERROR
+    """
+    values = field['Values']
+    try:
+      if isinstance(operand, list):
+        keys = [field['Key'](value) for value in operand]
+      else:
+        key = field['Key'](operand)
+        keys = [key]
+    except (ValueError, TypeError):
+      return S_OK(None)
+
+    if operation in ('>', '<', '>=', '<='):
+      if isinstance(operand, list):
+        return S_ERROR('Illegal query: list of values for comparison operation')
+      if operation == '>':
+        selected = values[bisect.bisect_right(values, key):]
+      elif operation == '>=':
+        selected = values[bisect.bisect_left(values, key):]
+      elif operation == '<':
+        selected = values[:bisect.bisect_left(values, key)]
+      else:
+        selected = values[:bisect.bisect_right(values, key)]
+      return S_OK(self.__union(field, selected))
+    if operation in ('in', '='):
+      return S_OK(self.__union(field, keys))
+    if operation in ('nin', '!='):
+      excluded = set(keys)
+      return S_OK(self.__union(field, [value for value in values if value not in excluded]))
+    # Ignored by the SQL queries as well
+    return S_OK(self.__union(field, field['Postings']))
+
+  def find(self, metaName, value):
+    """ Find the IDs of the objects matching a query term of a field
+
+        :param str metaName: name of the field
+        :param value: value of the query term: value, list of values, dict { operation: operand }, or Any
+        :return: S_OK( set of IDs ), S_OK( None ) if the query term is not supported by the index / S_ERROR
+    """
+    result = self.__getField(metaName)
+    if not result['OK']:
+      return result
+    field = result['Value']
+    with self.__lock:
+      self.__queries += 1
+      if field['Key'] is None:
+        # Values not supported by the index
+        return S_OK(None)
+
+      if isinstance(value, six.string_types) and value == ANY:
+        return S_OK(self.__union(field, field['Postings']))
+      if not isinstance(value, dict):
+        value = {'in': value if isinstance(value, list) else [value]}
+
+      ids = None
+      for operation, operand in value.items():
+        result = self.__evaluateOperation(field, operation, operand)
+        if not result['OK'] or result['Value'] is None:
+          return result
+        ids = result['Value'] if ids is None else ids & result['Value']
+      return S_OK(ids if ids is not None else self.__union(field, field['Postings']))
+
+  def __removeID(self, field, objID):
+    """ Remove an object from the posting lists of a field. The lock must be held """
+    for key, postings in list(field['Postings'].items()):
+      position = bisect.bisect_left(postings, objID)
+      if position < len(postings) and postings[position] == objID:
+        postings.pop(position)
+        if not postings:
+          del field['Postings'][key]
+          if key is not None:
+            field['Values'].remove(key)
+        return
+
+  def add(self, metaName, objID, value):
+    """ Set the value of a field for an object, replacing its previous value
+
+        :param str metaName: name of the field
+        :param int objID: ID of the directory or of the file
+        :param value: value
+    """
+    with self.__lock:
+      self.__setUpdated(metaName)
+      field = self.__fields.get(metaName)
+      if not field or field['Key'] is None:
+        # Loaded on the next query
+        return
+      try:
+        key = field['Key'](value)
+      except (ValueError, TypeError):
+        # The value stored by the database is not known: reloaded on the next query
+        del self.__fields[metaName]
+        return
+      objID = int(objID)
+      self.__removeID(field, objID)
+      postings = field['Postings'].get(key)
+      if postings is None:
+        postings = field['Postings'][key] = array.array('q')
+        bisect.insort(field['Values'], key)
+      bisect.insort(postings, objID)
+
+  def remove(self, metaName, objIDs):
+    """ Remove the value of a field for objects
+
+        :param str metaName: name of the field
+        :param list objIDs: IDs of the directories or of the files
+    """
+    with self.__lock:
+      self.__setUpdated(metaName)
+      field = self.__fields.get(metaName)
+      if field:
+        for objID in objIDs:
+          self.__removeID(field, int(objID))
+
+  def clear(self, metaName=None):
+    """ Remove a field from the index, or all the fields: they are reloaded on their next query
+
+        :param str metaName: name of the field
+    """
+    with self.__lock:
+      if metaName is None:
+        self.__fields.clear()
+        self.__clears += 1
+      else:
+        self.__fields.pop(metaName, None)
+        self.__setUpdated(metaName)
+
+  def getStatistics(self):
+    """ Get the statistics of the index
+
+        :return: dict with the number of loaded 'Fields', of distinct 'Values', of 'IDs' in the posting lists,
+                 and of 'Queries'
+    """
+    with self.__lock:
+      return {'Fields': len(self.__fields),
+              'Values': sum(len(field['Postings']) for field in self.__fields.values()),
+              'IDs': sum(len(postings) for field in self.__fields.values() for postings in field['Postings'].values()),
+              'Queries': self.__queries}
@@ -0,0 +1,114 @@
+""" In memory sqlite database standing for the FileCatalogDB in the tests of its components
+
+    The tables of the components are created from their description, and their queries run on real tables.
+    The MySQL constructs used by the components are translated to sqlite: UTC_TIMESTAMP(), the time
+    intervals, the backslash escape of LIKE, DELETE ... LIMIT, the %s placeholders of the arguments,
+    and the character sets and collations of the columns.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import datetime
+import re
+import sqlite3
+import threading
+
+from DIRAC import S_OK, S_ERROR
+
+
+class SQLiteDB(object):
+  """ Database with the query methods of the MySQL class used by the FileCatalogDB components
+  """
+
+  def __init__(self):
+    self.connection = sqlite3.connect(':memory:', check_same_thread=False, isolation_level=None)
+    self.connection.create_function('UTC_TIMESTAMP', 0, self.__utcTimestamp)
+    self.__lock = threading.Lock()
+    # Seconds added to the current time, to make the time pass in the tests
+    self.timeShift = 0
+    # Statements executed, for the tests checking which tables are queried
+    self.statements = []
+
+  def __utcTimestamp(self):
+    now = datetime.datetime.utcnow() + datetime.timedelta(seconds=self.timeShift)
+    return now.strftime('%Y-%m-%d %H:%M:%S')
+
+  @staticmethod
+  def __translate(req, args):
+    """ Translate a MySQL statement to sqlite """
+    if req == 'SHOW TABLES':
+      return "SELECT name FROM sqlite_master WHERE type='table'"
+    req = re.sub(r'UTC_TIMESTAMP\(\) - INTERVAL (\d+) (SECOND|DAY)',
+                 lambda match: "datetime(UTC_TIMESTAMP(), '-%s %ss')" % (match.group(1), match.group(2).lower()), req)
+    req = re.sub(r"(LIKE '(?:[^']|'')*')", r"\1 ESCAPE '\\'", req)
+    match = re.match(r'DELETE FROM (\w+) WHERE (.*) LIMIT (\d+)$', req)
+    if match:
+      req = "DELETE FROM %s WHERE rowid IN (SELECT rowid FROM %s WHERE %s LIMIT %s)" % \
+          (match.group(1), match.group(1), match.group(2), match.group(3))
+    if args is not None:
+      req = req.replace('%s', '?')
+    return req
+
+  def __execute(self, req, args=None, many=False):
+    self.statements.append(req)
+    sqliteReq = self.__translate(req, args)
+    with self.__lock:
+      try:
+        if many:
+          cursor = self.connection.executemany(sqliteReq, args)
+        else:
+          cursor = self.connection.execute(sqliteReq, args or ())
+        return S_OK(cursor)
+      except sqlite3.Error as e:
+        return S_ERROR('%s: %s' % (repr(e), sqliteReq))
+
+  def _getConnection(self):
+    return S_OK(self.connection)
+
+  def _escapeString(self, myString, conn=None):
+    return S_OK("'%s'" % str(myString).replace("'", "''"))
+
+  def _query(self, cmd, conn=None, debug=False):
+    result = self.__execute(cmd)
+    if not result['OK']:
+      return result
+    return S_OK(tuple(result['Value'].fetchall()))
+
+  def _update(self, cmd, conn=None, debug=False, args=None):
+    result = self.__execute(cmd, args=args)
+    if not result['OK']:
+      return result
+    cursor = result['Value']
+    result = S_OK(cursor.rowcount)
+    if cursor.lastrowid:
+      result['lastRowId'] = cursor.lastrowid
+    return result
+
+  def _updateMany(self, cmd, valuesList, conn=None):
+    if not valuesList:
+      return S_OK(0)
+    result = self.__execute(cmd, args=valuesList, many=True)
+    if not result['OK']:
+      return result
+    return S_OK(result['Value'].rowcount)
+
+  def _createTables(self, tableDict, force=False):
+    created = []
+    for table, description in tableDict.items():
+      fields = []
+      for field, fieldType in description['Fields'].items():
+        if 'AUTO_INCREMENT' in fieldType:
+          fieldType = 'INTEGER PRIMARY KEY AUTOINCREMENT'
+        fieldType = re.sub(r'(CHARACTER SET|COLLATE) \w+', '', fieldType)
+        fields.append('%s %s' % (field, fieldType))
+      primaryKey = description.get('PrimaryKey')
+      if primaryKey and 'AUTOINCREMENT' not in ' '.join(fields):
+        fields.append('PRIMARY KEY (%s)' % (primaryKey if isinstance(primaryKey, str) else ','.join(primaryKey)))
+      for index in description.get('UniqueIndexes', {}).values():
+        fields.append('UNIQUE (%s)' % ','.join(index))
+      result = self.__execute('CREATE TABLE %s (%s)' % (table, ', '.join(fields)))
+      if not result['OK']:
+        return result
+      created.append(table)
+    return S_OK(created)
@@ -0,0 +1,204 @@
+""" Test of the change log of the catalog, and of its recording and reading by the FileCatalogDB
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# pylint: disable=protected-access
+
+import errno
+
+from mock import MagicMock, patch
+
+from DIRAC import S_OK
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.ChangeLog import ChangeLog, MAX_CHANGES, \
+    CHANGE_SETTLE_TIME, ADD_FILE, ADD_REPLICA, REMOVE_FILE, REMOVE_REPLICA, SET_METADATA
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.test.SQLiteDB import SQLiteDB
+from DIRAC.DataManagementSystem.DB.FileCatalogDB import FileCatalogDB
+
+
+def getChangeLog():
+  """ Change log with replicas of /vo/data/f1 and /vo/data_1/f2 added, and /vo/data/f1 removed """
+  changeLog = ChangeLog(SQLiteDB())
+  assert changeLog.addChanges(ADD_REPLICA, [('/vo/data/f1', 1, 10, 'SE1'), ('/vo/data_1/f2', 2, 20, 'SE2')])['OK']
+  assert changeLog.addChanges(REMOVE_FILE, [('/vo/data/f1', 1, 10, None)])['OK']
+  return changeLog
+
+
+def settle(changeLog, seconds=CHANGE_SETTLE_TIME + 1):
+  """ Let the time pass """
+  changeLog.db.timeShift += seconds
+
+
+def getChangeIDs(result):
+  assert result['OK'], result
+  return [change['ChangeID'] for change in result['Value']]
+
+
+def test_addChanges():
+  changeLog = getChangeLog()
+  res = changeLog.getChanges(0)
+  assert res['OK'], res
+  assert [(change['Operation'], change['Path'], change['FileID'], change['Size'], change['SE'])
+          for change in res['Value']] == [(ADD_REPLICA, '/vo/data/f1', 1, 10, 'SE1'),
+                                          (ADD_REPLICA, '/vo/data_1/f2', 2, 20, 'SE2'),
+                                          (REMOVE_FILE, '/vo/data/f1', 1, 10, '')]
+  assert changeLog.getFirstChangeID()['Value'] == 1
+  assert changeLog.getLastChangeID()['Value'] == 3
+
+  assert changeLog.addChanges(ADD_FILE, [])['OK']
+  assert not changeLog.addChanges('Rename', [('/vo/data/f1', 1, 10, '')])['OK']
+  assert changeLog.getLastChangeID()['Value'] == 3
+
+
+def test_getChanges():
+  changeLog = getChangeLog()
+  assert getChangeIDs(changeLog.getChanges(1)) == [2, 3]
+  assert getChangeIDs(changeLog.getChanges(0, operations=[ADD_REPLICA, REMOVE_REPLICA])) == [1, 2]
+  assert getChangeIDs(changeLog.getChanges(0, seNames='SE1')) == [1]
+  assert getChangeIDs(changeLog.getChanges(0, path='/')) == [1, 2, 3]
+  # The wildcards of LIKE in the path are taken literally
+  assert getChangeIDs(changeLog.getChanges(0, path='/vo/data_1/')) == [2]
+  assert getChangeIDs(changeLog.getChanges(0, path='/vo/data')) == [1, 3]
+  assert getChangeIDs(changeLog.getChanges(0, path='/vo/data/f1')) == [1, 3]
+  assert getChangeIDs(changeLog.getChanges(0, maxChanges=2)) == [1, 2]
+  assert getChangeIDs(changeLog.getChanges(0, maxChangeID=2)) == [1, 2]
+
+
+def test_settleTime():
+  changeLog = getChangeLog()
+  # The recent changes are held back
+  assert getChangeIDs(changeLog.getChanges(0, settleTime=CHANGE_SETTLE_TIME)) == []
+  assert changeLog.getLastChangeID(settleTime=CHANGE_SETTLE_TIME)['Value'] == 0
+  settle(changeLog)
+  assert changeLog.addChanges(ADD_FILE, [('/vo/data/f3', 3, 30, '')])['OK']
+  assert getChangeIDs(changeLog.getChanges(0, settleTime=CHANGE_SETTLE_TIME)) == [1, 2, 3]
+  assert changeLog.getLastChangeID(settleTime=CHANGE_SETTLE_TIME)['Value'] == 3
+  assert changeLog.getLastChangeID()['Value'] == 4
+
+
+def test_removeChanges():
+  changeLog = getChangeLog()
+  settle(changeLog, 2 * 86400)
+  assert changeLog.addChanges(ADD_FILE, [('/vo/data/f3', 3, 30, '')])['OK']
+  with patch('DIRAC.DataManagementSystem.DB.FileCatalogComponents.ChangeLog.REMOVE_CHUNK_SIZE', new=2):
+    # The changes not yet read are kept
+    res = changeLog.removeChanges(1, maxChangeID=2)
+    assert res['OK'], res
+    assert res['Value'] == 2
+    res = changeLog.removeChanges(1)
+  assert res['OK'], res
+  assert res['Value'] == 1
+  assert getChangeIDs(changeLog.getChanges(0)) == [4]
+  assert changeLog.getFirstChangeID()['Value'] == 4
+
+
+def getFileCatalogDB(admin=True):
+  """ FileCatalogDB with a change log, and components knowing the file /vo/data/f1 """
+  def mockInit(self):
+    self.log = MagicMock()
+    self._connected = True
+
+  with patch('DIRAC.DataManagementSystem.DB.FileCatalogDB.FileCatalogDB.__init__', new=mockInit):
+    fcDB = FileCatalogDB()
+  fcDB.securityManager = MagicMock()
+  fcDB.securityManager.hasAdminAccess.return_value = S_OK(admin)
+  fcDB.securityManager.hasAccess.side_effect = \
+      lambda operation, lfns, credDict: S_OK({'Successful': dict((lfn, True) for lfn in lfns), 'Failed': {}})
+  fcDB.fileManager = MagicMock()
+  fcDB.fileManager._findFiles.return_value = S_OK({'Successful': {'/vo/data/f1': {'FileID': 1, 'Size': 10}},
+                                                   'Failed': {}})
+  for method in ('addFile', 'removeFile', 'addReplica', 'removeReplica'):
+    getattr(fcDB.fileManager, method).return_value = S_OK({'Successful': {'/vo/data/f1': True}, 'Failed': {}})
+  fcDB.dtree = MagicMock()
+  fcDB.dtree.isDirectory.return_value = S_OK({'Successful': {'/vo/data/f1': False}, 'Failed': {}})
+  fcDB.fmeta = MagicMock()
+  fcDB.fmeta.setMetadata.return_value = S_OK()
+  fcDB.datasetManager = MagicMock()
+  fcDB.changeLog = MagicMock()
+  fcDB.changeLog.addChanges.return_value = S_OK()
+  return fcDB
+
+
+def test_recordChanges():
+  fcDB = getFileCatalogDB()
+  res = fcDB.addReplica({'/vo/data/f1': {'SE': 'SE1', 'PFN': 'pfn'}}, {})
+  assert res['OK'], res
+  fcDB.changeLog.addChanges.assert_called_with(ADD_REPLICA, [('/vo/data/f1', 1, 10, 'SE1')])
+
+  res = fcDB.addFile({'/vo/data/f1': {'SE': 'SE2', 'Size': 10}}, {})
+  assert res['OK'], res
+  fcDB.changeLog.addChanges.assert_called_with(ADD_FILE, [('/vo/data/f1', 1, 10, 'SE2')])
+
+  res = fcDB.setMetadata('/vo/data/f1', {'Run': 1}, {})
+  assert res['OK'], res
+  fcDB.changeLog.addChanges.assert_called_with(SET_METADATA, [('/vo/data/f1', 1, 10, '')])
+
+  # The removed files are looked up before their removal
+  fcDB.fileManager.removeFile.side_effect = \
+      lambda lfns: fcDB.fileManager._findFiles.assert_called_with(['/vo/data/f1'], ['FileID', 'Size']) or \
+      S_OK({'Successful': {'/vo/data/f1': True}, 'Failed': {}})
+  fcDB.fileManager._findFiles.reset_mock()
+  res = fcDB.removeFile(['/vo/data/f1'], {})
+  assert res['OK'], res
+  fcDB.changeLog.addChanges.assert_called_with(REMOVE_FILE, [('/vo/data/f1', 1, 10, '')])
+
+  # Without change log
+  fcDB.changeLog = None
+  fcDB.fileManager._findFiles.reset_mock()
+  assert fcDB.addReplica({'/vo/data/f1': {'SE': 'SE1', 'PFN': 'pfn'}}, {})['OK']
+  fcDB.fileManager._findFiles.assert_not_called()
+
+
+def test_getChangesSince():
+  fcDB = getFileCatalogDB()
+  fcDB.changeLog = getChangeLog()
+  fcDB.changeLog.addChanges(ADD_REPLICA, [('/vo/data/f3', 3, 30, 'SE1')])
+  settle(fcDB.changeLog)
+  res = fcDB.getChangesSince(0, {'Operation': ADD_REPLICA, 'SE': ['SE1']}, 0, {})
+  assert res['OK'], res
+  assert [change['ChangeID'] for change in res['Value']['Changes']] == [1, 4]
+  assert res['Value']['LastChangeID'] == 4
+  assert res['Value']['FirstChangeID'] == 1
+
+  # The changes not yet settled are not returned, nor scanned
+  fcDB.changeLog.addChanges(ADD_REPLICA, [('/vo/data/f5', 5, 50, 'SE1')])
+  res = fcDB.getChangesSince(1, {'Path': '/vo/data_1'}, 10, {})
+  assert res['OK'], res
+  assert [change['ChangeID'] for change in res['Value']['Changes']] == [2]
+  assert res['Value']['LastChangeID'] == 4
+  # The changes scanned are not scanned again, even if none is selected
+  res = fcDB.getChangesSince(4, {'SE': 'SE2'}, 10, {})
+  assert res['OK'], res
+  assert res['Value']['Changes'] == []
+  assert res['Value']['LastChangeID'] == 4
+  settle(fcDB.changeLog)
+  res = fcDB.getChangesSince(4, {'SE': 'SE2'}, 10, {})
+  assert res['Value']['LastChangeID'] == 5
+
+  # The next call starts after the last change returned
+  res = fcDB.getChangesSince(0, {}, 2, {})
+  assert res['OK'], res
+  assert [change['ChangeID'] for change in res['Value']['Changes']] == [1, 2]
+  assert res['Value']['LastChangeID'] == 2
+  res = fcDB.getChangesSince(0, {}, 0, {})
+  assert len(res['Value']['Changes']) == 5 <= MAX_CHANGES
+
+  res = getFileCatalogDB(admin=False).getChangesSince(0, {}, 10, {})
+  assert not res['OK']
+  assert res['Errno'] == errno.EACCES
+
+
+def test_cleanChangeLog():
+  fcDB = getFileCatalogDB()
+  fcDB.datasetManager.refreshDatasetSnapshots.return_value = S_OK()
+  fcDB.datasetManager.getSnapshotsLastChangeID.return_value = S_OK(42)
+  fcDB.changeLog.removeChanges.return_value = S_OK(10)
+  res = fcDB.cleanChangeLog(30, {})
+  assert res['OK'], res
+  assert res['Value'] == 10
+  # The changes not yet applied to the dataset snapshots are kept
+  fcDB.changeLog.removeChanges.assert_called_once_with(30, maxChangeID=42)
+
+  fcDB.changeLog = None
+  assert not fcDB.cleanChangeLog(30, {})['OK']
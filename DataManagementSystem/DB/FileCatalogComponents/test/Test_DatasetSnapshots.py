@@ -0,0 +1,288 @@
+""" Test of the materialised snapshots of the dynamic datasets
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# pylint: disable=protected-access
+
+import pytest
+from mock import MagicMock, patch
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DatasetManager.DatasetManager import DatasetManager, \
+    packFileIDs, unpackFileIDs, MAX_REFRESH_ATTEMPTS
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.ChangeLog import ChangeLog, ADD_FILE, REMOVE_FILE, \
+    ADD_REPLICA, SET_METADATA, CHANGE_SETTLE_TIME
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.test.SQLiteDB import SQLiteDB
+
+META_QUERY = {'Path': '/vo/data', 'Run': 10}
+OWNER_CREDENTIALS = {'username': 'user', 'group': 'group'}
+
+
+@pytest.mark.parametrize('fileIDs', [[], [1], [3, 1, 2], list(range(5, 100000, 3)), [2 ** 31 - 1, 7]])
+def test_packFileIDs(fileIDs):
+  assert unpackFileIDs(packFileIDs(fileIDs)) == sorted(fileIDs)
+
+
+def test_packFileIDsCompact():
+  fileIDs = list(range(1000000, 1100000))
+  assert len(packFileIDs(fileIDs)) < len(fileIDs) // 100
+
+
+class Catalog(object):
+  """ Files of the catalog with their Run metadata, whose changes are recorded in the change log,
+      and the FileCatalogDB components used by the snapshots
+  """
+
+  def __init__(self):
+    self.db = SQLiteDB()
+    self.db.changeLog = ChangeLog(self.db)
+    # fileID: ( LFN, size, run )
+    self.files = {}
+    self.db.fmeta = MagicMock()
+    self.db.fmeta.findFilesByMetadata.side_effect = self.findFilesByMetadata
+    self.db.dtree = MagicMock()
+    self.db.dtree.findDir.return_value = S_OK(1)
+    self.db.fileManager = MagicMock()
+    self.db.fileManager.getFileSize.side_effect = self.getFileSize
+    self.db.fileManager._getFileLFNs.side_effect = \
+        lambda fileIDs: S_OK({'Successful': dict((fileID, self.files[fileID][0]) for fileID in fileIDs),
+                              'Failed': {}})
+    self.db.ugManager = MagicMock()
+    self.db.ugManager.getUserName.return_value = S_OK('user')
+    self.db.ugManager.getGroupName.return_value = S_OK('group')
+
+  def addFile(self, fileID, lfn, run, size=10):
+    self.files[fileID] = (lfn, size, run)
+    self.db.changeLog.addChanges(ADD_FILE, [(lfn, fileID, size, '')])
+    # Not read by the snapshots
+    self.db.changeLog.addChanges(ADD_REPLICA, [(lfn, fileID, size, 'SE1')])
+
+  def removeFile(self, fileID):
+    lfn, size, _run = self.files.pop(fileID)
+    self.db.changeLog.addChanges(REMOVE_FILE, [(lfn, fileID, size, '')])
+
+  def setRun(self, fileID, run):
+    lfn, size, _run = self.files[fileID]
+    self.files[fileID] = (lfn, size, run)
+    self.db.changeLog.addChanges(SET_METADATA, [(lfn, fileID, size, '')])
+
+  def settle(self):
+    """ Let the time pass until the recorded changes are settled """
+    self.db.timeShift += CHANGE_SETTLE_TIME + 1
+
+  def findFilesByMetadata(self, metaQuery, path, credDict):
+    assert credDict == OWNER_CREDENTIALS
+    return S_OK(dict((fileID, lfn) for fileID, (lfn, _size, run) in self.files.items()
+                     if lfn.startswith(path.rstrip('/') + '/') and run == metaQuery['Run']))
+
+  def getFileSize(self, lfns):
+    result = S_OK({})
+    result['TotalSize'] = sum(size for lfn, size, _run in self.files.values() if lfn in lfns)
+    return result
+
+  def getDatasetFileIDs(self, metaQuery=None):
+    """ Files of the dataset, from the evaluation of its whole metaquery """
+    metaQuery = dict(metaQuery or META_QUERY)
+    return sorted(self.findFilesByMetadata(metaQuery, metaQuery.pop('Path'), OWNER_CREDENTIALS)['Value'])
+
+  def addDataset(self, datasetName, metaQuery=None):
+    """ Add a dataset, without snapshot """
+    req = "INSERT INTO FC_MetaDatasets (DatasetName, MetaQuery, TotalSize, NumberOfFiles, UID, GID, Status,"
+    req += " DatasetHash) VALUES (%s, %s, 0, 0, 1, 1, 1, '')"
+    return self.db._update(req, args=(datasetName, str(metaQuery or META_QUERY)))['lastRowId']
+
+  def getSnapshot(self, datasetID):
+    """ File IDs, number of files, total size and last change ID of the stored snapshot """
+    result = self.db._query("SELECT FileIDs, NumberOfFiles, TotalSize, LastChangeID FROM FC_DatasetSnapshots"
+                            " WHERE DatasetID=%d" % datasetID)
+    packedFileIDs, numberOfFiles, totalSize, lastChangeID = result['Value'][0]
+    return unpackFileIDs(packedFileIDs), numberOfFiles, totalSize, lastChangeID
+
+
+@pytest.fixture
+def catalog():
+  """ Catalog with the files 1 to 3 in the dataset ds, and the file 4 out of it """
+  catalog = Catalog()
+  catalog.addFile(1, '/vo/data/run10/f1', 10)
+  catalog.addFile(2, '/vo/data/run10/f2', 10)
+  catalog.addFile(3, '/vo/data/run10_bis/f3', 10)
+  catalog.addFile(4, '/vo/data/run20/f4', 20)
+  catalog.settle()
+  catalog.datasetManager = DatasetManager(catalog.db)
+  catalog.datasetManager.setSnapshots(True)
+  catalog.datasetID = catalog.addDataset('ds')
+  return catalog
+
+
+def test_checkDataset(catalog):
+  datasetManager = catalog.datasetManager
+  # The snapshot is created from the whole metaquery
+  res = datasetManager.checkDataset({'ds': True}, {})
+  assert res['OK'], res
+  assert res['Value']['Successful']['ds']['NumberOfFiles'] == (0, 3)
+  assert catalog.getSnapshot(catalog.datasetID)[:3] == ([1, 2, 3], 3, 30)
+
+  catalog.addFile(5, '/vo/data/run10/f5', 10, size=5)
+  catalog.removeFile(2)
+  catalog.setRun(1, 20)
+  catalog.setRun(4, 10)
+  catalog.addFile(6, '/vo/mc/run10/f6', 10)
+  catalog.settle()
+  catalog.db.fmeta.findFilesByMetadata.reset_mock()
+  res = datasetManager.checkDataset({'ds': True}, {})
+  assert res['OK'], res
+  changeDict = res['Value']['Successful']['ds']
+  assert changeDict['NumberOfFiles'] == (0, 3)
+  assert changeDict['TotalSize'] == (0, 25)
+  fileIDs, numberOfFiles, totalSize, lastChangeID = catalog.getSnapshot(catalog.datasetID)
+  assert fileIDs == catalog.getDatasetFileIDs() == [3, 4, 5]
+  assert (numberOfFiles, totalSize) == (3, 25)
+  # Up to the addition of the file 6, before its replica
+  assert lastChangeID == catalog.db.changeLog.getLastChangeID()['Value'] - 1
+  # Only the directories of the changed files in the dataset are queried
+  assert sorted(call[0][1] for call in catalog.db.fmeta.findFilesByMetadata.call_args_list) == \
+      ['/vo/data/run10', '/vo/data/run20']
+
+  # The files are read from the snapshot
+  res = datasetManager.getDatasetFiles({'ds': True}, {})
+  assert res['OK'], res
+  assert sorted(res['Value']['Successful']['ds']) == \
+      ['/vo/data/run10/f5', '/vo/data/run10_bis/f3', '/vo/data/run20/f4']
+
+
+def test_checkDatasetDirectoryMetadata(catalog):
+  datasetManager = catalog.datasetManager
+  assert datasetManager.checkDataset({'ds': True}, {})['OK']
+  catalog.files[4] = ('/vo/data/run20/f4', 10, 10)
+  catalog.db.changeLog.addChanges(SET_METADATA, [('/vo/data/run20', 0, 0, '')])
+  catalog.settle()
+  catalog.db.fmeta.findFilesByMetadata.reset_mock()
+  res = datasetManager.checkDataset({'ds': True}, {})
+  assert res['OK'], res
+  assert catalog.getSnapshot(catalog.datasetID)[:3] == ([1, 2, 3, 4], 4, 40)
+  # The whole metaquery is evaluated
+  catalog.db.fmeta.findFilesByMetadata.assert_called_once_with({'Run': 10}, '/vo/data', OWNER_CREDENTIALS)
+
+
+def test_checkDatasetNoChange(catalog):
+  datasetManager = catalog.datasetManager
+  assert datasetManager.checkDataset({'ds': True}, {})['OK']
+  catalog.db.fmeta.findFilesByMetadata.reset_mock()
+  catalog.addFile(5, '/vo/mc/f5', 10)
+  catalog.settle()
+  res = datasetManager.checkDataset({'ds': True}, {})
+  assert res['OK'], res
+  catalog.db.fmeta.findFilesByMetadata.assert_not_called()
+  fileIDs, numberOfFiles, totalSize, lastChangeID = catalog.getSnapshot(catalog.datasetID)
+  assert (fileIDs, numberOfFiles, totalSize) == ([1, 2, 3], 3, 30)
+  assert lastChangeID == catalog.db.changeLog.getLastChangeID()['Value'] - 1
+
+
+def test_unsettledChanges(catalog):
+  """ The changes are applied once settled, after those with a lower ID committed after them """
+  datasetManager = catalog.datasetManager
+  assert datasetManager.checkDataset({'ds': True}, {})['OK']
+  lastChangeID = catalog.getSnapshot(catalog.datasetID)[3]
+  catalog.files[6] = ('/vo/data/run10/f6', 10, 10)
+  catalog.db._update("INSERT INTO FC_ChangeLog (ChangeID, ChangeTime, Operation, Path, FileID, Size)"
+                     " VALUES (%s, UTC_TIMESTAMP(), %s, '/vo/data/run10/f6', 6, 10)", args=(lastChangeID + 2, ADD_FILE))
+  assert datasetManager.checkDataset({'ds': True}, {})['OK']
+  assert catalog.getSnapshot(catalog.datasetID) == ([1, 2, 3], 3, 30, lastChangeID)
+
+  # Committed after the change with the next ID
+  catalog.files[5] = ('/vo/data/run10/f5', 10, 10)
+  catalog.db._update("INSERT INTO FC_ChangeLog (ChangeID, ChangeTime, Operation, Path, FileID, Size)"
+                     " VALUES (%s, UTC_TIMESTAMP(), %s, '/vo/data/run10/f5', 5, 10)", args=(lastChangeID + 1, ADD_FILE))
+  catalog.settle()
+  assert datasetManager.checkDataset({'ds': True}, {})['OK']
+  assert catalog.getSnapshot(catalog.datasetID) == ([1, 2, 3, 5, 6], 5, 50, lastChangeID + 2)
+
+
+def test_refreshConcurrent(catalog):
+  """ The changes are applied once when the snapshot is refreshed by another service in the meantime """
+  datasetManager = catalog.datasetManager
+  assert datasetManager.checkDataset({'ds': True}, {})['OK']
+  catalog.addFile(5, '/vo/data/run10/f5', 10)
+  catalog.settle()
+  otherManager = DatasetManager(catalog.db)
+  otherManager.setSnapshots(True)
+
+  def concurrentRefresh(metaQuery, path, credDict):
+    catalog.db.fmeta.findFilesByMetadata.side_effect = catalog.findFilesByMetadata
+    # Refresh by another service while the changes are applied
+    assert otherManager.checkDataset({'ds': True}, {})['OK']
+    return catalog.findFilesByMetadata(metaQuery, path, credDict)
+
+  catalog.db.fmeta.findFilesByMetadata.side_effect = concurrentRefresh
+  res = datasetManager.checkDataset({'ds': True}, {})
+  assert res['OK'], res
+  assert catalog.getSnapshot(catalog.datasetID)[:3] == ([1, 2, 3, 5], 4, 40)
+
+
+def test_refreshAlwaysConcurrent(catalog):
+  """ The attempts to refresh a snapshot always refreshed concurrently are bounded """
+  datasetManager = catalog.datasetManager
+  assert datasetManager.checkDataset({'ds': True}, {})['OK']
+  catalog.addFile(5, '/vo/data/run10/f5', 10)
+  catalog.settle()
+
+  def concurrentStore(metaQuery, path, credDict):
+    # Another service stores the snapshot at each attempt
+    catalog.db._update("UPDATE FC_DatasetSnapshots SET LastChangeID=LastChangeID-1")
+    return catalog.findFilesByMetadata(metaQuery, path, credDict)
+
+  catalog.db.fmeta.findFilesByMetadata.side_effect = concurrentStore
+  res = datasetManager.checkDataset({'ds': True}, {})
+  assert res['OK'], res
+  assert 'concurrently' in res['Value']['Failed']['ds']
+  assert len([req for req in catalog.db.statements if 'UPDATE FC_DatasetSnapshots SET FileIDs' in req]) == \
+      MAX_REFRESH_ATTEMPTS
+
+
+@pytest.mark.parametrize('batchSize', [2, 1000])
+def test_refreshDatasetSnapshots(catalog, batchSize):
+  datasetManager = catalog.datasetManager
+  assert datasetManager.checkDataset({'ds': True}, {})['OK']
+  mcID = catalog.addDataset('mc', {'Path': '/vo/mc', 'Run': 10})
+  brokenID = catalog.addDataset('broken', {'Path': '/vo/broken', 'Run': 10})
+  assert datasetManager.checkDataset({'mc': True, 'broken': True}, {})['OK']
+  # The metaquery of the broken dataset fails from now on
+  catalog.db.fmeta.findFilesByMetadata.side_effect = \
+      lambda metaQuery, path, credDict: S_ERROR('Broken') if path.startswith('/vo/broken') else \
+      catalog.findFilesByMetadata(metaQuery, path, credDict)
+
+  for fileID in range(5, 12):
+    catalog.addFile(fileID, '/vo/%s/run10/f%d' % ('data' if fileID % 2 else 'mc', fileID), 10)
+  catalog.removeFile(1)
+  catalog.addFile(12, '/vo/broken/f12', 10)
+  catalog.settle()
+
+  with patch('DIRAC.DataManagementSystem.DB.FileCatalogComponents.DatasetManager.DatasetManager.CHANGES_BATCH_SIZE',
+             new=batchSize):
+    res = datasetManager.refreshDatasetSnapshots()
+  assert not res['OK']
+  assert catalog.getSnapshot(catalog.datasetID)[0] == catalog.getDatasetFileIDs() == [2, 3, 5, 7, 9, 11]
+  mcSnapshot = catalog.getSnapshot(mcID)
+  assert mcSnapshot[0] == catalog.getDatasetFileIDs({'Path': '/vo/mc', 'Run': 10}) == [6, 8, 10]
+  lastChangeID = catalog.db.changeLog.getLastChangeID()['Value']
+  assert mcSnapshot[3] <= lastChangeID
+  # The changes not applied to the broken dataset are kept
+  assert datasetManager.getSnapshotsLastChangeID()['Value'] == catalog.getSnapshot(brokenID)[3] < lastChangeID
+  # Only the changes of the files and of the metadata are read
+  assert all(ADD_REPLICA not in req for req in catalog.db.statements if 'FROM FC_ChangeLog' in req)
+
+
+def test_getSnapshotsLastChangeID(catalog):
+  datasetManager = catalog.datasetManager
+  res = datasetManager.getSnapshotsLastChangeID()
+  assert res['OK'], res
+  assert res['Value'] is None
+  assert datasetManager.checkDataset({'ds': True}, {})['OK']
+  assert datasetManager.getSnapshotsLastChangeID()['Value'] == catalog.db.changeLog.getLastChangeID()['Value']
+
+  datasetManager.setSnapshots(False)
+  res = datasetManager.getSnapshotsLastChangeID()
+  assert res['OK'], res
+  assert res['Value'] is None
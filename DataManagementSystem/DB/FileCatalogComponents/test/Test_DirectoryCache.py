@@ -0,0 +1,163 @@
+""" Test of the cache of the directory paths and IDs, and of its use by the DirectoryManager
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# pylint: disable=protected-access
+
+import time
+
+from mock import MagicMock
+
+from DIRAC import S_OK
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryManager.DirectoryCache import DirectoryCache
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryManager.DirectoryLevelTree import DirectoryLevelTree
+
+
+def test_pathAndID():
+  cache = DirectoryCache(10, 60)
+  assert cache.getID('/vo/data') is None
+  cache.add('/vo/data', 3, level=2)
+  assert cache.getID('/vo/data') == (3, 2)
+  assert cache.getPath(3) == '/vo/data'
+  assert cache.getPath(4) is None
+  stats = cache.getStatistics()
+  assert stats['Hits'] == 2
+  assert stats['Misses'] == 2
+  assert stats['HitRate'] == 50.
+  assert stats['Size'] == 1
+
+
+def test_pathIDs():
+  cache = DirectoryCache(10, 60)
+  cache.add('/vo/data', pathIDs=[1, 2, 3])
+  assert cache.getPathIDs('/vo/data') == [1, 2, 3]
+  # The ID is not known from the parent chain
+  assert cache.getID('/vo/data') is None
+  cache.add('/vo/data', 3)
+  assert cache.getID('/vo/data') == (3, None)
+  assert cache.getPathIDs('/vo/data') == [1, 2, 3]
+
+  # A new directory with the same path
+  cache.add('/vo/data', 5)
+  assert cache.getPathIDs('/vo/data') is None
+  assert cache.getPath(3) is None
+  assert cache.getPath(5) == '/vo/data'
+
+
+def test_invalidate():
+  cache = DirectoryCache(10, 60)
+  cache.add('/vo', 2)
+  cache.add('/vo/data', 3)
+  cache.invalidate(path='/vo/data')
+  cache.invalidate(dirID=2)
+  cache.invalidate(path='/vo/other')
+  assert cache.getID('/vo/data') is None
+  assert cache.getID('/vo') is None
+  assert cache.getPath(2) is None
+  assert cache.getStatistics()['Invalidations'] == 2
+
+
+def test_lifetime():
+  cache = DirectoryCache(10, 0)
+  cache.add('/vo', 2)
+  time.sleep(0.01)
+  assert cache.getID('/vo') is None
+  assert cache.getPath(2) is None
+  assert cache.getStatistics()['Size'] == 0
+
+
+def test_eviction():
+  cache = DirectoryCache(2, 60)
+  cache.add('/a', 1)
+  cache.add('/b', 2)
+  # /a is the most recently used
+  assert cache.getID('/a') == (1, None)
+  cache.add('/c', 3)
+  assert cache.getID('/b') is None
+  assert cache.getPath(2) is None
+  assert cache.getID('/a') == (1, None)
+  assert cache.getID('/c') == (3, None)
+  assert cache.getStatistics()['Size'] == 2
+
+
+def getLevelTree():
+  """ DirectoryLevelTree with a cache, and a database knowing /vo and /vo/data """
+  dbMock = MagicMock()
+  dbMock._escapeString.side_effect = lambda value: S_OK("'%s'" % value)
+  directories = {"'/vo'": (2, 1), "'/vo/data'": (3, 2)}
+
+  def query(req, connection=False):
+    if 'WHERE DirName=' in req:
+      dirName = req.split('WHERE DirName=')[1]
+      return S_OK([directories[dirName]] if dirName in directories else [])
+    if 'WHERE DirName in' in req:
+      return S_OK([(dirName.strip("'"), directories[dirName][0]) for dirName in directories if dirName in req])
+    if 'SELECT DirName FROM' in req:
+      dirID = int(req.split('DirID=')[1])
+      return S_OK([(dirName.strip("'"),) for dirName in directories if directories[dirName][0] == dirID])
+    return S_OK([])
+
+  dbMock._query.side_effect = query
+  dbMock._update.return_value = S_OK()
+  dlt = DirectoryLevelTree(dbMock)
+  dlt.setCache(DirectoryCache(100, 60))
+  return dlt, dbMock
+
+
+def test_LevelTree_findDir():
+  dlt, dbMock = getLevelTree()
+  for _ in range(3):
+    res = dlt.findDir('/vo/data/')
+    assert res['OK'], res
+    assert res['Value'] == 3
+    assert res['Level'] == 2
+  assert dbMock._query.call_count == 1
+
+  # The directories not found are not cached
+  assert dlt.findDir('/vo/mc')['Value'] == ''
+  assert dlt.findDir('/vo/mc')['Value'] == ''
+  assert dbMock._query.call_count == 3
+
+  # The path of a cached directory
+  res = dlt.getDirectoryPath(3)
+  assert res['OK'], res
+  assert res['Value'] == '/vo/data'
+  assert dbMock._query.call_count == 3
+
+  stats = dlt.getCacheStatistics()
+  assert stats['OK'], stats
+  assert stats['Value']['Hits'] == 3
+
+
+def test_LevelTree_findDirs():
+  dlt, dbMock = getLevelTree()
+  assert dlt.findDir('/vo')['Value'] == 2
+  res = dlt.findDirs(['/vo', '/vo/data', '/vo/mc'])
+  assert res['OK'], res
+  assert res['Value'] == {'/vo': 2, '/vo/data': 3}
+  # Only the directories not cached are queried
+  assert "'/vo'" not in dbMock._query.call_args[0][0]
+  res = dlt.findDirs(['/vo', '/vo/data'])
+  assert res['Value'] == {'/vo': 2, '/vo/data': 3}
+  assert dbMock._query.call_count == 2
+
+
+def test_LevelTree_removeDir():
+  dlt, dbMock = getLevelTree()
+  assert dlt.findDir('/vo/data')['Value'] == 3
+  res = dlt.removeDir('/vo/data')
+  assert res['OK'], res
+  assert dlt.cache.getID('/vo/data') is None
+  assert dlt.cache.getPath(3) is None
+  assert dlt.getCacheStatistics()['Value']['Invalidations'] == 1
+
+
+def test_noCache():
+  dlt, dbMock = getLevelTree()
+  dlt.setCache(None)
+  assert dlt.findDir('/vo/data')['Value'] == 3
+  assert dlt.findDir('/vo/data')['Value'] == 3
+  assert dbMock._query.call_count == 2
+  assert not dlt.getCacheStatistics()['OK']
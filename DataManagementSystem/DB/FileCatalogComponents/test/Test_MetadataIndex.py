@@ -0,0 +1,230 @@
+""" Test of the inverted index of the metadata, and of its use by the metadata searches
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# pylint: disable=protected-access
+
+import threading
+import time
+
+import pytest
+from mock import MagicMock, patch
+
+from DIRAC import S_OK
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.MetadataIndex import MetadataIndex
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryMetadata.DirectoryMetadata import DirectoryMetadata
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.FileMetadata.FileMetadata import FileMetadata
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.test.SQLiteDB import SQLiteDB
+
+FIELDS = {'Run': 'INT', 'Energy': 'FLOAT', 'Type': 'VARCHAR(128)', 'Date': 'DATETIME'}
+ROWS = {'Run': [(1, 10), (2, 20), (3, 20), (4, 30)],
+        'Energy': [(1, 1.5), (2, 2.5)],
+        'Type': [(1, 'MC'), (2, 'data'), (3, 'Data'), (4, None)],
+        'Date': [(1, '2020-01-01 00:00:00'), (2, '2021-06-01 00:00:00')]}
+
+
+def getDatabase():
+  """ Database with the directory and file metadata fields FIELDS, having the values ROWS, and the files
+      of ROWS in the directory 7
+  """
+  db = SQLiteDB()
+  for fieldsTable, table, idColumn in [('FC_MetaFields', 'FC_Meta_%s', 'DirID'),
+                                       ('FC_FileMetaFields', 'FC_FileMeta_%s', 'FileID')]:
+    db._update("CREATE TABLE %s (MetaName VARCHAR(64), MetaType VARCHAR(128))" % fieldsTable)
+    for metaName, metaType in FIELDS.items():
+      db._update("INSERT INTO %s VALUES (%%s, %%s)" % fieldsTable, args=(metaName, metaType))
+      db._update("CREATE TABLE %s (%s INTEGER PRIMARY KEY, Value %s)" % (table % metaName, idColumn, metaType))
+      db._updateMany("INSERT INTO %s VALUES (%%s, %%s)" % (table % metaName), ROWS[metaName])
+  db._update("CREATE TABLE FC_Files (FileID INTEGER PRIMARY KEY, DirID INT)")
+  db._updateMany("INSERT INTO FC_Files VALUES (%s, %s)", [(fileID, 7) for fileID in range(1, 5)])
+  del db.statements[:]
+  return db
+
+
+def getIndex(lifetime=300):
+  return MetadataIndex(getDatabase(), 'FC_Meta_%s', 'DirID', 'FC_MetaFields', lifetime)
+
+
+@pytest.mark.parametrize('metaName, value, expected', [
+    ('Run', 20, {2, 3}),
+    ('Run', '20', {2, 3}),
+    ('Run', [10, 30], {1, 4}),
+    ('Run', 'Any', {1, 2, 3, 4}),
+    ('Run', {'>': 10}, {2, 3, 4}),
+    ('Run', {'>=': 20, '<': 30}, {2, 3}),
+    ('Run', {'<=': 20}, {1, 2, 3}),
+    ('Run', {'nin': [10, 20]}, {4}),
+    ('Run', {'!=': 20}, {1, 4}),
+    ('Run', {'in': [20, 40]}, {2, 3}),
+    ('Run', 15, set()),
+    ('Energy', {'>': 2}, {2}),
+    ('Type', 'data', {2, 3}),
+    ('Type', 'Any', {1, 2, 3, 4}),
+    ('Type', {'nin': []}, {1, 2, 3}),
+    ('Date', {'>': '2020-06-01'}, {2}),
+])
+def test_find(metaName, value, expected):
+  res = getIndex().find(metaName, value)
+  assert res['OK'], res
+  assert res['Value'] == expected
+
+
+@pytest.mark.parametrize('metaName, value', [
+    ('Run', 'abc'),
+    ('Run', {'>': 1.5}),
+    ('Date', 'yesterday'),
+])
+def test_findNotSupported(metaName, value):
+  res = getIndex().find(metaName, value)
+  assert res['OK'], res
+  assert res['Value'] is None
+
+
+def test_findErrors():
+  index = getIndex()
+  assert not index.find('Run', {'>': [1, 2]})['OK']
+  assert not index.find('Unknown', 1)['OK']
+
+
+def test_update():
+  index = getIndex()
+  db = index.db
+  assert index.find('Run', 20)['Value'] == {2, 3}
+  # The index is updated like the tables
+  db._update("UPDATE FC_Meta_Run SET Value=30 WHERE DirID=3")
+  index.add('Run', 3, 30)
+  db._update("INSERT INTO FC_Meta_Run VALUES (5, 50)")
+  index.add('Run', 5, 50)
+  db._update("DELETE FROM FC_Meta_Run WHERE DirID=1")
+  index.remove('Run', [1])
+  assert index.find('Run', 20)['Value'] == {2}
+  assert index.find('Run', {'>=': 30})['Value'] == {3, 4, 5}
+  assert index.find('Run', 'Any')['Value'] == {2, 3, 4, 5}
+  # The field is only loaded once
+  assert len([req for req in db.statements if 'Value FROM FC_Meta_Run' in req]) == 1
+  stats = index.getStatistics()
+  assert stats['Fields'] == 1
+  assert stats['Values'] == 3
+  assert stats['IDs'] == 4
+
+  # A value not known by the index reloads the field
+  index.add('Run', 3, 'abc')
+  assert index.find('Run', {'>=': 30})['Value'] == {3, 4, 5}
+  assert len([req for req in db.statements if 'Value FROM FC_Meta_Run' in req]) == 2
+
+  index.clear('Run')
+  assert index.getStatistics()['Fields'] == 0
+
+
+def test_lifetime():
+  index = getIndex(lifetime=0)
+  assert index.find('Run', 20)['Value'] == {2, 3}
+  # Changed by another service
+  index.db._update("UPDATE FC_Meta_Run SET Value=20 WHERE DirID=4")
+  time.sleep(0.01)
+  assert index.find('Run', 20)['Value'] == {2, 3, 4}
+
+
+def test_valueNotSupported():
+  index = getIndex()
+  index.db._update("INSERT INTO FC_Meta_Run VALUES (5, 'abc')")
+  # The queries of the field are left to SQL
+  res = index.find('Run', 20)
+  assert res['OK'], res
+  assert res['Value'] is None
+  assert index.find('Energy', 1.5)['Value'] == {1}
+
+
+def test_loadWithoutLock():
+  """ The queries and the updates are not blocked while a field is loaded, and the updates made
+      during the load are not lost
+  """
+  index = getIndex()
+  db = index.db
+  assert index.find('Energy', 1.5)['Value'] == {1}
+
+  loading = threading.Event()
+  loaded = threading.Event()
+  query = db._query
+
+  def slowQuery(req, conn=None, debug=False):
+    result = query(req)
+    if 'FROM FC_Meta_Run' in req:
+      loading.set()
+      assert loaded.wait(10)
+    return result
+
+  results = {}
+  with patch.object(db, '_query', side_effect=slowQuery):
+    thread = threading.Thread(target=lambda: results.setdefault('Run', index.find('Run', 20)))
+    thread.start()
+    assert loading.wait(10)
+    # While Run is loaded
+    assert index.find('Energy', 1.5)['Value'] == {1}
+    db._update("UPDATE FC_Meta_Run SET Value=20 WHERE DirID=4")
+    index.add('Run', 4, 20)
+    loaded.set()
+    thread.join()
+  assert results['Run']['Value'] == {2, 3}
+  # The field loaded before the update is not kept
+  assert index.find('Run', 20)['Value'] == {2, 3, 4}
+
+
+def test_findDirIDsByMetadata():
+  db = getDatabase()
+  db.dtree = MagicMock()
+  db.dtree.getAllSubdirectoriesByID.side_effect = lambda dirList: S_OK([dirID * 10 for dirID in dirList])
+  dmeta = DirectoryMetadata(db)
+  dmeta.setMetadataIndex(MetadataIndex(db, 'FC_Meta_%s', 'DirID', 'FC_MetaFields', 300))
+
+  res = dmeta.findDirIDsByMetadata({'Run': {'>': 10}, 'Type': 'Data'}, '/', {})
+  assert res['OK'], res
+  assert res['Value'] == [2, 3, 20, 30]
+  assert res['Selection'] == 'Done'
+  # Only the metadata fields and their values are queried
+  assert all('FC_Meta_' not in req or ', Value FROM' in req for req in db.statements)
+
+  res = dmeta.findDirIDsByMetadata({'Run': 15}, '/', {})
+  assert res['OK'], res
+  assert res['Value'] == []
+  assert res['Selection'] == 'None'
+
+  # A field with a value not supported by the index is searched with SQL
+  db._update("INSERT INTO FC_Meta_Run VALUES (5, 'abc')")
+  dmeta.index.clear()
+  res = dmeta.findDirIDsByMetadata({'Run': 20}, '/', {})
+  assert res['OK'], res
+  assert res['Value'] == [2, 3, 20, 30]
+
+
+def test_findFilesByMetadata():
+  db = getDatabase()
+  fmeta = FileMetadata(db)
+  fmeta.setMetadataIndex(MetadataIndex(db, 'FC_FileMeta_%s', 'FileID', 'FC_FileMetaFields', 300))
+
+  res = fmeta._FileMetadata__findFilesByMetadata({'Run': 20, 'Type': 'Any'}, [7], {})
+  assert res['OK'], res
+  assert sorted(res['Value']) == [2, 3]
+  # The files found with the index are selected by their ID in the directories
+  assert 'FC_FileMeta_' not in db.statements[-1]
+  assert not fmeta._FileMetadata__findFilesByMetadata({'Run': 20}, [8], {})['Value']
+
+  # The wildcards are left to the SQL query
+  res = fmeta._FileMetadata__findFilesByMetadata({'Run': {'>': 10}, 'Type': 'M*'}, [], {})
+  assert res['OK'], res
+  assert res['Value'] == []
+  res = fmeta._FileMetadata__findFilesByMetadata({'Run': {'<': 30}, 'Type': 'D*'}, [], {})
+  assert res['OK'], res
+  assert sorted(res['Value']) == [2, 3]
+  assert 'FC_FileMeta_Type' in db.statements[-1]
+
+  # A field with a value not supported by the index is searched with SQL
+  db._update("INSERT INTO FC_FileMeta_Run VALUES (5, 'abc')")
+  db._update("INSERT INTO FC_Files VALUES (5, 7)")
+  fmeta.index.clear()
+  res = fmeta._FileMetadata__findFilesByMetadata({'Run': 20, 'Type': 'Any'}, [7], {})
+  assert res['OK'], res
+  assert sorted(res['Value']) == [2, 3]
+  assert 'FC_FileMeta_Run' in db.statements[-1]
@@ -7,10 +7,16 @@ __RCSID__ = "$Id$"
 
 import errno
 
+import six
+
 from DIRAC import gLogger, S_OK, S_ERROR
 from DIRAC.Core.Base.DB import DB
 from DIRAC.Resources.Catalog.Utilities import checkArgumentFormat
 from DIRAC.Core.Utilities.ObjectLoader import ObjectLoader
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryManager.DirectoryCache import DirectoryCache
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.MetadataIndex import MetadataIndex
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.ChangeLog import ChangeLog, CHANGE_SETTLE_TIME, MAX_CHANGES, \
+    ADD_FILE, REMOVE_FILE, ADD_REPLICA, REMOVE_REPLICA, SET_METADATA, REMOVE_METADATA
 
 #############################################################################
 
@@ -37,6 +43,7 @@ class FileCatalogDB(DB):
     self.dmeta = None
     self.fmeta = None
     self.datasetManager = None
+    self.changeLog = None
     self.objectLoader = None
 
   def setConfig(self, databaseConfig):
@@ -81,6 +88,25 @@ class FileCatalogDB(DB):
         return result
       self.__setattr__(compAttribute, result['Value'])
 
+    # Cache of the directory paths and IDs, shared by the components through the DirectoryManager
+    directoryCacheSize = databaseConfig.get('DirectoryCacheSize', 0)
+    if directoryCacheSize:
+      self.dtree.setCache(DirectoryCache(directoryCacheSize, databaseConfig.get('DirectoryCacheLifetime', 60)))
+
+    # Inverted index of the directory and file metadata, for the metadata searches
+    if databaseConfig.get('MetadataIndex', False):
+      lifetime = databaseConfig.get('MetadataIndexLifetime', 300)
+      self.dmeta.setMetadataIndex(MetadataIndex(self, 'FC_Meta_%s', 'DirID', 'FC_MetaFields', lifetime))
+      self.fmeta.setMetadataIndex(MetadataIndex(self, 'FC_FileMeta_%s', 'FileID', 'FC_FileMetaFields', lifetime))
+
+    # Materialised snapshots of the dynamic datasets, refreshed from the changes of the files
+    self.datasetManager.setSnapshots(databaseConfig.get('DatasetSnapshots', False))
+
+    # Change feed of the catalog, also needed by the snapshots of the datasets
+    self.changeLog = None
+    if databaseConfig.get('ChangeLog', False) or databaseConfig.get('DatasetSnapshots', False):
+      self.changeLog = ChangeLog(self)
+
     return S_OK()
 
   def __loadCatalogComponent(self, componentType, componentName):
@@ -428,11 +454,14 @@ class FileCatalogDB(DB):
     if not res['Value']['Successful']:
       return S_OK({'Successful': {}, 'Failed': failed})
 
-    res = self.fileManager.addFile(res['Value']['Successful'], credDict)
+    fileDict = res['Value']['Successful']
+    res = self.fileManager.addFile(fileDict, credDict)
     if not res['OK']:
       return res
     failed.update(res['Value']['Failed'])
     successful = res['Value']['Successful']
+    if self.changeLog and successful:
+      self.__recordChanges(ADD_FILE, self.__getFileChanges(list(successful), fileDict))
     return S_OK({'Successful': successful, 'Failed': failed})
 
   def setFileStatus(self, lfns, credDict):
@@ -480,11 +509,18 @@ class FileCatalogDB(DB):
     if not res['Value']['Successful']:
       return S_OK({'Successful': {}, 'Failed': failed})
 
+    changes = []
+    if self.changeLog:
+      # The files are looked up before they are removed
+      changes = self.__getFileChanges(list(res['Value']['Successful']))
+
     res = self.fileManager.removeFile(res['Value']['Successful'])
     if not res['OK']:
       return res
     failed.update(res['Value']['Failed'])
     successful = res['Value']['Successful']
+    if self.changeLog:
+      self.__recordChanges(REMOVE_FILE, [change for change in changes if change[0] in successful])
     return S_OK({'Successful': successful, 'Failed': failed})
 
   def addReplica(self, lfns, credDict):
@@ -507,11 +543,14 @@ class FileCatalogDB(DB):
     if not res['Value']['Successful']:
       return S_OK({'Successful': {}, 'Failed': failed})
 
-    res = self.fileManager.addReplica(res['Value']['Successful'])
+    replicaDict = res['Value']['Successful']
+    res = self.fileManager.addReplica(replicaDict)
     if not res['OK']:
       return res
     failed.update(res['Value']['Failed'])
     successful = res['Value']['Successful']
+    if self.changeLog and successful:
+      self.__recordChanges(ADD_REPLICA, self.__getFileChanges(list(successful), replicaDict))
     return S_OK({'Successful': successful, 'Failed': failed})
 
   def removeReplica(self, lfns, credDict):
@@ -534,11 +573,14 @@ class FileCatalogDB(DB):
     if not res['Value']['Successful']:
       return S_OK({'Successful': {}, 'Failed': failed})
 
-    res = self.fileManager.removeReplica(res['Value']['Successful'])
+    replicaDict = res['Value']['Successful']
+    res = self.fileManager.removeReplica(replicaDict)
     if not res['OK']:
       return res
     failed.update(res['Value']['Failed'])
     successful = res['Value']['Successful']
+    if self.changeLog and successful:
+      self.__recordChanges(REMOVE_REPLICA, self.__getFileChanges(list(successful), replicaDict))
     return S_OK({'Successful': successful, 'Failed': failed})
 
   def setReplicaStatus(self, lfns, credDict):
@@ -1067,10 +1109,15 @@ class FileCatalogDB(DB):
       return S_ERROR('Failed to determine the path type')
     if result['Value']['Successful'][path]:
       # This is a directory
-      return self.dmeta.setMetadata(path, metadataDict, credDict)
+      result = self.dmeta.setMetadata(path, metadataDict, credDict)
+      if result['OK'] and self.changeLog:
+        self.__recordChanges(SET_METADATA, [(path, 0, 0, '')])
     else:
       # This is a file
-      return self.fmeta.setMetadata(path, metadataDict, credDict)
+      result = self.fmeta.setMetadata(path, metadataDict, credDict)
+      if result['OK'] and self.changeLog:
+        self.__recordChanges(SET_METADATA, self.__getFileChanges([path]))
+    return result
 
   def setMetadataBulk(self, pathMetadataDict, credDict):
     """  Add metadata for the given paths
@@ -1118,10 +1165,40 @@ class FileCatalogDB(DB):
       return S_ERROR('Failed to determine the path type')
     if result['Value']['Successful'][path]:
       # This is a directory
-      return self.dmeta.removeMetadata(path, metadata, credDict)
+      result = self.dmeta.removeMetadata(path, metadata, credDict)
+      if result['OK'] and self.changeLog:
+        self.__recordChanges(REMOVE_METADATA, [(path, 0, 0, '')])
     else:
       # This is a file
-      return self.fmeta.removeMetadata(path, metadata, credDict)
+      result = self.fmeta.removeMetadata(path, metadata, credDict)
+      if result['OK'] and self.changeLog:
+        self.__recordChanges(REMOVE_METADATA, self.__getFileChanges([path]))
+    return result
+
+  def __getFileChanges(self, lfns, lfnDict=None):
+    """ Get the changes of files for the change log
+
+        :param list lfns: LFNs of the changed files
+        :param dict lfnDict: arguments of the operation, indexed on the LFNs, with the 'SE' of the changed replicas
+        :return: list of tuples ( LFN, file ID, size, SE name )
+    """
+    result = self.fileManager._findFiles(lfns, ['FileID', 'Size'])
+    if not result['OK']:
+      gLogger.error("Failed to find the changed files of the change log", result['Message'])
+      return []
+    lfnDict = lfnDict or {}
+    return [(lfn, fileDict['FileID'], fileDict['Size'], lfnDict.get(lfn, {}).get('SE', ''))
+            for lfn, fileDict in result['Value']['Successful'].items()]
+
+  def __recordChanges(self, operation, changes):
+    """ Record changes in the change log: a failure does not fail the operation, which is already done
+
+        :param str operation: operation of the changes
+        :param list changes: tuples ( path, file ID, size, SE name )
+    """
+    result = self.changeLog.addChanges(operation, changes)
+    if not result['OK']:
+      gLogger.error("Failed to record the changes in the change log", "%s: %s" % (operation, result['Message']))
 
   #######################################################################
   #
@@ -1153,6 +1230,90 @@ class FileCatalogDB(DB):
     counterDict.update(res['Value'])
     return S_OK(counterDict)
 
+  def getDirectoryCacheStatistics(self, credDict):
+    """ Get the statistics of the cache of the directory paths and IDs
+
+        :param dict credDict: credentials of the caller, who must be an administrator
+        :return: S_OK( dict ) with the 'Hits', 'Misses', 'HitRate', 'Invalidations', 'Size' and 'MaxSize'
+    """
+    res = self._checkAdminPermission(credDict)
+    if not res['OK']:
+      return res
+    if not res['Value']:
+      return S_ERROR(errno.EACCES, "Permission denied")
+    return self.dtree.getCacheStatistics()
+
+  def getChangesSince(self, changeID, changeFilter, maxChanges, credDict):
+    """ Get the changes of the catalog made after a given one, from the change log
+
+        :param int changeID: ID of the last change known by the caller, 0 for the whole log
+        :param dict changeFilter: optional selection of the changes, by 'Operation', by 'Path' of a directory,
+                                  including its subdirectories, and by 'SE' of the replicas
+        :param int maxChanges: maximum number of changes, at most MAX_CHANGES
+        :param dict credDict: credentials of the caller, who must be an administrator
+        :return: S_OK( dict ) with the 'Changes', the 'LastChangeID' to give to the next call, and the
+                 'FirstChangeID' still in the log: the changes before it were cleaned
+    """
+    res = self._checkAdminPermission(credDict)
+    if not res['OK']:
+      return res
+    if not res['Value']:
+      return S_ERROR(errno.EACCES, "Permission denied")
+    if not self.changeLog:
+      return S_ERROR('The change log of the catalog is not enabled')
+
+    changeFilter = changeFilter or {}
+    maxChanges = min(maxChanges, MAX_CHANGES) if maxChanges > 0 else MAX_CHANGES
+    operations = changeFilter.get('Operation')
+    if isinstance(operations, six.string_types):
+      operations = [operations]
+    res = self.changeLog.getFirstChangeID()
+    if not res['OK']:
+      return res
+    firstChangeID = res['Value']
+    res = self.changeLog.getLastChangeID(settleTime=CHANGE_SETTLE_TIME)
+    if not res['OK']:
+      return res
+    settledChangeID = res['Value']
+    res = self.changeLog.getChanges(changeID, operations=operations, path=changeFilter.get('Path'),
+                                    seNames=changeFilter.get('SE'), maxChanges=maxChanges,
+                                    settleTime=CHANGE_SETTLE_TIME, maxChangeID=settledChangeID)
+    if not res['OK']:
+      return res
+    changes = res['Value']
+    if len(changes) == maxChanges:
+      lastChangeID = changes[-1]['ChangeID']
+    else:
+      # All the settled changes were scanned, those not selected by the filter are not scanned again
+      lastChangeID = max(changeID, settledChangeID)
+    return S_OK({'Changes': changes,
+                 'LastChangeID': lastChangeID,
+                 'FirstChangeID': firstChangeID})
+
+  def cleanChangeLog(self, retentionDays, credDict):
+    """ Remove the changes older than the retention period from the change log, keeping
+        those not yet applied to the snapshots of the datasets
+
+        :param int retentionDays: retention period in days
+        :param dict credDict: credentials of the caller, who must be an administrator
+        :return: S_OK( int ) number of removed changes / S_ERROR
+    """
+    res = self._checkAdminPermission(credDict)
+    if not res['OK']:
+      return res
+    if not res['Value']:
+      return S_ERROR(errno.EACCES, "Permission denied")
+    if not self.changeLog:
+      return S_ERROR('The change log of the catalog is not enabled')
+
+    res = self.datasetManager.refreshDatasetSnapshots()
+    if not res['OK']:
+      gLogger.error("Failed to refresh the dataset snapshots", res['Message'])
+    res = self.datasetManager.getSnapshotsLastChangeID()
+    if not res['OK']:
+      return res
+    return self.changeLog.removeChanges(retentionDays, maxChangeID=res['Value'])
+
   ########################################################################
   #
   #  Security based methods
@@ -1193,3 +1354,15 @@ class FileCatalogDB(DB):
         :returns: S_OK with list of tuples (lfn, checksum, size)
     """
     return self.fileManager.getSEDump(seName)
+
+  def iterSEDump(self, seName, batchSize=1000):
+    """
+         Iterate over all the files at a given SE, together with checksum and size,
+         without loading them all in memory
+
+        :param seName: name of the StorageElement
+        :param int batchSize: maximum number of files in each batch
+
+        :returns: S_OK with an iterator over tuples of (lfn, checksum, size)
+    """
+    return self.fileManager.iterSEDump(seName, batchSize=batchSize)
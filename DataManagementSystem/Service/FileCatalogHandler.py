@@ -21,6 +21,7 @@ import csv
 import os
 from types import IntType, LongType, DictType, StringTypes, BooleanType, ListType
 # from DIRAC
+from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
 from DIRAC.Core.DISET.RequestHandler import RequestHandler, getServiceOption
 
 from DIRAC import gLogger, S_OK, S_ERROR
@@ -66,13 +67,23 @@ def initializeFileCatalogHandler(serviceInfo):
                    'ValidFileStatus': ['AprioriGood', 'Trash', 'Removing', 'Probing'],
                    'ValidReplicaStatus': ['AprioriGood', 'Trash', 'Removing', 'Probing'],
                    'VisibleFileStatus': ['AprioriGood'],
-                   'VisibleReplicaStatus': ['AprioriGood']}
+                   'VisibleReplicaStatus': ['AprioriGood'],
+                   'DirectoryCacheSize': 0,
+                   'DirectoryCacheLifetime': 60,
+                   'MetadataIndex': False,
+                   'MetadataIndexLifetime': 300,
+                   'DatasetSnapshots': False,
+                   'DatasetSnapshotsRefreshPeriod': 600,
+                   'ChangeLog': False}
   for configKey in sorted(defaultConfig.keys()):
     defaultValue = defaultConfig[configKey]
     configValue = getServiceOption(serviceInfo, configKey, defaultValue)
     gLogger.info("%-20s : %-20s" % (str(configKey), str(configValue)))
     databaseConfig[configKey] = configValue
   res = gFileCatalogDB.setConfig(databaseConfig)
+  if res['OK'] and databaseConfig['DatasetSnapshots']:
+    gThreadScheduler.addPeriodicTask(databaseConfig['DatasetSnapshotsRefreshPeriod'],
+                                     gFileCatalogDB.datasetManager.refreshDatasetSnapshots)
 
   gMonitor.registerActivity("AddFile", "Amount of addFile calls",
                             "FileCatalogHandler", "calls/min", gMonitor.OP_SUM)
@@ -441,6 +452,12 @@ class FileCatalogHandler(RequestHandler):
     """ Get the number of registered directories, files and replicas in various tables """
     return gFileCatalogDB.getCatalogCounters(self.getRemoteCredentials())
 
+  types_getDirectoryCacheStatistics = []
+
+  def export_getDirectoryCacheStatistics(self):
+    """ Get the hit rate and size of the cache of the directory paths and IDs """
+    return gFileCatalogDB.getDirectoryCacheStatistics(self.getRemoteCredentials())
+
   types_rebuildDirectoryUsage = []
 
   @staticmethod
@@ -454,6 +471,18 @@ class FileCatalogHandler(RequestHandler):
     """ Repair the catalog inconsistencies """
     return gFileCatalogDB.repairCatalog(self.getRemoteCredentials())
 
+  types_getChangesSince = [[IntType, LongType], DictType, [IntType, LongType]]
+
+  def export_getChangesSince(self, changeID, changeFilter, maxChanges):
+    """ Get the changes of the catalog made after a given one """
+    return gFileCatalogDB.getChangesSince(changeID, changeFilter, maxChanges, self.getRemoteCredentials())
+
+  types_cleanChangeLog = [[IntType, LongType]]
+
+  def export_cleanChangeLog(self, retentionDays):
+    """ Remove the changes older than the retention period from the change log """
+    return gFileCatalogDB.cleanChangeLog(retentionDays, self.getRemoteCredentials())
+
   ########################################################################
   # Metadata Catalog Operations
   #
@@ -756,21 +785,25 @@ class FileCatalogHandler(RequestHandler):
 
     """
 
-    retVal = self.getSEDump(seName)
+    retVal = gFileCatalogDB.iterSEDump(seName)
+    if not retVal['OK']:
+      fileHelper.markAsTransferred()
+      return retVal
 
+    # The dump is sent by blocks of lines, while reading them from the DB
     try:
-      csvOutput = StringIO()
-      writer = csv.writer(csvOutput, delimiter='|')
-      for lfn in retVal:
-        writer.writerow(lfn)
-
-      csvOutput.seek(0)
-
-      ret = fileHelper.DataSourceToNetwork(csvOutput)
-      return ret
+      with retVal['Value'] as rowBatches:
+        for rows in rowBatches:
+          csvOutput = StringIO()
+          writer = csv.writer(csvOutput, delimiter='|')
+          writer.writerows(rows)
+          ret = fileHelper.sendData(csvOutput.getvalue())
+          if not ret['OK']:
+            return ret
+          if ret.get('AbortTransfer'):
+            return S_OK()
+      return fileHelper.sendEOF()
 
     except Exception as e:
       gLogger.exception("Exception while sending seDump", repr(e))
       return S_ERROR("Exception while sendind seDump: %s" % repr(e))
-    finally:
-      csvOutput.close()
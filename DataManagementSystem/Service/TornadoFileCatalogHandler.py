@@ -21,8 +21,8 @@ import six
 import csv
 import os
 
-from io import BytesIO
 # from DIRAC
+from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
 from DIRAC.Core.DISET.RequestHandler import getServiceOption
 
 from DIRAC import gLogger, S_OK, S_ERROR
@@ -74,13 +74,23 @@ class TornadoFileCatalogHandler(TornadoService):
                      'ValidFileStatus': ['AprioriGood', 'Trash', 'Removing', 'Probing'],
                      'ValidReplicaStatus': ['AprioriGood', 'Trash', 'Removing', 'Probing'],
                      'VisibleFileStatus': ['AprioriGood'],
-                     'VisibleReplicaStatus': ['AprioriGood']}
+                     'VisibleReplicaStatus': ['AprioriGood'],
+                     'DirectoryCacheSize': 0,
+                     'DirectoryCacheLifetime': 60,
+                     'MetadataIndex': False,
+                     'MetadataIndexLifetime': 300,
+                     'DatasetSnapshots': False,
+                     'DatasetSnapshotsRefreshPeriod': 600,
+                     'ChangeLog': False}
     for configKey in sorted(defaultConfig.keys()):
       defaultValue = defaultConfig[configKey]
       configValue = getServiceOption(serviceInfo, configKey, defaultValue)
       gLogger.info("%-20s : %-20s" % (str(configKey), str(configValue)))
       databaseConfig[configKey] = configValue
     res = cls.gFileCatalogDB.setConfig(databaseConfig)
+    if res['OK'] and databaseConfig['DatasetSnapshots']:
+      gThreadScheduler.addPeriodicTask(databaseConfig['DatasetSnapshotsRefreshPeriod'],
+                                       cls.gFileCatalogDB.datasetManager.refreshDatasetSnapshots)
 
     gMonitor.registerActivity("AddFile", "Amount of addFile calls",
                               "FileCatalogHandler", "calls/min", gMonitor.OP_SUM)
@@ -367,6 +377,10 @@ class TornadoFileCatalogHandler(TornadoService):
     """ Get the number of registered directories, files and replicas in various tables """
     return self.gFileCatalogDB.getCatalogCounters(self.getRemoteCredentials())
 
+  def export_getDirectoryCacheStatistics(self):
+    """ Get the hit rate and size of the cache of the directory paths and IDs """
+    return self.gFileCatalogDB.getDirectoryCacheStatistics(self.getRemoteCredentials())
+
   @staticmethod
   def export_rebuildDirectoryUsage(self):
     """ Rebuild DirectoryUsage table from scratch """
@@ -376,6 +390,14 @@ class TornadoFileCatalogHandler(TornadoService):
     """ Repair the catalog inconsistencies """
     return self.gFileCatalogDB.repairCatalog(self.getRemoteCredentials())
 
+  def export_getChangesSince(self, changeID, changeFilter, maxChanges):
+    """ Get the changes of the catalog made after a given one """
+    return self.gFileCatalogDB.getChangesSince(changeID, changeFilter, maxChanges, self.getRemoteCredentials())
+
+  def export_cleanChangeLog(self, retentionDays):
+    """ Remove the changes older than the retention period from the change log """
+    return self.gFileCatalogDB.cleanChangeLog(retentionDays, self.getRemoteCredentials())
+
   ########################################################################
   # Metadata Catalog Operations
   #
@@ -620,25 +642,21 @@ class TornadoFileCatalogHandler(TornadoService):
 
         :param seName: name of the se to dump
 
-        :returns: the result of the FileHelper
-
-
+        :returns: generator of the CSV lines, by blocks, streamed to the client
     """
 
-    retVal = self.getSEDump(seName)
-
-    try:
-      csvOutput = BytesIO()
-      writer = csv.writer(csvOutput, delimiter='|')
-      for lfn in retVal:
-        writer.writerow(lfn)
+    retVal = self.gFileCatalogDB.iterSEDump(seName)
+    if not retVal['OK']:
+      return retVal
+    rowBatches = retVal['Value']
 
-      # csvOutput.seek(0)
-      ret = csvOutput.getvalue()
-      return ret
+    def csvBlocks():
+      """ Format the dump by blocks of lines, while reading them from the DB """
+      with rowBatches:
+        for rows in rowBatches:
+          csvOutput = six.StringIO()
+          writer = csv.writer(csvOutput, delimiter='|')
+          writer.writerows(rows)
+          yield csvOutput.getvalue().encode()
 
-    except Exception as e:
-      gLogger.exception("Exception while sending seDump", repr(e))
-      return S_ERROR("Exception while sendind seDump: %s" % repr(e))
-    finally:
-      csvOutput.close()
+    return csvBlocks()
@@ -0,0 +1,112 @@
+""" Cache of the replicas returned by the catalogs, shared by the DataManager objects of a process
+
+    The cache is keyed by the catalogs queried and the query options, and holds the replicas of each LFN
+    for a given lifetime. When full, the least recently used LFNs are evicted first. The LFNs whose
+    replicas are modified by the DataManager of the process are invalidated: the modifications done by
+    other processes are only seen after the lifetime.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import collections
+import threading
+import time
+
+# Default maximum number of LFNs in the cache
+MAX_SIZE = 100000
+
+
+class ReplicaCache(object):
+  """ LRU cache of the replicas by LFN, with a lifetime
+  """
+
+  def __init__(self, maxSize=MAX_SIZE):
+    """ c'tor
+
+        :param int maxSize: maximum number of cached LFNs
+    """
+    self.maxSize = maxSize
+    self.__lock = threading.Lock()
+    # ( key, lfn ) -> ( time of the caching, replicas )
+    self.__cache = collections.OrderedDict()
+    self.__keys = set()
+    self.__hits = 0
+    self.__misses = 0
+    self.__invalidations = 0
+
+  def get(self, key, lfns, lifetime):
+    """ Get the cached replicas of LFNs
+
+        :param key: hashable description of the catalogs and query options
+        :param list lfns: LFNs
+        :param int lifetime: validity of the cached replicas in seconds
+
+        :return: tuple ( dict { lfn: replicas } of the cached LFNs, list of the other LFNs )
+    """
+    now = time.time()
+    replicas = {}
+    missing = []
+    with self.__lock:
+      for lfn in lfns:
+        entry = self.__cache.pop((key, lfn), None)
+        if entry is None or now - entry[0] > lifetime:
+          missing.append(lfn)
+          continue
+        # Moved to the end: most recently used
+        self.__cache[(key, lfn)] = entry
+        # The replicas are modified by the filters of the caller
+        replicas[lfn] = dict(entry[1])
+      self.__hits += len(replicas)
+      self.__misses += len(missing)
+    return replicas, missing
+
+  def add(self, key, replicas):
+    """ Cache the replicas of LFNs
+
+        :param key: hashable description of the catalogs and query options
+        :param dict replicas: { lfn: { se: url } }
+    """
+    now = time.time()
+    with self.__lock:
+      self.__keys.add(key)
+      for lfn, lfnReplicas in replicas.items():
+        self.__cache.pop((key, lfn), None)
+        self.__cache[(key, lfn)] = (now, dict(lfnReplicas))
+      while len(self.__cache) > self.maxSize:
+        self.__cache.popitem(last=False)
+
+  def invalidate(self, lfns):
+    """ Remove LFNs from the cache, for all the keys
+
+        :param lfns: iterable of LFNs
+    """
+    with self.__lock:
+      for lfn in lfns:
+        for key in self.__keys:
+          if self.__cache.pop((key, lfn), None) is not None:
+            self.__invalidations += 1
+
+  def clear(self):
+    """ Empty the cache, and reset the statistics """
+    with self.__lock:
+      self.__cache.clear()
+      self.__keys.clear()
+      self.__hits = self.__misses = self.__invalidations = 0
+
+  def getStatistics(self):
+    """ Get the statistics of the cache
+
+        :return: dict with the number of 'Hits' and 'Misses' by LFN, of 'Invalidations', and the 'Size'
+    """
+    with self.__lock:
+      return {'Hits': self.__hits,
+              'Misses': self.__misses,
+              'Invalidations': self.__invalidations,
+              'Size': len(self.__cache)}
+
+
+gReplicaCache = ReplicaCache()
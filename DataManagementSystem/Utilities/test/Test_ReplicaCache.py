@@ -0,0 +1,76 @@
+""" Test the replica cache, and its use by the DataManager
+"""
+
+# pylint: disable=protected-access, missing-docstring
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from mock import MagicMock, patch
+
+from DIRAC import S_OK
+from DIRAC.DataManagementSystem.Utilities.ReplicaCache import ReplicaCache, gReplicaCache
+
+
+def test_cache():
+  cache = ReplicaCache(maxSize=2)
+  cache.add('key', {'/a': {'SE1': 'url1'}, '/b': {'SE2': 'url2'}})
+  replicas, missing = cache.get('key', ['/a', '/c'], 60)
+  assert replicas == {'/a': {'SE1': 'url1'}}
+  assert missing == ['/c']
+  assert cache.get('otherKey', ['/a'], 60) == ({}, ['/a'])
+
+  # The cached replicas are not modified by the caller
+  replicas['/a'].pop('SE1')
+  assert cache.get('key', ['/a'], 60)[0] == {'/a': {'SE1': 'url1'}}
+
+  # /b is the least recently used
+  cache.add('key', {'/c': {}})
+  assert cache.get('key', ['/a', '/b', '/c'], 60)[1] == ['/b']
+
+  cache.invalidate(['/a'])
+  assert cache.get('key', ['/a'], 60)[1] == ['/a']
+  assert cache.getStatistics() == {'Hits': 4, 'Misses': 4, 'Invalidations': 1, 'Size': 1}
+
+  # Expired
+  assert cache.get('key', ['/c'], -1) == ({}, ['/c'])
+  assert cache.getStatistics()['Size'] == 0
+
+
+def test_dataManager():
+  from DIRAC.DataManagementSystem.Client.DataManager import DataManager
+
+  def mockInit(self):
+    self.log = MagicMock()
+    self.voName = 'vo'
+    self.useCatalogPFN = True
+    self.replicaCacheLifetime = 60
+    self.fileCatalog = MagicMock()
+    self.fileCatalog.getReadCatalogs.return_value = [('FileCatalog', None, True)]
+
+  with patch("DIRAC.DataManagementSystem.Client.DataManager.DataManager.__init__", new=mockInit):
+    dm = DataManager()
+  gReplicaCache.clear()
+  dm.fileCatalog.getReplicas.side_effect = lambda lfns, allStatus: S_OK({
+      'Successful': dict((lfn, {'SE1': 'url1'}) for lfn in lfns if lfn != '/missing'),
+      'Failed': dict((lfn, 'No such file') for lfn in lfns if lfn == '/missing')})
+
+  result = dm.getReplicas(['/a', '/missing'], getUrl=False)
+  assert result['Value'] == {'Successful': {'/a': {'SE1': True}}, 'Failed': {'/missing': 'No such file'}}
+  result = dm.getReplicas(['/a', '/b', '/missing'])
+  assert result['Value'] == {'Successful': {'/a': {'SE1': 'url1'}, '/b': {'SE1': 'url1'}},
+                             'Failed': {'/missing': 'No such file'}}
+  # Only the LFNs not cached are queried
+  assert dm.fileCatalog.getReplicas.call_args[0][0] == ['/b', '/missing']
+  # The key depends on the allStatus flag
+  dm.getReplicas(['/a'], allStatus=False)
+  assert dm.fileCatalog.getReplicas.call_args[0][0] == ['/a']
+
+  # A new replica is registered
+  dm.fileCatalog.addFile.return_value = S_OK({'Successful': {'/a': True}, 'Failed': {}})
+  dm._DataManager__registerFile([('/a', 'url', 1, 'SE2', 'guid', 'adler')], '')
+  dm.fileCatalog.getReplicas.reset_mock()
+  dm.getReplicas(['/a', '/b'])
+  assert dm.fileCatalog.getReplicas.call_args[0][0] == ['/a']
+  assert DataManager.getReplicaCacheStatistics()['Value']['Hits'] == 2
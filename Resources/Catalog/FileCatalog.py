@@ -15,8 +15,17 @@
     in the states of different catalogs. If no Master plug-in is declared, all the
     plug-ins are called (in case they implement the method) for the "write" methods.
 
-    For the "read" methods plug-ins are called one by one, starting with the Master
-    plug-in if declared, until getting a successful result.
+    For the "read" methods all the plug-ins are called, the results of the Master
+    plug-in if declared taking precedence, then the results of the others in their order.
+    With the FirstAnswerReads option, the first successful result is returned instead:
+    this is meant for replicated catalogs.
+
+    The calls to the plug-ins are done concurrently by a thread pool shared by all the
+    FileCatalog objects, unless the ParallelCalls option is False. For the "write" methods,
+    the Master plug-in is still called first, the other plug-ins being called concurrently
+    only if it succeeded. The result of a plug-in which did not answer within the Timeout
+    of its CS section (180 s by default) is replaced by an error. The latencies of the calls
+    are recorded by plug-in and method, see getCatalogLatencies().
 
     Most of the catalog plug-in methods are taking the first argument which represents
     the required LFNS. The LFNs argument can have one of the following forms:
@@ -47,10 +56,16 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-import six
+import errno
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+
+import six
 
 from DIRAC import gLogger, gConfig, S_OK, S_ERROR
+from DIRAC.Core.DISET.ThreadConfig import ThreadConfig
 from DIRAC.Core.Utilities import DErrno
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.Core.Security.ProxyInfo import getVOfromProxyGroup
@@ -58,6 +73,48 @@ from DIRAC.Resources.Catalog.Utilities import checkArgumentFormat
 from DIRAC.Resources.Catalog.FileCatalogFactory import FileCatalogFactory
 from DIRAC.Resources.Catalog.FCConditionParser import FCConditionParser
 
+# Maximum number of concurrent calls to the catalogs, for all the FileCatalog objects of the process
+MAX_PARALLEL_CALLS = 20
+
+_executor = None
+_executorLock = threading.Lock()
+
+# Statistics of the calls, by catalog and method
+_latencies = {}
+_latenciesLock = threading.Lock()
+
+
+def _getExecutor():
+  """ Get the thread pool of the calls to the catalogs, created at the first use """
+  global _executor
+  with _executorLock:
+    if _executor is None:
+      _executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_CALLS)
+  return _executor
+
+
+def _recordLatency(catalogName, methodName, duration, timedOut=False):
+  """ Add a call to the statistics """
+  with _latenciesLock:
+    stats = _latencies.setdefault(catalogName, {}).setdefault(methodName, {'Calls': 0, 'TotalTime': 0.,
+                                                                           'MaxTime': 0., 'Timeouts': 0})
+    stats['Calls'] += 1
+    stats['TotalTime'] += duration
+    stats['MaxTime'] = max(stats['MaxTime'], duration)
+    if timedOut:
+      stats['Timeouts'] += 1
+
+
+def getCatalogLatencies():
+  """ Get the statistics of the calls to the catalogs done in this process
+
+      :return: dict { catalogName: { methodName: { 'Calls', 'TotalTime', 'MaxTime', 'Timeouts' } } },
+               the times being in seconds. The calls which timed out are counted with the timeout.
+  """
+  with _latenciesLock:
+    return dict((catalogName, dict((methodName, dict(stats)) for methodName, stats in methods.items()))
+                for catalogName, methods in _latencies.items())
+
 
 class FileCatalog(object):
 
@@ -73,11 +130,14 @@ class FileCatalog(object):
 
     self.readCatalogs = []
     self.writeCatalogs = []
+    self.catalogTimeouts = {}
     self.rootConfigPath = '/Resources/FileCatalogs'
     self.vo = vo if vo else getVOfromProxyGroup().get('Value', None)
     self.log = gLogger.getSubLogger("FileCatalog")
 
     self.opHelper = Operations(vo=self.vo)
+    self.parallelCalls = self.opHelper.getValue('/Services/Catalogs/ParallelCalls', True)
+    self.firstAnswerReads = self.opHelper.getValue('/Services/Catalogs/FirstAnswerReads', False)
 
     catalogList = []
     if isinstance(catalogs, six.string_types):
@@ -183,6 +243,7 @@ class FileCatalog(object):
 
 
     """
+    call = self.call
     successful = {}
     failed = {}
     failedCatalogs = {}
@@ -193,8 +254,9 @@ class FileCatalog(object):
     allLfns = []
     lfnMapDict = {}
     masterResult = {}
+    fileInfo = {}
     parms1 = []
-    if self.call not in self.no_lfn_methods:
+    if call not in self.no_lfn_methods:
       fileInfo = parms[0]
       result = checkArgumentFormat(fileInfo, generateMap=True)
       if not result['OK']:
@@ -205,62 +267,59 @@ class FileCatalog(object):
       allLfns = list(fileInfo)
       parms1 = parms[1:]
 
+    results = []
+    # The master catalog is called first, the others being called only if it succeeds
+    # NOTE: the master implements the method since the write method list is populated
+    # only from the master catalog, and if the method is not there, __getattr__
+    # would raise an exception
     for catalogName, oCatalog, master in self.writeCatalogs:
-
-      # Skip if the method is not implemented in this catalog
-      # NOTE: it is impossible for the master since the write method list is populated
-      # only from the master catalog, and if the method is not there, __getattr__
-      # would raise an exception
-      if not oCatalog.hasCatalogMethod(self.call):
+      if not master:
         continue
+      args = parms
+      if call not in self.no_lfn_methods:
+        result = self.__getValidLFNs(call, catalogName, master, fileInfo, specialConditions)
+        if not result['OK']:
+          return result
+        args = (result['Value'],) + tuple(parms1)
 
-      method = getattr(oCatalog, self.call)
+      result = self.__callCatalog(catalogName, call, getattr(oCatalog, call), args, kws)
+      masterResult = result
+      if not result['OK']:
+        # If this is the master catalog and it fails we don't want to continue with the other catalogs
+        self.log.error("Failed to execute call on master catalog",
+                       "%s on %s: %s" % (call, catalogName, result['Message']))
+        return result
+      if allLfns:
+        # The operations failed in the master catalog are not attempted on the other catalogs
+        for lfn in result['Value']['Failed']:
+          fileInfo.pop(lfn, None)
+      results.append((catalogName, result))
 
-      if self.call in self.no_lfn_methods:
-        result = method(*parms, **kws)
-      else:
-        if isinstance(specialConditions, dict):
-          condition = specialConditions.get(catalogName)
-        else:
-          condition = specialConditions
-        # Check whether this catalog should be used for this method
-        res = self.condParser(catalogName, self.call, fileInfo, condition=condition)
-        # condParser never returns S_ERROR
-        condEvals = res['Value']['Successful']
-        # For a master catalog, ALL the lfns should be valid
-        if master:
-          if any([not valid for valid in condEvals.values()]):
-            gLogger.error("The master catalog is not valid for some LFNS", condEvals)
-            return S_ERROR("The master catalog is not valid for some LFNS %s" % condEvals)
-
-        validLFNs = dict((lfn, fileInfo[lfn]) for lfn in condEvals if condEvals[lfn])
+    catalogCalls = []
+    for catalogName, oCatalog, master in self.writeCatalogs:
+
+      # Skip if the method is not implemented in this catalog
+      if master or not oCatalog.hasCatalogMethod(call):
+        continue
 
+      args = parms
+      if call not in self.no_lfn_methods:
+        validLFNs = self.__getValidLFNs(call, catalogName, master, fileInfo, specialConditions)['Value']
         # We can skip the execution without worry,
         # since at this level it is for sure not a master catalog
         if not validLFNs:
           gLogger.debug("No valid LFN, skipping the call")
           continue
+        args = (validLFNs,) + tuple(parms1)
 
-        invalidLFNs = [lfn for lfn in condEvals if not condEvals[lfn]]
-
-        if invalidLFNs:
-          gLogger.debug("Some LFNs are not valid for operation '%s' on catalog '%s' : %s" % (self.call, catalogName,
-                                                                                             invalidLFNs))
-
-        result = method(validLFNs, *parms1, **kws)
+      catalogCalls.append((catalogName, getattr(oCatalog, call), args, kws))
 
-      if master:
-        masterResult = result
+    results.extend(self.__callCatalogs(call, catalogCalls))
 
+    for catalogName, result in results:
       if not result['OK']:
-        if master:
-          # If this is the master catalog and it fails we don't want to continue with the other catalogs
-          self.log.error("Failed to execute call on master catalog",
-                         "%s on %s: %s" % (self.call, catalogName, result['Message']))
-          return result
-        else:
-          # Otherwise we keep the failed catalogs so we can update their state later
-          failedCatalogs[catalogName] = result['Message']
+        # We keep the failed catalogs so we can update their state later
+        failedCatalogs[catalogName] = result['Message']
       else:
         successfulCatalogs[catalogName] = result['Value']
 
@@ -269,12 +328,9 @@ class FileCatalog(object):
           for lfn, message in result['Value']['Failed'].items():
             # Save the error message for the failed operations
             failed.setdefault(lfn, {})[catalogName] = message
-            if master:
-              # If this is the master catalog then we should not attempt the operation on other catalogs
-              fileInfo.pop(lfn, None)
-          for lfn, result in result['Value']['Successful'].items():
+          for lfn, lfnResult in result['Value']['Successful'].items():
             # Save the result return for each file for the successful operations
-            successful.setdefault(lfn, {})[catalogName] = result
+            successful.setdefault(lfn, {})[catalogName] = lfnResult
 
     if allLfns:
       # This recovers the states of the files that completely failed i.e. when S_ERROR is returned by a catalog
@@ -283,9 +339,9 @@ class FileCatalog(object):
           failed.setdefault(lfn, {})[catalogName] = errorMessage
       # Restore original lfns if they were changed by normalization
       if lfnMapDict:
-        for lfn in failed.keys():
+        for lfn in list(failed):
           failed[lfnMapDict.get(lfn, lfn)] = failed.pop(lfn)
-        for lfn in successful.keys():
+        for lfn in list(successful):
           successful[lfnMapDict.get(lfn, lfn)] = successful.pop(lfn)
       resDict = {'Failed': failed, 'Successful': successful}
       return S_OK(resDict)
@@ -294,19 +350,54 @@ class FileCatalog(object):
       # per catalog result needs multiple fixes in various client calls
       return masterResult
 
+  def __getValidLFNs(self, call, catalogName, master, fileInfo, specialConditions):
+    """ Select the LFNs for which a catalog should be used according to the conditions
+
+        :return: S_OK( dict of the valid LFNs ) / S_ERROR if some LFNs are not valid for the master catalog
+    """
+    if isinstance(specialConditions, dict):
+      condition = specialConditions.get(catalogName)
+    else:
+      condition = specialConditions
+    # Check whether this catalog should be used for this method
+    res = self.condParser(catalogName, call, fileInfo, condition=condition)
+    # condParser never returns S_ERROR
+    condEvals = res['Value']['Successful']
+    # For a master catalog, ALL the lfns should be valid
+    if master:
+      if any([not valid for valid in condEvals.values()]):
+        gLogger.error("The master catalog is not valid for some LFNS", condEvals)
+        return S_ERROR("The master catalog is not valid for some LFNS %s" % condEvals)
+
+    invalidLFNs = [lfn for lfn in condEvals if not condEvals[lfn]]
+    if invalidLFNs:
+      gLogger.debug("Some LFNs are not valid for operation '%s' on catalog '%s' : %s" % (call, catalogName,
+                                                                                         invalidLFNs))
+
+    return S_OK(dict((lfn, fileInfo[lfn]) for lfn in condEvals if condEvals[lfn]))
+
   def r_execute(self, *parms, **kws):
     """ Read method executor.
     """
-    successful = {}
-    failed = {}
-    for _catalogName, oCatalog, _master in self.readCatalogs:
+    call = self.call
+    catalogCalls = []
+    for catalogName, oCatalog, _master in self.readCatalogs:
 
       # Skip if the method is not implemented in this catalog
-      if not oCatalog.hasCatalogMethod(self.call):
+      if not oCatalog.hasCatalogMethod(call):
         continue
 
-      method = getattr(oCatalog, self.call)
-      res = method(*parms, **kws)
+      catalogCalls.append((catalogName, getattr(oCatalog, call), parms, kws))
+
+    if self.firstAnswerReads and self.parallelCalls and len(catalogCalls) > 1:
+      res = self.__getFirstAnswer(call, catalogCalls)
+      if res['OK']:
+        return res
+      return S_ERROR(DErrno.EFCERR, "Failed to perform %s from any catalog" % call)
+
+    successful = {}
+    failed = {}
+    for _catalogName, res in self.__callCatalogs(call, catalogCalls):
       if res['OK']:
         if 'Successful' in res['Value']:
           for key, item in res['Value']['Successful'].items():
@@ -318,9 +409,97 @@ class FileCatalog(object):
         else:
           return res
     if not successful and not failed:
-      return S_ERROR(DErrno.EFCERR, "Failed to perform %s from any catalog" % self.call)
+      return S_ERROR(DErrno.EFCERR, "Failed to perform %s from any catalog" % call)
     return S_OK({'Failed': failed, 'Successful': successful})
 
+  ###########################################################################################
+  #
+  # Below are the methods dispatching the calls to the catalogs
+  #
+
+  def __callCatalog(self, catalogName, call, method, args, kwargs, threadConfig=None):
+    """ Call a catalog method, recording its latency
+
+        :param tuple threadConfig: ThreadConfig of the calling thread, when executed in the thread pool
+    """
+    if threadConfig is not None:
+      # The call is done on behalf of the same user as in the calling thread
+      threadConfigObject = ThreadConfig()
+      threadConfigObject.reset()
+      threadConfigObject.load(threadConfig)
+    start = time.time()
+    result = method(*args, **kwargs)
+    duration = time.time() - start
+    _recordLatency(catalogName, call, duration)
+    self.log.debug("Catalog call", "%s on %s: %.3f s" % (call, catalogName, duration))
+    return result
+
+  def __submitCalls(self, call, catalogCalls):
+    """ Submit calls to the thread pool
+
+        :param list catalogCalls: tuples ( catalogName, method, args, kwargs )
+        :return: list of tuples ( future, deadline of the call ), in the order of the calls
+    """
+    threadConfig = ThreadConfig().dump()
+    executor = _getExecutor()
+    futures = []
+    for catalogName, method, args, kwargs in catalogCalls:
+      # Each catalog gets its own copy of the keyword arguments
+      future = executor.submit(self.__callCatalog, catalogName, call, method, args, dict(kwargs), threadConfig)
+      futures.append((future, time.time() + self.catalogTimeouts.get(catalogName, self.timeout)))
+    return futures
+
+  def __timeoutError(self, catalogName, call):
+    """ Record the timeout of a call, and get the error replacing its result """
+    timeout = self.catalogTimeouts.get(catalogName, self.timeout)
+    _recordLatency(catalogName, call, timeout, timedOut=True)
+    self.log.warn("Catalog call timed out", "%s on %s after %s s" % (call, catalogName, timeout))
+    return S_ERROR(errno.ETIMEDOUT, "%s on %s timed out after %s s" % (call, catalogName, timeout))
+
+  def __callCatalogs(self, call, catalogCalls):
+    """ Call several catalogs, concurrently unless disabled by the ParallelCalls option
+
+        :param list catalogCalls: tuples ( catalogName, method, args, kwargs )
+        :return: list of tuples ( catalogName, result ), in the order of the calls
+    """
+    if not self.parallelCalls or len(catalogCalls) < 2:
+      return [(catalogName, self.__callCatalog(catalogName, call, method, args, kwargs))
+              for catalogName, method, args, kwargs in catalogCalls]
+
+    results = []
+    futures = self.__submitCalls(call, catalogCalls)
+    for (catalogName, _method, _args, _kwargs), (future, deadline) in zip(catalogCalls, futures):
+      try:
+        result = future.result(timeout=max(0, deadline - time.time()))
+      except FuturesTimeoutError:
+        future.cancel()
+        result = self.__timeoutError(catalogName, call)
+      results.append((catalogName, result))
+    return results
+
+  def __getFirstAnswer(self, call, catalogCalls):
+    """ Call several catalogs concurrently, and get the first successful result,
+        waiting at most for the longest of their timeouts
+
+        :param list catalogCalls: tuples ( catalogName, method, args, kwargs )
+        :return: S_OK / S_ERROR if no catalog answered successfully
+    """
+    futures = self.__submitCalls(call, catalogCalls)
+    catalogNames = dict((future, catalogCall[0]) for (future, _deadline), catalogCall in zip(futures, catalogCalls))
+    deadline = max(futureDeadline for _future, futureDeadline in futures)
+    result = S_ERROR(DErrno.EFCERR, "Failed to perform %s from any catalog" % call)
+    try:
+      for future in as_completed(catalogNames, timeout=max(0, deadline - time.time())):
+        result = future.result()
+        if result['OK']:
+          return result
+    except FuturesTimeoutError:
+      for future, catalogName in catalogNames.items():
+        if not future.done():
+          future.cancel()
+          result = self.__timeoutError(catalogName, call)
+    return result
+
   ###########################################################################################
   #
   # Below is the method for obtaining the objects instantiated for a provided catalogue configuration
@@ -377,6 +556,7 @@ class FileCatalog(object):
       if not result['OK']:
         return result
       oCatalog = result['Value']
+      self.catalogTimeouts[catalogName] = int(catalogConfig.get('Timeout', self.timeout))
       if re.search('Read', catalogConfig['AccessType']):
         if catalogConfig['Master']:
           self.readCatalogs.insert(0, (catalogName, oCatalog, catalogConfig['Master']))
@@ -431,6 +611,7 @@ class FileCatalog(object):
         if not res['OK']:
           return res
         oCatalog = res['Value']
+        self.catalogTimeouts[catalogName] = int(catalogConfig.get('Timeout', self.timeout))
         master = catalogConfig['Master']
         # If the catalog is read type
         if re.search('Read', catalogConfig['AccessType']):
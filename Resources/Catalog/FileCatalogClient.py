@@ -94,7 +94,8 @@ class FileCatalogClient(FileCatalogClientBase):
       'rebuildDirectoryUsage']
 
   ADMIN_METHODS = ['addUser', 'deleteUser', 'addGroup', 'deleteGroup', 'getUsers', 'getGroups',
-                   'getCatalogCounters', 'repairCatalog', 'rebuildDirectoryUsage']
+                   'getCatalogCounters', 'getDirectoryCacheStatistics', 'repairCatalog', 'rebuildDirectoryUsage',
+                   'getChangesSince', 'cleanChangeLog']
 
   def __init__(self, url=None, **kwargs):
     """ Constructor function.
@@ -507,6 +508,10 @@ class FileCatalogClient(FileCatalogClientBase):
     """ Get the number of registered directories, files and replicas in various tables """
     return self._getRPC(timeout=timeout).getCatalogCounters()
 
+  def getDirectoryCacheStatistics(self, timeout=120):
+    """ Get the hit rate and size of the cache of the directory paths and IDs of the service """
+    return self._getRPC(timeout=timeout).getDirectoryCacheStatistics()
+
   def rebuildDirectoryUsage(self, timeout=120):
     """ Rebuild DirectoryUsage table from scratch """
     return self._getRPC(timeout=timeout).rebuildDirectoryUsage()
@@ -515,6 +520,20 @@ class FileCatalogClient(FileCatalogClientBase):
     """ Repair the catalog inconsistencies """
     return self._getRPC(timeout=timeout).repairCatalog()
 
+  def getChangesSince(self, changeID=0, changeFilter=None, maxChanges=0, timeout=120):
+    """ Get the changes of the catalog made after a given one, from its change log
+
+        :param int changeID: ID of the last change already known, 0 for the whole log
+        :param dict changeFilter: optional selection of the changes by 'Operation', 'Path' and 'SE'
+        :param int maxChanges: maximum number of changes, 0 for the maximum of the service
+        :return: S_OK( dict ) with the 'Changes', and the 'LastChangeID' to give to the next call
+    """
+    return self._getRPC(timeout=timeout).getChangesSince(changeID, changeFilter or {}, maxChanges)
+
+  def cleanChangeLog(self, retentionDays, timeout=600):
+    """ Remove the changes older than the retention period from the change log of the catalog """
+    return self._getRPC(timeout=timeout).cleanChangeLog(retentionDays)
+
   ########################################################################
   # Metadata Catalog Operations
   #
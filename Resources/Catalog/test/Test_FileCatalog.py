@@ -6,11 +6,13 @@ from __future__ import division
 from __future__ import print_function
 
 import sys
+import time
 import unittest
 import mock
 
 import DIRAC
-from DIRAC.Resources.Catalog.FileCatalog import FileCatalog
+from DIRAC.Core.DISET.ThreadConfig import ThreadConfig
+from DIRAC.Resources.Catalog.FileCatalog import FileCatalog, getCatalogLatencies
 
 from DIRAC import S_OK, S_ERROR
 
@@ -87,6 +89,11 @@ class GenericCatalog(object):
           return S_ERROR("%s.%s did not go well" % (self.name, self.call))
         elif retType == "Failed":
           failed[lfn] = "%s.%s failed for %s" % (self.name, self.call, lfn)
+        elif retType == "Slow":
+          time.sleep(0.5)
+          successful[lfn] = "slow"
+        elif retType == "DN":
+          successful[lfn] = ThreadConfig().getDN()
       except ValueError:
         successful[lfn] = "yeah"
 
@@ -422,9 +429,87 @@ class TestRead(unittest.TestCase):
     self.assertEqual(['c2'], sorted(res['Value']['Failed'][lfn]))
 
 
+class TestParallel(unittest.TestCase):
+  """ Tests of the concurrent calls to the catalogs """
+
+  @mock.patch.object(
+      DIRAC.Resources.Catalog.FileCatalog.FileCatalog,
+      '_getSelectedCatalogs',
+      side_effect=mock_fc_getSelectedCatalogs,
+      autospec=True)  # autospec is for the binding of the method...
+  @mock.patch.object(
+      DIRAC.Resources.Catalog.FileCatalog.FileCatalog,
+      '_getEligibleCatalogs',
+      side_effect=mock_fc_getEligibleCatalogs,
+      autospec=True)  # autospec is for the binding of the method...
+  def test_01_timeout(self, mk_getSelectedCatalogs, mk_getEligibleCatalogs):
+    """ The catalogs are called concurrently, and the slow ones are given up """
+
+    fc = FileCatalog(catalogs=['c1_True_True_True_2_0_2_0', 'c2_False_True_True_2_0_2_0',
+                               'c3_False_True_True_2_0_2_0'])
+    self.assertTrue(fc.parallelCalls)
+
+    lfn = '/lhcb/c2/Slow/c3/Slow'
+    start = time.time()
+    res = fc.write1(lfn)
+    self.assertLess(time.time() - start, 0.9)
+    self.assertTrue(res['OK'])
+    self.assertEqual(sorted(res['Value']['Successful'][lfn]), ['c1', 'c2', 'c3'])
+
+    # The answer of c3 is given up, c2 answers right away
+    fc.catalogTimeouts['c3'] = 0.1
+    lfn = '/lhcb/c3/Slow'
+    start = time.time()
+    res = fc.write1(lfn)
+    self.assertLess(time.time() - start, 0.4)
+    self.assertTrue(res['OK'])
+    self.assertEqual(sorted(res['Value']['Successful'][lfn]), ['c1', 'c2'])
+    self.assertIn('timed out', res['Value']['Failed'][lfn]['c3'])
+    self.assertEqual(getCatalogLatencies()['c3']['write1']['Timeouts'], 1)
+    self.assertGreaterEqual(getCatalogLatencies()['c2']['write1']['MaxTime'], 0.5)
+
+    # The read results of the master take precedence
+    res = fc.read1(['/lhcb/c1/Slow'])
+    self.assertEqual(res['Value']['Successful'], {'/lhcb/c1/Slow': 'slow'})
+
+  @mock.patch.object(
+      DIRAC.Resources.Catalog.FileCatalog.FileCatalog,
+      '_getSelectedCatalogs',
+      side_effect=mock_fc_getSelectedCatalogs,
+      autospec=True)  # autospec is for the binding of the method...
+  @mock.patch.object(
+      DIRAC.Resources.Catalog.FileCatalog.FileCatalog,
+      '_getEligibleCatalogs',
+      side_effect=mock_fc_getEligibleCatalogs,
+      autospec=True)  # autospec is for the binding of the method...
+  def test_02_firstAnswer(self, mk_getSelectedCatalogs, mk_getEligibleCatalogs):
+    """ Reads from replicated catalogs """
+
+    fc = FileCatalog(catalogs=['c1_False_True_False_2_0_0_0', 'c2_False_True_False_2_0_0_0'])
+    fc.firstAnswerReads = True
+
+    # The fastest successful answer
+    start = time.time()
+    res = fc.read1(['/lhcb/c1/Slow'])
+    self.assertLess(time.time() - start, 0.4)
+    self.assertEqual(res['Value']['Successful'], {'/lhcb/c1/Slow': 'yeah'})
+
+    res = fc.read1(['/lhcb/c1/Error/c2/Error'])
+    self.assertFalse(res['OK'])
+
+    # The calls are done on behalf of the user of the calling thread
+    ThreadConfig().setDN('/DC=ch/CN=user')
+    try:
+      res = fc.read1(['/lhcb/c1/DN/c2/DN'])
+    finally:
+      ThreadConfig().reset()
+    self.assertEqual(res['Value']['Successful'], {'/lhcb/c1/DN/c2/DN': '/DC=ch/CN=user'})
+
+
 if __name__ == '__main__':
   suite = unittest.defaultTestLoader.loadTestsFromTestCase(TestInitialization)
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TestWrite))
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TestRead))
+  suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TestParallel))
 
   unittest.TextTestRunner(verbosity=2).run(suite)
@@ -16,23 +16,22 @@ from past.builtins import long
 import time
 from six.moves import queue as Queue
 import os
+import glob
 import datetime
-import pickle
 
 from DIRAC import S_OK, S_ERROR
 from DIRAC.Core.Base.AgentModule import AgentModule
 from DIRAC.Core.Utilities.ThreadPool import ThreadPool
-from DIRAC.Core.Utilities.ThreadSafe import Synchronizer
 from DIRAC.Core.Utilities.List import breakListIntoChunks, randomize
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.TransformationSystem.Client.TransformationClient import TransformationClient
 from DIRAC.TransformationSystem.Agent.TransformationAgentsUtilities import TransformationAgentsUtilities
+from DIRAC.TransformationSystem.Utilities.ReplicaCacheStore import ReplicaCacheStore
 from DIRAC.DataManagementSystem.Client.DataManager import DataManager
 
 __RCSID__ = "$Id$"
 
 AGENT_NAME = 'Transformation/TransformationAgent'
-gSynchro = Synchronizer()
 
 
 class TransformationAgent(AgentModule, TransformationAgentsUtilities):
@@ -67,8 +66,6 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
     # Validity of the cache
     self.replicaCache = None
     self.replicaCacheValidity = None
-    self.writingCache = False
-    self.removedFromCache = 0
 
     self.noUnusedDelay = 0
     self.unusedFiles = {}
@@ -99,16 +96,22 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
     # clients
     self.transfClient = TransformationClient()
 
-    # for caching using a pickle file
+    # for caching the replicas in a sqlite file
     self.workDirectory = self.am_getWorkDirectory()
-    self.cacheFile = os.path.join(self.workDirectory, 'ReplicaCache.pkl')
+    self.cacheFile = os.path.join(self.workDirectory, 'ReplicaCache.db')
     self.controlDirectory = self.am_getControlDirectory()
+    # The pickle files of the previous versions of the cache are not used anymore
+    for oldCacheFile in glob.glob(os.path.join(self.workDirectory, 'ReplicaCache*.pkl')):
+      try:
+        os.remove(oldCacheFile)
+      except OSError:
+        pass
 
     # remember the offset if any in TS
     self.lastFileOffset = {}
 
     # Validity of the cache
-    self.replicaCache = {}
+    self.replicaCache = ReplicaCacheStore(self.cacheFile)
     self.replicaCacheValidity = self.am_getOption('ReplicaCacheValidity', 2)
 
     self.noUnusedDelay = self.am_getOption('NoUnusedDelay', 6)
@@ -138,12 +141,15 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
       while self.transInThread:
         time.sleep(2)
       self._logInfo("Threads are empty, terminating the agent...", method=method)
-    self.__writeCache()
+    self.replicaCache.close()
     return S_OK()
 
   def execute(self):
     """ Just puts transformations in the queue
     """
+    # Remove the expired replicas from the cache, ignored by the reads in the meantime
+    self.__cleanCache()
+
     # Get the transformations to process
     res = self.getTransformations()
     if not res['OK']:
@@ -253,8 +259,6 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
     if not transFiles['Value']:
       return S_OK()
 
-    if transID not in self.replicaCache:
-      self.__readCache(transID)
     transFiles = transFiles['Value']
     unusedLfns = [f['LFN'] for f in transFiles]
     unusedFiles = len(unusedLfns)
@@ -454,24 +458,15 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
       self._logInfo("Replica cache cleared", method=method, transID=transID)
       # We may need to get new replicas
       self.__clearCacheForTrans(transID)
-    else:
-      # If the cache needs to be cleaned
-      self.__cleanCache(transID)
     startTime = time.time()
-    dataReplicas = {}
     nLfns = len(lfns)
     self._logVerbose("Getting replicas for %d files" % nLfns, method=method, transID=transID)
-    cachedReplicaSets = self.replicaCache.get(transID, {})
-    cachedReplicas = {}
-    # Merge all sets of replicas
-    for replicas in cachedReplicaSets.values():
-      cachedReplicas.update(replicas)
-    self._logInfo("Number of cached replicas: %d" % len(cachedReplicas), method=method, transID=transID)
-    setCached = set(cachedReplicas)
-    setLfns = set(lfns)
-    for lfn in setLfns & setCached:
-      dataReplicas[lfn] = cachedReplicas[lfn]
-    newLFNs = setLfns - setCached
+    # Only the replicas of the LFNs are read, the expired ones being ignored
+    res = self.replicaCache.getReplicas(transID, lfns, self.replicaCacheValidity * 86400)
+    if not res['OK']:
+      self._logWarn("Failed to get cached replicas", res['Message'], method=method, transID=transID)
+    dataReplicas = res['Value'] if res['OK'] else {}
+    newLFNs = set(lfns) - set(dataReplicas)
     self._logInfo("ReplicaCache hit for %d out of %d LFNs" % (len(dataReplicas), nLfns),
                   method=method, transID=transID)
     if newLFNs:
@@ -494,7 +489,6 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
                     method=method, transID=transID)
       dataReplicas.update(newReplicas)
       noReplicas = newLFNs - set(dataReplicas)
-      self.__writeCache(transID)
       if noReplicas:
         self._logWarn("Found %d files without replicas (or only in Failover)" % len(noReplicas),
                       method=method, transID=transID)
@@ -563,118 +557,34 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
   def __updateCache(self, transID, newReplicas):
     """ Add replicas to the cache
     """
-    self.replicaCache.setdefault(transID, {})[datetime.datetime.utcnow()] = newReplicas
-#    if len( newReplicas ) > 5000:
-#      self.__writeCache( transID )
+    res = self.replicaCache.addReplicas(transID, newReplicas)
+    if not res['OK']:
+      self._logWarn("Failed to cache replicas", res['Message'], method='__updateCache', transID=transID)
 
   def __clearCacheForTrans(self, transID):
     """ Remove all replicas for a transformation
     """
-    self.replicaCache.pop(transID, None)
+    res = self.replicaCache.clear(transID)
+    if not res['OK']:
+      self._logWarn("Failed to clear the replica cache", res['Message'], method='__clearCacheForTrans',
+                    transID=transID)
 
-  def __cleanReplicas(self, transID, lfns):
-    """ Remove cached replicas that are not in a list
-    """
-    cachedReplicas = set()
-    for replicas in self.replicaCache.get(transID, {}).values():
-      cachedReplicas.update(replicas)
-    toRemove = cachedReplicas - set(lfns)
-    if toRemove:
-      self._logInfo("Remove %d files from cache" % len(toRemove), method='__cleanReplicas', transID=transID)
-      self.__removeFromCache(transID, toRemove)
-
-  def __cleanCache(self, transID):
-    """ Cleans the cache
+  def __cleanCache(self):
+    """ Remove the expired replicas of all transformations from the cache
     """
-    try:
-      if transID in self.replicaCache:
-        timeLimit = datetime.datetime.utcnow() - datetime.timedelta(days=self.replicaCacheValidity)
-        for updateTime in set(self.replicaCache[transID]):
-          nCache = len(self.replicaCache[transID][updateTime])
-          if updateTime < timeLimit or not nCache:
-            self._logInfo("Clear %s replicas for transformation %s, time %s" %
-                          ('%d cached' % nCache if nCache else 'empty cache', str(transID), str(updateTime)),
-                          transID=transID, method='__cleanCache')
-            del self.replicaCache[transID][updateTime]
-        # Remove empty transformations
-        if not self.replicaCache[transID]:
-          del self.replicaCache[transID]
-    except Exception as x:
-      self._logException("Exception when cleaning replica cache:", lException=x)
+    res = self.replicaCache.removeExpired(self.replicaCacheValidity * 86400)
+    if not res['OK']:
+      self._logWarn("Failed to clean the replica cache", res['Message'], method='__cleanCache')
+    elif res['Value']:
+      self._logInfo("Removed %d expired replicas from cache" % res['Value'], method='__cleanCache')
 
   def __removeFilesFromCache(self, transID, lfns):
-    removed = self.__removeFromCache(transID, lfns)
-    if removed:
-      self._logInfo("Removed %d replicas from cache" % removed, method='__removeFilesFromCache', transID=transID)
-      self.__writeCache(transID)
-
-  def __removeFromCache(self, transID, lfns):
-    if transID not in self.replicaCache:
-      return
-    removed = 0
-    if self.replicaCache[transID] and lfns:
-      for lfn in lfns:
-        for timeKey in self.replicaCache[transID]:
-          if self.replicaCache[transID][timeKey].pop(lfn, None):
-            removed += 1
-    return removed
-
-  def __cacheFile(self, transID):
-    return self.cacheFile.replace('.pkl', '_%s.pkl' % str(transID))
-
-  @gSynchro
-  def __readCache(self, transID):
-    """ Reads from the cache
-    """
-    if transID in self.replicaCache:
-      return
-    try:
-      method = '__readCache'
-      fileName = self.__cacheFile(transID)
-      if not os.path.exists(fileName):
-        self.replicaCache[transID] = {}
-      else:
-        with open(fileName, 'r') as cacheFile:
-          self.replicaCache[transID] = pickle.load(cacheFile)
-        self._logInfo("Successfully loaded replica cache from file %s (%d files)" %
-                      (fileName, self.__filesInCache(transID)),
-                      method=method, transID=transID)
-    except Exception as x:
-      self._logException("Failed to load replica cache from file %s" % fileName, lException=x,
-                         method=method, transID=transID)
-      self.replicaCache[transID] = {}
-
-  def __filesInCache(self, transID):
-    cache = self.replicaCache.get(transID, {})
-    return sum(len(lfns) for lfns in cache.values())
-
-  @gSynchro
-  def __writeCache(self, transID=None):
-    """ Writes the cache
-    """
-    method = '__writeCache'
-    try:
-      startTime = time.time()
-      transList = [transID] if transID else set(self.replicaCache)
-      filesInCache = 0
-      nCache = 0
-      for t_id in transList:
-        # Protect the copy of the cache
-        filesInCache += self.__filesInCache(t_id)
-        # write to a temporary file in order to avoid corrupted files
-        cacheFile = self.__cacheFile(t_id)
-        tmpFile = cacheFile + '.tmp'
-        with open(tmpFile, 'w') as fd:
-          pickle.dump(self.replicaCache.get(t_id, {}), fd)
-        # Now rename the file as it shold
-        os.rename(tmpFile, cacheFile)
-        nCache += 1
-      self._logInfo("Successfully wrote %d replica cache file(s) (%d files) in %.1f seconds"
-                    % (nCache, filesInCache, time.time() - startTime),
-                    method=method, transID=transID if transID else None)
-    except Exception as x:
-      self._logException("Could not write replica cache file %s" % cacheFile, lException=x,
-                         method=method, transID=t_id)
+    res = self.replicaCache.removeReplicas(transID, lfns)
+    if not res['OK']:
+      self._logWarn("Failed to remove replicas from cache", res['Message'], method='__removeFilesFromCache',
+                    transID=transID)
+    elif res['Value']:
+      self._logInfo("Removed %d replicas from cache" % res['Value'], method='__removeFilesFromCache', transID=transID)
 
   def __generatePluginObject(self, plugin, clients):
     """ This simply instantiates the TransformationPlugin class with the relevant plugin name
@@ -700,10 +610,5 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
     """ Standard plugin callback
     """
     if invalidateCache:
-      try:
-        if transID in self.replicaCache:
-          self._logInfo("Removed cached replicas for transformation", method='pluginCallBack', transID=transID)
-          self.replicaCache.pop(transID)
-          self.__writeCache(transID)
-      except BaseException:
-        pass
+      self._logInfo("Removed cached replicas for transformation", method='pluginCallBack', transID=transID)
+      self.__clearCacheForTrans(transID)
@@ -12,10 +12,11 @@ import datetime
 import pytest
 from mock import MagicMock
 
-from DIRAC import gLogger
+from DIRAC import gLogger, S_OK
 # sut
 from DIRAC.TransformationSystem.Agent.TaskManagerAgentBase import TaskManagerAgentBase
 from DIRAC.TransformationSystem.Agent.TransformationAgent import TransformationAgent
+from DIRAC.TransformationSystem.Utilities.ReplicaCacheStore import ReplicaCacheStore
 
 mockAM = MagicMock()
 
@@ -209,3 +210,28 @@ def test__getTransformationFiles(mocker, transDict, getTFiles, expected):
   tc_mock.getTransformationFiles.return_value = getTFiles
   res = TransformationAgent()._getTransformationFiles(transDict, {'TransformationClient': tc_mock})
   assert res['OK'] == expected
+
+
+def test__getDataReplicasCache(mocker, tmpdir):
+  mocker.patch('DIRAC.TransformationSystem.Agent.TransformationAgent.AgentModule', side_effect=mockAM)
+  agent = TransformationAgent()
+  agent.controlDirectory = str(tmpdir)
+  agent.replicaCache = ReplicaCacheStore(str(tmpdir.join('ReplicaCache.db')))
+  agent.replicaCacheValidity = 2
+  dm_mock = MagicMock()
+  dm_mock.getReplicasForJobs.side_effect = \
+      lambda lfns, getUrl: S_OK({'Successful': dict((lfn, {'SE1': ''}) for lfn in lfns), 'Failed': {}})
+  clients = {'DataManager': dm_mock, 'TransformationClient': tc_mock}
+  transDict = {'TransformationID': 123, 'Status': 'Active', 'Body': ''}
+
+  res = agent._TransformationAgent__getDataReplicas(transDict, ['/a', '/b'], clients)
+  assert res['OK'], res
+  assert res['Value'] == {'/a': ['SE1'], '/b': ['SE1']}
+  # Only the LFNs not cached are asked to the catalog
+  res = agent._TransformationAgent__getDataReplicas(transDict, ['/a', '/c'], clients)
+  assert res['Value'] == {'/a': ['SE1'], '/c': ['SE1']}
+  assert sorted(dm_mock.getReplicasForJobs.call_args[0][0]) == ['/c']
+
+  agent._TransformationAgent__removeFilesFromCache(123, ['/a'])
+  assert agent.replicaCache.getReplicas(123, ['/a', '/b'], 3600)['Value'] == {'/b': ['SE1']}
+  agent.replicaCache.close()
@@ -0,0 +1,172 @@
+""" Persistent store of the replicas cached by the TransformationAgent
+
+    The replicas are stored in a sqlite file, with one record per transformation and LFN holding
+    the SEs of the LFN and the time at which they were obtained. The records are written as they are
+    obtained from the catalog, only the LFNs asked are read, and the expired records are ignored
+    by the reads until they are removed.
+
+    Each thread of the agent uses its own connection to the file, which is in the WAL journal mode:
+    the reads are not blocked by the writes, the writes are serialised by sqlite.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import sqlite3
+import threading
+import time
+
+from DIRAC import S_OK, S_ERROR
+
+# Maximum number of LFNs in the queries, below the default limit of the number of sqlite variables
+QUERY_CHUNK_SIZE = 500
+# Time in seconds to wait for the lock of the file held by another connection
+BUSY_TIMEOUT = 60
+
+
+class ReplicaCacheStore(object):
+  """ Store of the replicas of the LFNs of the transformations
+  """
+
+  def __init__(self, fileName):
+    """ c'tor
+
+        :param str fileName: path of the sqlite file, created if needed
+    """
+    self.fileName = fileName
+    self.__local = threading.local()
+    self.__lock = threading.Lock()
+    self.__connections = []
+
+  def __getConnection(self):
+    """ Get the connection of the current thread, opened and with the table created if needed """
+    connection = getattr(self.__local, 'connection', None)
+    if connection is None:
+      connection = sqlite3.connect(self.fileName, timeout=BUSY_TIMEOUT, check_same_thread=False)
+      connection.execute("PRAGMA journal_mode=WAL")
+      connection.execute("PRAGMA synchronous=NORMAL")
+      with connection:
+        connection.execute("CREATE TABLE IF NOT EXISTS Replicas (TransID INTEGER NOT NULL, LFN TEXT NOT NULL, "
+                           "SEs TEXT NOT NULL, UpdateTime REAL NOT NULL, PRIMARY KEY (TransID, LFN)) WITHOUT ROWID")
+        connection.execute("CREATE INDEX IF NOT EXISTS UpdateTime ON Replicas (UpdateTime)")
+      self.__local.connection = connection
+      with self.__lock:
+        self.__connections.append(connection)
+    return connection
+
+  def getReplicas(self, transID, lfns, validity):
+    """ Get the cached replicas of LFNs
+
+        :param int transID: transformation ID
+        :param list lfns: LFNs
+        :param float validity: time in seconds after which the cached replicas are expired
+        :return: S_OK( dict ) LFN: list of SEs, for the LFNs with replicas cached and not expired / S_ERROR
+    """
+    replicas = {}
+    lfns = list(lfns)
+    try:
+      connection = self.__getConnection()
+      minTime = time.time() - validity
+      for start in range(0, len(lfns), QUERY_CHUNK_SIZE):
+        chunk = lfns[start:start + QUERY_CHUNK_SIZE]
+        req = "SELECT LFN, SEs FROM Replicas WHERE TransID=? AND UpdateTime>=? AND LFN IN (%s)"
+        rows = connection.execute(req % ','.join('?' * len(chunk)), [transID, minTime] + chunk)
+        replicas.update((lfn, ses.split(',')) for lfn, ses in rows)
+    except sqlite3.Error as e:
+      return S_ERROR('Failed to read the replica cache %s: %s' % (self.fileName, repr(e)))
+    return S_OK(replicas)
+
+  def addReplicas(self, transID, replicas):
+    """ Add or replace the cached replicas of LFNs
+
+        :param int transID: transformation ID
+        :param dict replicas: LFN: list of SEs
+        :return: S_OK/S_ERROR
+    """
+    now = time.time()
+    try:
+      connection = self.__getConnection()
+      with connection:
+        connection.executemany("INSERT OR REPLACE INTO Replicas (TransID, LFN, SEs, UpdateTime) VALUES (?,?,?,?)",
+                               ((transID, lfn, ','.join(ses), now) for lfn, ses in replicas.items()))
+    except sqlite3.Error as e:
+      return S_ERROR('Failed to write the replica cache %s: %s' % (self.fileName, repr(e)))
+    return S_OK()
+
+  def removeReplicas(self, transID, lfns):
+    """ Remove the cached replicas of LFNs
+
+        :param int transID: transformation ID
+        :param list lfns: LFNs
+        :return: S_OK( int ) number of LFNs removed / S_ERROR
+    """
+    lfns = list(lfns)
+    removed = 0
+    try:
+      connection = self.__getConnection()
+      with connection:
+        for start in range(0, len(lfns), QUERY_CHUNK_SIZE):
+          chunk = lfns[start:start + QUERY_CHUNK_SIZE]
+          req = "DELETE FROM Replicas WHERE TransID=? AND LFN IN (%s)" % ','.join('?' * len(chunk))
+          removed += connection.execute(req, [transID] + chunk).rowcount
+    except sqlite3.Error as e:
+      return S_ERROR('Failed to write the replica cache %s: %s' % (self.fileName, repr(e)))
+    return S_OK(removed)
+
+  def removeExpired(self, validity):
+    """ Remove the expired replicas of all the transformations
+
+        :param float validity: time in seconds after which the cached replicas are expired
+        :return: S_OK( int ) number of LFNs removed / S_ERROR
+    """
+    try:
+      connection = self.__getConnection()
+      with connection:
+        removed = connection.execute("DELETE FROM Replicas WHERE UpdateTime<?", (time.time() - validity,)).rowcount
+    except sqlite3.Error as e:
+      return S_ERROR('Failed to write the replica cache %s: %s' % (self.fileName, repr(e)))
+    return S_OK(removed)
+
+  def clear(self, transID):
+    """ Remove the cached replicas of a transformation
+
+        :param int transID: transformation ID
+        :return: S_OK( int ) number of LFNs removed / S_ERROR
+    """
+    try:
+      connection = self.__getConnection()
+      with connection:
+        removed = connection.execute("DELETE FROM Replicas WHERE TransID=?", (transID,)).rowcount
+    except sqlite3.Error as e:
+      return S_ERROR('Failed to write the replica cache %s: %s' % (self.fileName, repr(e)))
+    return S_OK(removed)
+
+  def countReplicas(self, transID=None):
+    """ Count the cached LFNs, expired or not
+
+        :param int transID: transformation ID, all the transformations if None
+        :return: S_OK( int ) / S_ERROR
+    """
+    try:
+      connection = self.__getConnection()
+      if transID is None:
+        rows = connection.execute("SELECT COUNT(*) FROM Replicas")
+      else:
+        rows = connection.execute("SELECT COUNT(*) FROM Replicas WHERE TransID=?", (transID,))
+      return S_OK(rows.fetchone()[0])
+    except sqlite3.Error as e:
+      return S_ERROR('Failed to read the replica cache %s: %s' % (self.fileName, repr(e)))
+
+  def close(self):
+    """ Close the connections of all the threads """
+    with self.__lock:
+      for connection in self.__connections:
+        try:
+          connection.close()
+        except sqlite3.Error:
+          pass
+      self.__connections = []
+    # The connections of the threads are reopened if the store is used again
+    self.__local = threading.local()
@@ -0,0 +1,104 @@
+""" Test of the persistent store of the replicas cached by the TransformationAgent
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import threading
+import time
+
+import pytest
+
+from DIRAC.TransformationSystem.Utilities.ReplicaCacheStore import ReplicaCacheStore, QUERY_CHUNK_SIZE
+
+
+@pytest.fixture
+def store(tmpdir):
+  replicaStore = ReplicaCacheStore(os.path.join(str(tmpdir), 'ReplicaCache.db'))
+  yield replicaStore
+  replicaStore.close()
+
+
+def test_addAndGet(store):
+  assert store.addReplicas(1, {'/vo/f1': ['SE1', 'SE2'], '/vo/f2': ['SE3']})['OK']
+  assert store.addReplicas(2, {'/vo/f1': ['SE4']})['OK']
+  res = store.getReplicas(1, ['/vo/f1', '/vo/f3'], 3600)
+  assert res['OK'], res
+  assert res['Value'] == {'/vo/f1': ['SE1', 'SE2']}
+  assert store.getReplicas(2, ['/vo/f1', '/vo/f2'], 3600)['Value'] == {'/vo/f1': ['SE4']}
+
+  # Replaced
+  assert store.addReplicas(1, {'/vo/f1': ['SE5']})['OK']
+  assert store.getReplicas(1, ['/vo/f1'], 3600)['Value'] == {'/vo/f1': ['SE5']}
+  assert store.countReplicas(1)['Value'] == 2
+  assert store.countReplicas()['Value'] == 3
+
+
+def test_manyLFNs(store):
+  replicas = dict(('/vo/f%d' % i, ['SE%d' % (i % 3)]) for i in range(3 * QUERY_CHUNK_SIZE + 1))
+  assert store.addReplicas(1, replicas)['OK']
+  res = store.getReplicas(1, list(replicas) + ['/vo/missing'], 3600)
+  assert res['OK'], res
+  assert res['Value'] == replicas
+  res = store.removeReplicas(1, set(replicas))
+  assert res['OK'], res
+  assert res['Value'] == len(replicas)
+
+
+def test_remove(store):
+  assert store.addReplicas(1, {'/vo/f1': ['SE1'], '/vo/f2': ['SE1']})['OK']
+  assert store.addReplicas(2, {'/vo/f1': ['SE1']})['OK']
+  assert store.removeReplicas(1, ['/vo/f1', '/vo/f3'])['Value'] == 1
+  assert store.getReplicas(1, ['/vo/f1', '/vo/f2'], 3600)['Value'] == {'/vo/f2': ['SE1']}
+  assert store.clear(1)['Value'] == 1
+  assert store.countReplicas(1)['Value'] == 0
+  assert store.countReplicas(2)['Value'] == 1
+
+
+def test_expiry(store):
+  assert store.addReplicas(1, {'/vo/f1': ['SE1']})['OK']
+  time.sleep(0.05)
+  assert store.addReplicas(1, {'/vo/f2': ['SE1']})['OK']
+  # The expired replicas are ignored until removed
+  assert store.getReplicas(1, ['/vo/f1', '/vo/f2'], 0.02)['Value'] == {'/vo/f2': ['SE1']}
+  assert store.countReplicas(1)['Value'] == 2
+  assert store.removeExpired(0.02)['Value'] == 1
+  assert store.countReplicas(1)['Value'] == 1
+
+
+def test_persistence(store):
+  assert store.addReplicas(1, {'/vo/f1': ['SE1']})['OK']
+  store.close()
+  other = ReplicaCacheStore(store.fileName)
+  assert other.getReplicas(1, ['/vo/f1'], 3600)['Value'] == {'/vo/f1': ['SE1']}
+  other.close()
+  # Reopened when used after being closed
+  assert store.countReplicas()['Value'] == 1
+
+
+def test_threads(store):
+  errors = []
+
+  def addAndRead(transID):
+    for i in range(20):
+      replicas = dict(('/vo/t%d/f%d_%d' % (transID, i, j), ['SE1']) for j in range(50))
+      if not store.addReplicas(transID, replicas)['OK']:
+        errors.append(transID)
+      res = store.getReplicas(transID, list(replicas), 3600)
+      if not res['OK'] or res['Value'] != replicas:
+        errors.append(transID)
+
+  threads = [threading.Thread(target=addAndRead, args=(transID,)) for transID in range(4)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  assert not errors
+  assert store.countReplicas()['Value'] == 4 * 20 * 50
+
+
+def test_error(tmpdir):
+  store = ReplicaCacheStore(os.path.join(str(tmpdir), 'missing', 'ReplicaCache.db'))
+  assert not store.getReplicas(1, ['/vo/f1'], 3600)['OK']
+  assert not store.addReplicas(1, {'/vo/f1': ['SE1']})['OK']
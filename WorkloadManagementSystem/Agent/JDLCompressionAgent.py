@@ -0,0 +1,106 @@
+""" The JDLCompressionAgent converts the JDLs stored in the JobDB to the format given by its JDLStorage option,
+    a batch of jobs at a time, in the background of the services. Only the jobs in a final status are converted:
+    the others are left for a later pass, after the agent restarts or a new dictionary is trained.
+
+    With the Dictionary storage, the first compression dictionary is trained on the JDLs already stored.
+    A new one can be trained by setting the DictionaryRetrainingPeriod option, the JDLs compressed with
+    the previous dictionaries being then converted to the new one.
+
+.. literalinclude:: ../ConfigTemplate.cfg
+  :start-after: ##BEGIN JDLCompressionAgent
+  :end-before: ##END
+  :dedent: 2
+  :caption: JDLCompressionAgent options
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+__RCSID__ = "$Id$"
+
+import time
+
+from DIRAC import S_OK
+from DIRAC.Core.Base.AgentModule import AgentModule
+from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB, JDL_STORAGE_TEXT, JDL_STORAGE_DICTIONARY
+
+
+class JDLCompressionAgent(AgentModule):
+  """ Agent converting the stored JDLs
+  """
+
+  def __init__(self, *args, **kwargs):
+    """ c'tor
+    """
+    AgentModule.__init__(self, *args, **kwargs)
+
+    self.jobDB = None
+    self.lastJobID = 0
+    self.lastTrainingTime = 0
+    self.maxJobsAtOnce = 1000
+    self.maxJobsPerCycle = 100000
+    self.dictionarySampleSize = 1000
+    self.dictionaryRetrainingPeriod = 0
+
+  def initialize(self):
+    """ Sets defaults
+    """
+    self.jobDB = JobDB()
+    return S_OK()
+
+  def execute(self):
+    """ Convert the next batches of JDLs
+    """
+    self.maxJobsAtOnce = self.am_getOption('MaxJobsAtOnce', self.maxJobsAtOnce)
+    self.maxJobsPerCycle = self.am_getOption('MaxJobsPerCycle', self.maxJobsPerCycle)
+    self.dictionarySampleSize = self.am_getOption('DictionarySampleSize', self.dictionarySampleSize)
+    self.dictionaryRetrainingPeriod = self.am_getOption('DictionaryRetrainingPeriod', self.dictionaryRetrainingPeriod)
+
+    if self.jobDB.jdlStorage == JDL_STORAGE_TEXT:
+      self.log.info("The JDLs are stored as text, nothing to convert")
+      return S_OK()
+
+    if self.jobDB.jdlStorage == JDL_STORAGE_DICTIONARY:
+      # The first dictionary is trained at the first cycle
+      retrainingDue = self.dictionaryRetrainingPeriod > 0 and \
+          time.time() - self.lastTrainingTime > self.dictionaryRetrainingPeriod * 86400
+      if not self.lastTrainingTime or retrainingDue:
+        result = self.__trainDictionary(retrainingDue)
+        if not result['OK']:
+          self.log.error("Failed to train the JDL compression dictionary", result['Message'])
+
+    nbConverted = 0
+    nbProcessed = 0
+    while nbProcessed < self.maxJobsPerCycle:
+      result = self.jobDB.migrateJDLs(self.lastJobID, self.maxJobsAtOnce)
+      if not result['OK']:
+        self.log.error("Failed to convert the JDLs", result['Message'])
+        break
+      lastJobID, converted = result['Value']
+      if lastJobID == self.lastJobID:
+        # All the jobs are processed: the next jobs are stored in the right format
+        break
+      nbProcessed += self.maxJobsAtOnce
+      nbConverted += converted
+      self.lastJobID = lastJobID
+    self.log.info("JDLs converted", "%d, up to job %d" % (nbConverted, self.lastJobID))
+    return S_OK()
+
+  def __trainDictionary(self, retraining):
+    """ Train a new dictionary, if there is none or if it is time to replace it
+    """
+    self.lastTrainingTime = time.time()
+    if not retraining:
+      # Keep the dictionary of a previous run of the agent
+      result = self.jobDB.getJDLDictionaryID()
+      if not result['OK']:
+        return result
+      if result['Value'] is not None:
+        return S_OK()
+    result = self.jobDB.trainJDLDictionary(self.dictionarySampleSize)
+    if not result['OK']:
+      return result
+    # All the JDLs are to be converted to the new dictionary
+    self.lastJobID = 0
+    return S_OK()
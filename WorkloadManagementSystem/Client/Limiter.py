@@ -171,14 +171,10 @@ class Limiter(object):
       cK = "Running:%s:%s" % (siteName, attName)
       data = self.condCache.get(cK)
       if not data:
-        result = self.jobDB.getCounters(
-            'Jobs', [attName], {
-                'Site': siteName, 'Status': [
-                    'Running', 'Matched', 'Stalled']})
+        result = self.jobDB.getRunningJobCounters(siteName, attName)
         if not result['OK']:
           return result
         data = result['Value']
-        data = dict([(k[0][attName], k[1]) for k in data])
         self.condCache.add(cK, 10, data)
       for attValue in limitsDict[attName]:
         limit = limitsDict[attName][attValue]
@@ -14,6 +14,7 @@ from DIRAC import gLogger
 
 from DIRAC.FrameworkSystem.Client.MonitoringClient import gMonitor
 from DIRAC.Core.Utilities.PrettyPrint import printDict
+from DIRAC.Core.Utilities.ClassAd.ClassAdLight import ClassAd
 from DIRAC.Core.Security import Properties
 from DIRAC.ConfigurationSystem.Client.Helpers import Registry
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
@@ -30,8 +31,10 @@ class Matcher(object):
   """ Logic for matching
   """
 
-  def __init__(self, pilotAgentsDB=None, jobDB=None, tqDB=None, jlDB=None, opsHelper=None):
+  def __init__(self, pilotAgentsDB=None, jobDB=None, tqDB=None, jlDB=None, opsHelper=None, tqIndex=None):
     """ c'tor
+
+        :param tqIndex: optional TaskQueueIndex, to select the matching task queues in memory
     """
     if pilotAgentsDB:
       self.pilotAgentsDB = pilotAgentsDB
@@ -55,6 +58,8 @@ class Matcher(object):
     else:
       self.opsHelper = Operations()
 
+    self.tqIndex = tqIndex
+
     self.log = gLogger.getSubLogger("Matcher")
 
     self.limiter = Limiter(jobDB=self.jobDB, opsHelper=self.opsHelper)
@@ -85,7 +90,7 @@ class Matcher(object):
     self.log.info('Resource description for matching', printDict(toPrintDict))
 
     negativeCond = self.limiter.getNegativeCondForSite(resourceDict['Site'])
-    result = self.tqDB.matchAndGetJob(resourceDict, negativeCond=negativeCond)
+    result = self.tqDB.matchAndGetJob(resourceDict, negativeCond=negativeCond, tqIndex=self.tqIndex)
 
     if not result['OK']:
       raise RuntimeError(result['Message'])
@@ -146,6 +151,133 @@ class Matcher(object):
 
     return resultDict
 
+  def selectJobs(self, resourceDescription, credDict, nJobs, resources=None):
+    """ Select up to nJobs jobs fitting together in the available resources, for the resources running
+        several jobs at the same time. The checks of the credentials, of the mask and of the pilot version
+        are done once, and the reporting of the matched jobs in bulk.
+
+        :param dict resourceDescription: ceDict, like for selectJob
+        :param dict credDict: credentials of the pilot
+        :param int nJobs: maximum number of jobs
+        :param dict resources: available NumberOfProcessors and MaxRAM (MB),
+                               by default the ones of the resourceDescription
+
+        :return: list of dicts, like the one returned by selectJob, empty if no match was found
+    """
+
+    startTime = time.time()
+
+    resources = resources or {}
+    freeProcessors = int(resources.get('NumberOfProcessors', resourceDescription.get('NumberOfProcessors', 1)))
+    freeRAM = resources.get('MaxRAM', resourceDescription.get('MaxRAM'))
+    capacityDescription = dict(resourceDescription, NumberOfProcessors=freeProcessors)
+    if freeRAM:
+      capacityDescription['MaxRAM'] = freeRAM
+
+    resourceDict = self._getResourceDict(capacityDescription, credDict)
+    self.log.info('Resource description for matching jobs',
+                  '%s jobs, %s processors, %s MB: %s' % (nJobs, freeProcessors, freeRAM, printDict(resourceDict)))
+
+    checkDelay = self.opsHelper.getValue("JobScheduling/CheckMatchingDelay", True)
+    jdls = {}
+    while len(jdls) < nJobs and freeProcessors > 0:
+      negativeCond = self.limiter.getNegativeCondForSite(resourceDict['Site'])
+      result = self.tqDB.matchAndGetJob(resourceDict, negativeCond=negativeCond, tqIndex=self.tqIndex)
+      if not result['OK']:
+        raise RuntimeError(result['Message'])
+      if not result['Value']['matchFound']:
+        break
+      jobID = result['Value']['jobId']
+      result = self.jobDB.getJobJDL(jobID)
+      if not result['OK']:
+        raise RuntimeError("Failed to get the job JDL")
+      jdls[jobID] = result['Value']
+      if checkDelay:
+        self.limiter.updateDelayCounters(resourceDict['Site'], jobID)
+
+      # What is left for the next jobs
+      processors, ram = self._getJobResources(jdls[jobID], freeProcessors)
+      freeProcessors -= processors
+      capacityDescription['NumberOfProcessors'] = freeProcessors
+      capacityDescription.pop('WholeNode', None)
+      if freeRAM:
+        freeRAM = max(freeRAM - ram, 0)
+        capacityDescription['MaxRAM'] = freeRAM
+      tags = self._processResourceDescription(capacityDescription).get('Tag')
+      if tags:
+        resourceDict['Tag'] = tags
+      else:
+        resourceDict.pop('Tag', None)
+      if not set(resourceDict.get('RequiredTag', [])).issubset(set(tags or [])):
+        break
+
+    if not jdls:
+      self.log.info("No match found")
+      return []
+
+    # Only the jobs still waiting can be given
+    result = self.jobDB.getAttributesForJobList(list(jdls), ['OwnerDN', 'OwnerGroup', 'Status'])
+    if not result['OK']:
+      raise RuntimeError('Could not retrieve job attributes')
+    jobAttributes = result['Value']
+    for jobID in list(jdls):
+      if jobAttributes.get(jobID, {}).get('Status') != 'Waiting':
+        self.log.error('Job matched by the TQ is not in Waiting state', str(jobID))
+        result = self.tqDB.deleteJob(jobID)
+        if not result['OK']:
+          raise RuntimeError(result['Message'])
+        jdls.pop(jobID)
+    if not jdls:
+      return []
+    jobIDs = sorted(jdls)
+
+    self._reportStatus(resourceDict, jobIDs)
+
+    if not resourceDict.get('PilotInfoReportedFlag', False):
+      self._updatePilotInfo(resourceDict)
+    self._updatePilotJobMapping(resourceDict, jobIDs)
+
+    resultList = []
+    for jobID in jobIDs:
+      resultDict = {}
+      # Get some extra stuff into the response returned
+      resOpt = self.jobDB.getJobOptParameters(jobID)
+      if resOpt['OK']:
+        resultDict.update(resOpt['Value'])
+      resultDict['JDL'] = jdls[jobID]
+      resultDict['JobID'] = jobID
+      resultDict['DN'] = jobAttributes[jobID]['OwnerDN']
+      resultDict['Group'] = jobAttributes[jobID]['OwnerGroup']
+      resultDict['PilotInfoReportedFlag'] = True
+      resultList.append(resultDict)
+
+    matchTime = time.time() - startTime
+    self.log.info("Match time", "[%s] for %d jobs" % (str(matchTime), len(resultList)))
+    gMonitor.addMark("matchTime", matchTime)
+
+    return resultList
+
+  @staticmethod
+  def _getJobResources(jdl, freeProcessors):
+    """ Processors and memory (MB) taken by a job, allocated like the PoolComputingElement does
+
+        :param str jdl: job JDL
+        :param int freeProcessors: processors available for the job
+        :return: tuple (processors, memory)
+    """
+    classAdJob = ClassAd(jdl if jdl.strip().startswith('[') else '[%s]' % jdl)
+    if classAdJob.getAttributeString('WholeNode').lower() in ('1', 'yes', 'true', 'y'):
+      processors = freeProcessors
+    else:
+      processors = classAdJob.getAttributeInt('NumberOfProcessors') or \
+          classAdJob.getAttributeInt('MinNumberOfProcessors') or 1
+      maxProcessors = classAdJob.getAttributeInt('MaxNumberOfProcessors')
+      if maxProcessors:
+        processors = max(processors, min(maxProcessors, freeProcessors))
+    # The job MaxRAM is in GB
+    ram = (classAdJob.getAttributeInt('MaxRAM') or 0) * 1000
+    return processors, ram
+
   def _getResourceDict(self, resourceDescription, credDict):
     """ from resourceDescription to resourceDict (just various mods)
     """
@@ -226,9 +358,11 @@ class Matcher(object):
     return resourceDict
 
   def _reportStatus(self, resourceDict, jobID):
-    """ Reports the status of the matched job in jobDB and jobLoggingDB
+    """ Reports the status of the matched job(s) in jobDB and jobLoggingDB
 
         Do not fail if errors happen here
+
+        :param jobID: job ID or list of job IDs
     """
     attNames = ['Status', 'MinorStatus', 'ApplicationStatus', 'Site']
     attValues = ['Matched', 'Assigned', 'Unknown', resourceDict['Site']]
@@ -239,10 +373,8 @@ class Matcher(object):
     else:
       self.log.verbose("Set job attributes for jobID", jobID)
 
-    result = self.jlDB.addLoggingRecord(jobID,
-                                        status='Matched',
-                                        minor='Assigned',
-                                        source='Matcher')
+    jobIDs = jobID if isinstance(jobID, list) else [jobID]
+    result = self.jlDB.addLoggingRecords([(jID, 'Matched', 'Assigned', 'idem', '', 'Matcher') for jID in jobIDs])
     if not result['OK']:
       self.log.error("Problem reporting job status",
                      "addLoggingRecord, jobID = %s: %s" % (jobID, result['Message']))
@@ -292,14 +424,17 @@ class Matcher(object):
 
   def _updatePilotJobMapping(self, resourceDict, jobID):
     """ Update pilot to job mapping information
+
+        :param jobID: job ID or list of job IDs
     """
     pilotReference = resourceDict.get('PilotReference', '')
     if pilotReference and pilotReference != 'Unknown':
-      result = self.pilotAgentsDB.setCurrentJobID(pilotReference, jobID)
+      jobIDs = jobID if isinstance(jobID, list) else [jobID]
+      result = self.pilotAgentsDB.setCurrentJobID(pilotReference, jobIDs[-1])
       if not result['OK']:
         self.log.error("Problem updating pilot information",
                        ";setCurrentJobID. pilotReference: %s; %s" % (pilotReference, result['Message']))
-      result = self.pilotAgentsDB.setJobForPilot(jobID, pilotReference, updateStatus=False)
+      result = self.pilotAgentsDB.setJobsForPilot(jobIDs, pilotReference, updateStatus=False)
       if not result['OK']:
         self.log.error("Problem updating pilot information",
                        "; setJobForPilot. pilotReference: %s; %s" % (pilotReference, result['Message']))
@@ -85,6 +85,53 @@ class MatcherTestCase(ClientsTestCase):
 
     self.assertEqual(res, resExpected)
 
+  def test__getJobResources(self):
+
+    self.assertEqual(self.matcher._getJobResources('[ JobID = 1; ]', 8), (1, 0))
+    self.assertEqual(self.matcher._getJobResources('NumberOfProcessors = 4; MaxRAM = 2;', 8), (4, 2000))
+    self.assertEqual(self.matcher._getJobResources('[ MinNumberOfProcessors = 2; MaxNumberOfProcessors = 6; ]', 4),
+                     (4, 0))
+    self.assertEqual(self.matcher._getJobResources('[ WholeNode = "yes"; ]', 8), (8, 0))
+
+  def test_selectJobs(self):
+
+    jdls = {1: '[ NumberOfProcessors = 4; ]', 2: '[ JobID = 2; ]', 3: '[ JobID = 3; ]', 4: '[ JobID = 4; ]'}
+    matchedTags = []
+
+    def matchAndGetJob(resourceDict, **kwargs):
+      matchedTags.append(resourceDict.get('Tag'))
+      return {'OK': True, 'Value': {'matchFound': True, 'jobId': len(matchedTags)}}
+
+    self.tqDBMock.matchAndGetJob.side_effect = matchAndGetJob
+    self.jobDBMock.getJobJDL.side_effect = lambda jobID: {'OK': True, 'Value': jdls[jobID]}
+    self.jobDBMock.getAttributesForJobList.side_effect = lambda jobIDs, _attributes: {
+        'OK': True, 'Value': dict((jobID, {'OwnerDN': 'dn', 'OwnerGroup': 'group',
+                                           'Status': 'Running' if jobID == 2 else 'Waiting'}) for jobID in jobIDs)}
+    self.jobDBMock.getJobOptParameters.return_value = {'OK': True, 'Value': {}}
+    self.matcher._checkCredentials = MagicMock(side_effect=lambda resourceDict, _credDict: resourceDict)
+    self.matcher._checkPilotVersion = MagicMock()
+    self.matcher._checkMask = MagicMock(return_value=True)
+    self.matcher.limiter = MagicMock()
+
+    resourceDescription = {'Setup': 'Test', 'CPUTime': 100000, 'Site': 'Site1', 'PilotReference': 'pilot',
+                           'NumberOfProcessors': 8}
+    res = self.matcher.selectJobs(resourceDescription, {}, 10, {'NumberOfProcessors': 6})
+
+    # 4 + 1 + 1 processors, the job 2 is not waiting any more
+    self.assertEqual([resultDict['JobID'] for resultDict in res], [1, 3])
+    self.assertEqual(res[0]['JDL'], jdls[1])
+    self.assertEqual(sorted(matchedTags[0]), ['2Processors', '3Processors', '4Processors', '5Processors',
+                                              '6Processors', 'MultiProcessor'])
+    self.assertEqual(sorted(matchedTags[1]), ['2Processors', 'MultiProcessor'])
+    self.assertEqual(matchedTags[2], None)
+    self.tqDBMock.deleteJob.assert_called_once_with(2)
+    # The DB updates are done once for all the jobs
+    self.jobDBMock.setJobAttributes.assert_called_once_with([1, 3], ['Status', 'MinorStatus', 'ApplicationStatus',
+                                                                     'Site'],
+                                                            ['Matched', 'Assigned', 'Unknown', 'Site1'])
+    self.assertEqual(len(self.jlDBMock.addLoggingRecords.call_args[0][0]), 2)
+    self.pilotAgentsDBMock.setJobsForPilot.assert_called_once_with([1, 3], 'pilot', updateStatus=False)
+
 #############################################################################
 
 
@@ -9,6 +9,16 @@ The following options can be set in ``Systems/WorkloadManagement/<Setup>/Databas
 
 * *MaxRescheduling*:     Set the maximum number of times a job can be rescheduled, default *3*.
 * *CompressJDLs*:        Enable compression of JDLs when they are stored in the database, default *False*.
+* *JDLStorage*:          Format of the JDLs stored in the database: *Text* (default, compressed as
+                        base64 text if CompressJDLs is set), *Binary* (zlib compressed binary) or *Dictionary*
+                        (zlib compressed binary with a preset dictionary trained on the stored JDLs, Python 3 only).
+                        The JDLs already stored are converted by the JDLCompressionAgent.
+* *RunningCounterAttributes*: Job attributes for which the numbers of running jobs per site are counted
+                        in the RunningJobCounters table, default *JobType*. They are used by the Limiter
+                        to check the running limits of the sites without counting the jobs.
+
+The running job counters are updated with the job status changes done through the setJobAttributes method,
+and reconciled with the Jobs table by reconcileRunningJobCounters.
 
 """
 
@@ -17,8 +27,12 @@ from __future__ import absolute_import
 from __future__ import division
 
 import six
+import time
+import uuid
 import zlib
 
+from collections import defaultdict
+
 from six.moves import range
 import operator
 
@@ -35,10 +49,23 @@ from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 from DIRAC.Core.Utilities import Time
 from DIRAC.Core.Utilities.DErrno import EWMSSUBM
 from DIRAC.Core.Utilities.Decorators import deprecated
+from DIRAC.Core.Utilities.List import breakListIntoChunks
 from DIRAC.Core.Utilities.ObjectLoader import ObjectLoader
 from DIRAC.ResourceStatusSystem.Client.SiteStatus import SiteStatus
 from DIRAC.WorkloadManagementSystem.Client.JobState.JobManifest import JobManifest
 from DIRAC.WorkloadManagementSystem.Client import JobStatus
+from DIRAC.WorkloadManagementSystem.Utilities import JDLCompression
+
+# Formats of the stored JDLs
+JDL_STORAGE_TEXT = 'Text'
+JDL_STORAGE_BINARY = 'Binary'
+JDL_STORAGE_DICTIONARY = 'Dictionary'
+JDL_STORAGES = (JDL_STORAGE_TEXT, JDL_STORAGE_BINARY, JDL_STORAGE_DICTIONARY)
+# Period in seconds of the check of a new JDL compression dictionary
+JDL_DICTIONARY_REFRESH_PERIOD = 600
+
+# Statuses of the jobs counted in the RunningJobCounters table
+RUNNING_COUNTER_STATUSES = (JobStatus.RUNNING, JobStatus.MATCHED, JobStatus.STALLED)
 
 #############################################################################
 
@@ -57,6 +84,16 @@ class JobDB(DB):
     self.__initialized = False
     self.maxRescheduling = self.getCSOption('MaxRescheduling', 3)
     self.compressJDLs = self.getCSOption('CompressJDLs', False)
+    self.jdlStorage = self.getCSOption('JDLStorage', JDL_STORAGE_TEXT)
+    if self.jdlStorage not in JDL_STORAGES:
+      self.log.error("Unknown JDLStorage, the JDLs are stored as text", self.jdlStorage)
+      self.jdlStorage = JDL_STORAGE_TEXT
+    elif self.jdlStorage == JDL_STORAGE_DICTIONARY and not JDLCompression.DICTIONARY_SUPPORTED:
+      self.log.error("The JDL compression with a dictionary requires Python 3, the JDLs are stored as binary")
+      self.jdlStorage = JDL_STORAGE_BINARY
+    self.__jdlDictionaries = {}
+    self.__currentJDLDictionary = (None, None)
+    self.__currentJDLDictionaryTime = 0
 
     # loading the function that will be used to determine the platform (it can be VO specific)
     res = ObjectLoader().loadObject("ConfigurationSystem.Client.Helpers.Resources", 'getDIRACPlatform')
@@ -76,8 +113,24 @@ class JobDB(DB):
 
     self.jdl2DBParameters = ['JobName', 'JobType', 'JobGroup']
 
+    self.runningCounterAttributes = [attName for attName in self.getCSOption('RunningCounterAttributes', ['JobType'])
+                                     if attName in self.jobAttributeNames]
+    result = self.__checkRunningJobCountersTable()
+    if not result['OK']:
+      self.log.error("Can not create the RunningJobCounters table, the running jobs are not counted",
+                     result['Message'])
+      self.runningCounterAttributes = []
+
+    if self.jdlStorage == JDL_STORAGE_DICTIONARY:
+      result = self.__checkJDLDictionariesTable()
+      if not result['OK']:
+        self.log.error("Can not create the JDLDictionaries table, the JDLs are stored as binary", result['Message'])
+        self.jdlStorage = JDL_STORAGE_BINARY
+
     self.log.info("MaxReschedule", self.maxRescheduling)
     self.log.info("CompressJDLs", self.compressJDLs)
+    self.log.info("JDLStorage", self.jdlStorage)
+    self.log.info("RunningCounterAttributes", self.runningCounterAttributes)
     self.log.info("==================================================")
     self.__initialized = True
 
@@ -99,6 +152,43 @@ class JobDB(DB):
 
     return S_OK()
 
+  def __checkRunningJobCountersTable(self):
+    """ Create the RunningJobCounters table of the installations prior to its introduction
+    """
+    if not self.runningCounterAttributes:
+      return S_OK()
+    res = self._query("SHOW TABLES LIKE 'RunningJobCounters'")
+    if not res['OK']:
+      return res
+    if res['Value']:
+      return S_OK()
+    res = self._createTables({'RunningJobCounters': {'Fields': {'Site': "VARCHAR(100) NOT NULL",
+                                                                'Attribute': "VARCHAR(32) NOT NULL",
+                                                                'Value': "VARCHAR(255) NOT NULL",
+                                                                'Count': "INT(11) NOT NULL DEFAULT 0"},
+                                                     'PrimaryKey': ['Site', 'Attribute', 'Value'],
+                                                     'Engine': 'InnoDB',
+                                                     'Charset': 'latin1'}})
+    if not res['OK']:
+      return res
+    return self.reconcileRunningJobCounters()
+
+  def __checkJDLDictionariesTable(self):
+    """ Create the JDLDictionaries table of the installations prior to its introduction
+    """
+    res = self._query("SHOW TABLES LIKE 'JDLDictionaries'")
+    if not res['OK']:
+      return res
+    if res['Value']:
+      return S_OK()
+    fields = {'DictionaryID': "INT(11) UNSIGNED NOT NULL AUTO_INCREMENT",
+              'Dictionary': "MEDIUMBLOB NOT NULL",
+              'CreationTime': "DATETIME NOT NULL"}
+    return self._createTables({'JDLDictionaries': {'Fields': fields,
+                                                   'PrimaryKey': ['DictionaryID'],
+                                                   'Engine': 'InnoDB',
+                                                   'Charset': 'latin1'}})
+
 #############################################################################
   def getAttributesForJobList(self, jobIDList, attrList=None):
     """ Get attributes for the jobs in the the jobIDList.
@@ -599,6 +689,9 @@ class JobDB(DB):
     if attrName not in self.jobAttributeNames:
       return S_ERROR(EWMSSUBM, 'Request to set non-existing job attribute')
 
+    if self.__changesRunningJobCounters([attrName]):
+      return self.setJobAttributes(jobID, [attrName], [attrValue], update=update, myDate=myDate)
+
     ret = self._escapeString(jobID)
     if not ret['OK']:
       return ret
@@ -671,8 +764,129 @@ class JobDB(DB):
     if myDate:
       cmd += ' AND LastUpdateTime < %s' % myDate
 
+    if self.__changesRunningJobCounters(attrNames):
+      return self.__updateWithRunningJobCounters(cmd, jIDList, dict(zip(attrNames, attrValues)), myDate)
+
     return self._transaction([cmd])
 
+  def __changesRunningJobCounters(self, attrNames):
+    """ Whether changing these attributes can change the running job counters """
+    if not self.runningCounterAttributes:
+      return False
+    return any(attrName in ('Status', 'Site') or attrName in self.runningCounterAttributes for attrName in attrNames)
+
+  def __updateWithRunningJobCounters(self, updateCmd, jIDList, newValues, myDate=None):
+    """ Update the jobs, and the running job counters according to the jobs changes
+
+        :param str updateCmd: UPDATE statement of the jobs
+        :param list jIDList: escaped job IDs
+        :param dict newValues: new values of the attributes
+        :param str myDate: optional condition on the LastUpdateTime, as for the update
+    """
+    countedAttributes = ['Status', 'Site'] + self.runningCounterAttributes
+    selectCmd = 'SELECT %s FROM Jobs WHERE JobID in ( %s )' % (', '.join(countedAttributes), ', '.join(jIDList))
+    if myDate:
+      selectCmd += ' AND LastUpdateTime < %s' % myDate
+
+    retVal = self._getConnection()
+    if not retVal['OK']:
+      return retVal
+    connection = retVal['Value']
+    try:
+      cursor = connection.cursor()
+      # The connections are in autocommit mode
+      cursor.execute('START TRANSACTION')
+      # Lock the jobs, so that their previous state is the one changed by the update
+      cursor.execute(selectCmd + ' FOR UPDATE')
+      oldRows = cursor.fetchall()
+      result = cursor.execute(updateCmd)
+      # The counters are changed in the same transaction as the jobs, for the reconciliation to see both or none
+      rows = self.__getRunningJobCounterChanges(countedAttributes, oldRows, newValues)
+      if rows:
+        cursor.executemany("INSERT INTO RunningJobCounters (Site, Attribute, Value, Count) VALUES (%s, %s, %s, %s) "
+                           "ON DUPLICATE KEY UPDATE Count = Count + VALUES(Count)", rows)
+      connection.commit()
+    except Exception as error:  # pylint: disable=broad-except
+      self.logger.exception(error)
+      connection.rollback()
+      return S_ERROR(DErrno.EMYSQL, error)
+    cursor.close()
+    return S_OK([(updateCmd, result)])
+
+  def __getRunningJobCounterChanges(self, countedAttributes, oldRows, newValues):
+    """ Changes of the running job counters when jobs are updated
+
+        :param list countedAttributes: names of the attributes in the rows
+        :param list oldRows: values of the counted attributes of the jobs before the update
+        :param dict newValues: new values of the attributes
+
+        :return: sorted list of (Site, Attribute, Value, change), without the null changes
+    """
+    counterChanges = defaultdict(int)
+    for row in oldRows:
+      oldJob = dict(zip(countedAttributes, row))
+      newJob = dict(oldJob)
+      newJob.update((attName, value) for attName, value in newValues.items() if attName in countedAttributes)
+      for job, change in ((oldJob, -1), (newJob, 1)):
+        if job['Status'] in RUNNING_COUNTER_STATUSES:
+          for attName in self.runningCounterAttributes:
+            counterChanges[(str(job['Site']), attName, str(job[attName]))] += change
+    # Sorted, so that the concurrent transactions lock the counters in the same order
+    return sorted(key + (change,) for key, change in counterChanges.items() if change)
+
+  def getRunningJobCounters(self, site, attName):
+    """ Get the number of running, matched and stalled jobs at a site for each value of an attribute.
+        They are read from the RunningJobCounters table for the RunningCounterAttributes,
+        and otherwise counted in the Jobs table.
+
+        :param str site: site name
+        :param str attName: job attribute name
+
+        :return: S_OK( { attribute value : number of jobs } ) / S_ERROR
+    """
+    if attName not in self.runningCounterAttributes:
+      result = self.getCounters('Jobs', [attName], {'Site': site, 'Status': list(RUNNING_COUNTER_STATUSES)})
+      if not result['OK']:
+        return result
+      return S_OK(dict((attDict[attName], count) for attDict, count in result['Value']))
+
+    result = self.getFields('RunningJobCounters', ['Value', 'Count'], {'Site': site, 'Attribute': attName})
+    if not result['OK']:
+      return result
+    return S_OK(dict((value, count) for value, count in result['Value'] if count > 0))
+
+  def reconcileRunningJobCounters(self):
+    """ Set the running job counters from the Jobs table, to fix the changes done without setJobAttributes
+        and the updates of the counters which failed
+    """
+    retVal = self._getConnection()
+    if not retVal['OK']:
+      return retVal
+    connection = retVal['Value']
+    statuses = ', '.join("'%s'" % status for status in RUNNING_COUNTER_STATUSES)
+    rows = []
+    try:
+      cursor = connection.cursor()
+      cursor.execute('START TRANSACTION')
+      # Deleting the counters locks them: the jobs updates changing them wait for this transaction,
+      # and are counted below only if they were committed before
+      cursor.execute('DELETE FROM RunningJobCounters')
+      for attName in self.runningCounterAttributes:
+        cursor.execute('SELECT Site, %s, COUNT(*) FROM Jobs WHERE Status IN (%s) GROUP BY Site, %s' %
+                       (attName, statuses, attName))
+        rows.extend((site, attName, str(value), count) for site, value, count in cursor.fetchall())
+      if rows:
+        cursor.executemany('INSERT INTO RunningJobCounters (Site, Attribute, Value, Count) VALUES (%s, %s, %s, %s)',
+                           rows)
+      connection.commit()
+    except Exception as error:  # pylint: disable=broad-except
+      self.logger.exception(error)
+      connection.rollback()
+      return S_ERROR(DErrno.EMYSQL, error)
+    cursor.close()
+    self.log.verbose("Running job counters reconciled", "%d counters" % len(rows))
+    return S_OK()
+
 #############################################################################
   def setJobStatus(self, jobID, status='', minor='', application=''):
     """ Set status of the job specified by its jobID
@@ -771,20 +985,21 @@ class JobDB(DB):
     if not parameters:
       return S_OK()
 
-    insertValueList = []
-    for name, value in parameters:
-      ret = self._escapeString(name)
-      if not ret['OK']:
-        return ret
-      e_name = ret['Value']
-      ret = self._escapeString(value)
-      if not ret['OK']:
-        return ret
-      e_value = ret['Value']
-      insertValueList.append('(%s,%s,%s)' % (jobID, e_name, e_value))
+    return self.insertMany('JobParameters', ['JobID', 'Name', 'Value'],
+                           [(int(jobID), str(name), self._blobValue(value)) for name, value in parameters],
+                           updateFields=['Value'])
 
-    cmd = 'REPLACE JobParameters (JobID,Name,Value) VALUES %s' % ', '.join(insertValueList)
-    return self._update(cmd)
+  @staticmethod
+  def _blobValue(value):
+    """ Value to store in a BLOB column with a parameterized statement:
+        bytes are stored as they are, anything else as its UTF-8 encoded string
+
+        :param value: value of any type
+        :return: bytes
+    """
+    if not isinstance(value, (six.binary_type, six.text_type)):
+      value = str(value)
+    return six.ensure_binary(value)
 
 #############################################################################
   def setJobOptParameter(self, jobID, name, value):
@@ -867,20 +1082,8 @@ class JobDB(DB):
   def setJobJDL(self, jobID, jdl=None, originalJDL=None):
     """ Insert JDL's for job specified by jobID
     """
-    ret = self._escapeString(jobID)
-    if not ret['OK']:
-      return ret
-    jobID = ret['Value']
-
-    ret = self._escapeString(self.__compressJDL(jdl))
-    if not ret['OK']:
-      return ret
-    e_JDL = ret['Value']
-
-    ret = self._escapeString(self.__compressJDL(originalJDL))
-    if not ret['OK']:
-      return ret
-    e_originalJDL = ret['Value']
+    # The JDLs can be binary: they are passed as parameters of the commands
+    jobID = int(jobID)
 
     req = "SELECT OriginalJDL FROM JobJDLs WHERE JobID=%s" % jobID
     result = self._query(req)
@@ -892,36 +1095,176 @@ class JobDB(DB):
     if jdl:
 
       if updateFlag:
-        cmd = "UPDATE JobJDLs Set JDL=%s WHERE JobID=%s" % (e_JDL, jobID)
+        cmd = "UPDATE JobJDLs Set JDL=%s WHERE JobID=%s"
+        args = (self.__compressJDL(jdl), jobID)
       else:
-        cmd = "INSERT INTO JobJDLs (JobID,JDL) VALUES (%s,%s)" % (jobID, e_JDL)
-      result = self._update(cmd)
+        cmd = "INSERT INTO JobJDLs (JobID,JDL) VALUES (%s,%s)"
+        args = (jobID, self.__compressJDL(jdl))
+      result = self._update(cmd, args=args)
       if not result['OK']:
         return result
     if originalJDL:
       if updateFlag:
-        cmd = "UPDATE JobJDLs Set OriginalJDL=%s WHERE JobID=%s" % (e_originalJDL, jobID)
+        cmd = "UPDATE JobJDLs Set OriginalJDL=%s WHERE JobID=%s"
+        args = (self.__compressJDL(originalJDL), jobID)
       else:
-        cmd = "INSERT INTO JobJDLs (JobID,OriginalJDL) VALUES (%s,%s)" % (jobID, e_originalJDL)
+        cmd = "INSERT INTO JobJDLs (JobID,OriginalJDL) VALUES (%s,%s)"
+        args = (jobID, self.__compressJDL(originalJDL))
 
-      result = self._update(cmd)
+      result = self._update(cmd, args=args)
 
     return result
 
-#############################################################################
   def __compressJDL(self, jdl):
     """Return compressed JDL string."""
+    if self.jdlStorage == JDL_STORAGE_BINARY:
+      return JDLCompression.compressJDL(jdl)
+    if self.jdlStorage == JDL_STORAGE_DICTIONARY:
+      dictionaryID, dictionary = self.__getCurrentJDLDictionary()
+      return JDLCompression.compressJDL(jdl, dictionaryID, dictionary)
     if not self.compressJDLs:
       return jdl
     return zlib.compress(jdl, -1).encode('base64')
 
   def __extractJDL(self, compressedJDL):
     """Return decompressed JDL string."""
-    # the starting bracket is guaranteeed by JobManager.submitJob
-    # we need the check to be backward compatible
-    if compressedJDL.startswith('['):
-      return compressedJDL
-    return zlib.decompress(compressedJDL.decode('base64'))
+    dictionaryID = JDLCompression.getDictionaryID(compressedJDL)
+    if dictionaryID is not None and dictionaryID not in self.__jdlDictionaries:
+      result = self.__loadJDLDictionaries()
+      if not result['OK']:
+        return result
+    return JDLCompression.extractJDL(compressedJDL, self.__jdlDictionaries)
+
+  def __loadJDLDictionaries(self):
+    """ Load the JDL compression dictionaries not yet known
+    """
+    knownIDs = ', '.join(str(dictionaryID) for dictionaryID in self.__jdlDictionaries)
+    cmd = "SELECT DictionaryID, Dictionary FROM JDLDictionaries"
+    if knownIDs:
+      cmd += " WHERE DictionaryID NOT IN ( %s )" % knownIDs
+    result = self._query(cmd)
+    if not result['OK']:
+      return result
+    for dictionaryID, dictionary in result['Value']:
+      self.__jdlDictionaries[int(dictionaryID)] = dictionary
+    return S_OK()
+
+  def __getCurrentJDLDictionary(self):
+    """ Get the most recent JDL compression dictionary, checking periodically for a new one
+
+        :return: tuple ( dictionary ID, dictionary ), ( None, None ) if there is no dictionary yet
+    """
+    if time.time() - self.__currentJDLDictionaryTime > JDL_DICTIONARY_REFRESH_PERIOD:
+      result = self._query("SELECT MAX(DictionaryID) FROM JDLDictionaries")
+      if not result['OK']:
+        self.log.warn("Can not get the JDL compression dictionary", result['Message'])
+      else:
+        self.__currentJDLDictionaryTime = time.time()
+        dictionaryID = result['Value'][0][0]
+        if dictionaryID is not None:
+          dictionaryID = int(dictionaryID)
+          if dictionaryID not in self.__jdlDictionaries:
+            result = self.__loadJDLDictionaries()
+            if not result['OK']:
+              self.log.warn("Can not get the JDL compression dictionary", result['Message'])
+          if dictionaryID in self.__jdlDictionaries:
+            self.__currentJDLDictionary = (dictionaryID, self.__jdlDictionaries[dictionaryID])
+    return self.__currentJDLDictionary
+
+  def getJDLDictionaryID(self):
+    """ Get the ID of the JDL compression dictionary used for the new JDLs
+
+        :return: S_OK( dictionary ID, None if there is no dictionary )
+    """
+    return S_OK(self.__getCurrentJDLDictionary()[0])
+
+  def trainJDLDictionary(self, sampleSize=1000):
+    """ Train a new JDL compression dictionary on the most recent JDLs, and use it for the next stored JDLs
+
+        :param int sampleSize: number of JDLs to train the dictionary on
+
+        :return: S_OK( dictionary ID ) / S_ERROR
+    """
+    result = self._query("SELECT JDL FROM JobJDLs ORDER BY JobID DESC LIMIT %d" % int(sampleSize))
+    if not result['OK']:
+      return result
+    jdls = []
+    for row in result['Value']:
+      res = self.__extractJDL(row[0])
+      if res['OK'] and res['Value']:
+        jdls.append(res['Value'])
+    dictionary = JDLCompression.trainDictionary(jdls)
+    if not dictionary:
+      return S_ERROR("Not enough JDLs to train a dictionary")
+
+    result = self._update("INSERT INTO JDLDictionaries (Dictionary, CreationTime) VALUES (%s, UTC_TIMESTAMP())",
+                          args=(dictionary,))
+    if not result['OK']:
+      return result
+    dictionaryID = int(result['lastRowId'])
+    self.__jdlDictionaries[dictionaryID] = dictionary
+    self.__currentJDLDictionary = (dictionaryID, dictionary)
+    self.__currentJDLDictionaryTime = time.time()
+    self.log.info("New JDL compression dictionary",
+                  "%d: %d bytes trained on %d JDLs" % (dictionaryID, len(dictionary), len(jdls)))
+    return S_OK(dictionaryID)
+
+  def migrateJDLs(self, lastJobID=0, maxJobs=1000):
+    """ Convert the stored JDLs of the jobs following lastJobID to the JDLStorage format.
+        Only the jobs in a final status are converted, the JDLs of the others being still changed
+        by the optimizers or a rescheduling. A JDL changed since it was read is not overwritten.
+
+        :param int lastJobID: the jobs with a larger JobID are converted
+        :param int maxJobs: maximum number of jobs converted
+
+        :return: S_OK( ( largest JobID processed, number of jobs converted ) ) / S_ERROR
+    """
+    if self.jdlStorage == JDL_STORAGE_TEXT:
+      return S_ERROR("The JDLs are only converted to the Binary and Dictionary storages")
+    finalStates = ', '.join("'%s'" % status for status in JobStatus.JOB_FINAL_STATES)
+    result = self._query("SELECT JobJDLs.JobID, JobJDLs.JDL, JobJDLs.OriginalJDL FROM JobJDLs "
+                         "JOIN Jobs ON Jobs.JobID = JobJDLs.JobID "
+                         "WHERE JobJDLs.JobID > %d AND Jobs.Status IN (%s) ORDER BY JobJDLs.JobID LIMIT %d" %
+                         (int(lastJobID), finalStates, int(maxJobs)))
+    if not result['OK']:
+      return result
+    if not result['Value']:
+      return S_OK((int(lastJobID), 0))
+
+    if self.jdlStorage == JDL_STORAGE_DICTIONARY:
+      targetFormat = JDLCompression.FORMAT_ZLIB_DICTIONARY
+      targetDictionaryID = self.__getCurrentJDLDictionary()[0]
+      if targetDictionaryID is None:
+        targetFormat = JDLCompression.FORMAT_ZLIB
+    else:
+      targetFormat = JDLCompression.FORMAT_ZLIB
+      targetDictionaryID = None
+
+    rows = []
+    for row in result['Value']:
+      jobID = int(row[0])
+      jdls = list(row[1:])
+      # The JDL of a job being inserted is still empty
+      if not jdls[0]:
+        continue
+      if all(not jdl or (JDLCompression.getJDLFormat(jdl) == targetFormat and
+                         JDLCompression.getDictionaryID(jdl) == targetDictionaryID) for jdl in jdls):
+        continue
+      newJDLs = []
+      for jdl in jdls:
+        res = self.__extractJDL(jdl)
+        if not res['OK']:
+          self.log.error("Can not convert the JDL", "of job %d: %s" % (jobID, res['Message']))
+          break
+        newJDLs.append(self.__compressJDL(res['Value']) if res['Value'] else jdl)
+      else:
+        rows.append(newJDLs + [jobID] + jdls)
+
+    # Conditional on the JDLs read, so that a concurrent change is not lost
+    res = self.updateMany('JobJDLs', ['JDL', 'OriginalJDL'], ['JobID', 'JDL', 'OriginalJDL'], rows)
+    if not res['OK']:
+      return res
+    return S_OK((int(result['Value'][-1][0]), res['Value']))
 
   def __insertNewJDL(self, jdl):
     """Insert a new JDL in the system, this produces a new JobID
@@ -929,9 +1272,8 @@ class JobDB(DB):
 
     err = 'JobDB.__insertNewJDL: Failed to retrieve a new Id.'
 
-    result = self.insertFields('JobJDLs',
-                               ['JDL', 'JobRequirements', 'OriginalJDL'],
-                               ['', '', self.__compressJDL(jdl)])
+    result = self._update("INSERT INTO JobJDLs (JDL, JobRequirements, OriginalJDL) VALUES (%s, %s, %s)",
+                          args=('', '', self.__compressJDL(jdl)))
     if not result['OK']:
       self.log.error('Can not insert New JDL', result['Message'])
       return result
@@ -965,7 +1307,7 @@ class JobDB(DB):
       jdl = result['Value']
       if not jdl:
         return S_OK(jdl)
-      return S_OK(self.__extractJDL(jdl[0][0]))
+      return self.__extractJDL(jdl[0][0])
     return result
 
 #############################################################################
@@ -1065,26 +1407,9 @@ class JobDB(DB):
     if not result['OK']:
       return result
 
-    priority = classAdJob.getAttributeInt('Priority')
-    if priority is None:
-      priority = 0
-    jobAttrNames.append('UserPriority')
-    jobAttrValues.append(priority)
-
-    for jdlName in self.jdl2DBParameters:
-      # Defaults are set by the DB.
-      jdlValue = classAdJob.getAttributeString(jdlName)
-      if jdlValue:
-        jobAttrNames.append(jdlName)
-        jobAttrValues.append(jdlValue)
-
-    jdlValue = classAdJob.getAttributeString('Site')
-    if jdlValue:
-      jobAttrNames.append('Site')
-      if jdlValue.find(',') != -1:
-        jobAttrValues.append('Multiple')
-      else:
-        jobAttrValues.append(jdlValue)
+    for attrName, attrValue in self.__getJDLAttributes(classAdJob):
+      jobAttrNames.append(attrName)
+      jobAttrValues.append(attrValue)
 
     jobAttrNames.append('VerifiedFlag')
     jobAttrValues.append('True')
@@ -1147,14 +1472,217 @@ class JobDB(DB):
 
     return retVal
 
+  def insertNewJobsIntoDB(self, jdlList, owner, ownerDN, ownerGroup, diracSetup,
+                          initialStatus=JobStatus.RECEIVED,
+                          initialMinorStatus="Job accepted"):
+    """ Insert several jobs, typically the jobs generated from a parametric job, in bulk:
+        the JobIDs are allocated in a block, the rows of each table are inserted with multiple rows
+        statements, and the whole submission is done in a single transaction. Contrary to
+        insertNewJobIntoDB, an invalid job description makes the whole submission fail.
+
+        :param list jdlList: job description JDLs
+        :param str owner: job owner user name
+        :param str ownerDN: job owner DN
+        :param str ownerGroup: job owner group
+        :param str diracSetup: setup in which context the jobs are submitted
+        :param str initialStatus: optional initial job status (Received by default)
+        :param str initialMinorStatus: optional initial minor job status
+        :return: S_OK( list of dictionaries with the JobID, Status and MinorStatus of the new jobs ) / S_ERROR
+    """
+    if not jdlList:
+      return S_OK([])
+
+    # 1.- check the job descriptions before writing anything
+    jobManifests = []
+    originalJDLs = []
+    for jdl in jdlList:
+      jobManifest = JobManifest()
+      result = jobManifest.load(jdl)
+      if not result['OK']:
+        return result
+      jobManifest.setOptionsFromDict({'OwnerName': owner,
+                                      'OwnerDN': ownerDN,
+                                      'OwnerGroup': ownerGroup,
+                                      'DIRACSetup': diracSetup})
+      result = jobManifest.check()
+      if not result['OK']:
+        return result
+      jobManifests.append(jobManifest)
+      # Fix the possible lack of the brackets in the JDL
+      if jdl.strip()[0].find('[') != 0:
+        jdl = '[' + jdl + ']'
+      originalJDLs.append(self.__compressJDL(jdl))
+
+    retVal = self._getConnection()
+    if not retVal['OK']:
+      return retVal
+    connection = retVal['Value']
+    try:
+      cursor = connection.cursor()
+      # The connections are in autocommit mode
+      cursor.execute('START TRANSACTION')
+      result = self.__insertNewJobs(connection, jobManifests, originalJDLs, owner, ownerDN, ownerGroup,
+                                    diracSetup, initialStatus, initialMinorStatus)
+      if result['OK']:
+        connection.commit()
+      else:
+        connection.rollback()
+    except Exception as error:  # pylint: disable=broad-except
+      self.logger.exception(error)
+      connection.rollback()
+      return S_ERROR(DErrno.EMYSQL, error)
+    cursor.close()
+    if not result['OK']:
+      return result
+
+    self.log.info('JobDB: New JobIDs served',
+                  "%d jobs from %s to %s" % (len(result['Value']), result['Value'][0]['JobID'],
+                                             result['Value'][-1]['JobID']))
+    return result
+
+  def __insertNewJobs(self, connection, jobManifests, originalJDLs, owner, ownerDN, ownerGroup,
+                      diracSetup, initialStatus, initialMinorStatus):
+    """ Insert the rows of new jobs within the transaction of insertNewJobsIntoDB
+    """
+    # 2.- allocate the JobIDs: the new rows are tagged to find them back, the automatic IDs
+    # of the rows of a statement being increasing
+    result = self._query('SELECT MAX(JobID) FROM JobJDLs', conn=connection)
+    if not result['OK']:
+      return result
+    maxJobID = result['Value'][0][0] or 0
+    tag = 'Submission %s' % uuid.uuid4()
+    result = self.insertMany('JobJDLs', ['JDL', 'JobRequirements', 'OriginalJDL'],
+                             [('', tag, originalJDL) for originalJDL in originalJDLs], conn=connection)
+    if not result['OK']:
+      return result
+    result = self._query("SELECT JobID FROM JobJDLs WHERE JobID > %d AND JobRequirements = '%s' ORDER BY JobID" %
+                         (maxJobID, tag), conn=connection)
+    if not result['OK']:
+      return result
+    jobIDs = [int(row[0]) for row in result['Value']]
+    if len(jobIDs) != len(jobManifests):
+      return S_ERROR(EWMSSUBM, 'Failed to allocate the JobIDs: %d for %d jobs' % (len(jobIDs), len(jobManifests)))
+
+    # 3.- prepare the rows of the jobs
+    submissionCache = {}
+    jdlRows = []
+    jobRows = defaultdict(list)
+    parameterRows = []
+    inputDataRows = []
+    jobStatuses = []
+    for jobID, jobManifest, originalJDL in zip(jobIDs, jobManifests, originalJDLs):
+      jobManifest.setOption('JobID', jobID)
+      now = Time.toString()
+      jobAttributes = [('JobID', jobID),
+                       ('LastUpdateTime', now),
+                       ('SubmissionTime', now),
+                       ('Owner', owner),
+                       ('OwnerDN', ownerDN),
+                       ('OwnerGroup', ownerGroup),
+                       ('DIRACSetup', diracSetup)]
+
+      jobJDL = jobManifest.dumpAsJDL()
+      # Replace the JobID placeholder if any
+      if jobJDL.find('%j') != -1:
+        jobJDL = jobJDL.replace('%j', str(jobID))
+
+      classAdJob = ClassAd(jobJDL)
+      classAdReq = ClassAd('[]')
+      if not classAdJob.isOK():
+        # Unlike insertNewJobIntoDB, no job is inserted as Failed: the whole submission is rolled back
+        return S_ERROR(EWMSSUBM, 'Error in JDL syntax of the job %d of the submission' % (len(jobStatuses) + 1))
+
+      classAdJob.insertAttributeInt('JobID', jobID)
+      result = self.__prepareJob(classAdJob, classAdReq, owner, ownerDN, ownerGroup, diracSetup,
+                                 submissionCache=submissionCache)
+      if not result['OK']:
+        return result
+      if result['Value']:
+        return S_ERROR(EWMSSUBM, result['Value'])
+
+      jobAttributes += self.__getJDLAttributes(classAdJob)
+      jobAttributes += [('VerifiedFlag', 'True'),
+                        ('Status', initialStatus),
+                        ('MinorStatus', initialMinorStatus)]
+
+      classAdJob.insertAttributeInt('JobRequirements', classAdReq.asJDL())
+      jdlRows.append((jobID, self.__compressJDL(classAdJob.asJDL()), '', originalJDL))
+      jobRows[tuple(name for name, _value in jobAttributes)].append([value for _name, value in jobAttributes])
+
+      if classAdJob.lookupAttribute("Parameters"):
+        parameterRows += [(jobID, str(name), self._blobValue(value))
+                          for name, value in classAdJob.getDictionaryFromSubJDL("Parameters").items()]
+
+      if classAdJob.lookupAttribute('InputData'):
+        # some jobs are setting empty string as InputData
+        inputDataRows += [(jobID, lfn.strip()) for lfn in classAdJob.getListFromExpression('InputData') if lfn]
+
+      jobStatuses.append({'JobID': jobID, 'Status': initialStatus, 'MinorStatus': initialMinorStatus})
+
+    # 4.- insert them, with as few statements as possible
+    result = self.insertMany('JobJDLs', ['JobID', 'JDL', 'JobRequirements', 'OriginalJDL'], jdlRows,
+                             updateFields=['JDL', 'JobRequirements'], conn=connection)
+    if not result['OK']:
+      return result
+    # The optional attributes are set by the DB when missing: the jobs are grouped by set of attributes
+    for attrNames, rows in jobRows.items():
+      result = self.insertMany('Jobs', list(attrNames), rows, conn=connection)
+      if not result['OK']:
+        return result
+    result = self.insertMany('JobParameters', ['JobID', 'Name', 'Value'], parameterRows,
+                             updateFields=['Value'], conn=connection)
+    if not result['OK']:
+      return result
+    result = self.insertMany('InputData', ['JobID', 'LFN'], inputDataRows, conn=connection)
+    if not result['OK']:
+      return result
+
+    return S_OK(jobStatuses)
+
   def __checkAndPrepareJob(self, jobID, classAdJob, classAdReq, owner, ownerDN,
                            ownerGroup, diracSetup, jobAttrNames, jobAttrValues):
     """
       Check Consistency of Submitted JDL and set some defaults
       Prepare subJDL with Job Requirements
     """
+    result = self.__prepareJob(classAdJob, classAdReq, owner, ownerDN, ownerGroup, diracSetup)
+    if not result['OK']:
+      return result
+    error = result['Value']
+
+    if error:
+      retVal = S_ERROR(EWMSSUBM, error)
+      retVal['JobId'] = jobID
+      retVal['Status'] = 'Failed'
+      retVal['MinorStatus'] = error
+
+      jobAttrNames.append('Status')
+      jobAttrValues.append('Failed')
+
+      jobAttrNames.append('MinorStatus')
+      jobAttrValues.append(error)
+      resultInsert = self.setJobAttributes(jobID, jobAttrNames, jobAttrValues)
+      if not resultInsert['OK']:
+        retVal['MinorStatus'] += '; %s' % resultInsert['Message']
+
+      return retVal
+
+    return S_OK()
+
+  def __prepareJob(self, classAdJob, classAdReq, owner, ownerDN, ownerGroup, diracSetup, submissionCache=None):
+    """
+      Check the consistency of the job ClassAd, set its defaults and fill the requirements ClassAd
+
+      :param dict submissionCache: values from the configuration, kept between the jobs of a bulk submission
+
+      :return: S_OK( error message, empty if the job is correct ) / S_ERROR
+    """
+    if submissionCache is None:
+      submissionCache = {}
     error = ''
-    vo = getVOForGroup(ownerGroup)
+    if 'VO' not in submissionCache:
+      submissionCache['VO'] = getVOForGroup(ownerGroup)
+    vo = submissionCache['VO']
 
     jdlDiracSetup = classAdJob.getAttributeString('DIRACSetup')
     jdlOwner = classAdJob.getAttributeString('Owner')
@@ -1188,14 +1716,14 @@ class JobDB(DB):
     if vo:
       classAdReq.insertAttributeString('VirtualOrganization', vo)
 
-    setup = gConfig.getValue('/DIRAC/Setup', '')
-    voPolicyDict = gConfig.getOptionsDict('/DIRAC/VOPolicy/%s/%s' % (vo, setup))
-    # voPolicyDict = gConfig.getOptionsDict('/DIRAC/VOPolicy')
-    if voPolicyDict['OK']:
-      voPolicy = voPolicyDict['Value']
-      for param, val in voPolicy.items():
-        if not classAdJob.lookupAttribute(param):
-          classAdJob.insertAttributeString(param, val)
+    if 'VOPolicy' not in submissionCache:
+      setup = gConfig.getValue('/DIRAC/Setup', '')
+      voPolicyDict = gConfig.getOptionsDict('/DIRAC/VOPolicy/%s/%s' % (vo, setup))
+      # voPolicyDict = gConfig.getOptionsDict('/DIRAC/VOPolicy')
+      submissionCache['VOPolicy'] = voPolicyDict['Value'] if voPolicyDict['OK'] else {}
+    for param, val in submissionCache['VOPolicy'].items():
+      if not classAdJob.lookupAttribute(param):
+        classAdJob.insertAttributeString(param, val)
 
     # priority
     priority = classAdJob.getAttributeInt('Priority')
@@ -1206,40 +1734,52 @@ class JobDB(DB):
     # CPU time
     cpuTime = classAdJob.getAttributeInt('CPUTime')
     if cpuTime is None:
-      opsHelper = Operations(group=ownerGroup,
-                             setup=diracSetup)
-      cpuTime = opsHelper.getValue('JobDescription/DefaultCPUTime', 86400)
+      if 'DefaultCPUTime' not in submissionCache:
+        opsHelper = Operations(group=ownerGroup,
+                               setup=diracSetup)
+        submissionCache['DefaultCPUTime'] = opsHelper.getValue('JobDescription/DefaultCPUTime', 86400)
+      cpuTime = submissionCache['DefaultCPUTime']
     classAdReq.insertAttributeInt('CPUTime', cpuTime)
 
     # platform(s)
     platformList = classAdJob.getListFromExpression('Platform')
     if platformList:
-      result = self.getDIRACPlatform(platformList)
-      if not result['OK']:
-        return result
-      if result['Value']:
-        classAdReq.insertAttributeVectorString('Platforms', result['Value'])
+      platformKey = ('Platform',) + tuple(platformList)
+      if platformKey not in submissionCache:
+        result = self.getDIRACPlatform(platformList)
+        if not result['OK']:
+          return result
+        submissionCache[platformKey] = result['Value']
+      if submissionCache[platformKey]:
+        classAdReq.insertAttributeVectorString('Platforms', submissionCache[platformKey])
       else:
         error = "OS compatibility info not found"
 
-    if error:
-      retVal = S_ERROR(EWMSSUBM, error)
-      retVal['JobId'] = jobID
-      retVal['Status'] = 'Failed'
-      retVal['MinorStatus'] = error
+    return S_OK(error)
 
-      jobAttrNames.append('Status')
-      jobAttrValues.append('Failed')
+  def __getJDLAttributes(self, classAdJob):
+    """ Get the job attributes taken from the job ClassAd
 
-      jobAttrNames.append('MinorStatus')
-      jobAttrValues.append(error)
-      resultInsert = self.setJobAttributes(jobID, jobAttrNames, jobAttrValues)
-      if not resultInsert['OK']:
-        retVal['MinorStatus'] += '; %s' % resultInsert['Message']
+        :return: list of tuples (attribute name, value)
+    """
+    priority = classAdJob.getAttributeInt('Priority')
+    if priority is None:
+      priority = 0
+    jobAttributes = [('UserPriority', priority)]
 
-      return retVal
+    for jdlName in self.jdl2DBParameters:
+      # Defaults are set by the DB.
+      jdlValue = classAdJob.getAttributeString(jdlName)
+      if jdlValue:
+        jobAttributes.append((jdlName, jdlValue))
 
-    return S_OK()
+    jdlValue = classAdJob.getAttributeString('Site')
+    if jdlValue:
+      if jdlValue.find(',') != -1:
+        jobAttributes.append(('Site', 'Multiple'))
+      else:
+        jobAttributes.append(('Site', jdlValue))
+    return jobAttributes
 
 #############################################################################
   def removeJobFromDB(self, jobIDs):
@@ -1916,7 +2456,8 @@ class JobDB(DB):
       return ret
     e_jobID = ret['Value']
 
-    req = "UPDATE Jobs SET HeartBeatTime=UTC_TIMESTAMP(), Status='Running' WHERE JobID=%s" % e_jobID
+    # The Running status is restored by the caller through setJobAttributes, which counts the running jobs
+    req = "UPDATE Jobs SET HeartBeatTime=UTC_TIMESTAMP() WHERE JobID=%s" % e_jobID
     result = self._update(req)
     if not result['OK']:
       return S_ERROR('Failed to set the heart beat time: ' + result['Message'])
@@ -1959,6 +2500,66 @@ class JobDB(DB):
       return S_OK()
     return S_ERROR('Failed to store some or all the parameters')
 
+  def setHeartBeatDataBulk(self, heartBeats):
+    """ Add the heart beat data of several jobs to the database, with a few statements for all of them.
+        The jobs in Stalled or Matched status are set back to Running, the status of the others is not changed:
+        the heart beats can be written after the job reached a final status.
+
+        :param dict heartBeats: for each job ID, a dictionary with the time stamp of its last heart beat
+                                'HeartBeatTime', its static data 'StaticData', and the dynamic data of its
+                                heart beats by their time stamp 'DynamicData'
+
+        :return: S_OK/S_ERROR
+    """
+    heartBeats = dict((int(jobID), heartBeat) for jobID, heartBeat in heartBeats.items())
+
+    # The jobs removed in the meantime are ignored
+    result = self.getAttributesForJobList(sorted(heartBeats), ['Status'])
+    if not result['OK']:
+      return result
+    jobIDs = sorted(result['Value'])
+    if not jobIDs:
+      return S_OK()
+
+    # The status is restored first, for the running job counters to follow it
+    restoredJobIDs = [jobID for jobID, attrDict in result['Value'].items()
+                      if attrDict['Status'] in (JobStatus.STALLED, JobStatus.MATCHED)]
+    if restoredJobIDs:
+      result = self.setJobAttributes(restoredJobIDs, ['Status'], [JobStatus.RUNNING], update=True)
+      if not result['OK']:
+        self.log.warn('Failed to restore the job status to Running', result['Message'])
+
+    for jobIDChunk in breakListIntoChunks(jobIDs, 1000):
+      req = "UPDATE Jobs SET HeartBeatTime = CASE JobID %s END WHERE JobID IN ( %s )" % \
+          (' '.join('WHEN %d THEN %%s' % jobID for jobID in jobIDChunk), ', '.join(str(jobID) for jobID in jobIDChunk))
+      result = self._update(req, args=tuple(heartBeats[jobID]['HeartBeatTime'] for jobID in jobIDChunk))
+      if not result['OK']:
+        return S_ERROR('Failed to set the heart beat time: ' + result['Message'])
+
+    ok = True
+    parameters = [(jobID, str(name), self._blobValue(value))
+                  for jobID in jobIDs for name, value in heartBeats[jobID].get('StaticData', {}).items()]
+    if parameters:
+      result = self.insertMany('JobParameters', ['JobID', 'Name', 'Value'], parameters, updateFields=['Value'])
+      if not result['OK']:
+        ok = False
+        self.log.warn(result['Message'])
+
+    loggingInfo = [(jobID, str(name), self._blobValue(value), heartBeatTime)
+                   for jobID in jobIDs
+                   for heartBeatTime, dynamicData in sorted(heartBeats[jobID].get('DynamicData', {}).items())
+                   for name, value in dynamicData.items()]
+    if loggingInfo:
+      result = self.insertMany('HeartBeatLoggingInfo', ['JobID', 'Name', 'Value', 'HeartBeatTime'], loggingInfo,
+                               updateFields=['Value'])
+      if not result['OK']:
+        ok = False
+        self.log.warn(result['Message'])
+
+    if ok:
+      return S_OK()
+    return S_ERROR('Failed to store some or all the parameters')
+
 #####################################################################################
   def getHeartBeatData(self, jobID):
     """ Retrieve the job's heart beat data
@@ -167,3 +167,22 @@ CREATE TABLE `JobCommands` (
   PRIMARY KEY (`JobID`,`Arguments`,`ReceptionTime`),
   FOREIGN KEY (`JobID`) REFERENCES `Jobs`(`JobID`)
 ) ENGINE=InnoDB DEFAULT CHARSET=latin1;
+
+-- ------------------------------------------------------------------------------
+DROP TABLE IF EXISTS `RunningJobCounters`;
+CREATE TABLE `RunningJobCounters` (
+  `Site` VARCHAR(100) NOT NULL,
+  `Attribute` VARCHAR(32) NOT NULL,
+  `Value` VARCHAR(255) NOT NULL,
+  `Count` INT(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`Site`,`Attribute`,`Value`)
+) ENGINE=InnoDB DEFAULT CHARSET=latin1;
+
+-- ------------------------------------------------------------------------------
+DROP TABLE IF EXISTS `JDLDictionaries`;
+CREATE TABLE `JDLDictionaries` (
+  `DictionaryID` INT(11) UNSIGNED NOT NULL AUTO_INCREMENT,
+  `Dictionary` MEDIUMBLOB NOT NULL,
+  `CreationTime` DATETIME NOT NULL,
+  PRIMARY KEY (`DictionaryID`)
+) ENGINE=InnoDB DEFAULT CHARSET=latin1;
@@ -2,6 +2,7 @@
     The following methods are provided
 
     addLoggingRecord()
+    addLoggingRecords()
     getJobLoggingInfo()
     deleteJob()
     getWMSTimeStamps()
@@ -49,10 +50,33 @@ class JobLoggingDB(DB):
         as datetime.datetime object. If the time stamp is not provided the current
         UTC time is used.
     """
+    return self.addLoggingRecords([(jobID, status, minor, application, date, source)])
 
-    event = 'status/minor/app=%s/%s/%s' % (status, minor, application)
-    self.log.info("Adding record for job ", str(jobID) + ": '" + event + "' from " + source)
+  def addLoggingRecords(self, records):
+    """ Add several entries to the JobLoggingDB table, with a single statement.
 
+        :param list records: list of tuples (jobID, status, minor, application, date, source),
+                             with the same meaning as the arguments of addLoggingRecord
+    """
+    rows = []
+    for jobID, status, minor, application, date, source in records:
+      event = 'status/minor/app=%s/%s/%s' % (status, minor, application)
+      self.log.info("Adding record for job ", str(jobID) + ": '" + event + "' from " + source)
+      _date, time_order = self.__getStatusTime(date)
+      # The values used to be formatted in the statement, so None is stored as 'None'
+      rows.append((int(jobID), str(status), str(minor), str(application)[:255], str(_date), time_order,
+                   str(source)[:32]))
+
+    return self.insertMany('LoggingInfo',
+                           ['JobId', 'Status', 'MinorStatus', 'ApplicationStatus',
+                            'StatusTime', 'StatusTimeOrder', 'StatusSource'],
+                           rows)
+
+  def __getStatusTime(self, date):
+    """ Return the UTC datetime of a record, and its time order number
+
+        :param date: string in UTC or datetime, if empty the current time is used
+    """
     if not date:
       # Make the UTC datetime string and float
       _date = Time.dateTime()
@@ -80,13 +104,7 @@ class JobLoggingDB(DB):
         _date = Time.dateTime()
         epoc = time.mktime(_date.timetuple()) - MAGIC_EPOC_NUMBER
         time_order = round(epoc, 3)
-
-    cmd = "INSERT INTO LoggingInfo (JobId, Status, MinorStatus, ApplicationStatus, " + \
-          "StatusTime, StatusTimeOrder, StatusSource) VALUES (%d,'%s','%s','%s','%s',%f,'%s')" % \
-        (int(jobID), status, minor, application[:255],
-         str(_date), time_order, source[:32])
-
-    return self._update(cmd)
+    return _date, time_order
 
 #############################################################################
   def getJobLoggingInfo(self, jobID):
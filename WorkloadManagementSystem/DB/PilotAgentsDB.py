@@ -13,6 +13,7 @@
     storePilotOutput()
     getPilotOutput()
     setJobForPilot()
+    setJobsForPilot()
     getPilotsSummary()
 
 """
@@ -435,16 +436,22 @@ AND SubmissionTime < DATE_SUB(UTC_TIMESTAMP(),INTERVAL %d DAY)" %
   def setJobForPilot(self, jobID, pilotRef, site=None, updateStatus=True):
     """ Store the jobID of the job executed by the pilot with reference pilotRef
     """
+    return self.setJobsForPilot([jobID], pilotRef, site=site, updateStatus=updateStatus)
+
+  def setJobsForPilot(self, jobIDs, pilotRef, site=None, updateStatus=True):
+    """ Store the jobIDs of the jobs executed by the pilot with reference pilotRef, with a single statement
+    """
 
     pilotID = self.__getPilotID(pilotRef)
     if pilotID:
       if updateStatus:
-        reason = 'Report from job %d' % int(jobID)
-        result = self.setPilotStatus(pilotRef, status='Running', statusReason=reason,
+        reason = 'Report from job %s' % ', '.join(str(int(jobID)) for jobID in jobIDs)
+        result = self.setPilotStatus(pilotRef, status='Running', statusReason=reason[:255],
                                      gridSite=site)
         if not result['OK']:
           return result
-      req = "INSERT INTO JobToPilotMapping (PilotID,JobID,StartTime) VALUES (%d,%d,UTC_TIMESTAMP())" % (pilotID, jobID)
+      req = "INSERT INTO JobToPilotMapping (PilotID,JobID,StartTime) VALUES %s" % \
+          ", ".join("(%d,%d,UTC_TIMESTAMP())" % (pilotID, int(jobID)) for jobID in jobIDs)
       result = self._update(req)
       return result
     else:
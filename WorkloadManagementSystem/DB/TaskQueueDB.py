@@ -354,77 +354,85 @@ class TaskQueueDB(DB):
 
         :returns: S_OK() / S_ERROR
     """
-    try:
-      int(jobId)
-    except ValueError:
-      return S_ERROR("JobId is not a number!")
+    return self.insertJobs([(jobId, tqDefDict, jobPriority)], skipTQDefCheck=skipTQDefCheck)
+
+  def insertJobs(self, jobs, skipTQDefCheck=False):
+    """ Insert jobs in task queues (creating them if they don't exist).
+        The jobs with the same requirements are inserted together in the same task queue.
+
+        :param list jobs: list of tuples (job ID, dict for TQ definition, job priority)
+
+        :returns: S_OK() / S_ERROR
+    """
+    # Group the jobs by requirements
+    jobsByTQDef = {}
+    for jobId, tqDefDict, jobPriority in jobs:
+      try:
+        int(jobId)
+      except ValueError:
+        return S_ERROR("JobId is not a number!")
+      tqDefDict = dict(tqDefDict)
+      if not skipTQDefCheck:
+        retVal = self._checkTaskQueueDefinition(tqDefDict)
+        if not retVal['OK']:
+          self.log.error("TQ definition check failed", retVal['Message'])
+          return retVal
+        tqDefDict = retVal['Value']
+      tqDefDict['CPUTime'] = self.fitCPUTimeToSegments(tqDefDict['CPUTime'])
+      tqJobs = jobsByTQDef.setdefault(repr(sorted(tqDefDict.items())), (tqDefDict, []))[1]
+      tqJobs.append((jobId, jobPriority))
+
     retVal = self._getConnection()
     if not retVal['OK']:
       return S_ERROR("Can't insert job: %s" % retVal['Message'])
     connObj = retVal['Value']
-    if not skipTQDefCheck:
-      tqDefDict = dict(tqDefDict)
-      retVal = self._checkTaskQueueDefinition(tqDefDict)
-      if not retVal['OK']:
-        self.log.error("TQ definition check failed", retVal['Message'])
-        return retVal
-      tqDefDict = retVal['Value']
-    tqDefDict['CPUTime'] = self.fitCPUTimeToSegments(tqDefDict['CPUTime'])
-    self.log.info("Inserting job with requirements",
-                  "(%s : %s)" % (jobId, printDict(tqDefDict)))
-    retVal = self.__findAndDisableTaskQueue(tqDefDict, skipDefinitionCheck=True, connObj=connObj)
-    if not retVal['OK']:
-      return retVal
-    tqInfo = retVal['Value']
-    newTQ = False
-    if not tqInfo['found']:
-      self.log.info("Creating a TQ for job", jobId)
-      retVal = self.__createTaskQueue(tqDefDict, 1, connObj=connObj)
+
+    for tqDefDict, tqJobs in jobsByTQDef.values():
+      jobIds = [jobId for jobId, _jobPriority in tqJobs]
+      self.log.info("Inserting jobs with requirements",
+                    "(%s : %s)" % (jobIds, printDict(tqDefDict)))
+      retVal = self.__findAndDisableTaskQueue(tqDefDict, skipDefinitionCheck=True, connObj=connObj)
       if not retVal['OK']:
         return retVal
-      tqId = retVal['Value']
-      newTQ = True
-    else:
-      tqId = tqInfo['tqId']
-      self.log.info("Found TQ for job requirements",
-                    "(%s : %s)" % (tqId, jobId))
-    try:
-      result = self.__insertJobInTaskQueue(jobId, tqId, int(jobPriority), checkTQExists=False, connObj=connObj)
-      if not result['OK']:
-        self.log.error("Error inserting job in TQ", "Job %s TQ %s: %s" % (jobId, tqId, result['Message']))
-        return result
-      if newTQ:
-        self.recalculateTQSharesForEntity(tqDefDict['OwnerDN'], tqDefDict['OwnerGroup'], connObj=connObj)
-    finally:
-      self.__setTaskQueueEnabled(tqId, True)
+      tqInfo = retVal['Value']
+      newTQ = False
+      if not tqInfo['found']:
+        self.log.info("Creating a TQ for jobs", jobIds)
+        retVal = self.__createTaskQueue(tqDefDict, 1, connObj=connObj)
+        if not retVal['OK']:
+          return retVal
+        tqId = retVal['Value']
+        newTQ = True
+      else:
+        tqId = tqInfo['tqId']
+        self.log.info("Found TQ for job requirements",
+                      "(%s : %s)" % (tqId, jobIds))
+      try:
+        result = self.__insertJobsInTaskQueue(tqId, tqJobs, connObj=connObj)
+        if not result['OK']:
+          self.log.error("Error inserting jobs in TQ", "Jobs %s TQ %s: %s" % (jobIds, tqId, result['Message']))
+          return result
+        if newTQ:
+          self.recalculateTQSharesForEntity(tqDefDict['OwnerDN'], tqDefDict['OwnerGroup'], connObj=connObj)
+      finally:
+        self.__setTaskQueueEnabled(tqId, True)
     return S_OK()
 
-  def __insertJobInTaskQueue(self, jobId, tqId, jobPriority, checkTQExists=True, connObj=False):
-    """ Insert a job in a given task queue
+  def __insertJobsInTaskQueue(self, tqId, jobs, connObj=False):
+    """ Insert jobs in a given task queue, with a single statement
 
-        :param int jobId: job ID
-        :param dict tqDefDict: dict for TQ definition
-        :param int jobPriority: integer that defines the job priority
+        :param int tqId: task queue ID
+        :param list jobs: list of tuples (job ID, job priority)
 
         :returns: S_OK() / S_ERROR
     """
-    self.log.info("Inserting job in TQ with priority",
-                  "(%s : %s : %s)" % (jobId, tqId, jobPriority))
-    if not connObj:
-      result = self._getConnection()
-      if not result['OK']:
-        return S_ERROR("Can't insert job: %s" % result['Message'])
-      connObj = result['Value']
-    if checkTQExists:
-      result = self._query("SELECT tqId FROM `tq_TaskQueues` WHERE TQId = %s" % tqId, conn=connObj)
-      if not result['OK'] or not result['Value']:
-        return S_OK("Can't find task queue with id %s: %s" % (tqId, result['Message']))
-    hackedPriority = self.__hackJobPriority(jobPriority)
-    result = self._update("INSERT INTO tq_Jobs ( TQId, JobId, Priority, RealPriority ) \
-                            VALUES ( %s, %s, %s, %f ) ON DUPLICATE KEY UPDATE TQId = %s, \
-                            Priority = %s, RealPriority = %f" % (tqId, jobId, jobPriority, hackedPriority,
-                                                                 tqId, jobPriority, hackedPriority),
-                          conn=connObj)
+    rows = []
+    for jobId, jobPriority in jobs:
+      self.log.info("Inserting job in TQ with priority",
+                    "(%s : %s : %s)" % (jobId, tqId, jobPriority))
+      rows.append((tqId, int(jobId), int(jobPriority), self.__hackJobPriority(jobPriority)))
+    result = self.insertMany('tq_Jobs', ['TQId', 'JobId', 'Priority', 'RealPriority'], rows,
+                             updateFields=['TQId', 'Priority', 'RealPriority'], conn=connObj)
     if not result['OK']:
       return result
     return S_OK()
@@ -509,14 +517,18 @@ ORDER BY COUNT( `tq_Jobs`.JobID ) ASC" % (sqlCmd, result['Value'])
       return S_OK({'found': False})
     return S_OK({'found': True, 'tqId': data[0][1], 'enabled': data[0][2], 'jobs': data[0][0]})
 
-  def matchAndGetJob(self, tqMatchDict, numJobsPerTry=50, numQueuesPerTry=10, negativeCond=None):
+  def matchAndGetJob(self, tqMatchDict, numJobsPerTry=50, numQueuesPerTry=10, negativeCond=None, tqIndex=None):
     """ Match a job based on requirements
 
         :param dict tqDefDict: dict for TQ definition
+        :param tqIndex: optional TaskQueueIndex used to select the task queues in memory,
+                        only taking the job out of the selected task queue is then done in the DB
         :returns: S_OK() / S_ERROR
     """
     if negativeCond is None:
       negativeCond = {}
+    # The index works with the values as given, not escaped
+    rawMatchDict = tqMatchDict
     # Make a copy to avoid modification of original if escaping needs to be done
     tqMatchDict = dict(tqMatchDict)
     retVal = self._checkMatchDefinition(tqMatchDict)
@@ -541,6 +553,10 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
                                            skipMatchDictDef=True,
                                            connObj=connObj)
         preJobSQL = "%s AND `tq_Jobs`.JobId = %s " % (preJobSQL, tqMatchDict['JobID'])
+      elif tqIndex:
+        retVal = tqIndex.match(rawMatchDict,
+                               numQueuesToGet=numQueuesPerTry,
+                               negativeCond=negativeCond)
       else:
         retVal = self.matchAndGetTaskQueue(tqMatchDict,
                                            numQueuesToGet=numQueuesPerTry,
@@ -569,6 +585,9 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
         if not jobTQList:
           self.log.info("Task queue seems to be empty, triggering a cleaning of", tqId)
           self.__deleteTQWithDelay.add(tqId, 300, (tqId, tqOwnerDN, tqOwnerGroup))
+          if tqIndex:
+            # It comes back with the next refresh if it gets jobs again
+            tqIndex.discard(tqId)
         while jobTQList:
           jobId, tqId = jobTQList.pop(random.randint(0, len(jobTQList) - 1))
           self.log.info("Trying to extract job from TQ",
@@ -1066,6 +1085,44 @@ WHERE j.JobId = %s AND t.TQId = j.TQId" %
       return retVal
     return S_OK(retVal['Value'][0][0])
 
+  def getTaskQueuePriorities(self):
+    """ Get the priority of all the task queues, with a single light query
+
+        :returns: S_OK( { tqId : ( priority, enabled ) } ) / S_ERROR
+    """
+    retVal = self._query("SELECT TQId, Priority, Enabled FROM `tq_TaskQueues`")
+    if not retVal['OK']:
+      return retVal
+    return S_OK(dict((row[0], (row[1], row[2])) for row in retVal['Value']))
+
+  def getTaskQueueDefinitions(self, tqIdList):
+    """ Get the definition of some task queues, whether they have jobs or not
+
+        :param list tqIdList: task queue IDs
+
+        :returns: S_OK( { tqId : { field : value or list of values } } ) / S_ERROR
+    """
+    if not tqIdList:
+      return S_OK({})
+    tqIds = ", ".join([str(int(tqId)) for tqId in tqIdList])
+    retVal = self._query("SELECT TQId, %s FROM `tq_TaskQueues` WHERE TQId in ( %s )" %
+                         (", ".join(singleValueDefFields), tqIds))
+    if not retVal['OK']:
+      return retVal
+    tqData = {}
+    for record in retVal['Value']:
+      tqData[record[0]] = dict(zip(singleValueDefFields, record[1:]))
+      for field in multiValueDefFields:
+        tqData[record[0]][field] = []
+    for field in multiValueDefFields:
+      retVal = self._query("SELECT TQId, Value FROM `tq_TQTo%s` WHERE TQId in ( %s )" % (field, tqIds))
+      if not retVal['OK']:
+        return retVal
+      for tqId, value in retVal['Value']:
+        if tqId in tqData:
+          tqData[tqId][field].append(value)
+    return S_OK(tqData)
+
   def retrieveTaskQueues(self, tqIdList=None):
     """
     Get all the task queues
@@ -37,3 +37,171 @@ class JobDBTest(unittest.TestCase):
     print(result)
     self.assertTrue(result['OK'])
     self.assertEqual(result['Value'], ['/vo/user/lfn1', '/vo/user/lfn2'])
+
+  def test_setJobParameters(self):
+    self.jobDB.insertMany = MagicMock(return_value=S_OK())
+    result = self.jobDB.setJobParameters(1, [('Text', u'caf\xe9'), ('Bytes', b'\x00\xff'), ('Number', 3)])
+    self.assertTrue(result['OK'])
+    self.assertEqual(self.jobDB.insertMany.call_args[0][2],
+                     [(1, 'Text', b'caf\xc3\xa9'), (1, 'Bytes', b'\x00\xff'), (1, 'Number', b'3')])
+
+  def test_runningJobCounters(self):
+    self.jobDB.jobAttributeNames = ['Status', 'MinorStatus', 'Site', 'JobType', 'LastUpdateTime']
+    self.jobDB.runningCounterAttributes = ['JobType']
+    self.jobDB._escapeString = MagicMock(side_effect=lambda value: S_OK("'%s'" % value))
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchall.return_value = (('Matched', 'Site1', 'User'),
+                                    ('Running', 'Site1', 'MCSimulation'),
+                                    ('Waiting', 'Site2', 'User'))
+    cursor.executemany.side_effect = lambda *args: self.assertFalse(connection.commit.called)
+    self.jobDB._getConnection = MagicMock(return_value=S_OK(connection))
+
+    result = self.jobDB.setJobAttributes([1, 2, 3], ['Status', 'Site'], ['Running', 'Site2'])
+    self.assertTrue(result['OK'])
+    self.assertTrue(connection.commit.called)
+    # The Waiting job starts running at Site2, the others move from Site1 to Site2,
+    # in the transaction of the jobs update
+    self.assertEqual(cursor.executemany.call_args[0][1],
+                     [('Site1', 'JobType', 'MCSimulation', -1), ('Site1', 'JobType', 'User', -1),
+                      ('Site2', 'JobType', 'MCSimulation', 1), ('Site2', 'JobType', 'User', 2)])
+
+    # The changes of the other attributes do not lock the jobs
+    self.jobDB._getConnection.reset_mock()
+    self.jobDB._update = MagicMock(return_value=S_OK(1))
+    result = self.jobDB.setJobAttribute(1, 'MinorStatus', 'Application')
+    self.assertTrue(result['OK'])
+    self.assertTrue(self.jobDB._update.called)
+    self.assertFalse(self.jobDB._getConnection.called)
+
+  def test_reconcileRunningJobCounters(self):
+    self.jobDB.runningCounterAttributes = ['JobType']
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    statements = []
+    cursor.execute.side_effect = statements.append
+    cursor.fetchall.return_value = (('Site1', 'User', 3),)
+    self.jobDB._getConnection = MagicMock(return_value=S_OK(connection))
+
+    result = self.jobDB.reconcileRunningJobCounters()
+    self.assertTrue(result['OK'])
+    # The jobs are counted in the transaction, once the counters are locked
+    self.assertEqual(statements[:2], ['START TRANSACTION', 'DELETE FROM RunningJobCounters'])
+    self.assertTrue(statements[2].startswith('SELECT Site, JobType, COUNT(*) FROM Jobs'))
+    self.assertEqual(cursor.executemany.call_args[0][1], [('Site1', 'JobType', 'User', 3)])
+    self.assertTrue(connection.commit.called)
+
+  def test_setHeartBeatData(self):
+    self.jobDB._escapeString = MagicMock(side_effect=lambda value: S_OK("'%s'" % value))
+    self.jobDB._update = MagicMock(return_value=S_OK(1))
+    self.jobDB.insertMany = MagicMock(return_value=S_OK())
+    result = self.jobDB.setHeartBeatData(1, {}, {})
+    self.assertTrue(result['OK'])
+    # The status is not changed without counting the running jobs
+    self.assertNotIn('Status', self.jobDB._update.call_args[0][0])
+
+  def test_getRunningJobCounters(self):
+    self.jobDB.runningCounterAttributes = ['JobType']
+    self.jobDB.getFields = MagicMock(return_value=S_OK((('User', 3), ('MCSimulation', 0))))
+    self.jobDB.getCounters = MagicMock(return_value=S_OK([({'JobGroup': '00001'}, 2)]))
+    self.assertEqual(self.jobDB.getRunningJobCounters('Site1', 'JobType')['Value'], {'User': 3})
+    self.assertEqual(self.jobDB.getRunningJobCounters('Site1', 'JobGroup')['Value'], {'00001': 2})
+
+  @patch(MODULE_NAME + ".getVOForGroup", new=MagicMock(return_value='vo'))
+  @patch(MODULE_NAME + ".JobManifest")
+  def test_insertNewJobsIntoDB(self, jobManifestMock):
+    jobManifestMock.return_value.load.return_value = S_OK()
+    jobManifestMock.return_value.check.return_value = S_OK()
+    jobManifestMock.return_value.dumpAsJDL.side_effect = [
+        '[Executable = "a.sh"; CPUTime = 1000; JobName = "job_%j"; InputData = {"/lfn/1", ""};'
+        ' Parameters = [ p = 1 ];]',
+        '[Executable = "a.sh"; CPUTime = 1000; JobName = "job_%j"]']
+    self.jobDB.jdl2DBParameters = ['JobName', 'JobType', 'JobGroup']
+    self.jobDB.compressJDLs = False
+    self.jobDB.jdlStorage = 'Text'
+    connection = MagicMock()
+    self.jobDB._getConnection = MagicMock(return_value=S_OK(connection))
+    self.jobDB._query.side_effect = [S_OK(((10,),)), S_OK(((12,), (14,)))]
+    self.jobDB.insertMany = MagicMock(return_value=S_OK())
+
+    with patch(MODULE_NAME + ".gConfig.getOptionsDict", new=MagicMock(return_value=S_OK({}))):
+      result = self.jobDB.insertNewJobsIntoDB(['[Executable = "a.sh"]', 'Executable = "a.sh"'],
+                                              'owner', '/DN/owner', 'group', 'Setup')
+    self.assertTrue(result['OK'], result.get('Message'))
+    self.assertEqual([jobDict['JobID'] for jobDict in result['Value']], [12, 14])
+    # JobJDLs tagged rows, then the final JDLs, Jobs, JobParameters and InputData
+    tables = [call[0][0] for call in self.jobDB.insertMany.call_args_list]
+    self.assertEqual(tables, ['JobJDLs', 'JobJDLs', 'Jobs', 'JobParameters', 'InputData'])
+    jobsRows = self.jobDB.insertMany.call_args_list[2][0][2]
+    self.assertEqual([row[0] for row in jobsRows], [12, 14])
+    jobNames = self.jobDB.insertMany.call_args_list[2][0][1].index('JobName')
+    self.assertEqual([row[jobNames] for row in jobsRows], ['job_12', 'job_14'])
+    self.assertEqual(self.jobDB.insertMany.call_args_list[3][0][2], [(12, 'p', b'1')])
+    self.assertEqual(self.jobDB.insertMany.call_args_list[4][0][2], [(12, '/lfn/1')])
+    self.assertTrue(connection.commit.called)
+
+    # Nothing is inserted if the JobIDs can not be allocated
+    self.jobDB._query.side_effect = [S_OK(((10,),)), S_OK(((12,),))]
+    result = self.jobDB.insertNewJobsIntoDB(['[Executable = "a.sh"]'] * 2, 'owner', '/DN/owner', 'group', 'Setup')
+    self.assertFalse(result['OK'])
+    self.assertTrue(connection.rollback.called)
+
+    # Nor if a job has an invalid JDL, instead of inserting it as Failed
+    connection.reset_mock()
+    self.jobDB.insertMany.reset_mock()
+    self.jobDB._query.side_effect = [S_OK(((10,),)), S_OK(((12,), (14,)))]
+    jobManifestMock.return_value.dumpAsJDL.side_effect = ['[Executable = "a.sh"]', '[Executable = ']
+    result = self.jobDB.insertNewJobsIntoDB(['[Executable = "a.sh"]'] * 2, 'owner', '/DN/owner', 'group', 'Setup')
+    self.assertFalse(result['OK'])
+    self.assertTrue(connection.rollback.called)
+    self.assertFalse(connection.commit.called)
+    self.assertEqual(self.jobDB.insertMany.call_count, 1)
+
+  def test_migrateJDLs(self):
+    from DIRAC.WorkloadManagementSystem.Utilities.JDLCompression import compressJDL, extractJDL
+    self.jobDB.jdlStorage = 'Binary'
+    self.jobDB._JobDB__jdlDictionaries = {}
+    self.jobDB.updateMany = MagicMock(return_value=S_OK(1))
+    jdl = '[Executable = "a.sh"]'
+    self.jobDB._query.return_value = S_OK(((3, jdl, jdl), (5, compressJDL(jdl), compressJDL(jdl)), (8, '', jdl)))
+    result = self.jobDB.migrateJDLs(lastJobID=2, maxJobs=3)
+    self.assertTrue(result['OK'], result.get('Message'))
+    # The last processed job, and the number of converted ones
+    self.assertEqual(result['Value'], (8, 1))
+    # Only the jobs in a final status
+    self.assertIn("Jobs.Status IN ('Done', 'Completed', 'Failed')", self.jobDB._query.call_args[0][0])
+    # The job being inserted, without JDL yet, is skipped
+    args = self.jobDB.updateMany.call_args[0]
+    self.assertEqual(args[2], ['JobID', 'JDL', 'OriginalJDL'])
+    rows = args[3]
+    self.assertEqual(len(rows), 1)
+    self.assertEqual(extractJDL(rows[0][0])['Value'], jdl)
+    self.assertEqual(extractJDL(rows[0][1])['Value'], jdl)
+    # Updated only if the JDLs are still the ones read
+    self.assertEqual(rows[0][2:], [3, jdl, jdl])
+
+  def test_setHeartBeatDataBulk(self):
+    self.jobDB.jobAttributeNames = ['Status', 'LastUpdateTime']
+    self.jobDB.getAttributesForJobList = MagicMock(return_value=S_OK({1: {'Status': 'Stalled'},
+                                                                      2: {'Status': 'Running'}}))
+    self.jobDB.setJobAttributes = MagicMock(return_value=S_OK())
+    self.jobDB._update = MagicMock(return_value=S_OK())
+    self.jobDB.insertMany = MagicMock(return_value=S_OK())
+    heartBeats = {1: {'HeartBeatTime': '2020-01-01 10:00:10', 'StaticData': {'Node': 'wn1'},
+                      'DynamicData': {'2020-01-01 10:00:10': {'CPU': 2},
+                                      '2020-01-01 10:00:00': {'CPU': 1, 'Memory': 10}}},
+                  2: {'HeartBeatTime': '2020-01-01 10:00:05', 'StaticData': {}, 'DynamicData': {}},
+                  # Removed job
+                  3: {'HeartBeatTime': '2020-01-01 10:00:05', 'StaticData': {'Node': 'wn3'}, 'DynamicData': {}}}
+    result = self.jobDB.setHeartBeatDataBulk(heartBeats)
+    self.assertTrue(result['OK'], result.get('Message'))
+
+    self.assertEqual(self.jobDB.setJobAttributes.call_args[0][:3], ([1], ['Status'], ['Running']))
+    # A single statement for the heart beat times, which does not change the status of the other jobs
+    self.assertEqual(self.jobDB._update.call_count, 1)
+    self.assertNotIn('Status', self.jobDB._update.call_args[0][0])
+    self.assertEqual(self.jobDB._update.call_args[1]['args'], ('2020-01-01 10:00:10', '2020-01-01 10:00:05'))
+    self.assertEqual(self.jobDB.insertMany.call_args_list[0][0][2], [(1, 'Node', b'wn1')])
+    self.assertEqual(sorted(self.jobDB.insertMany.call_args_list[1][0][2]),
+                     [(1, 'CPU', b'1', '2020-01-01 10:00:00'), (1, 'CPU', b'2', '2020-01-01 10:00:10'),
+                      (1, 'Memory', b'10', '2020-01-01 10:00:00')])
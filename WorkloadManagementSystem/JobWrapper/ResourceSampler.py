@@ -0,0 +1,236 @@
+""" Low overhead sampling of the resources used by a job, for the Watchdog
+
+    The CPU time and memory of the process tree of the job are read from procfs: the tree is cached
+    between the samples, and only the children of the known processes are looked up at each sample,
+    when the kernel provides the children of the threads in procfs. Otherwise the parent of each
+    process is read, once per sample.
+    The CPU time of each live process includes the one of its terminated children, once they are
+    waited for.
+
+    With the cgroup backend, the CPU time and memory are read from the cgroup v2 of the job instead.
+    This requires the job to run in its own cgroup, e.g. a cgroup per job slot created by the batch system.
+
+    The free disk space is obtained with statvfs, instead of a df command, the mount point of the working
+    directory being looked up once.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import errno
+import os
+
+from DIRAC import S_OK, S_ERROR, gLogger
+from DIRAC.Core.Utilities.Os import getDiskSpace
+
+PROCFS = '/proc'
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+BACKEND_PROCFS = 'procfs'
+BACKEND_CGROUP = 'cgroup'
+
+
+def _readFile(path):
+  """ Read a small file of procfs or of the cgroup filesystem """
+  with open(path) as fd:
+    return fd.read()
+
+
+class ResourceSampler(object):
+  """ Sampler of the CPU time, memory, and free disk space of a job
+  """
+
+  def __init__(self, pid, backend=BACKEND_PROCFS, procfs=PROCFS, cgroupRoot=CGROUP_ROOT):
+    """ c'tor
+
+        :param int pid: PID of the root process of the job
+        :param str backend: BACKEND_PROCFS or BACKEND_CGROUP
+        :param str procfs: mount point of procfs
+        :param str cgroupRoot: mount point of the cgroup v2 filesystem
+    """
+    self.pid = int(pid)
+    self.backend = backend
+    self.procfs = procfs
+    self.log = gLogger.getSubLogger('ResourceSampler')
+    self.clockTicks = os.sysconf('SC_CLK_TCK')
+    self.pageSize = os.sysconf('SC_PAGE_SIZE')
+    # Processes of the tree, by PID: their start time to detect the reuse of the PIDs
+    self.__processes = {}
+    self.__maxCPU = 0.
+    self.__mountPoints = {}
+    self.__hasChildrenFiles = os.path.exists(os.path.join(procfs, str(self.pid), 'task', str(self.pid), 'children'))
+    self.cgroupPath = None
+    if backend == BACKEND_CGROUP:
+      self.cgroupPath = self.__getCgroupPath(cgroupRoot)
+
+  @classmethod
+  def isAvailable(cls, pid, backend=BACKEND_PROCFS, procfs=PROCFS, cgroupRoot=CGROUP_ROOT):
+    """ Whether the backend can be used for this process
+    """
+    if not os.path.exists(os.path.join(procfs, str(pid), 'stat')):
+      return False
+    if backend == BACKEND_CGROUP:
+      return cls(pid, backend, procfs, cgroupRoot).cgroupPath is not None
+    return backend == BACKEND_PROCFS
+
+  def __getCgroupPath(self, cgroupRoot):
+    """ Find the cgroup v2 directory of the process, None if there is none """
+    try:
+      for line in _readFile(os.path.join(self.procfs, str(self.pid), 'cgroup')).splitlines():
+        # The unified hierarchy is the line '0::<path>', the root cgroup being the whole node
+        cgroup = line[3:].strip().strip('/')
+        if not line.startswith('0::') or not cgroup:
+          continue
+        # cgroupRoot/unified in the hybrid mode of systemd
+        for root in (cgroupRoot, os.path.join(cgroupRoot, 'unified')):
+          path = os.path.join(root, cgroup)
+          if os.path.exists(os.path.join(path, 'cpu.stat')) and os.path.exists(os.path.join(path, 'memory.current')):
+            return path
+    except (IOError, OSError) as e:
+      self.log.warn("Can not read the cgroup of the process", repr(e))
+    return None
+
+  def __readStat(self, pid):
+    """ Read the fields of /proc/<pid>/stat after the command name, which can contain spaces """
+    stat = _readFile(os.path.join(self.procfs, str(pid), 'stat'))
+    return stat[stat.rfind(')') + 2:].split()
+
+  def __getChildren(self, pid):
+    """ Get the PIDs of the children of a process, from the children files of its threads """
+    children = []
+    taskDir = os.path.join(self.procfs, str(pid), 'task')
+    for tid in os.listdir(taskDir):
+      try:
+        children.extend(int(child) for child in _readFile(os.path.join(taskDir, tid, 'children')).split())
+      except (IOError, OSError):
+        # The thread terminated in the meantime
+        continue
+    return children
+
+  def __getChildrenMap(self):
+    """ Get the children of all the processes, from the parent PIDs: when the children files are missing
+
+        :return: dict { pid: list of PIDs of the children }
+    """
+    childrenMap = {}
+    for entry in os.listdir(self.procfs):
+      if not entry.isdigit():
+        continue
+      try:
+        # ppid is the field 4 of stat
+        childrenMap.setdefault(int(self.__readStat(entry)[1]), []).append(int(entry))
+      except (IOError, OSError, IndexError):
+        continue
+    return childrenMap
+
+  def __updateProcessTree(self):
+    """ Update the cached process tree: remove the terminated processes, and add the new children
+
+        :return: dict { pid: stat fields } of the processes of the tree
+    """
+    stats = {}
+    childrenMap = None if self.__hasChildrenFiles else self.__getChildrenMap()
+    toVisit = [self.pid]
+    # The known processes whose parent terminated are reparented: they are looked up directly
+    toVisit.extend(pid for pid in self.__processes if pid != self.pid)
+    while toVisit:
+      pid = toVisit.pop()
+      if pid in stats:
+        continue
+      try:
+        fields = self.__readStat(pid)
+      except (IOError, OSError):
+        self.__processes.pop(pid, None)
+        continue
+      # Field 22 of stat, the start time, identifies the process with its PID
+      startTime = fields[19]
+      if self.__processes.setdefault(pid, startTime) != startTime:
+        # PID reused by a process out of the tree
+        self.__processes.pop(pid)
+        continue
+      stats[pid] = fields
+      if childrenMap is not None:
+        toVisit.extend(childrenMap.get(pid, []))
+        continue
+      try:
+        toVisit.extend(self.__getChildren(pid))
+      except (IOError, OSError):
+        continue
+    if self.pid not in stats:
+      self.__processes.clear()
+    return stats
+
+  def sample(self):
+    """ Sample the resources used by the job
+
+        :return: S_OK( dict ) with the CPU time in seconds 'CPU', 'CPUUser' and 'CPUSystem',
+                 the resident and virtual memory in bytes 'RSS' and 'Vsize', and the number of 'Processes'
+    """
+    stats = self.__updateProcessTree()
+    if not stats:
+      return S_ERROR(errno.ESRCH, 'No such process: %d' % self.pid)
+
+    # utime, stime, cutime and cstime are the fields 14 to 17 of stat, vsize and rss the fields 23 and 24
+    cpuUser = sum(float(fields[11]) + float(fields[13]) for fields in stats.values()) / self.clockTicks
+    cpuSystem = sum(float(fields[12]) + float(fields[14]) for fields in stats.values()) / self.clockTicks
+    sample = {'CPUUser': cpuUser,
+              'CPUSystem': cpuSystem,
+              'Vsize': float(sum(int(fields[20]) for fields in stats.values())),
+              'RSS': float(sum(int(fields[21]) for fields in stats.values()) * self.pageSize),
+              'Processes': len(stats)}
+
+    if self.cgroupPath:
+      try:
+        cpuStat = dict(line.split() for line in _readFile(os.path.join(self.cgroupPath, 'cpu.stat')).splitlines())
+        sample['CPUUser'] = int(cpuStat['user_usec']) / 1e6
+        sample['CPUSystem'] = int(cpuStat['system_usec']) / 1e6
+        sample['RSS'] = float(_readFile(os.path.join(self.cgroupPath, 'memory.current')))
+      except (IOError, OSError, KeyError, ValueError) as e:
+        self.log.warn("Can not read the cgroup statistics, using procfs", repr(e))
+
+    # The CPU time of a terminated process is not counted until its parent waits for it
+    sample['CPU'] = max(self.__maxCPU, sample['CPUUser'] + sample['CPUSystem'])
+    self.__maxCPU = sample['CPU']
+    return S_OK(sample)
+
+  def __getMountPoint(self, path):
+    """ Get the mount point and the file system type of a path, from the mounts of the process """
+    path = os.path.realpath(path)
+    if path not in self.__mountPoints:
+      mountPoint, fsType = '/', ''
+      for line in _readFile(os.path.join(self.procfs, 'self', 'mounts')).splitlines():
+        fields = line.split()
+        if len(fields) < 3:
+          continue
+        # Spaces are escaped as \040 in the mounts
+        candidate = fields[1].replace('\\040', ' ')
+        if (path == candidate or path.startswith(candidate.rstrip('/') + '/')) and \
+           len(candidate) >= len(mountPoint):
+          mountPoint, fsType = candidate, fields[2]
+      self.__mountPoints[path] = (mountPoint, fsType)
+    return self.__mountPoints[path]
+
+  def getFreeDiskSpace(self, path='.', exclude=None):
+    """ Get the free disk space of the file system of a path, in MB
+
+        :param str path: path
+        :param str exclude: file system type for which the space is not evaluated, e.g. fuse
+        :return: S_OK( float ) / S_ERROR
+    """
+    try:
+      _mountPoint, fsType = self.__getMountPoint(path)
+      if exclude and fsType.startswith(exclude):
+        return S_ERROR('Disk space of a %s file system is not evaluated' % fsType)
+      if fsType == 'afs':
+        # The AFS quotas are not seen by statvfs
+        diskSpace = getDiskSpace(path)
+        if diskSpace == -1:
+          return S_ERROR('Could not obtain the AFS disk space')
+        return S_OK(float(diskSpace))
+      fsStat = os.statvfs(path)
+    except (IOError, OSError) as e:
+      return S_ERROR('Could not obtain the disk space: %s' % repr(e))
+    return S_OK(fsStat.f_bavail * fsStat.f_frsize / float(2 ** 20))
@@ -41,6 +41,7 @@ from DIRAC.Core.Utilities.Subprocess import getChildrenPIDs
 from DIRAC.ConfigurationSystem.Client.Config import gConfig
 from DIRAC.ConfigurationSystem.Client.PathFinder import getSystemInstance
 from DIRAC.WorkloadManagementSystem.Client.JobStateUpdateClient import JobStateUpdateClient
+from DIRAC.WorkloadManagementSystem.JobWrapper.ResourceSampler import ResourceSampler, BACKEND_PROCFS, BACKEND_CGROUP
 
 
 class Watchdog(object):
@@ -69,6 +70,10 @@ class Watchdog(object):
     self.peekFailCount = 0
     self.peekRetry = 5
     self.profiler = Profiler(pid)
+    # Sampler of procfs or of the cgroup, replacing the profiler if configured
+    self.sampler = None
+    self.lastSample = None
+    self.peakMemory = {}
     self.checkError = ''
     self.currentStats = {}
     self.initialized = False
@@ -95,6 +100,7 @@ class Watchdog(object):
     self.jobCPUMargin = 20  # %age buffer before killing job
     self.minCPUWallClockRatio = 5  # ratio %age
     self.nullCPULimit = 5  # After 5 sample times return null CPU consumption kill job
+    self.samplingTime = 0  # no sampling between the checks
     self.checkCount = 0
     self.wallClockCheckCount = 0
     self.nullCPUCount = 0
@@ -147,6 +153,17 @@ class Watchdog(object):
     self.minCPUWallClockRatio = gConfig.getValue(self.section + '/MinCPUWallClockRatio', 5)  # ratio %age
     # After 5 sample times return null CPU consumption kill job
     self.nullCPULimit = gConfig.getValue(self.section + '/NullCPUCountLimit', 5)
+    # Profiler, procfs or cgroup
+    samplerBackend = gConfig.getValue(self.section + '/ResourceSampler', 'Profiler')
+    if samplerBackend in (BACKEND_PROCFS, BACKEND_CGROUP):
+      if ResourceSampler.isAvailable(self.wrapperPID, samplerBackend):
+        self.sampler = ResourceSampler(self.wrapperPID, samplerBackend)
+      else:
+        self.log.warn("Resource sampler not available, using the profiler", samplerBackend)
+    elif samplerBackend != 'Profiler':
+      self.log.warn("Unknown resource sampler, using the profiler", samplerBackend)
+    # Period of the memory samples between the checks, for the peak memory: only with a resource sampler
+    self.samplingTime = gConfig.getValue(self.section + '/SamplingTime', 0)
     if self.checkingTime < self.minCheckingTime:
       self.log.info(
           'Requested CheckingTime of %s setting to %s seconds (minimum)' %
@@ -216,6 +233,12 @@ class Watchdog(object):
       else:
         self.littleTimeLeftCount -= 1
 
+    if self.sampler and self.samplingTime and \
+       (self.lastSample is None or time.time() - self.lastSample[0] >= self.samplingTime):
+      result = self.__sample()
+      if not result['OK']:
+        self.log.warn("Could not sample the resources", result['Message'])
+
     # Note: need to poll regularly to see if the thread is alive
     #      but only perform checks with a certain frequency
     if (time.time() - self.initialValues['StartTime']) > self.checkingTime * self.checkCount:
@@ -297,26 +320,27 @@ class Watchdog(object):
       self.parameters['MemoryUsed'] = []
     self.parameters['MemoryUsed'].append(memoryUsed)
 
-    result = self.profiler.vSizeUsage(withChildren=True)
-    if not result['OK']:
-      self.log.warn("Could not get vSize info from profiler", result['Message'])
-    else:
-      vsize = result['Value'] * 1024.
+    memory = self.__getMemory()
+    if 'Vsize' in memory:
+      vsize = memory['Vsize']
       heartBeatDict['Vsize'] = vsize
       self.parameters.setdefault('Vsize', [])
       self.parameters['Vsize'].append(vsize)
       msg += "Job Vsize: %.1f kb " % vsize
 
-    result = self.profiler.memoryUsage(withChildren=True)
-    if not result['OK']:
-      self.log.warn("Could not get rss info from profiler", result['Message'])
-    else:
-      rss = result['Value'] * 1024.
+    if 'RSS' in memory:
+      rss = memory['RSS']
       heartBeatDict['RSS'] = rss
       self.parameters.setdefault('RSS', [])
       self.parameters['RSS'].append(rss)
       msg += "Job RSS: %.1f kb " % rss
 
+    if self.peakMemory.get('RSS'):
+      # Peak of the samples since the previous check
+      heartBeatDict['MaxRSS'] = self.peakMemory['RSS']
+      msg += "Job MaxRSS: %.1f kb " % self.peakMemory['RSS']
+      self.peakMemory = {}
+
     if 'DiskSpace' not in self.parameters:
       self.parameters['DiskSpace'] = []
 
@@ -407,29 +431,79 @@ class Watchdog(object):
     return S_OK('Watchdog checking cycle complete')
 
   #############################################################################
-  def __getCPU(self):
-    """Uses the profiler to get CPU time for current process, its child, and the terminated child,
-       and returns HH:MM:SS after conversion.
+  def __sample(self):
+    """ Sample the resources with the resource sampler, keeping the peak memory since the last check.
+        A sample is reused by the checks of a same cycle.
     """
-    result = self.profiler.cpuUsageUser(withChildren=True,
-                                        withTerminatedChildren=True)
+    if self.lastSample is None or time.time() - self.lastSample[0] > 1:
+      result = self.sampler.sample()
+      if not result['OK']:
+        return result
+      self.lastSample = (time.time(), result['Value'])
+      for name in ('Vsize', 'RSS'):
+        self.peakMemory[name] = max(self.peakMemory.get(name, 0.), result['Value'][name] / 1024.)
+    return S_OK(self.lastSample[1])
+
+  #############################################################################
+  def __getMemory(self):
+    """ Get the virtual and resident memory of the job, in kB
+
+        :return: dict with 'Vsize' and 'RSS', for those which could be obtained
+    """
+    if self.sampler:
+      result = self.__sample()
+      if not result['OK']:
+        self.log.warn("Could not get memory info from the resource sampler", result['Message'])
+        return {}
+      return {'Vsize': result['Value']['Vsize'] / 1024., 'RSS': result['Value']['RSS'] / 1024.}
+
+    memory = {}
+    result = self.profiler.vSizeUsage(withChildren=True)
     if not result['OK']:
-      self.log.warn("Issue while checking consumed CPU for user", result['Message'])
-      if result['Errno'] == errno.ESRCH:
-        self.log.warn("The main process does not exist (anymore). This might be correct.")
-      return result
-    cpuUsageUser = result['Value']
+      self.log.warn("Could not get vSize info from profiler", result['Message'])
+    else:
+      memory['Vsize'] = result['Value'] * 1024.
 
-    result = self.profiler.cpuUsageSystem(withChildren=True,
-                                          withTerminatedChildren=True)
+    result = self.profiler.memoryUsage(withChildren=True)
     if not result['OK']:
-      self.log.warn("Issue while checking consumed CPU for system", result['Message'])
-      if result['Errno'] == errno.ESRCH:
-        self.log.warn("The main process does not exist (anymore). This might be correct.")
-      return result
-    cpuUsageSystem = result['Value']
+      self.log.warn("Could not get rss info from profiler", result['Message'])
+    else:
+      memory['RSS'] = result['Value'] * 1024.
+    return memory
+
+  #############################################################################
+  def __getCPU(self):
+    """Uses the profiler, or the resource sampler, to get CPU time for current process, its child,
+       and the terminated child, and returns HH:MM:SS after conversion.
+    """
+    if self.sampler:
+      result = self.__sample()
+      if not result['OK']:
+        self.log.warn("Issue while checking consumed CPU", result['Message'])
+        if result['Errno'] == errno.ESRCH:
+          self.log.warn("The main process does not exist (anymore). This might be correct.")
+        return result
+      cpuTimeTotal = result['Value']['CPU']
+    else:
+      result = self.profiler.cpuUsageUser(withChildren=True,
+                                          withTerminatedChildren=True)
+      if not result['OK']:
+        self.log.warn("Issue while checking consumed CPU for user", result['Message'])
+        if result['Errno'] == errno.ESRCH:
+          self.log.warn("The main process does not exist (anymore). This might be correct.")
+        return result
+      cpuUsageUser = result['Value']
 
-    cpuTimeTotal = cpuUsageUser + cpuUsageSystem
+      result = self.profiler.cpuUsageSystem(withChildren=True,
+                                            withTerminatedChildren=True)
+      if not result['OK']:
+        self.log.warn("Issue while checking consumed CPU for system", result['Message'])
+        if result['Errno'] == errno.ESRCH:
+          self.log.warn("The main process does not exist (anymore). This might be correct.")
+        return result
+      cpuUsageSystem = result['Value']
+
+      cpuTimeTotal = cpuUsageUser + cpuUsageSystem
     if cpuTimeTotal:
       self.log.verbose("Raw CPU time consumed (s) =", cpuTimeTotal)
       return self.__getCPUHMS(cpuTimeTotal)
@@ -741,20 +815,15 @@ class Watchdog(object):
     self.initialValues['MemoryUsed'] = memUsed
     self.parameters['MemoryUsed'] = []
 
-    result = self.profiler.vSizeUsage(withChildren=True)
-    if not result['OK']:
-      self.log.warn("Could not get vSize info from profiler", result['Message'])
-    else:
-      vsize = result['Value'] * 1024.
+    memory = self.__getMemory()
+    if 'Vsize' in memory:
+      vsize = memory['Vsize']
       self.initialValues['Vsize'] = vsize
       self.log.verbose("Vsize(kb)", "%.1f" % vsize)
     self.parameters['Vsize'] = []
 
-    result = self.profiler.memoryUsage(withChildren=True)
-    if not result['OK']:
-      self.log.warn("Could not get rss info from profiler", result['Message'])
-    else:
-      rss = result['Value'] * 1024.
+    if 'RSS' in memory:
+      rss = memory['RSS']
       self.initialValues['RSS'] = rss
       self.log.verbose("RSS(kb)", "%.1f" % rss)
     self.parameters['RSS'] = []
@@ -978,6 +1047,13 @@ class Watchdog(object):
   def getDiskSpace(self, exclude=None):
     """Obtains the available disk space.
     """
+    if self.sampler:
+      result = self.sampler.getFreeDiskSpace(exclude=exclude)
+      if not result['OK']:
+        self.log.warn(' Could not obtain disk usage', result['Message'])
+        result['Value'] = float(-1)
+      return result
+
     result = S_OK()
     diskSpace = getDiskSpace(exclude=exclude)
 
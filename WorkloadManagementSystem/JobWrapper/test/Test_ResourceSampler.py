@@ -0,0 +1,115 @@
+""" unit test for ResourceSampler.py
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import errno
+import os
+import subprocess
+
+import pytest
+
+from DIRAC.Core.Utilities.Os import getDiskSpace
+from DIRAC.WorkloadManagementSystem.JobWrapper.ResourceSampler import ResourceSampler, BACKEND_CGROUP
+
+pytestmark = pytest.mark.skipif(not os.path.exists('/proc/self/stat'), reason='procfs is not available')
+
+
+@pytest.fixture
+def fakeProcfs(tmpdir):
+  """ procfs and cgroup filesystem of a job 100 with a child 101, in its own cgroup """
+  procfs = tmpdir.mkdir('proc')
+  for pid, ppid, children in ((100, 1, '101'), (101, 100, '')):
+    procDir = procfs.mkdir(str(pid))
+    # utime stime cutime cstime at 14-17, starttime at 22, vsize and rss at 23-24
+    procDir.join('stat').write('%d (job (1)) S %d 0 0 0 0 0 0 0 0 0 100 50 20 10 0 0 1 0 1234 4096000 100 0\n' %
+                               (pid, ppid))
+    procDir.join('cgroup').write('1:memory:/\n0::/slot1\n')
+    procDir.mkdir('task').mkdir(str(pid)).join('children').write(children)
+  cgroup = tmpdir.mkdir('cgroup').mkdir('slot1')
+  cgroup.join('cpu.stat').write('usage_usec 9000000\nuser_usec 6000000\nsystem_usec 3000000\n')
+  cgroup.join('memory.current').write('2097152\n')
+  return str(procfs), str(tmpdir.join('cgroup'))
+
+
+def test_sample():
+  sampler = ResourceSampler(os.getpid())
+  sum(i * i for i in range(10 ** 6))
+  res = sampler.sample()
+  assert res['OK'], res
+  assert res['Value']['CPU'] > 0
+  assert res['Value']['CPU'] == pytest.approx(res['Value']['CPUUser'] + res['Value']['CPUSystem'])
+  assert res['Value']['RSS'] > 0
+  assert res['Value']['Vsize'] >= res['Value']['RSS']
+
+  # The CPU time does not decrease
+  cpu = res['Value']['CPU']
+  res = sampler.sample()
+  assert res['OK'], res
+  assert res['Value']['CPU'] >= cpu
+
+
+def test_sampleChildren():
+  sampler = ResourceSampler(os.getpid())
+  res = sampler.sample()
+  assert res['OK'], res
+  processes = res['Value']['Processes']
+
+  child = subprocess.Popen(['sleep', '30'])
+  try:
+    res = sampler.sample()
+    assert res['OK'], res
+    assert res['Value']['Processes'] == processes + 1
+  finally:
+    child.kill()
+    child.wait()
+  res = sampler.sample()
+  assert res['OK'], res
+  assert res['Value']['Processes'] == processes
+
+
+def test_sampleNoProcess(fakeProcfs):
+  procfs, _cgroupRoot = fakeProcfs
+  res = ResourceSampler(999, procfs=procfs).sample()
+  assert not res['OK']
+  assert res['Errno'] == errno.ESRCH
+
+
+def test_sampleFakeProcfs(fakeProcfs):
+  procfs, _cgroupRoot = fakeProcfs
+  sampler = ResourceSampler(100, procfs=procfs)
+  res = sampler.sample()
+  assert res['OK'], res
+  clockTicks = float(os.sysconf('SC_CLK_TCK'))
+  assert res['Value']['Processes'] == 2
+  assert res['Value']['CPUUser'] == pytest.approx(2 * 120 / clockTicks)
+  assert res['Value']['CPUSystem'] == pytest.approx(2 * 60 / clockTicks)
+  assert res['Value']['Vsize'] == 2 * 4096000
+  assert res['Value']['RSS'] == 2 * 100 * os.sysconf('SC_PAGE_SIZE')
+
+
+def test_sampleCgroup(fakeProcfs):
+  procfs, cgroupRoot = fakeProcfs
+  assert ResourceSampler.isAvailable(100, BACKEND_CGROUP, procfs=procfs, cgroupRoot=cgroupRoot)
+  sampler = ResourceSampler(100, BACKEND_CGROUP, procfs=procfs, cgroupRoot=cgroupRoot)
+  res = sampler.sample()
+  assert res['OK'], res
+  assert res['Value']['CPU'] == 9.
+  assert res['Value']['CPUUser'] == 6.
+  assert res['Value']['RSS'] == 2097152.
+
+
+def test_cgroupNotAvailable(fakeProcfs):
+  procfs, _cgroupRoot = fakeProcfs
+  assert not ResourceSampler.isAvailable(100, BACKEND_CGROUP, procfs=procfs, cgroupRoot='/nonexistent')
+
+
+def test_getFreeDiskSpace():
+  res = ResourceSampler(os.getpid()).getFreeDiskSpace('.')
+  assert res['OK'], res
+  diskSpace = getDiskSpace('.')
+  if diskSpace != -1:
+    # The free space can change between both calls
+    assert abs(res['Value'] - diskSpace) < 100
@@ -11,6 +11,7 @@ from mock import MagicMock
 
 # sut
 from DIRAC.WorkloadManagementSystem.JobWrapper.Watchdog import Watchdog
+from DIRAC.WorkloadManagementSystem.JobWrapper.ResourceSampler import ResourceSampler
 
 mock_exeThread = MagicMock()
 mock_spObject = MagicMock()
@@ -43,3 +44,17 @@ def test__performChecksFull():
   assert res['OK'] is True
   res = wd._performChecks()
   assert res['OK'] is True
+
+
+def test__performChecksSampler():
+  pid = os.getpid()
+  wd = Watchdog(pid, mock_exeThread, mock_spObject, 5000)
+  wd.sampler = ResourceSampler(pid)
+
+  res = wd.calibrate()
+  assert res['OK'] is True
+  assert wd.initialValues['RSS'] > 0
+  assert 'DiskSpace' in wd.initialValues
+  res = wd._performChecks()
+  assert res['OK'] is True
+  assert wd.parameters['RSS'][-1] > 0
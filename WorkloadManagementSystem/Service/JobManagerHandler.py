@@ -176,36 +176,41 @@ class JobManagerHandler(RequestHandler):
       if not result['OK']:
         return result
       jobDescList = result['Value']
-    else:
-      # if we are here, then jobDesc was the description of a single job.
-      jobDescList = [jobDesc]
 
-    jobIDList = []
+      # The generated jobs are inserted in bulk, all or none of them
+      result = gJobDB.insertNewJobsIntoDB(jobDescList,
+                                          self.owner,
+                                          self.ownerDN,
+                                          self.ownerGroup,
+                                          self.diracSetup,
+                                          initialStatus=JobStatus.SUBMITTING,
+                                          initialMinorStatus='Bulk transaction confirmation')
+      if not result['OK']:
+        return result
+      jobIDList = [jobDict['JobID'] for jobDict in result['Value']]
+      self.log.info("Jobs added to the JobDB", "%s to %s for %s/%s" % (jobIDList[0], jobIDList[-1],
+                                                                       self.ownerDN, self.ownerGroup))
 
-    if parametricJob:
-      initialStatus = JobStatus.SUBMITTING
-      initialMinorStatus = 'Bulk transaction confirmation'
+      gJobLoggingDB.addLoggingRecords([(jobDict['JobID'], jobDict['Status'], jobDict['MinorStatus'],
+                                        'idem', '', 'JobManager') for jobDict in result['Value']])
     else:
-      initialStatus = JobStatus.RECEIVED
-      initialMinorStatus = 'Job accepted'
-
-    for jobDescription in jobDescList:  # jobDescList because there might be a list generated by a parametric job
-      result = gJobDB.insertNewJobIntoDB(jobDescription,
+      # if we are here, then jobDesc was the description of a single job.
+      result = gJobDB.insertNewJobIntoDB(jobDesc,
                                          self.owner,
                                          self.ownerDN,
                                          self.ownerGroup,
                                          self.diracSetup,
-                                         initialStatus=initialStatus,
-                                         initialMinorStatus=initialMinorStatus)
+                                         initialStatus=JobStatus.RECEIVED,
+                                         initialMinorStatus='Job accepted')
       if not result['OK']:
         return result
 
       jobID = result['JobID']
-      self.log.info('Job added to the JobDB", "%s for %s/%s' % (jobID, self.ownerDN, self.ownerGroup))
+      self.log.info("Job added to the JobDB", "%s for %s/%s" % (jobID, self.ownerDN, self.ownerGroup))
 
       gJobLoggingDB.addLoggingRecord(jobID, result['Status'], result['MinorStatus'], source='JobManager')
 
-      jobIDList.append(jobID)
+      jobIDList = [jobID]
 
     # Set persistency flag
     retVal = gProxyManager.getUserPersistence(self.ownerDN, self.ownerGroup)
@@ -5,6 +5,9 @@
 
     setJobStatus()
 
+    With the AsyncHeartBeats option, the heart beats are acknowledged as soon as they are queued,
+    and written to the JobDB in bulk by a background thread, see HeartBeatQueue.
+
 """
 
 from __future__ import absolute_import
@@ -17,8 +20,8 @@ __RCSID__ = "$Id$"
 
 import time
 
-from DIRAC import S_OK, S_ERROR
-from DIRAC.Core.DISET.RequestHandler import RequestHandler
+from DIRAC import gLogger, S_OK, S_ERROR
+from DIRAC.Core.DISET.RequestHandler import RequestHandler, getServiceOption
 from DIRAC.Core.Utilities import Time
 from DIRAC.Core.Utilities.DEncode import ignoreEncodeWarning
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
@@ -26,19 +29,32 @@ from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB
 from DIRAC.WorkloadManagementSystem.DB.ElasticJobParametersDB import ElasticJobParametersDB
 from DIRAC.WorkloadManagementSystem.DB.JobLoggingDB import JobLoggingDB
 from DIRAC.WorkloadManagementSystem.Client import JobStatus
+from DIRAC.WorkloadManagementSystem.private.HeartBeatQueue import HeartBeatQueue
 
 # This is a global instance of the JobDB class
 jobDB = False
 logDB = False
 elasticJobParametersDB = False
+heartBeatQueue = None
 
 
 def initializeJobStateUpdateHandler(serviceInfo):
 
   global jobDB
   global logDB
+  global heartBeatQueue
   jobDB = JobDB()
   logDB = JobLoggingDB()
+  if getServiceOption(serviceInfo, 'AsyncHeartBeats', False):
+    heartBeatQueue = HeartBeatQueue(jobDB,
+                                    getServiceOption(serviceInfo, 'HeartBeatLogFile', 'heartBeats.log'),
+                                    getServiceOption(serviceInfo, 'HeartBeatFlushPeriod', 5))
+    # The heart beats recovered from the log of the previous run are written first.
+    # If it fails, they are kept in the queue and its log, and written by the next flushes.
+    result = heartBeatQueue.flush()
+    if not result['OK']:
+      gLogger.error("Failed to write the heart beats recovered from the log", result['Message'])
+    heartBeatQueue.start()
   return S_OK()
 
 
@@ -231,15 +247,17 @@ class JobStateUpdateHandler(RequestHandler):
       result = jobDB.setStartExecTime(jobID, startTime)
 
     # Update the JobLoggingDB records
+    records = []
     for date in dates:
       sDict = statusDict[date]
       status = sDict['Status'] if sDict['Status'] else 'idem'
       minor = sDict['MinorStatus'] if sDict['MinorStatus'] else 'idem'
       application = sDict['ApplicationStatus'] if sDict['ApplicationStatus'] else 'idem'
       source = sDict['Source']
-      result = logDB.addLoggingRecord(jobID, status, minor, application, date, source)
-      if not result['OK']:
-        return result
+      records.append((jobID, status, minor, application, date, source))
+    result = logDB.addLoggingRecords(records)
+    if not result['OK']:
+      return result
 
     return S_OK()
 
@@ -382,6 +400,11 @@ class JobStateUpdateHandler(RequestHandler):
     """ Send a heart beat sign of life for a job jobID
     """
 
+    if heartBeatQueue:
+      # The status is restored when the heart beats are written
+      heartBeatQueue.add(int(jobID), staticData, dynamicData)
+      return self.__sendJobCommands(int(jobID))
+
     result = jobDB.setHeartBeatData(int(jobID), staticData, dynamicData)
     if not result['OK']:
       self.log.warn('Failed to set the heart beat data', 'for job %d ' % int(jobID))
@@ -400,6 +423,12 @@ class JobStateUpdateHandler(RequestHandler):
       if not result['OK']:
         self.log.warn('Failed to restore the job status to Running')
 
+    return self.__sendJobCommands(int(jobID))
+
+  @staticmethod
+  def __sendJobCommands(jobID):
+    """ Get the commands to send to the job in the reply to its heart beat, and mark them as sent
+    """
     jobMessageDict = {}
     result = jobDB.getJobCommand(int(jobID))
     if result['OK']:
@@ -13,7 +13,7 @@ import six
 from DIRAC import gLogger, S_OK, S_ERROR
 
 from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
-from DIRAC.Core.DISET.RequestHandler import RequestHandler
+from DIRAC.Core.DISET.RequestHandler import RequestHandler, getServiceOption
 from DIRAC.Core.Utilities.DEncode import ignoreEncodeWarning
 
 from DIRAC.FrameworkSystem.Client.MonitoringClient import gMonitor
@@ -23,12 +23,14 @@ from DIRAC.WorkloadManagementSystem.DB.TaskQueueDB import TaskQueueDB
 from DIRAC.WorkloadManagementSystem.DB.JobLoggingDB import JobLoggingDB
 from DIRAC.WorkloadManagementSystem.DB.PilotAgentsDB import PilotAgentsDB
 
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex, DEFAULT_REFRESH_PERIOD
 from DIRAC.WorkloadManagementSystem.Client.Matcher import Matcher
 from DIRAC.WorkloadManagementSystem.Client.Limiter import Limiter
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 
 gJobDB = False
 gTaskQueueDB = False
+gTaskQueueIndex = None
 
 
 def initializeMatcherHandler(serviceInfo):
@@ -37,6 +39,7 @@ def initializeMatcherHandler(serviceInfo):
 
   global gJobDB
   global gTaskQueueDB
+  global gTaskQueueIndex
   global jlDB
   global pilotAgentsDB
 
@@ -45,6 +48,11 @@ def initializeMatcherHandler(serviceInfo):
   jlDB = JobLoggingDB()
   pilotAgentsDB = PilotAgentsDB()
 
+  if getServiceOption(serviceInfo, 'UseTaskQueueIndex', False):
+    gTaskQueueIndex = TaskQueueIndex(gTaskQueueDB,
+                                     refreshPeriod=getServiceOption(serviceInfo, 'TaskQueueIndexRefreshPeriod',
+                                                                    DEFAULT_REFRESH_PERIOD))
+
   gMonitor.registerActivity('matchTime', "Job matching time",
                             'Matching', "secs", gMonitor.OP_MEAN, 300)
   gMonitor.registerActivity('matchesDone', "Job Match Request",
@@ -57,6 +65,9 @@ def initializeMatcherHandler(serviceInfo):
   gTaskQueueDB.recalculateTQSharesForAll()
   gThreadScheduler.addPeriodicTask(120, gTaskQueueDB.recalculateTQSharesForAll)
   gThreadScheduler.addPeriodicTask(60, sendNumTaskQueues)
+  if gJobDB.runningCounterAttributes:
+    gThreadScheduler.addPeriodicTask(getServiceOption(serviceInfo, 'RunningCountersReconciliationPeriod', 600),
+                                     gJobDB.reconcileRunningJobCounters)
 
   sendNumTaskQueues()
 
@@ -93,7 +104,8 @@ class MatcherHandler(RequestHandler):
                         jobDB=gJobDB,
                         tqDB=gTaskQueueDB,
                         jlDB=jlDB,
-                        opsHelper=opsHelper)
+                        opsHelper=opsHelper,
+                        tqIndex=gTaskQueueIndex)
       result = matcher.selectJob(resourceDescription, credDict)
     except RuntimeError as rte:
       self.log.error("Error requesting job: ", rte)
@@ -107,6 +119,37 @@ class MatcherHandler(RequestHandler):
     # FIXME: This is correctly interpreted by the JobAgent, but DErrno should be used instead
     return S_ERROR("No match found")
 
+##############################################################################
+  types_requestJobs = [dict, six.integer_types, dict]
+
+  def export_requestJobs(self, resourceDescription, nJobs, resources):
+    """ Serve up to nJobs jobs to the request of an agent running several jobs at the same time,
+        fitting together in the resources (available NumberOfProcessors and MaxRAM)
+    """
+
+    resourceDescription['Setup'] = self.serviceInfoDict['clientSetup']
+    credDict = self.getRemoteCredentials()
+    nJobs = min(nJobs, self.srv_getCSOption('MaxJobsPerRequest', 64))
+
+    try:
+      opsHelper = Operations(group=credDict['group'])
+      matcher = Matcher(pilotAgentsDB=pilotAgentsDB,
+                        jobDB=gJobDB,
+                        tqDB=gTaskQueueDB,
+                        jlDB=jlDB,
+                        opsHelper=opsHelper,
+                        tqIndex=gTaskQueueIndex)
+      result = matcher.selectJobs(resourceDescription, credDict, nJobs, resources)
+    except RuntimeError as rte:
+      self.log.error("Error requesting jobs: ", rte)
+      return S_ERROR("Error requesting jobs")
+
+    gMonitor.addMark("matchesDone")
+    if result:
+      gMonitor.addMark("matchesOK", len(result))
+      return S_OK(result)
+    return S_ERROR("No match found")
+
 ##############################################################################
   types_getActiveTaskQueues = []
 
@@ -0,0 +1,153 @@
+""" Encoding of the JDLs stored in the JobJDLs table of the JobDB
+
+    Three formats are read:
+
+    - plain JDL text, starting with '['
+    - base64 encoded zlib compressed JDL, as written with the CompressJDLs option
+    - binary zlib compressed JDL, starting with BINARY_PREFIX, followed by a format byte:
+
+      - FORMAT_ZLIB: the zlib data
+      - FORMAT_ZLIB_DICTIONARY: the ID of the dictionary on 4 bytes, then the zlib data compressed with
+        this preset dictionary. The dictionaries are trained on a sample of JDLs with trainDictionary.
+        Their use requires Python 3, the zlib module of Python 2 not supporting preset dictionaries.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import base64
+import collections
+import struct
+import zlib
+
+import six
+
+from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
+
+# A JDL can not start with a null byte, nor can base64 data
+BINARY_PREFIX = b'\x00JDL'
+FORMAT_ZLIB = b'\x01'
+FORMAT_ZLIB_DICTIONARY = b'\x02'
+
+# Maximum size of the zlib preset dictionaries
+MAX_DICTIONARY_SIZE = 32 * 1024
+
+DICTIONARY_SUPPORTED = six.PY3
+
+
+def _toBytes(value):
+  """ Encode the text values """
+  if isinstance(value, six.text_type):
+    return value.encode('utf-8')
+  return value
+
+
+def _toStr(value):
+  """ Get the native string of bytes """
+  if six.PY3 and isinstance(value, bytes):
+    return value.decode('utf-8')
+  return value
+
+
+def compressJDL(jdl, dictionaryID=None, dictionary=None):
+  """ Compress a JDL in the binary format
+
+      :param str jdl: JDL text
+      :param int dictionaryID: ID of the preset dictionary, if any
+      :param bytes dictionary: preset dictionary
+
+      :return: bytes
+  """
+  jdl = _toBytes(jdl)
+  if dictionary and DICTIONARY_SUPPORTED:
+    compressor = zlib.compressobj(9, zlib.DEFLATED, zlib.MAX_WBITS, 9, zlib.Z_DEFAULT_STRATEGY, dictionary)
+    return (BINARY_PREFIX + FORMAT_ZLIB_DICTIONARY + struct.pack('!I', dictionaryID) +
+            compressor.compress(jdl) + compressor.flush())
+  return BINARY_PREFIX + FORMAT_ZLIB + zlib.compress(jdl, 9)
+
+
+def getJDLFormat(data):
+  """ Get the format of a stored JDL
+
+      :return: None for the text formats, else FORMAT_ZLIB or FORMAT_ZLIB_DICTIONARY
+  """
+  data = _toBytes(data)
+  if not data.startswith(BINARY_PREFIX):
+    return None
+  return data[len(BINARY_PREFIX):len(BINARY_PREFIX) + 1]
+
+
+def getDictionaryID(data):
+  """ Get the ID of the dictionary used to compress a stored JDL, None if there is none
+  """
+  data = _toBytes(data)
+  if getJDLFormat(data) != FORMAT_ZLIB_DICTIONARY:
+    return None
+  start = len(BINARY_PREFIX) + 1
+  return struct.unpack('!I', data[start:start + 4])[0]
+
+
+def extractJDL(data, dictionaries=None):
+  """ Get back the JDL text from any of the stored formats
+
+      :param data: stored JDL
+      :param dict dictionaries: preset dictionaries by their ID
+
+      :return: S_OK( str ) / S_ERROR
+  """
+  if not data:
+    return S_OK('')
+  data = _toBytes(data)
+  # the starting bracket is guaranteeed by JobManager.submitJob
+  # we need the check to be backward compatible
+  if data.startswith(b'['):
+    return S_OK(_toStr(data))
+
+  jdlFormat = getJDLFormat(data)
+  try:
+    if jdlFormat is None:
+      return S_OK(_toStr(zlib.decompress(base64.b64decode(data))))
+    start = len(BINARY_PREFIX) + 1
+    if jdlFormat == FORMAT_ZLIB:
+      return S_OK(_toStr(zlib.decompress(data[start:])))
+    if jdlFormat == FORMAT_ZLIB_DICTIONARY:
+      if not DICTIONARY_SUPPORTED:
+        return S_ERROR('The JDL compression with a dictionary requires Python 3')
+      dictionaryID = getDictionaryID(data)
+      dictionary = (dictionaries or {}).get(dictionaryID)
+      if dictionary is None:
+        return S_ERROR('Unknown JDL compression dictionary %s' % dictionaryID)
+      decompressor = zlib.decompressobj(zlib.MAX_WBITS, dictionary)
+      return S_OK(_toStr(decompressor.decompress(data[start + 4:]) + decompressor.flush()))
+  except (zlib.error, ValueError, TypeError) as e:
+    return S_ERROR('Failed to decompress the JDL: %s' % repr(e))
+  return S_ERROR('Unknown JDL format %s' % repr(jdlFormat))
+
+
+def trainDictionary(jdls, maxSize=MAX_DICTIONARY_SIZE):
+  """ Build a preset dictionary from a sample of JDLs: their most common lines, weighted by their length,
+      the most common ones being at the end of the dictionary where the references to them are the shortest
+
+      :param list jdls: sample of JDL texts
+      :param int maxSize: maximum size of the dictionary
+
+      :return: bytes
+  """
+  lineCounts = collections.Counter()
+  for jdl in jdls:
+    lineCounts.update(set(_toBytes(line.strip()) for line in jdl.splitlines() if line.strip()))
+
+  selectedLines = []
+  size = 0
+  # The lines found in a single JDL are not worth it
+  for line, count in sorted(lineCounts.items(), key=lambda item: (item[1] * len(item[0]), item[0]), reverse=True):
+    if count < 2:
+      continue
+    if size + len(line) + 1 > maxSize:
+      continue
+    selectedLines.append(line)
+    size += len(line) + 1
+  return b'\n'.join(reversed(selectedLines))
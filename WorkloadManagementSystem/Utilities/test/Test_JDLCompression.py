@@ -0,0 +1,69 @@
+""" Test of the encoding of the stored JDLs
+"""
+
+# pylint: disable=missing-docstring
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import base64
+import zlib
+
+import pytest
+
+from DIRAC.WorkloadManagementSystem.Utilities import JDLCompression
+from DIRAC.WorkloadManagementSystem.Utilities.JDLCompression import compressJDL, extractJDL, trainDictionary, \
+    getJDLFormat, getDictionaryID
+
+JDL_TEMPLATE = """[
+    Arguments = "jobDescription.xml -o LogLevel=INFO";
+    Executable = "dirac-jobexec";
+    InputData = {"/lhcb/MC/2018/DST/%08d/0000/%08d_00000%03d_1.dst"};
+    JobGroup = "%08d";
+    JobName = "%08d_%08d";
+    JobType = "MCSimulation";
+    OutputSandbox = {"std.err", "std.out"};
+    Priority = 1;
+    StdError = "std.err";
+    StdOutput = "std.out";
+]"""
+
+JDLS = [JDL_TEMPLATE % (n // 100, n // 100, n % 100, n // 100, n // 100, n) for n in range(200)]
+
+
+def test_formats():
+  jdl = JDLS[0]
+  assert extractJDL(jdl)['Value'] == jdl
+  assert extractJDL(jdl.encode())['Value'] == jdl
+  assert extractJDL('')['Value'] == ''
+  # Legacy base64 text
+  assert extractJDL(base64.b64encode(zlib.compress(jdl.encode())))['Value'] == jdl
+
+  compressed = compressJDL(jdl)
+  assert getJDLFormat(compressed) == JDLCompression.FORMAT_ZLIB
+  assert getDictionaryID(compressed) is None
+  assert len(compressed) < len(jdl)
+  assert extractJDL(compressed)['Value'] == jdl
+
+  assert not extractJDL(JDLCompression.BINARY_PREFIX + b'\x01garbage')['OK']
+
+
+@pytest.mark.skipif(not JDLCompression.DICTIONARY_SUPPORTED, reason="Requires Python 3")
+def test_dictionary():
+  dictionary = trainDictionary(JDLS[:100])
+  assert 0 < len(dictionary) <= JDLCompression.MAX_DICTIONARY_SIZE
+  # The lines found in every JDL are in the dictionary, the job specific ones are not
+  assert b'JobType = "MCSimulation";' in dictionary
+  assert b'JobName = "00000000_00000000";' not in dictionary
+
+  jdl = JDLS[150]
+  compressed = compressJDL(jdl, 7, dictionary)
+  assert getJDLFormat(compressed) == JDLCompression.FORMAT_ZLIB_DICTIONARY
+  assert getDictionaryID(compressed) == 7
+  assert len(compressed) < len(compressJDL(jdl))
+  assert extractJDL(compressed, {7: dictionary})['Value'] == jdl
+  assert not extractJDL(compressed, {8: dictionary})['OK']
+
+  assert trainDictionary(JDLS[:100], maxSize=100).count(b'\n') < 5
+  assert trainDictionary(JDLS[:1]) == b''
@@ -0,0 +1,190 @@
+""" Queue of the heart beats received by the JobStateUpdate service, written to the JobDB in bulk
+
+    The heart beats are coalesced per job in memory: the last heart beat time and static data of each job,
+    and its dynamic data by heart beat time. A writer thread flushes them to the JobDB at a fixed period,
+    with a few statements for all the jobs.
+
+    Each heart beat is first appended to a write-ahead log file, so that the heart beats not yet written
+    to the JobDB are recovered when the service restarts. At each flush the log is moved aside to
+    <logFile>.flushing, which is removed once the flush succeeded.
+
+    The log is written to the operating system before a heart beat is acknowledged, but it is not synced
+    to the disk: the heart beats survive a restart of the service, while the last ones acknowledged can be
+    lost if the host crashes. A job sends a new heart beat at each period, so only its last monitoring data
+    and heart beat time are lost.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import json
+import os
+import shutil
+import threading
+import time
+
+from DIRAC import S_OK, gLogger
+from DIRAC.Core.Utilities import Time
+
+
+class HeartBeatQueue(object):
+  """ In memory queue of the heart beats, backed by a write-ahead log file
+  """
+
+  def __init__(self, jobDB, logFile, flushPeriod=5):
+    """ c'tor, recovering the heart beats of the log files left by a previous run
+
+        :param jobDB: JobDB instance
+        :param str logFile: path of the write-ahead log file
+        :param int flushPeriod: period of the writing to the JobDB in seconds
+    """
+    self.jobDB = jobDB
+    self.logFile = os.path.abspath(logFile)
+    self.flushingLogFile = self.logFile + '.flushing'
+    self.flushPeriod = flushPeriod
+    self.log = gLogger.getSubLogger('HeartBeatQueue')
+
+    self.__heartBeats = {}
+    # Protects the heart beats and the log file, the flushes being serialized by the flush lock
+    self.__lock = threading.Lock()
+    self.__flushLock = threading.Lock()
+    self.__writerThread = None
+
+    recovered = 0
+    for fileName in (self.flushingLogFile, self.logFile):
+      recovered += self.__replay(fileName)
+    if recovered:
+      self.log.info("Heart beats recovered from the log", "%d, for %d jobs" % (recovered, len(self.__heartBeats)))
+    logDir = os.path.dirname(self.logFile)
+    if not os.path.isdir(logDir):
+      os.makedirs(logDir)
+    self.__log = open(self.logFile, 'a')
+    if recovered and self.__log.tell() and not self.__endsWithNewLine(self.logFile):
+      # Do not append to a truncated record
+      self.__log.write('\n')
+
+  def start(self):
+    """ Start the writer thread
+    """
+    if self.__writerThread is None:
+      self.__writerThread = threading.Thread(target=self.__writeLoop, name='HeartBeatQueue')
+      self.__writerThread.daemon = True
+      self.__writerThread.start()
+    return S_OK()
+
+  def add(self, jobID, staticData, dynamicData, heartBeatTime=None):
+    """ Queue the heart beat of a job
+
+        :param int jobID: job ID
+        :param dict staticData: static data, stored as job parameters
+        :param dict dynamicData: dynamic data, stored in the heart beat logging info
+        :param str heartBeatTime: time stamp of the heart beat, now by default
+    """
+    if heartBeatTime is None:
+      heartBeatTime = Time.dateTime().strftime('%Y-%m-%d %H:%M:%S')
+    record = json.dumps([int(jobID), heartBeatTime, staticData, dynamicData], default=str)
+    with self.__lock:
+      self.__log.write(record + '\n')
+      self.__log.flush()
+      self.__queue(int(jobID), heartBeatTime, staticData, dynamicData)
+    return S_OK()
+
+  def getNumberOfJobs(self):
+    """ Number of jobs with queued heart beats """
+    return len(self.__heartBeats)
+
+  def flush(self):
+    """ Write the queued heart beats to the JobDB
+
+        :return: S_OK( number of jobs ) / S_ERROR, the heart beats being kept in the queue
+    """
+    with self.__flushLock:
+      with self.__lock:
+        heartBeats = self.__heartBeats
+        if not heartBeats:
+          return S_OK(0)
+        self.__heartBeats = {}
+        self.__rotateLog()
+
+      result = self.jobDB.setHeartBeatDataBulk(heartBeats)
+      if not result['OK']:
+        # Retried at the next flush, with the heart beats received in between
+        with self.__lock:
+          for jobID, heartBeat in heartBeats.items():
+            newHeartBeat = self.__heartBeats.get(jobID)
+            self.__heartBeats[jobID] = heartBeat
+            if newHeartBeat:
+              heartBeat['HeartBeatTime'] = max(heartBeat['HeartBeatTime'], newHeartBeat['HeartBeatTime'])
+              heartBeat['StaticData'].update(newHeartBeat['StaticData'])
+              for heartBeatTime, dynamicData in newHeartBeat['DynamicData'].items():
+                heartBeat['DynamicData'].setdefault(heartBeatTime, {}).update(dynamicData)
+        return result
+
+      os.remove(self.flushingLogFile)
+      return S_OK(len(heartBeats))
+
+  def __writeLoop(self):
+    """ Body of the writer thread """
+    while True:
+      time.sleep(self.flushPeriod)
+      try:
+        result = self.flush()
+        if not result['OK']:
+          self.log.error("Failed to write the heart beats", result['Message'])
+        elif result['Value']:
+          self.log.verbose("Heart beats written", "for %d jobs" % result['Value'])
+      except Exception as e:  # pylint: disable=broad-except
+        self.log.exception("Failed to write the heart beats", lException=e)
+
+  def __queue(self, jobID, heartBeatTime, staticData, dynamicData):
+    """ Coalesce a heart beat with the queued ones of the job """
+    heartBeat = self.__heartBeats.setdefault(jobID, {'HeartBeatTime': heartBeatTime,
+                                                     'StaticData': {},
+                                                     'DynamicData': {}})
+    heartBeat['HeartBeatTime'] = max(heartBeat['HeartBeatTime'], heartBeatTime)
+    heartBeat['StaticData'].update(staticData)
+    if dynamicData:
+      heartBeat['DynamicData'].setdefault(heartBeatTime, {}).update(dynamicData)
+
+  def __rotateLog(self):
+    """ Move the log of the heart beats being flushed aside, and start a new one """
+    self.__log.close()
+    if os.path.exists(self.flushingLogFile):
+      # The previous flush failed: its heart beats are flushed again with the new ones
+      with open(self.logFile) as logFile:
+        with open(self.flushingLogFile, 'a') as flushingLogFile:
+          shutil.copyfileobj(logFile, flushingLogFile)
+      os.remove(self.logFile)
+    else:
+      os.rename(self.logFile, self.flushingLogFile)
+    self.__log = open(self.logFile, 'a')
+
+  @staticmethod
+  def __endsWithNewLine(fileName):
+    """ Whether the last record of a log file is complete """
+    with open(fileName, 'rb') as logFile:
+      logFile.seek(-1, os.SEEK_END)
+      return logFile.read(1) == b'\n'
+
+  def __replay(self, fileName):
+    """ Queue the heart beats of a log file
+
+        :return: number of heart beats
+    """
+    if not os.path.exists(fileName):
+      return 0
+    count = 0
+    with open(fileName) as logFile:
+      for line in logFile:
+        try:
+          jobID, heartBeatTime, staticData, dynamicData = json.loads(line)
+        except ValueError:
+          # The last line can be truncated
+          self.log.warn("Invalid heart beat record in the log", "%s: %s" % (fileName, line.strip()))
+          continue
+        self.__queue(jobID, heartBeatTime, staticData, dynamicData)
+        count += 1
+    return count
@@ -0,0 +1,324 @@
+""" In memory index of the task queues, used by the Matcher to select the task queues matching a resource
+    without querying the TaskQueueDB.
+
+    The task queue definitions never change once created, so the index only loads the definitions
+    of the new task queues and forgets the deleted ones. For this, a light query on the task queues
+    priorities is done at most every refreshPeriod seconds. The jobs are still taken out
+    of the selected task queues in the DB, see TaskQueueDB.matchAndGetJob.
+
+    The selection gives the same results as the SQL query generated by the TaskQueueDB:
+    the values are compared like MySQL does (case insensitive, ignoring the trailing spaces)
+    and the task queues are ordered by RAND() / Priority.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import heapq
+import random
+import string
+import threading
+import time
+
+from collections import defaultdict
+
+from DIRAC import gLogger, S_OK, S_ERROR
+from DIRAC.Core.Security import Properties
+from DIRAC.ConfigurationSystem.Client.Helpers import Registry
+from DIRAC.WorkloadManagementSystem.DB.TaskQueueDB import singleValueDefFields, multiValueDefFields, \
+    multiValueMatchFields, bannedJobMatchFields, mandatoryMatchFields
+
+DEFAULT_REFRESH_PERIOD = 10
+
+
+def _normalise(value):
+  """ Key used to compare the values, like MySQL with a case insensitive collation """
+  return str(value).strip().lower()
+
+
+def _asList(value):
+  if isinstance(value, (list, tuple)):
+    return list(value)
+  return [value]
+
+
+def _isAny(values):
+  """ True if one of the values means anything """
+  return any(''.join(char for char in _normalise(value) if char not in string.punctuation) == 'any'
+             for value in values)
+
+
+class TaskQueueIndex(object):
+  """ Inverted maps of the task queues, by owner, setup, CPU time segment and multi value field
+  """
+
+  def __init__(self, tqDB, refreshPeriod=DEFAULT_REFRESH_PERIOD):
+    """ c'tor
+
+        :param tqDB: TaskQueueDB object
+        :param int refreshPeriod: maximum age in seconds of the index content
+    """
+    self.__tqDB = tqDB
+    self.__refreshPeriod = refreshPeriod
+    self.log = gLogger.getSubLogger("TaskQueueIndex")
+    self.__lock = threading.Lock()
+    self.__refreshLock = threading.Lock()
+    self.__lastRefresh = 0
+    self.__loaded = False
+    # tqId -> priority, for the indexed task queues
+    self.__priorities = {}
+    # tqId -> (ownerDN, ownerGroup) as in the DB
+    self.__owners = {}
+    # tqId -> normalised definition
+    self.__definitions = {}
+    self.__byOwner = defaultdict(set)
+    self.__bySingleField = dict((field, defaultdict(set)) for field in singleValueDefFields)
+    self.__byValue = dict((field, defaultdict(set)) for field in multiValueDefFields)
+    self.__withoutValue = dict((field, set()) for field in multiValueDefFields)
+
+  def __len__(self):
+    return len(self.__definitions)
+
+  def refresh(self, force=False):
+    """ Bring the index up to date, if it is older than the refresh period
+
+        :param bool force: refresh whatever the age of the index
+        :returns: S_OK() / S_ERROR
+    """
+    if not force and time.time() - self.__lastRefresh < self.__refreshPeriod:
+      return S_OK()
+    # Only one thread refreshes, the other ones use the current content, unless there is none yet
+    if not self.__refreshLock.acquire(not self.__loaded):
+      return S_OK()
+    try:
+      if not force and time.time() - self.__lastRefresh < self.__refreshPeriod:
+        return S_OK()
+      result = self.__tqDB.getTaskQueuePriorities()
+      if not result['OK']:
+        return result
+      tqPriorities = result['Value']
+      # The task queues are created disabled, and enabled once their definition is complete
+      newTQs = [tqId for tqId, (_priority, enabled) in tqPriorities.items()
+                if tqId not in self.__definitions and enabled >= 1]
+      result = self.__tqDB.getTaskQueueDefinitions(newTQs)
+      if not result['OK']:
+        return result
+      newDefinitions = result['Value']
+      with self.__lock:
+        for tqId in list(self.__definitions):
+          if tqId not in tqPriorities:
+            self.__remove(tqId)
+        for tqId, tqDefDict in newDefinitions.items():
+          if tqId in tqPriorities:
+            self.__add(tqId, tqDefDict)
+        self.__priorities = dict((tqId, tqPriorities[tqId][0]) for tqId in self.__definitions)
+      self.__lastRefresh = time.time()
+      self.__loaded = True
+      self.log.verbose("Task queue index refreshed",
+                       "%s task queues, %s new" % (len(self.__definitions), len(newDefinitions)))
+      return S_OK()
+    finally:
+      self.__refreshLock.release()
+
+  def discard(self, tqId):
+    """ Remove a task queue from the index, for instance because it is empty.
+        It is added back by the next refresh if it still exists.
+    """
+    with self.__lock:
+      if tqId in self.__definitions:
+        self.__remove(tqId)
+        self.__priorities.pop(tqId, None)
+
+  def __add(self, tqId, tqDefDict):
+    """ Index a task queue """
+    definition = {}
+    for field in singleValueDefFields:
+      value = int(tqDefDict[field]) if field == 'CPUTime' else _normalise(tqDefDict[field])
+      definition[field] = value
+      self.__bySingleField[field][value].add(tqId)
+    self.__byOwner[(definition['OwnerDN'], definition['OwnerGroup'])].add(tqId)
+    for field in multiValueDefFields:
+      values = set(_normalise(value) for value in tqDefDict.get(field, []))
+      definition[field] = values
+      if not values:
+        self.__withoutValue[field].add(tqId)
+      for value in values:
+        self.__byValue[field][value].add(tqId)
+    self.__definitions[tqId] = definition
+    self.__owners[tqId] = (tqDefDict['OwnerDN'], tqDefDict['OwnerGroup'])
+
+  def __remove(self, tqId):
+    """ Remove a task queue from the maps """
+    definition = self.__definitions.pop(tqId)
+    self.__owners.pop(tqId)
+    for field in singleValueDefFields:
+      self.__discardFromMap(self.__bySingleField[field], definition[field], tqId)
+    self.__discardFromMap(self.__byOwner, (definition['OwnerDN'], definition['OwnerGroup']), tqId)
+    for field in multiValueDefFields:
+      self.__withoutValue[field].discard(tqId)
+      for value in definition[field]:
+        self.__discardFromMap(self.__byValue[field], value, tqId)
+
+  @staticmethod
+  def __discardFromMap(indexMap, key, tqId):
+    tqIds = indexMap.get(key)
+    if tqIds is not None:
+      tqIds.discard(tqId)
+      if not tqIds:
+        del indexMap[key]
+
+  def __withValues(self, field, values):
+    """ Task queues having at least one of the values for a multi value field """
+    tqIds = set()
+    for value in values:
+      tqIds.update(self.__byValue[field].get(_normalise(value), ()))
+    return tqIds
+
+  def __withAllValues(self, field, values):
+    """ Task queues having all the values for a multi value field """
+    tqIds = None
+    for value in values:
+      withValue = self.__byValue[field].get(_normalise(value), set())
+      tqIds = set(withValue) if tqIds is None else tqIds & withValue
+    return tqIds if tqIds is not None else set(self.__definitions)
+
+  def match(self, tqMatchDict, numQueuesToGet=1, negativeCond=None):
+    """ Get the task queues matching the requirements, like TaskQueueDB.matchAndGetTaskQueue
+
+        :param dict tqMatchDict: resource description, with values not escaped
+        :param int numQueuesToGet: maximum number of task queues to return, 0 for all
+        :param negativeCond: dict or list of dicts of conditions excluding task queues, like the Limiter ones
+
+        :returns: S_OK( [ ( tqId, ownerDN, ownerGroup ) ] ) / S_ERROR
+    """
+    for field in mandatoryMatchFields:
+      if field not in tqMatchDict:
+        return S_ERROR("Missing mandatory field '%s' in match request definition" % field)
+    result = self.refresh()
+    if not result['OK']:
+      if not self.__loaded:
+        return S_ERROR("Can't load the task queue index: %s" % result['Message'])
+      self.log.warn("Can't refresh the task queue index, using the current content", result['Message'])
+    with self.__lock:
+      result = self.__select(tqMatchDict, negativeCond)
+      if not result['OK']:
+        return result
+      # Same as ORDER BY RAND() / Priority
+      randomKeys = []
+      for tqId in result['Value']:
+        priority = self.__priorities[tqId]
+        randomKeys.append((random.random() / priority if priority > 0 else float('inf'), tqId))
+      if numQueuesToGet:
+        randomKeys = heapq.nsmallest(numQueuesToGet, randomKeys)
+      else:
+        randomKeys.sort()
+      return S_OK([(tqId,) + self.__owners[tqId] for _key, tqId in randomKeys])
+
+  def __select(self, tqMatchDict, negativeCond):
+    """ Set of task queues matching the requirements, the lock must be held """
+    tqIds = set(self.__definitions)
+
+    # Owner: only the combinations that make sense
+    if 'OwnerDN' in tqMatchDict and 'OwnerGroup' in tqMatchDict:
+      ownerTQs = set()
+      for group in _asList(tqMatchDict['OwnerGroup']):
+        if Properties.JOB_SHARING in Registry.getPropertiesForGroup(group):
+          ownerTQs.update(self.__bySingleField['OwnerGroup'].get(_normalise(group), ()))
+        else:
+          for dn in _asList(tqMatchDict['OwnerDN']):
+            ownerTQs.update(self.__byOwner.get((_normalise(dn), _normalise(group)), ()))
+      tqIds &= ownerTQs
+    else:
+      for field in ('OwnerGroup', 'OwnerDN'):
+        if field in tqMatchDict:
+          tqIds &= self.__withSingleValues(field, tqMatchDict[field])
+
+    tqIds &= self.__withSingleValues('Setup', tqMatchDict['Setup'])
+    # The task queue CPU time is one of the segments, smaller than the one of the resource
+    maxCPUTime = max(int(cpuTime) for cpuTime in _asList(tqMatchDict['CPUTime']))
+    cpuTQs = set()
+    for cpuTime, segmentTQs in self.__bySingleField['CPUTime'].items():
+      if cpuTime <= maxCPUTime:
+        cpuTQs.update(segmentTQs)
+    tqIds &= cpuTQs
+
+    # Multi value fields
+    tagValues = []
+    for field in multiValueMatchFields:
+      # Without Tag nor RequiredTag, only the task queues without tags match
+      if field == 'Tag' and 'Tag' not in tqMatchDict and 'RequiredTag' not in tqMatchDict:
+        tqMatchDict = dict(tqMatchDict, Tag=[])
+      if field not in tqMatchDict:
+        continue
+      tqField = '%ss' % field
+      values = _asList(tqMatchDict[field])
+      if field == 'Tag':
+        tagValues = values
+        if _isAny(values):
+          continue
+        # All the tags of the task queue must be provided by the resource, MySQL ignores the empty one
+        resourceTags = set(_normalise(value) for value in values) or set([''])
+        for tag, tagTQs in self.__byValue[tqField].items():
+          if tag not in resourceTags:
+            tqIds -= tagTQs
+      else:
+        if not tqMatchDict[field] or _isAny(values):
+          continue
+        tqIds &= self.__withoutValue[tqField] | self.__withValues(tqField, values)
+
+      # In case of Site, check it's not in job banned sites
+      if field in bannedJobMatchFields:
+        tqIds -= self.__withAllValues('Banned%s' % tqField, values)
+
+    # Required tags, that must be in the task queue tags
+    requiredTags = _asList(tqMatchDict.get('RequiredTag', []))
+    if requiredTags and not _isAny(requiredTags):
+      if not set(requiredTags).issubset(set(tagValues)):
+        return S_ERROR('Wrong conditions')
+      tqIds &= self.__withAllValues('Tags', requiredTags)
+
+    # Resource banning conditions: the task queue can't require all the banned values
+    for field in multiValueMatchFields:
+      bannedValues = tqMatchDict.get("Banned%s" % field)
+      if not bannedValues:
+        continue
+      bannedValues = _asList(bannedValues)
+      if _isAny(bannedValues):
+        continue
+      tqIds -= self.__withAllValues('%ss' % field, bannedValues)
+
+    # Extra negative conditions
+    if negativeCond:
+      if isinstance(negativeCond, dict):
+        negativeCond = [negativeCond]
+      elif not isinstance(negativeCond, (list, tuple)):
+        return S_ERROR("negativeCond has to be either a list or a dict or a tuple, and it's %s" % type(negativeCond))
+      eligibleTQs = set()
+      for condDict in negativeCond:
+        eligibleTQs |= self.__notDict(condDict, tqIds)
+      tqIds &= eligibleTQs
+
+    return S_OK(tqIds)
+
+  def __withSingleValues(self, field, values):
+    """ Task queues with one of the values for a single value field """
+    tqIds = set()
+    for value in _asList(values):
+      value = int(value) if field == 'CPUTime' else _normalise(value)
+      tqIds.update(self.__bySingleField[field].get(value, ()))
+    return tqIds
+
+  def __notDict(self, condDict, tqIds):
+    """ Task queues among tqIds not fulfilling all the conditions of the dict:
+        not ( cond1 and cond2 ) = ( not cond1 or not cond2 )
+    """
+    eligibleTQs = set()
+    for field, values in condDict.items():
+      if field in multiValueMatchFields:
+        eligibleTQs |= tqIds - self.__withValues('%ss' % field, _asList(values))
+      elif field in singleValueDefFields:
+        for value in _asList(values):
+          eligibleTQs |= tqIds - self.__withSingleValues(field, value)
+    return eligibleTQs
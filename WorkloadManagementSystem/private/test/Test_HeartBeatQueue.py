@@ -0,0 +1,81 @@
+""" Test the queue of the heart beats
+"""
+
+# pylint: disable=protected-access, missing-docstring
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+from mock import MagicMock
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.WorkloadManagementSystem.private.HeartBeatQueue import HeartBeatQueue
+
+
+def test_coalesce(tmpdir):
+  jobDB = MagicMock()
+  jobDB.setHeartBeatDataBulk.return_value = S_OK()
+  queue = HeartBeatQueue(jobDB, str(tmpdir.join('heartBeats.log')))
+  queue.add(1, {'Node': 'wn1'}, {'CPU': 1}, '2020-01-01 10:00:00')
+  queue.add(2, {}, {'CPU': 5}, '2020-01-01 10:00:01')
+  queue.add(1, {'Node': 'wn2'}, {'CPU': 2}, '2020-01-01 10:00:10')
+  assert queue.getNumberOfJobs() == 2
+
+  assert queue.flush()['Value'] == 2
+  heartBeats = jobDB.setHeartBeatDataBulk.call_args[0][0]
+  assert heartBeats[1] == {'HeartBeatTime': '2020-01-01 10:00:10',
+                           'StaticData': {'Node': 'wn2'},
+                           'DynamicData': {'2020-01-01 10:00:00': {'CPU': 1}, '2020-01-01 10:00:10': {'CPU': 2}}}
+  assert queue.getNumberOfJobs() == 0
+  assert not os.path.exists(queue.flushingLogFile)
+  assert os.path.getsize(queue.logFile) == 0
+
+  jobDB.reset_mock()
+  assert queue.flush()['Value'] == 0
+  assert not jobDB.setHeartBeatDataBulk.called
+
+
+def test_failedFlush(tmpdir):
+  jobDB = MagicMock()
+  jobDB.setHeartBeatDataBulk.return_value = S_ERROR('DB down')
+  queue = HeartBeatQueue(jobDB, str(tmpdir.join('heartBeats.log')))
+  queue.add(1, {'Node': 'wn1'}, {'CPU': 1}, '2020-01-01 10:00:00')
+  assert not queue.flush()['OK']
+  # The heart beats received in between take precedence
+  queue.add(1, {'Node': 'wn2'}, {'CPU': 2}, '2020-01-01 10:00:10')
+  assert not queue.flush()['OK']
+  assert queue.getNumberOfJobs() == 1
+
+  jobDB.setHeartBeatDataBulk.return_value = S_OK()
+  assert queue.flush()['OK']
+  heartBeat = jobDB.setHeartBeatDataBulk.call_args[0][0][1]
+  assert heartBeat['StaticData'] == {'Node': 'wn2'}
+  assert sorted(heartBeat['DynamicData']) == ['2020-01-01 10:00:00', '2020-01-01 10:00:10']
+  assert not os.path.exists(queue.flushingLogFile)
+
+
+def test_recovery(tmpdir):
+  logFile = str(tmpdir.join('heartBeats.log'))
+  jobDB = MagicMock()
+  jobDB.setHeartBeatDataBulk.return_value = S_ERROR('DB down')
+  queue = HeartBeatQueue(jobDB, logFile)
+  queue.add(1, {'Node': 'wn1'}, {'CPU': 1}, '2020-01-01 10:00:00')
+  queue.flush()
+  queue.add(2, {}, {'CPU': 5}, '2020-01-01 10:00:01')
+  # A record truncated by a crash
+  with open(logFile, 'a') as log:
+    log.write('[3, "2020-01')
+
+  # Restart: both the heart beats of the failed flush and the queued ones are recovered
+  jobDB = MagicMock()
+  jobDB.setHeartBeatDataBulk.return_value = S_OK()
+  queue = HeartBeatQueue(jobDB, logFile)
+  assert queue.getNumberOfJobs() == 2
+  queue.add(4, {}, {'CPU': 4}, '2020-01-01 10:00:20')
+  assert HeartBeatQueue(jobDB, logFile).getNumberOfJobs() == 3
+  assert queue.flush()['Value'] == 3
+  assert sorted(jobDB.setHeartBeatDataBulk.call_args[0][0]) == [1, 2, 4]
+  assert HeartBeatQueue(jobDB, logFile).getNumberOfJobs() == 0
@@ -0,0 +1,107 @@
+""" Test the in memory index of the task queues
+"""
+
+# pylint: disable=protected-access, missing-docstring
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from mock import MagicMock, patch
+from pytest import fixture
+
+from DIRAC import S_OK
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
+
+DN = '/DC=ch/CN=user'
+TASK_QUEUES = {1: {'OwnerDN': DN, 'OwnerGroup': 'user', 'Setup': 'Test', 'CPUTime': 360},
+               2: {'OwnerDN': DN, 'OwnerGroup': 'user', 'Setup': 'Test', 'CPUTime': 86400,
+                   'Sites': ['Site1', 'Site2'], 'Platforms': ['x86_64-centos7']},
+               3: {'OwnerDN': '/DC=ch/CN=prod', 'OwnerGroup': 'prod', 'Setup': 'Test', 'CPUTime': 360,
+                   'BannedSites': ['Site1'], 'JobTypes': ['MCSimulation'], 'Tags': ['MultiProcessor', '4Processors']},
+               4: {'OwnerDN': DN, 'OwnerGroup': 'user', 'Setup': 'Other', 'CPUTime': 360},
+               5: {'OwnerDN': DN, 'OwnerGroup': 'user', 'Setup': 'Test', 'CPUTime': 360, 'Tags': ['GPU']}}
+
+
+def getDefinitions(tqIdList):
+  tqData = {}
+  for tqId in tqIdList:
+    tqData[tqId] = dict(TASK_QUEUES[tqId])
+  return S_OK(tqData)
+
+
+@fixture
+def tqDB():
+  tqDB = MagicMock()
+  tqDB.getTaskQueuePriorities.return_value = S_OK(dict((tqId, (1., 1)) for tqId in TASK_QUEUES))
+  tqDB.getTaskQueueDefinitions.side_effect = getDefinitions
+  return tqDB
+
+
+def match(index, resourceDict, negativeCond=None):
+  with patch('DIRAC.WorkloadManagementSystem.private.TaskQueueIndex.Registry.getPropertiesForGroup',
+             side_effect=lambda group: ['JobSharing'] if group == 'prod' else []):
+    result = index.match(dict(resourceDict, Setup='Test'), numQueuesToGet=0, negativeCond=negativeCond)
+  assert result['OK'], result['Message']
+  return sorted(tqId for tqId, _ownerDN, _ownerGroup in result['Value'])
+
+
+def test_match(tqDB):
+  index = TaskQueueIndex(tqDB)
+  assert match(index, {'CPUTime': 1000}) == [1]
+  assert match(index, {'CPUTime': 100000}) == [1, 2]
+  # Values compared like MySQL does
+  assert match(index, {'CPUTime': 100000, 'Site': 'site2 '}) == [1, 2]
+  assert match(index, {'CPUTime': 100000, 'Site': 'Site3'}) == [1]
+  assert match(index, {'CPUTime': 100000, 'Site': 'ANY'}) == [1, 2]
+  assert match(index, {'CPUTime': 100000, 'Platform': ['slc6', 'x86_64-centos7']}) == [1, 2]
+  assert match(index, {'CPUTime': 100000, 'BannedSite': ['Site1', 'Site2']}) == [1]
+  # Tags of the task queue all provided by the resource, required tags all in the task queue
+  assert match(index, {'CPUTime': 1000, 'Tag': ['MultiProcessor', '4Processors', '2Processors']}) == [1, 3]
+  assert match(index, {'CPUTime': 1000, 'Tag': ['MultiProcessor']}) == [1]
+  assert match(index, {'CPUTime': 1000, 'Tag': ['GPU', 'MultiProcessor', '4Processors'],
+                       'RequiredTag': ['GPU']}) == [5]
+  assert not index.match({'Setup': 'Test', 'CPUTime': 1000, 'RequiredTag': ['GPU']})['OK']
+  # Banned sites of the task queues
+  assert match(index, {'CPUTime': 1000, 'Site': 'Site1', 'Tag': ['MultiProcessor', '4Processors']}) == [1]
+  assert match(index, {'CPUTime': 1000, 'Site': ['Site1', 'Site2'], 'Tag': ['MultiProcessor', '4Processors']}) == [1, 3]
+
+
+def test_owner(tqDB):
+  index = TaskQueueIndex(tqDB)
+  assert match(index, {'CPUTime': 1000, 'OwnerDN': DN, 'OwnerGroup': 'user'}) == [1]
+  assert match(index, {'CPUTime': 1000, 'OwnerDN': DN, 'OwnerGroup': 'prod', 'Tag': 'any'}) == [3]
+  assert match(index, {'CPUTime': 1000, 'OwnerGroup': ['user', 'prod']}) == [1]
+
+
+def test_negativeCond(tqDB):
+  index = TaskQueueIndex(tqDB)
+  resourceDict = {'CPUTime': 1000, 'Tag': ['MultiProcessor', '4Processors']}
+  assert match(index, resourceDict, negativeCond={'JobType': ['MCSimulation']}) == [1]
+  assert match(index, resourceDict, negativeCond={'JobType': ['User']}) == [1, 3]
+  # Not ( JobType and OwnerGroup )
+  assert match(index, resourceDict, negativeCond={'JobType': ['MCSimulation'], 'OwnerGroup': ['user']}) == [1, 3]
+  assert match(index, resourceDict, negativeCond=[{'OwnerGroup': ['user']}, {'OwnerGroup': ['prod']}]) == [1, 3]
+
+
+def test_refresh(tqDB):
+  index = TaskQueueIndex(tqDB, refreshPeriod=0)
+  assert match(index, {'CPUTime': 1000}) == [1]
+  assert len(index) == 5
+  # Only the new task queues are loaded, the deleted ones are forgotten, the disabled ones wait
+  tqDB.getTaskQueuePriorities.return_value = S_OK({1: (1., 0), 2: (1., 1), 3: (1., 1), 5: (1., 0)})
+  index.discard(5)
+  assert match(index, {'CPUTime': 1000}) == [1]
+  assert tqDB.getTaskQueueDefinitions.call_args[0][0] == []
+  assert len(index) == 3
+  tqDB.getTaskQueuePriorities.return_value = S_OK({1: (1., 1), 5: (1., 1)})
+  assert match(index, {'CPUTime': 1000, 'Tag': 'GPU'}) == [1, 5]
+  assert tqDB.getTaskQueueDefinitions.call_args[0][0] == [5]
+
+
+def test_priorities(tqDB):
+  """ The task queues are ordered by RAND() / Priority """
+  tqDB.getTaskQueuePriorities.return_value = S_OK({1: (1000000., 1), 2: (0.001, 1)})
+  index = TaskQueueIndex(tqDB)
+  firsts = [index.match({'Setup': 'Test', 'CPUTime': 100000}, numQueuesToGet=1)['Value'][0][0] for _ in range(20)]
+  assert firsts.count(1) > 15
@@ -275,3 +275,69 @@ def test_deleteEntries(name, fields, requiredFields, values, table, cond, expect
   result = mysqlDB.getCounters(name, fields, {})
   assert result['OK']
   assert result['Value'] == []
+
+
+@pytest.mark.parametrize("name, requiredFields, values, table, batchSize", [
+    (name, reqFields, genVal1(), table, 30)
+])
+def test_queryIter(name, requiredFields, values, table, batchSize):
+  """ Create a table, insert elements and iterate over them by batches, while doing other queries
+  """
+  mysqlDB = setupDBCreateTableInsertFields(table, requiredFields, values)
+
+  result = mysqlDB._queryIter("SELECT Count FROM %s ORDER BY Count" % name, batchSize=batchSize)
+  assert result['OK']
+  counts = []
+  for rows in result['Value']:
+    assert len(rows) <= batchSize
+    counts.extend(row[0] for row in rows)
+    # The connection of the thread is still usable
+    result = mysqlDB.getCounters(name, ['Name'], {})
+    assert result['OK']
+  assert counts == list(range(100))
+
+  # Interrupted iteration
+  result = mysqlDB._queryIter("SELECT Count FROM %s" % name, batchSize=batchSize)
+  assert result['OK']
+  with result['Value'] as rowBatches:
+    assert len(next(rowBatches)) == batchSize
+  assert list(rowBatches) == []
+
+  result = mysqlDB._queryIter("SELECT NoSuchField FROM %s" % name)
+  assert not result['OK']
+
+
+@pytest.mark.parametrize("name, table", [
+    (name, table)
+])
+def test_insertManyUpdateMany(name, table):
+  """ Create a table, insert and update rows in bulk
+  """
+  mysqlDB = setupDB()
+
+  result = mysqlDB._createTables(table, force=True)
+  assert result['OK']
+
+  result = mysqlDB.insertMany(name, ['ID', 'Name', 'Count'], [(i + 1, "it's %d" % i, i) for i in range(1000)])
+  assert result['OK']
+  assert result['Value'] == 1000
+
+  # The existing rows are updated
+  result = mysqlDB.insertMany(name, ['ID', 'Name', 'Count'], [(1, 'first', 0), (1001, 'last', 1000)],
+                              updateFields=['Name'])
+  assert result['OK']
+
+  result = mysqlDB.updateMany(name, ['Surname'], ['Count'], [('even', i) for i in range(0, 1001, 2)])
+  assert result['OK']
+  assert result['Value'] == 501
+
+  result = mysqlDB.getCounters(name, ['Surname'], {})
+  assert result['OK']
+  assert sorted(result['Value'], key=lambda x: x[1]) == [({'Surname': 'Tu'}, 500), ({'Surname': 'even'}, 501)]
+
+  result = mysqlDB.getFields(name, ['Name'], {'ID': [1, 3, 1001]})
+  assert result['OK']
+  assert sorted(result['Value']) == [('first',), ("it's 2",), ('last',)]
+
+  result = mysqlDB.insertMany(name, ['ID', 'Name'], [(1, 'wrong', 'number')])
+  assert not result['OK']
@@ -179,3 +179,37 @@ def test_jobParameters():
   for job in jobs:
     res = jobDB.removeJobFromDB(job)
     assert res['OK'] is True, res['Message']
+
+
+def test_insertNewJobsIntoDB():
+  jdls = [jdl.replace('"helloWorld"', '"helloWorld_%d"' % n).replace('InputData = ""', 'InputData = "/lfn/%d"' % n)
+          for n in range(5)]
+  res = jobDB.insertNewJobsIntoDB(jdls, 'owner', '/DN/OF/owner', 'ownerGroup', 'someSetup',
+                                  initialStatus='Submitting', initialMinorStatus='Bulk transaction confirmation')
+  assert res['OK'] is True, res['Message']
+  jobIDs = [jobDict['JobID'] for jobDict in res['Value']]
+  assert len(jobIDs) == 5
+  assert jobIDs == sorted(jobIDs)
+
+  for n, jobID in enumerate(jobIDs):
+    res = jobDB.getJobAttributes(jobID, ['Status', 'MinorStatus', 'JobName', 'Owner'])
+    assert res['OK'] is True, res['Message']
+    assert res['Value'] == {'Status': 'Submitting', 'MinorStatus': 'Bulk transaction confirmation',
+                            'JobName': 'helloWorld_%d' % n, 'Owner': 'owner'}
+    res = jobDB.getInputData(jobID)
+    assert res['OK'] is True, res['Message']
+    assert res['Value'] == ['/lfn/%d' % n]
+    res = jobDB.getJobJDL(jobID)
+    assert res['OK'] is True, res['Message']
+    assert 'JobRequirements' in res['Value']
+
+  # An invalid job makes the whole submission fail
+  res = jobDB.insertNewJobsIntoDB([jdls[0], jdl.replace('JobType = "User"', 'JobType = "User"; Owner = "other"')],
+                                  'owner', '/DN/OF/owner', 'ownerGroup', 'someSetup')
+  assert res['OK'] is False
+  res = jobDB.selectJobs({})
+  assert res['OK'] is True, res['Message']
+  assert sorted(int(job) for job in res['Value']) == jobIDs
+
+  res = jobDB.removeJobFromDB(jobIDs)
+  assert res['OK'] is True, res['Message']
@@ -60,6 +60,24 @@ class JobLoggingCase(JobLoggingDBTestCase):
 
     self.jlogDB.deleteJob(1)
 
+  def test_bulkRecords(self):
+
+    records = [(2, 'testing', 'minor %d' % i, 'idem', '2006-04-25 14:20:%02d' % i, 'Unittest') for i in range(10)]
+    result = self.jlogDB.addLoggingRecords(records)
+    self.assertTrue(result['OK'], result.get('Message'))
+    result = self.jlogDB.getJobLoggingInfo(2)
+    self.assertTrue(result['OK'], result.get('Message'))
+    self.assertEqual([record[1] for record in result['Value']], ['minor %d' % i for i in range(10)])
+
+    # None is stored as 'None', like it was before the records could be added in bulk
+    result = self.jlogDB.addLoggingRecords([(2, 'testing', None, None, '2006-04-25 14:21:00', 'Unittest')])
+    self.assertTrue(result['OK'], result.get('Message'))
+    result = self.jlogDB.getJobLoggingInfo(2)
+    self.assertTrue(result['OK'], result.get('Message'))
+    self.assertEqual(result['Value'][-1][1:3], ('None', 'None'))
+
+    self.jlogDB.deleteJob(2)
+
 
 if __name__ == '__main__':
   suite = unittest.defaultTestLoader.loadTestsFromTestCase(JobLoggingCase)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+""" Micro benchmark of the DEncode engines.
+
+    It compares the table driven reference implementation (tableEncode/tableDecode)
+    with the fast path (fastEncode/fastDecode) on payloads shaped like real DISET replies:
+
+      * replicas: {LFN: {SE: PFN}}, as returned by getReplicas
+      * jobAttributes: {JobID: {attribute: value}}, as returned by getJobsAttributes
+      * jobList: list of job attribute lists, as returned by the JobMonitoring summaries
+      * bigString: a single large string, like a sandbox or bundle chunk
+
+    Usage::
+
+      python benchmarkDEncode.py [nbOfLFNs] [repetitions]
+
+    It does not need any DIRAC configuration or service.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import datetime
+import sys
+import timeit
+
+from DIRAC.Core.Utilities import DEncode
+
+
+def generateReplicas(nbLfns):
+  """ Nested dict LFN -> SE -> PFN """
+  ses = ['CERN-DST', 'CNAF-DST', 'GRIDKA-DST', 'IN2P3-DST', 'PIC-DST', 'RAL-DST']
+  replicas = {}
+  for i in range(nbLfns):
+    lfn = '/lhcb/MC/2018/ALLSTREAMS.DST/00091234/0000/00091234_%08d_7.AllStreams.dst' % i
+    replicas[lfn] = dict((se, 'root://eos%s.cern.ch//eos%s' % (se.lower(), lfn)) for se in ses[:2 + i % 4])
+  return {'OK': True, 'Value': {'Successful': replicas, 'Failed': {}}}
+
+
+def generateJobAttributes(nbJobs):
+  """ Dict JobID -> attributes """
+  now = datetime.datetime.utcnow()
+  attributes = {}
+  for jobID in range(nbJobs):
+    attributes[jobID] = {'JobID': jobID,
+                         'Status': 'Running',
+                         'MinorStatus': 'Application',
+                         'Site': 'LCG.CERN.cern',
+                         'Owner': 'someuser',
+                         'OwnerGroup': 'lhcb_user',
+                         'JobGroup': '00012345',
+                         'LastUpdateTime': now,
+                         'RescheduleCounter': 0,
+                         'VerifiedFlag': True,
+                         'CPUTime': 12345.6}
+  return {'OK': True, 'Value': attributes}
+
+
+def generateJobList(nbJobs):
+  """ List of lists, as in the paged summaries """
+  return {'OK': True,
+          'Value': {'ParameterNames': ['JobID', 'Status', 'MinorStatus', 'Site', 'Owner'],
+                    'Records': [[jobID, 'Done', 'Execution Complete', 'LCG.CERN.cern', 'someuser']
+                                for jobID in range(nbJobs)]}}
+
+
+def generateBigString(size):
+  """ One big string """
+  return {'OK': True, 'Value': 'x' * size}
+
+
+def bench(name, payload, repetitions):
+  """ Time both engines on the payload and print the results """
+  encoded = DEncode.tableEncode(payload)
+  assert DEncode.fastEncode(payload) == encoded
+  assert DEncode.fastDecode(encoded)[1] == len(encoded)
+
+  results = {}
+  for label, func, arg in (('tableEncode', DEncode.tableEncode, payload),
+                           ('fastEncode', DEncode.fastEncode, payload),
+                           ('tableDecode', DEncode.tableDecode, encoded),
+                           ('fastDecode', DEncode.fastDecode, encoded)):
+    results[label] = min(timeit.repeat(lambda: func(arg), number=1, repeat=repetitions))
+
+  print("%-14s %10d bytes | encode %8.2f ms -> %8.2f ms (x%.1f) | decode %8.2f ms -> %8.2f ms (x%.1f)" % (
+      name, len(encoded),
+      results['tableEncode'] * 1000, results['fastEncode'] * 1000,
+      results['tableEncode'] / results['fastEncode'],
+      results['tableDecode'] * 1000, results['fastDecode'] * 1000,
+      results['tableDecode'] / results['fastDecode']))
+
+
+def main():
+  nbLfns = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+  repetitions = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+  bench('replicas', generateReplicas(nbLfns), repetitions)
+  bench('jobAttributes', generateJobAttributes(nbLfns), repetitions)
+  bench('jobList', generateJobList(nbLfns), repetitions)
+  bench('bigString', generateBigString(nbLfns * 10000), repetitions)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+""" Compare the formats of the JDLs stored in the JobDB: size, and time to decode them.
+
+    The formats are the plain text, the base64 text of the CompressJDLs option,
+    and the binary formats of the JDLStorage option, with and without a dictionary.
+    The dictionary is trained on one half of the JDLs, and measured on the other half.
+
+    Usage::
+
+      python benchmarkJDLCompression.py [nbOfJDLs] [jdlFile ...]
+
+    The JDLs are read from the files if given, else the most recent ones are read from the JobDB,
+    configured like for the integration tests, ideally a copy of a production instance.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import base64
+import sys
+import time
+import zlib
+
+from DIRAC.Core.Base import Script
+Script.parseCommandLine()
+
+from DIRAC.WorkloadManagementSystem.Utilities import JDLCompression
+
+
+def readJDLsFromDB(nbJDLs):
+  """ Read the most recent JDLs of the JobDB """
+  from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB
+  jobDB = JobDB()
+  result = jobDB._query("SELECT JobID FROM JobJDLs ORDER BY JobID DESC LIMIT %d" % nbJDLs)
+  assert result['OK'], result['Message']
+  jdls = []
+  for row in result['Value']:
+    result = jobDB.getJobJDL(row[0], original=True)
+    if result['OK'] and result['Value']:
+      jdls.append(result['Value'])
+  return jdls
+
+
+def measure(name, jdls, encode, decode):
+  """ Print the size of the encoded JDLs and the time to decode them """
+  encoded = [encode(jdl) for jdl in jdls]
+  start = time.time()
+  for data in encoded:
+    decode(data)
+  decodeTime = time.time() - start
+  size = sum(len(data) for data in encoded)
+  print("%-20s %12d bytes %8.1f%% %10.1f us/JDL" % (name, size, 100. * size / sum(len(jdl) for jdl in jdls),
+                                                    1e6 * decodeTime / len(jdls)))
+
+
+def main():
+  args = Script.getPositionalArgs()
+  nbJDLs = int(args[0]) if args else 10000
+  if len(args) > 1:
+    jdls = []
+    for fileName in args[1:]:
+      with open(fileName) as jdlFile:
+        jdls.append(jdlFile.read())
+  else:
+    jdls = readJDLsFromDB(nbJDLs)
+  if len(jdls) < 2:
+    print("Not enough JDLs")
+    sys.exit(1)
+
+  # Train on the oldest half, measure on the newest half
+  trainingJDLs = jdls[len(jdls) // 2:]
+  jdls = jdls[:len(jdls) // 2]
+  print("%d JDLs, %.0f bytes on average" % (len(jdls), sum(len(jdl) for jdl in jdls) / len(jdls)))
+
+  def extract(data, dictionaries=None):
+    result = JDLCompression.extractJDL(data, dictionaries)
+    assert result['OK'], result['Message']
+
+  measure('Text', jdls, lambda jdl: jdl, extract)
+  measure('Text base64', jdls, lambda jdl: base64.b64encode(zlib.compress(jdl.encode(), -1)), extract)
+  measure('Binary', jdls, JDLCompression.compressJDL, extract)
+  if JDLCompression.DICTIONARY_SUPPORTED:
+    start = time.time()
+    dictionary = JDLCompression.trainDictionary(trainingJDLs)
+    print("Dictionary of %d bytes trained on %d JDLs in %.2f s" %
+          (len(dictionary), len(trainingJDLs), time.time() - start))
+    measure('Binary dictionary', jdls, lambda jdl: JDLCompression.compressJDL(jdl, 1, dictionary),
+            lambda data: extract(data, {1: dictionary}))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+""" Benchmark of the bulk insertions and updates of the MySQL class.
+
+    It compares, in rows per second:
+
+      * insertFields called for each row with insertMany, on a table shaped like JobParameters
+      * updateFields called for each row with updateMany
+      * insertMany with ON DUPLICATE KEY UPDATE, like JobDB.setJobParameters does
+
+    Usage::
+
+      python benchmarkMySQLBulk.py [nbOfRows]
+
+    It needs a MySQL server, configured like for the integration tests
+    (/Systems/Databases/Host, User, Password and Port, by default mysql, Dirac, Dirac, 3306).
+    The table BenchmarkBulk is created (and dropped) in the AccountingDB database.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+import time
+
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine()
+
+from DIRAC import gConfig
+from DIRAC.Core.Utilities.MySQL import MySQL
+
+TABLE = 'BenchmarkBulk'
+TABLE_DEFINITION = {TABLE: {'Fields': {'JobID': "INT(11) UNSIGNED NOT NULL",
+                                       'Name': "VARCHAR(100) NOT NULL",
+                                       'Value': "BLOB NOT NULL"},
+                            'PrimaryKey': ['JobID', 'Name']}}
+
+
+def getDB():
+  """ Return a MySQL object on the test database """
+  host = gConfig.getValue('/Systems/Databases/Host', 'mysql')
+  user = gConfig.getValue('/Systems/Databases/User', 'Dirac')
+  password = gConfig.getValue('/Systems/Databases/Password', 'Dirac')
+  port = gConfig.getValue('/Systems/Databases/Port', 3306)
+  return MySQL(host, user, password, 'AccountingDB', port)
+
+
+def bench(name, func, nbRows):
+  """ Time func and print the rows per second """
+  start = time.time()
+  result = func()
+  elapsed = time.time() - start
+  assert result['OK'], result['Message']
+  print("%-30s %8d rows in %7.2f s: %10.0f rows/s" % (name, nbRows, elapsed, nbRows / elapsed))
+  return nbRows / elapsed
+
+
+def insertLoop(mysqlDB, rows):
+  """ One insertFields per row, as before """
+  for row in rows:
+    result = mysqlDB.insertFields(TABLE, ['JobID', 'Name', 'Value'], list(row))
+    if not result['OK']:
+      return result
+  return result
+
+
+def updateLoop(mysqlDB, rows):
+  """ One updateFields per row, as before """
+  for value, jobID, name in rows:
+    result = mysqlDB.updateFields(TABLE, ['Value'], [value], {'JobID': jobID, 'Name': name})
+    if not result['OK']:
+      return result
+  return result
+
+
+def main():
+  nbRows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+  mysqlDB = getDB()
+  rows = [(jobID // 10, 'Parameter%d' % (jobID % 10), 'Some value for %d' % jobID) for jobID in range(nbRows)]
+  updates = [('New value for %d' % jobID, jobID // 10, 'Parameter%d' % (jobID % 10)) for jobID in range(nbRows)]
+
+  results = []
+  for label, before, after in (('insert', lambda: insertLoop(mysqlDB, rows),
+                                lambda: mysqlDB.insertMany(TABLE, ['JobID', 'Name', 'Value'], rows)),
+                               ('update', lambda: updateLoop(mysqlDB, updates),
+                                lambda: mysqlDB.updateMany(TABLE, ['Value'], ['JobID', 'Name'], updates))):
+    mysqlDB._createTables(TABLE_DEFINITION, force=True)
+    if label == 'update':
+      mysqlDB.insertMany(TABLE, ['JobID', 'Name', 'Value'], rows)
+    rowsPerSecBefore = bench('%sFields loop' % label, before, nbRows)
+    mysqlDB._createTables(TABLE_DEFINITION, force=True)
+    if label == 'update':
+      mysqlDB.insertMany(TABLE, ['JobID', 'Name', 'Value'], rows)
+    rowsPerSecAfter = bench('%sMany' % label, after, nbRows)
+    results.append((label, rowsPerSecAfter / rowsPerSecBefore))
+
+  bench('insertMany on duplicate key',
+        lambda: mysqlDB.insertMany(TABLE, ['JobID', 'Name', 'Value'], rows, updateFields=['Value']),
+        nbRows)
+
+  for label, speedup in results:
+    print("%s: x%.1f" % (label, speedup))
+
+  mysqlDB._update('DROP TABLE `%s`' % TABLE)
+
+
+if __name__ == "__main__":
+  main()
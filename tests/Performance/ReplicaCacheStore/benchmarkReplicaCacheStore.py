@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+""" Compare the replica cache of the TransformationAgent stored in pickle files with the ReplicaCacheStore.
+
+    The cycles of the agent are simulated on one transformation with nbOfFiles cached LFNs:
+    at each cycle, the replicas of chunkSize LFNs are read, the replicas of chunkSize new LFNs
+    are added and the chunkSize LFNs put in tasks are removed. With the pickle files, as done before
+    the ReplicaCacheStore, the cache is loaded whole when the agent starts, and written whole after
+    each change.
+
+    Usage::
+
+      python benchmarkReplicaCacheStore.py [nbOfFiles] [chunkSize] [nbOfCycles]
+
+    It prints the time to load the cache, the time per cycle and the size of the files.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import datetime
+import os
+import pickle
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from DIRAC.TransformationSystem.Utilities.ReplicaCacheStore import ReplicaCacheStore
+
+TRANS_ID = 1
+SES = ['CERN-DST', 'CNAF-DST', 'GRIDKA-DST', 'IN2P3-DST', 'PIC-DST', 'RAL-DST', 'SARA-DST']
+VALIDITY = 2 * 86400
+
+
+def makeReplicas(first, nbFiles):
+  """ Replicas of nbFiles LFNs, on 2 or 3 SEs """
+  return dict(('/lhcb/LHCb/Collision18/CHARM.MDST/00075000/%04d/00075000_%08d_1.charm.mdst' % (i // 10000, i),
+               random.sample(SES, random.randint(2, 3))) for i in range(first, first + nbFiles))
+
+
+def writePickle(fileName, cache):
+  """ Write the cache of a transformation like the TransformationAgent did """
+  with open(fileName + '.tmp', 'wb') as fd:
+    pickle.dump(cache, fd)
+  os.rename(fileName + '.tmp', fileName)
+
+
+def benchmarkPickle(fileName, replicas, chunkSize, nbCycles):
+  """ Cache of { updateTime: { lfn: SEs } } in a pickle file """
+  writePickle(fileName, {datetime.datetime.utcnow(): replicas})
+  start = time.time()
+  with open(fileName, 'rb') as fd:
+    cache = pickle.load(fd)
+  loadTime = time.time() - start
+
+  nextLFN = len(replicas)
+  start = time.time()
+  for _ in range(nbCycles):
+    cachedReplicas = {}
+    for cachedSet in cache.values():
+      cachedReplicas.update(cachedSet)
+    lfns = random.sample(list(cachedReplicas), chunkSize)
+    found = dict((lfn, cachedReplicas[lfn]) for lfn in lfns if lfn in cachedReplicas)
+    assert len(found) == chunkSize
+    cache[datetime.datetime.utcnow()] = makeReplicas(nextLFN, chunkSize)
+    nextLFN += chunkSize
+    writePickle(fileName, cache)
+    for lfn in lfns:
+      for cachedSet in cache.values():
+        cachedSet.pop(lfn, None)
+    writePickle(fileName, cache)
+  return loadTime, (time.time() - start) / nbCycles
+
+
+def benchmarkStore(fileName, replicas, chunkSize, nbCycles):
+  """ Cache of the records of the LFNs in the ReplicaCacheStore """
+  store = ReplicaCacheStore(fileName)
+  assert store.addReplicas(TRANS_ID, replicas)['OK']
+  store.close()
+  start = time.time()
+  store = ReplicaCacheStore(fileName)
+  # Nothing is loaded before the first read
+  assert store.countReplicas(TRANS_ID)['OK']
+  loadTime = time.time() - start
+
+  cachedLFNs = list(replicas)
+  nextLFN = len(replicas)
+  start = time.time()
+  for _ in range(nbCycles):
+    lfns = random.sample(cachedLFNs, chunkSize)
+    result = store.getReplicas(TRANS_ID, lfns, VALIDITY)
+    assert len(result['Value']) == chunkSize
+    newReplicas = makeReplicas(nextLFN, chunkSize)
+    nextLFN += chunkSize
+    assert store.addReplicas(TRANS_ID, newReplicas)['OK']
+    assert store.removeReplicas(TRANS_ID, lfns)['Value'] == chunkSize
+    removed = set(lfns)
+    cachedLFNs = [lfn for lfn in cachedLFNs if lfn not in removed] + list(newReplicas)
+  cycleTime = (time.time() - start) / nbCycles
+  store.close()
+  return loadTime, cycleTime
+
+
+def fileSize(fileName):
+  """ Size of a file, with the WAL file of sqlite """
+  return sum(os.path.getsize(name) for name in (fileName, fileName + '-wal') if os.path.exists(name))
+
+
+def main():
+  if len(sys.argv) > 1 and sys.argv[1] in ('-h', '--help'):
+    print(__doc__)
+    sys.exit(0)
+  nbFiles = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+  chunkSize = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+  nbCycles = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+  random.seed(1)
+  replicas = makeReplicas(0, nbFiles)
+  print("%d cached LFNs, %d LFNs read, added and removed per cycle, %d cycles" % (nbFiles, chunkSize, nbCycles))
+  workDir = tempfile.mkdtemp()
+  try:
+    for name, benchmark, fileName in [('pickle', benchmarkPickle, 'ReplicaCache_%d.pkl' % TRANS_ID),
+                                      ('ReplicaCacheStore', benchmarkStore, 'ReplicaCache.db')]:
+      fileName = os.path.join(workDir, fileName)
+      loadTime, cycleTime = benchmark(fileName, dict(replicas), chunkSize, nbCycles)
+      size = fileSize(fileName) / 1024. ** 2
+      print("%-20s load %8.3f s  cycle %8.3f s  file %8.1f MB" % (name, loadTime, cycleTime, size))
+  finally:
+    shutil.rmtree(workDir)
+
+
+if __name__ == "__main__":
+  main()
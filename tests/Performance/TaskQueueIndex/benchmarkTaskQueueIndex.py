@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+""" Replay recorded resource descriptions against the TaskQueueDB and the in memory TaskQueueIndex.
+
+    For each resource description, it compares the task queues selected by the SQL query of
+    TaskQueueDB.matchAndGetTaskQueue with the ones selected by TaskQueueIndex.match,
+    and the time taken by both. Nothing is modified in the DB: no job is taken out of the task queues.
+
+    Usage::
+
+      python benchmarkTaskQueueIndex.py resourceDescriptions.json [nbOfReplays]
+
+    The JSON file contains a list of resource descriptions, as given by the Matcher to
+    TaskQueueDB.matchAndGetJob, for instance::
+
+      [{"Setup": "Production", "CPUTime": 1728000, "Site": "LCG.CERN.cern", "GridCE": "ce503.cern.ch",
+        "Platform": ["x86_64-centos7"], "Tag": ["MultiProcessor", "8Processors"]},
+       {"Setup": "Production", "CPUTime": 86400, "Site": "LCG.RAL.uk", "OwnerGroup": "lhcb_user"}]
+
+    It needs the TaskQueueDB, configured like for the integration tests, ideally filled
+    with the task queues of a production instance.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import sys
+import time
+
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine()
+
+from DIRAC.WorkloadManagementSystem.DB.TaskQueueDB import TaskQueueDB
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
+
+
+def timeMatches(matchFunc, descriptions, nbReplays):
+  """ Return the matches per second of matchFunc over the descriptions """
+  start = time.time()
+  for _ in range(nbReplays):
+    for description in descriptions:
+      result = matchFunc(description)
+      assert result['OK'], result['Message']
+  return nbReplays * len(descriptions) / (time.time() - start)
+
+
+def main():
+  if len(sys.argv) < 2:
+    print(__doc__)
+    sys.exit(1)
+  with open(sys.argv[1]) as descriptionFile:
+    descriptions = json.load(descriptionFile)
+  nbReplays = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+  tqDB = TaskQueueDB()
+  tqIndex = TaskQueueIndex(tqDB)
+  start = time.time()
+  result = tqIndex.refresh(force=True)
+  assert result['OK'], result['Message']
+  print("Index of %d task queues loaded in %.2f s" % (len(tqIndex), time.time() - start))
+
+  # Same task queues selected, ignoring the order which is random
+  differences = 0
+  for description in descriptions:
+    sqlTQs = tqDB.matchAndGetTaskQueue(description, numQueuesToGet=0)
+    indexTQs = tqIndex.match(description, numQueuesToGet=0)
+    if sqlTQs['OK'] != indexTQs['OK'] or \
+            sqlTQs['OK'] and set(sqlTQs['Value']) != set(indexTQs['Value']):
+      differences += 1
+      print("Different task queues for %s:\n  SQL: %s\n  index: %s" % (description, sqlTQs, indexTQs))
+  descriptions = [description for description in descriptions
+                  if tqDB.matchAndGetTaskQueue(description, numQueuesToGet=0)['OK']]
+
+  sqlRate = timeMatches(lambda description: tqDB.matchAndGetTaskQueue(description, numQueuesToGet=10),
+                        descriptions, nbReplays)
+  indexRate = timeMatches(lambda description: tqIndex.match(description, numQueuesToGet=10),
+                          descriptions, nbReplays)
+  print("%d resource descriptions replayed %d times, %d with different task queues" %
+        (len(descriptions), nbReplays, differences))
+  print("%-10s %10.0f matches/s" % ('SQL', sqlRate))
+  print("%-10s %10.0f matches/s" % ('Index', indexRate))
+  print("x%.1f" % (indexRate / sqlRate))
+
+
+if __name__ == "__main__":
+  main()